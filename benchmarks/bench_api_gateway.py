@@ -0,0 +1,88 @@
+"""Benchmark: Workshop create throughput with a slow API server.
+
+Runs the real ``workshop_create_handler`` for a burst of Workshops against a
+fake API that adds a fixed latency to every call, once with the API calls made
+inline on the event loop (the old behaviour) and once through the bounded
+``ApiGateway`` executor.
+
+Usage:
+    python benchmarks/bench_api_gateway.py [--workshops 200] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable
+
+from fakes import FakeKubernetesApi, workshop_spec
+
+from handlers.workshop import workshop_create_handler
+from utils.k8s_client import configure_gateway, shutdown_gateway
+
+
+class InlineExecutor(Executor):
+    """Executor that runs each call immediately on the calling thread."""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+async def create_burst(workshops: int) -> float:
+    """Create ``workshops`` Workshops concurrently; return elapsed seconds."""
+    async def create_one(index: int) -> None:
+        patch: dict = {}
+        await workshop_create_handler(
+            spec=workshop_spec(index),
+            meta={'creationTimestamp': ''},
+            patch=patch,
+            status={},
+            namespace='bench',
+            name=f"bench-{index:05d}",
+        )
+        assert patch['status']['phase'] != 'Failed', patch['status']
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create_one(i) for i in range(workshops)))
+    return time.perf_counter() - started
+
+
+def run(workshops: int, latency: float, workers: int) -> None:
+    print(f"{workshops} workshops, {latency * 1000:.0f} ms API latency per call")
+    print(f"{'mode':<24}{'seconds':>10}{'workshops/s':>14}{'calls':>8}")
+
+    modes = [
+        ('blocking (inline)', {'executor': InlineExecutor()}),
+        (f"gateway ({workers} workers)", {'max_workers': workers}),
+    ]
+    for label, options in modes:
+        fake = FakeKubernetesApi(latency=latency)
+        # Measure raw throughput, without client-side write limiting
+        configure_gateway(
+            apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None,
+            **options
+        )
+        elapsed = asyncio.run(create_burst(workshops))
+        shutdown_gateway()
+        print(
+            f"{label:<24}{elapsed:>10.2f}{workshops / elapsed:>14.1f}"
+            f"{fake.count():>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+    run(args.workshops, args.latency, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: provisioning a whole class as one WorkshopCohort reconcile.
+
+Runs ``cohort_create_handler`` once for an N-seat cohort against the fake API
+and reports wall time, API calls and the size of the resulting status patch.
+
+Usage:
+    python benchmarks/bench_cohort.py [--seats 300] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from fakes import FakeKubernetesApi
+
+from handlers.cohort import cohort_create_handler
+from utils.k8s_client import configure_gateway, shutdown_gateway
+
+
+def run(seats: int, latency: float, parallelism: int) -> None:
+    fake = FakeKubernetesApi(latency=latency)
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    patch: dict = {}
+    spec = {
+        'seats': seats,
+        'parallelism': parallelism,
+        'template': {'duration': '3h', 'storage': {'size': '10Gi'}},
+    }
+
+    started = time.perf_counter()
+    asyncio.run(cohort_create_handler(
+        spec=spec,
+        meta={'creationTimestamp': ''},
+        status={},
+        patch=patch,
+        namespace='bench',
+        name='bench-cohort',
+    ))
+    elapsed = time.perf_counter() - started
+    shutdown_gateway()
+
+    status = patch['status']
+    print(
+        f"{seats} seats, {latency * 1000:.0f} ms API latency, "
+        f"parallelism {parallelism}"
+    )
+    print("  reconciles:       1")
+    print(f"  wall time:        {elapsed:.2f} s")
+    print(f"  API calls:        {fake.count()} ({fake.count() / seats:.1f} per seat)")
+    print(f"  created/failed:   {status['createdSeats']}/{status['failedSeats']}")
+    print(f"  status patch:     {len(json.dumps(status))} bytes")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seats', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--parallelism', type=int, default=20)
+    args = parser.parse_args()
+    run(args.seats, args.latency, args.parallelism)
+
+
+if __name__ == '__main__':
+    main()
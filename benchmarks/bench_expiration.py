@@ -0,0 +1,139 @@
+"""Benchmark: expiring 10k workshops with one heap vs. per-object timers.
+
+Feeds N synthetic Workshops (expiresAt spread over ``--window`` seconds)
+through the operator's expiration tracking and lets them all expire, deleting
+each one through the fake API. For comparison it then runs the old model of
+one periodic timer task per Workshop, with the 300 s Kopf interval scaled
+down to ``--poll-interval`` so the run stays short.
+
+Usage:
+    python benchmarks/bench_expiration.py [--workshops 10000] [--window 5]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List
+
+from fakes import FakeKubernetesApi, percentile
+
+import handlers.cleanup as cleanup
+from utils.k8s_client import configure_gateway, shutdown_gateway
+from utils.scheduler import DeadlineScheduler
+
+
+def expires_at(epoch: float) -> str:
+    """Format a deadline the way the create handler stores it (naive UTC)."""
+    moment = datetime.fromtimestamp(epoch, timezone.utc)
+    return moment.replace(tzinfo=None).isoformat()
+
+
+async def run_heap(deadlines: List[float]) -> Dict[str, float]:
+    fake = FakeKubernetesApi()
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    for index in range(len(deadlines)):
+        fake.objects[('workshops', 'bench', f"ws-{index}")] = {}
+
+    lateness: List[float] = []
+    by_key: Dict[Hashable, float] = {}
+
+    async def record_and_expire(key: Hashable) -> None:
+        lateness.append(time.time() - by_key[key])
+        await cleanup.expire_resource(key)
+
+    cleanup._scheduler = DeadlineScheduler(record_and_expire)
+    cleanup.start_expiration_scheduler()
+
+    for index, deadline in enumerate(deadlines):
+        name = f"ws-{index}"
+        by_key[('workshops', 'bench', name)] = deadline
+        cleanup.track_expiration(
+            'workshops', None, {}, {'expiresAt': expires_at(deadline)}, 'bench', name
+        )
+
+    while len(lateness) < len(deadlines):
+        await asyncio.sleep(0.05)
+    stats = cleanup._scheduler.stats()
+    await cleanup.stop_expiration_scheduler()
+    shutdown_gateway()
+
+    return {
+        'tasks': 1,
+        'wakeups': stats['wakeups'],
+        'deleted': fake.count('delete'),
+        'p50': percentile(lateness, 0.5),
+        'p99': percentile(lateness, 0.99),
+        'max': max(lateness),
+    }
+
+
+async def run_polling(deadlines: List[float], interval: float) -> Dict[str, float]:
+    wakeups = 0
+    lateness: List[float] = []
+
+    async def timer(deadline: float) -> None:
+        nonlocal wakeups
+        # Kopf timers start at a random offset relative to the deadline
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            wakeups += 1
+            now = time.time()
+            if now >= deadline:
+                lateness.append(now - deadline)
+                return
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*(timer(deadline) for deadline in deadlines))
+    return {
+        'tasks': len(deadlines),
+        'wakeups': wakeups,
+        'deleted': 0,
+        'p50': percentile(lateness, 0.5),
+        'p99': percentile(lateness, 0.99),
+        'max': max(lateness),
+    }
+
+
+def run(workshops: int, window: float, poll_interval: float) -> None:
+    def make_deadlines() -> List[float]:
+        start = time.time() + 0.5
+        return [start + random.uniform(0, window) for _ in range(workshops)]
+
+    heap = asyncio.run(run_heap(make_deadlines()))
+    polling = asyncio.run(run_polling(make_deadlines(), poll_interval))
+
+    print(
+        f"{workshops} workshops expiring over {window:.0f}s; per-object timer "
+        f"interval scaled to {poll_interval}s"
+    )
+    print(
+        f"{'mode':<20}{'tasks':>8}{'wakeups':>10}{'deleted':>9}"
+        f"{'p50 late':>11}{'p99 late':>11}{'max late':>11}"
+    )
+    for label, result in (('heap scheduler', heap), ('per-object timers', polling)):
+        print(
+            f"{label:<20}{result['tasks']:>8}{result['wakeups']:>10}"
+            f"{result['deleted']:>9}{result['p50']:>10.3f}s"
+            f"{result['p99']:>10.3f}s{result['max']:>10.3f}s"
+        )
+    print(
+        f"lateness is in seconds; at the production 300s interval the timer "
+        f"figures scale by {300 / poll_interval:.0f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=10000)
+    parser.add_argument('--window', type=float, default=5.0)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    args = parser.parse_args()
+    run(args.workshops, args.window, args.poll_interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Benchmark: hibernating idle workshops and waking them again.
+
+Provisions N running workshops against the fake API, marks a share of them
+idle in a static activity source and runs the idle detector twice, an idle
+timeout apart. Reports the API calls per hibernation, the capacity the
+ledger gets back (and how many more seats fit on the same nodes), and the
+calls to wake a sample of the hibernated workshops through the wake-up
+server and wake handler.
+
+Usage:
+    python benchmarks/bench_hibernation.py [--workshops 400] [--idle 0.5]
+        [--latency 0.005]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+import kopf
+from fakes import FakeKubernetesApi, workshop_spec
+
+from handlers.capacity import (
+    get_ledger,
+    start_admission_control,
+    workshop_capacity_event,
+    workshop_demand,
+)
+from handlers.hibernation import (
+    WAKE_ANNOTATION,
+    IdleDetector,
+    WakeServer,
+    workshop_wake_handler,
+)
+from handlers.readiness import deployment_readiness_event
+from handlers.workshop import build_create_plan
+from resources.ingress import workshop_host
+from resources.owner import owner_reference
+from utils.activity import Activity, StaticActivitySource
+from utils.k8s_client import configure_gateway, get_gateway, shutdown_gateway
+
+
+NAMESPACE = 'bench'
+IDLE_TIMEOUT = 1800.0
+WAKE_SERVICE = {'service': 'orchestra-wake', 'namespace': 'orchestra-system'}
+
+
+def workshop_name(index: int) -> str:
+    return f"ws-{index:05d}"
+
+
+async def provision(fake: FakeKubernetesApi, workshops: int) -> None:
+    async def create_one(index: int) -> None:
+        spec = workshop_spec(index)
+        name = workshop_name(index)
+        fake.objects[('workshops', NAMESPACE, name)] = {
+            'metadata': {
+                'name': name, 'namespace': NAMESPACE, 'uid': f"uid-{index}"
+            },
+            'spec': spec,
+            'status': {'phase': 'Running'},
+        }
+        await build_create_plan(
+            get_gateway(), spec['name'], NAMESPACE, spec,
+            owner=owner_reference('Workshop', name, f"uid-{index}")
+        ).run()
+
+    await asyncio.gather(*(create_one(index) for index in range(workshops)))
+
+
+async def sync_ledger(fake: FakeKubernetesApi, workshops: int) -> None:
+    """Feed every Workshop's current state to the capacity ledger."""
+    for index in range(workshops):
+        name = workshop_name(index)
+        workshop = fake.objects[('workshops', NAMESPACE, name)]
+        await workshop_capacity_event(
+            type='MODIFIED', namespace=NAMESPACE, name=name,
+            spec=workshop['spec'], status=workshop['status'],
+        )
+
+
+async def wake(fake: FakeKubernetesApi, server: WakeServer, index: int) -> int:
+    """Wake one hibernated workshop as Kopf would; return the handler runs."""
+    name = workshop_name(index)
+    key = ('workshops', NAMESPACE, name)
+    spec = fake.objects[key]['spec']
+    await server.wake(workshop_host(spec['name'], spec['ingress']))
+    runs = 0
+    while True:
+        workshop = fake.objects[key]
+        patch: Dict[str, Any] = {}
+        runs += 1
+        try:
+            await workshop_wake_handler(
+                new=workshop['metadata']['annotations'][WAKE_ANNOTATION],
+                spec=spec, meta=workshop['metadata'], status=workshop['status'],
+                patch=patch, namespace=NAMESPACE, name=name,
+            )
+        except kopf.TemporaryError:
+            # The pod comes up between retries
+            await deployment_readiness_event(
+                type='MODIFIED', namespace=NAMESPACE,
+                labels={'workshop': spec['name']}, spec={'replicas': 1},
+                status={'readyReplicas': 1, 'availableReplicas': 1},
+                workshop_phases={},
+            )
+        finally:
+            await get_gateway().custom.patch_namespaced_custom_object(
+                group='orchestra.io', version='v1', namespace=NAMESPACE,
+                plural='workshops', name=name, body=patch
+            )
+        if 'hibernation' in patch.get('status', {}):
+            return runs
+
+
+async def scenario(args: argparse.Namespace) -> None:
+    fake = FakeKubernetesApi(latency=args.latency)
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    await provision(fake, args.workshops)
+
+    # Nodes with room for exactly the provisioned workshops
+    os.environ['ORCHESTRA_ADMISSION_HEADROOM'] = '1'
+    start_admission_control()
+    ledger = get_ledger()
+    cpu, memory = workshop_demand(workshop_spec(0))
+    ledger.set_node('node', (cpu * args.workshops, memory * args.workshops))
+    await sync_ledger(fake, args.workshops)
+    reserved_before = ledger.reserved_cpu
+
+    idle = int(args.workshops * args.idle)
+    source = StaticActivitySource()
+    for index in range(args.workshops):
+        busy = index >= idle
+        source.set(
+            (NAMESPACE, workshop_spec(index)['name']),
+            Activity(2.0, 0.4) if busy else Activity(0.0, 0.001)
+        )
+    detector = IdleDetector(source, WAKE_SERVICE, default_timeout=IDLE_TIMEOUT)
+
+    before = fake.count()
+    started = time.perf_counter()
+    await detector.check(now=0.0)
+    first = fake.count() - before
+    hibernated = await detector.check(now=IDLE_TIMEOUT)
+    elapsed = time.perf_counter() - started
+    calls = fake.count() - before - first
+
+    await sync_ledger(fake, args.workshops)
+    scaled_down = sum(
+        1 for (kind, _, _), obj in fake.objects.items()
+        if kind == 'deployment' and obj['spec']['replicas'] == 0
+    )
+    free_cpu, free_memory = ledger.free()
+    extra_seats = min(free_cpu // cpu, free_memory // memory)
+
+    print(
+        f"{args.workshops} running workshops, {idle} idle, "
+        f"{args.latency * 1000:.0f} ms API latency"
+    )
+    print(
+        f"idle checks        {elapsed:.2f}s, {first} calls for the first check, "
+        f"{calls} for the second"
+    )
+    print(
+        f"hibernated         {len(hibernated)} workshops, {scaled_down} "
+        f"Deployments at 0 replicas, "
+        # One LIST of the workshops per check, the rest per workshop
+        f"{(calls - 1) / max(len(hibernated), 1):.2f} calls each"
+    )
+    print(
+        f"ledger CPU         {reserved_before / 1000:.1f} -> "
+        f"{ledger.reserved_cpu / 1000:.1f} cores reserved; "
+        f"{extra_seats} more seats fit "
+        f"({(args.workshops + extra_seats) / args.workshops:.2f}x)"
+    )
+
+    # What the wake-up server learns from Workshop watch events
+    server = WakeServer()
+    for index in range(idle):
+        spec = workshop_spec(index)
+        server.track(
+            workshop_host(spec['name'], spec['ingress']),
+            (NAMESPACE, workshop_name(index)), hibernated=True
+        )
+
+    sample = list(range(min(idle, args.wakes)))
+    before = fake.count()
+    runs: List[int] = []
+    started = time.perf_counter()
+    for index in sample:
+        runs.append(await wake(fake, server, index))
+    elapsed = time.perf_counter() - started
+    calls = fake.count() - before
+    await sync_ledger(fake, args.workshops)
+    if sample:
+        print(
+            f"woken              {len(sample)} workshops in {elapsed:.2f}s, "
+            f"{calls / len(sample):.2f} calls and "
+            f"{sum(runs) / len(sample):.1f} handler runs each; ledger back to "
+            f"{ledger.reserved_cpu / 1000:.1f} cores"
+        )
+    shutdown_gateway()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=400)
+    parser.add_argument('--idle', type=float, default=0.5,
+                        help='share of workshops that are idle')
+    parser.add_argument('--wakes', type=int, default=20,
+                        help='hibernated workshops to wake again')
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(scenario(args))
+
+
+if __name__ == '__main__':
+    main()
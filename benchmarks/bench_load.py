@@ -0,0 +1,398 @@
+"""Load test: workshop storms against the fake API server.
+
+Runs the real handlers from ``src/handlers/`` against the in-process fake API
+with configurable latency and injected 500s and 429s. Watch events from the
+fake stand in for Kopf: a created Deployment becomes ready ``--pod-start``
+seconds later and is fed to the readiness handler, and a deleted Workshop
+runs the delete handler. Handlers that raise ``kopf.TemporaryError`` are
+retried after their delay, as Kopf would.
+
+Scenarios:
+
+- ``storm``: ``--workshops`` Workshops created at an even rate over
+  ``--window`` seconds; reports time from creation to Ready
+- ``expiry``: as many running Workshops expiring over ``--window`` seconds;
+  reports time from deadline to the delete handler finishing
+
+Each scenario reports p50/p99 latency, API calls per workshop, injected
+failures and peak memory. Peak memory is the process's peak RSS, which
+carries over between scenarios; ``--trace-memory`` reports the peak
+allocated by each scenario instead, but tracemalloc slows the run down
+enough to inflate the latencies.
+
+Usage:
+    python benchmarks/bench_load.py [--scenario all] [--workshops 500]
+        [--window 10] [--latency 0.02] [--throttle-rate 0.01]
+        [--error-rate 0] [--write-qps 0] [--trace-memory]
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import kopf
+from fakes import FakeKubernetesApi, object_labels, percentile, workshop_spec
+
+import handlers.cleanup as cleanup
+from handlers.readiness import deployment_readiness_event, workshop_readiness_event
+from handlers.workshop import (
+    build_create_plan,
+    workshop_create_handler,
+    workshop_delete_handler,
+)
+from utils.k8s_client import configure_gateway, get_gateway, shutdown_gateway
+from utils.ratelimit import WriteScheduler
+
+
+NAMESPACE = 'load'
+
+# Extra readiness events sent when a readiness patch failed, as the
+# Deployment's later status changes would
+READINESS_EVENTS = 50
+
+ObjectKey = Tuple[str, str, str]
+
+
+def timestamp(epoch: float) -> str:
+    """Format an epoch time as an ISO 8601 UTC timestamp."""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def workshop_name(index: int) -> str:
+    return workshop_spec(index)['name']
+
+
+async def kopf_retry(handler: Callable[[], Awaitable[Any]]) -> int:
+    """
+    Run a handler until it stops raising ``kopf.TemporaryError``.
+
+    Returns:
+        Number of retries
+    """
+    retries = 0
+    while True:
+        try:
+            await handler()
+            return retries
+        except kopf.TemporaryError as e:
+            retries += 1
+            await asyncio.sleep(e.delay or 1.0)
+
+
+class Cluster:
+    """
+    Drives the handlers from the fake API's changes, as Kopf's watches would.
+
+    Workshop objects are seeded into the fake directly; their status is
+    tracked here so the readiness handler sees the index Kopf would give it.
+    """
+
+    def __init__(self, fake: FakeKubernetesApi, pod_start: float) -> None:
+        self.fake = fake
+        self.pod_start = pod_start
+        self.loop = asyncio.get_running_loop()
+        self.phases: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.created_at: Dict[str, float] = {}
+        self.ready_at: Dict[str, float] = {}
+        self.deadlines: Dict[str, float] = {}
+        self.gone_at: Dict[str, float] = {}
+        self.failed = 0
+        self.retries = 0
+        self._tasks: set = set()
+        fake.watch(self._on_change)
+
+    def seed_workshop(
+        self,
+        index: int,
+        status: Optional[Dict[str, Any]] = None
+    ) -> None:
+        name = workshop_name(index)
+        self.fake.objects[('workshops', NAMESPACE, name)] = {
+            'metadata': {
+                'name': name, 'namespace': NAMESPACE, 'uid': f"uid-{index}"
+            },
+            'spec': workshop_spec(index),
+            'status': status or {},
+        }
+        self._set_phase(name, (status or {}).get('phase'))
+
+    def _set_phase(
+        self,
+        name: str,
+        phase: Optional[str],
+        ready: bool = False
+    ) -> None:
+        self.phases[(NAMESPACE, name)] = [{
+            'name': name,
+            'phase': phase,
+            'ready': ready,
+            'createdAt': timestamp(self.created_at.get(name, time.time())),
+        }]
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_change(self, verb: str, key: ObjectKey, obj: Any) -> None:
+        # Called on an executor thread
+        self.loop.call_soon_threadsafe(self._dispatch, verb, key, obj)
+
+    def _dispatch(self, verb: str, key: ObjectKey, obj: Any) -> None:
+        kind, _, name = key
+        if kind == 'deployment' and verb == 'create':
+            self._spawn(self._start_pod(object_labels(obj)['workshop']))
+        elif kind == 'workshops' and verb == 'patch':
+            status = obj.get('status') or {}
+            if status.get('phase') in ('Ready', 'Running'):
+                self._mark_ready(name, status['phase'])
+        elif kind == 'workshops' and verb == 'delete':
+            self._spawn(self._delete(name))
+
+    def _mark_ready(self, name: str, phase: str) -> None:
+        self.ready_at.setdefault(name, time.time())
+        self._set_phase(name, phase, ready=True)
+
+    async def _start_pod(self, name: str) -> None:
+        await asyncio.sleep(self.pod_start)
+        for _ in range(READINESS_EVENTS):
+            if name in self.ready_at:
+                return
+            # Before the create handler has finished this only records the
+            # observed phase, which the handler then reports itself
+            await deployment_readiness_event(
+                type='MODIFIED',
+                namespace=NAMESPACE,
+                labels={'workshop': name, 'component': 'rstudio'},
+                spec={'replicas': 1},
+                status={'readyReplicas': 1, 'availableReplicas': 1},
+                workshop_phases=self.phases,
+            )
+            await asyncio.sleep(0.1)
+
+    async def create(self, index: int) -> None:
+        """Run the create handler for Workshop ``index`` and apply its patch."""
+        name = workshop_name(index)
+        spec = workshop_spec(index)
+        self.created_at[name] = time.time()
+        meta = {
+            'uid': f"uid-{index}",
+            'creationTimestamp': timestamp(self.created_at[name]),
+        }
+        self.seed_workshop(index)
+        patch: Dict[str, Any] = {}
+
+        async def handler() -> None:
+            await workshop_create_handler(
+                spec=spec, meta=meta, patch=patch, status={},
+                namespace=NAMESPACE, name=name,
+            )
+
+        self.retries += await kopf_retry(handler)
+        status = patch.get('status') or {}
+        if status.get('phase') == 'Failed':
+            self.failed += 1
+            return
+        if status.get('phase') in ('Ready', 'Running'):
+            self._mark_ready(name, status['phase'])
+            return
+        # Kopf applies the patch; the resulting Workshop event lets the
+        # readiness handler catch up with a pod that is already ready
+        self._set_phase(name, status.get('phase'))
+        await workshop_readiness_event(
+            type='MODIFIED', namespace=NAMESPACE, name=name, spec=spec,
+            meta=meta, status=status,
+        )
+
+    async def _delete(self, name: str) -> None:
+        async def handler() -> None:
+            await workshop_delete_handler(
+                meta={'uid': None}, namespace=NAMESPACE, name=name
+            )
+
+        try:
+            self.retries += await kopf_retry(handler)
+        except kopf.PermanentError:
+            self.failed += 1
+            return
+        self.gone_at[name] = time.time()
+
+    async def drain(self) -> None:
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+
+def connect(args: argparse.Namespace) -> FakeKubernetesApi:
+    fake = FakeKubernetesApi(latency=args.latency, seed=args.seed)
+    limiter = (
+        WriteScheduler(args.write_qps, args.write_burst) if args.write_qps else None
+    )
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=limiter
+    )
+    return fake
+
+
+def inject(fake: FakeKubernetesApi, args: argparse.Namespace) -> None:
+    fake.error_rate = args.error_rate
+    fake.throttle_rate = args.throttle_rate
+    fake.retry_after = args.retry_after
+
+
+async def storm(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = connect(args)
+    inject(fake, args)
+    cluster = Cluster(fake, args.pod_start)
+    interval = args.window / args.workshops
+
+    async def arrive(index: int) -> None:
+        await asyncio.sleep(index * interval)
+        await cluster.create(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(arrive(index) for index in range(args.workshops)))
+    deadline = time.time() + args.timeout
+    while len(cluster.ready_at) + cluster.failed < args.workshops:
+        if time.time() > deadline:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    await cluster.drain()
+    shutdown_gateway()
+
+    latencies = [
+        cluster.ready_at[name] - cluster.created_at[name] for name in cluster.ready_at
+    ]
+    return {
+        'done': len(latencies), 'latencies': latencies, 'elapsed': elapsed,
+        'fake': fake, 'cluster': cluster,
+    }
+
+
+async def expiry(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = connect(args)
+    cluster = Cluster(fake, args.pod_start)
+    # Provision every workshop up front, without failures
+    await asyncio.gather(*(
+        build_create_plan(
+            get_gateway(), workshop_name(index), NAMESPACE,
+            workshop_spec(index)
+        ).run()
+        for index in range(args.workshops)
+    ))
+    for index in range(args.workshops):
+        cluster.seed_workshop(index, {'phase': 'Running'})
+    await cluster.drain()
+    calls_before = fake.count()
+    inject(fake, args)
+
+    cleanup._scheduler = None
+    cleanup.start_expiration_scheduler()
+    now = time.time() + 0.5
+    for index in range(args.workshops):
+        name = workshop_name(index)
+        cluster.deadlines[name] = now + index * args.window / args.workshops
+        cleanup.track_expiration(
+            'workshops', None, {},
+            {'expiresAt': timestamp(cluster.deadlines[name])},
+            NAMESPACE, name
+        )
+
+    started = time.perf_counter()
+    deadline = time.time() + args.window + args.timeout
+    while len(cluster.gone_at) + cluster.failed < args.workshops:
+        if time.time() > deadline:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    await cleanup.stop_expiration_scheduler()
+    await cluster.drain()
+    shutdown_gateway()
+
+    latencies = [
+        cluster.gone_at[name] - cluster.deadlines[name] for name in cluster.gone_at
+    ]
+    fake.calls = fake.calls[calls_before:]
+    return {
+        'done': len(latencies), 'latencies': latencies, 'elapsed': elapsed,
+        'fake': fake, 'cluster': cluster,
+    }
+
+
+SCENARIOS = {
+    'storm': ('time to Ready', storm),
+    'expiry': ('time to deleted', expiry),
+}
+
+
+def report(
+    name: str,
+    metric: str,
+    workshops: int,
+    result: Dict[str, Any],
+    peak: int
+) -> None:
+    fake: FakeKubernetesApi = result['fake']
+    cluster: Cluster = result['cluster']
+    latencies = result['latencies'] or [float('nan')]
+    print(f"{name}: {result['done']}/{workshops} done in {result['elapsed']:.2f}s")
+    print(
+        f"  {metric:<16} p50 {percentile(latencies, 0.5):.3f}s  "
+        f"p99 {percentile(latencies, 0.99):.3f}s  max {max(latencies):.3f}s"
+    )
+    calls = fake.count()
+    print(f"  API calls        {calls} ({calls / workshops:.2f} per workshop)")
+    print(
+        f"  injected         {fake.injected[429]} x 429, "
+        f"{fake.injected[500]} x 500; "
+        f"{cluster.retries} handler retries, {cluster.failed} failed"
+    )
+    print(f"  peak memory      {peak / 2 ** 20:.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=['all', *SCENARIOS], default='all')
+    parser.add_argument('--workshops', type=int, default=500)
+    parser.add_argument('--window', type=float, default=10.0)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--pod-start', type=float, default=0.5)
+    parser.add_argument('--throttle-rate', type=float, default=0.01)
+    parser.add_argument('--retry-after', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--write-qps', type=float, default=0.0)
+    parser.add_argument('--write-burst', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true')
+    args = parser.parse_args()
+    # Injected failures are logged as warnings by the handlers
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"{args.workshops} workshops over {args.window:g}s, "
+        f"{args.latency * 1000:.0f} ms API latency, "
+        f"{args.throttle_rate:.1%} 429s, {args.error_rate:.1%} 500s"
+    )
+    names = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+    for name in names:
+        metric, scenario = SCENARIOS[name]
+        if args.trace_memory:
+            tracemalloc.start()
+        result = asyncio.run(scenario(args))
+        if args.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            # ru_maxrss is in KiB on Linux
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        report(name, metric, args.workshops, result, peak)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Benchmark: default spreading vs bin-packed placement of cohort seats.
+
+Simulates a node inventory of ``--pools`` pools (zones) of ``--nodes``
+nodes each, and a stream of cohorts that arrive one per time step and
+expire after a random lifetime. Each seat's Deployment is rendered by the
+operator and scheduled by a small stand-in for kube-scheduler: nodes the
+pod fits on are scored by least-allocated resources (the default, which
+spreads pods) plus the node and pod affinity preferences of the pod
+template at twice that weight, as the default scheduler profile weighs
+them.
+
+This runs twice: once without placement, and once with the placement
+planner fed from the simulated nodes. Reports:
+
+- the mean number of nodes running at least one pod
+- how many nodes were left empty by cohort expiries (whole nodes the
+  cluster autoscaler could remove)
+- seats that fit on no node
+
+Usage:
+    python benchmarks/bench_placement.py [--pools 3] [--nodes 8]
+        [--cohorts 60] [--lifetime 8] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import heapq
+import logging
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import fakes  # noqa: F401  (puts the operator sources on sys.path)
+
+import handlers.placement as placement
+from handlers.cohort import COHORT_LABEL
+from handlers.placement import (
+    PlacementPlanner,
+    cohort_placement_event,
+    node_placement_event,
+    place_cohort,
+)
+from resources.cohort import iter_seat_specs, seat_names, seat_template
+from resources.manifests import render_workshop_manifests
+from utils.quantity import cpu_millis, memory_bytes
+
+
+NAMESPACE = 'bench'
+POOL_LABEL = 'topology.kubernetes.io/zone'
+
+# Weights of the default scheduler profile's score plugins
+RESOURCES_WEIGHT = 1
+AFFINITY_WEIGHT = 2
+
+
+class Node:
+    """A simulated node and the pods bound to it."""
+
+    def __init__(self, name: str, pool: str, cpu: int, memory: int) -> None:
+        self.name = name
+        self.labels = {POOL_LABEL: pool, 'kubernetes.io/hostname': name}
+        self.cpu = cpu
+        self.memory = memory
+        self.pods: Dict[str, Tuple[Dict[str, str], int, int]] = {}
+
+    def used(self) -> Tuple[int, int]:
+        return (
+            sum(pod[1] for pod in self.pods.values()),
+            sum(pod[2] for pod in self.pods.values()),
+        )
+
+    def fits(self, cpu: int, memory: int) -> bool:
+        used_cpu, used_memory = self.used()
+        return used_cpu + cpu <= self.cpu and used_memory + memory <= self.memory
+
+    def as_event(self) -> Dict[str, Any]:
+        return {
+            'labels': self.labels,
+            'spec': {},
+            'status': {
+                'allocatable': {'cpu': f"{self.cpu}m", 'memory': str(self.memory)},
+                'conditions': [{'type': 'Ready', 'status': 'True'}],
+            },
+        }
+
+
+def _matches(labels: Dict[str, str], selector: Dict[str, Any]) -> bool:
+    return all(
+        labels.get(key) == value
+        for key, value in (selector.get('matchLabels') or {}).items()
+    )
+
+
+def _normalized(scores: List[float]) -> List[float]:
+    top = max(scores, default=0)
+    return [100 * score / top if top else 0.0 for score in scores]
+
+
+def schedule(nodes: List[Node], pod: Dict[str, Any]) -> Optional[Node]:
+    """Bind a pod the way the default scheduler profile would score it."""
+    container = pod['spec']['containers'][0]
+    requests = container['resources']['requests']
+    cpu, memory = cpu_millis(requests['cpu']), memory_bytes(requests['memory'])
+    candidates = [node for node in nodes if node.fits(cpu, memory)]
+    if not candidates:
+        return None
+
+    affinity = pod['spec'].get('affinity') or {}
+    node_terms = (affinity.get('nodeAffinity') or {}).get(
+        'preferredDuringSchedulingIgnoredDuringExecution'
+    ) or []
+    pod_terms = (affinity.get('podAffinity') or {}).get(
+        'preferredDuringSchedulingIgnoredDuringExecution'
+    ) or []
+
+    least_allocated, node_affinity, pod_affinity = [], [], []
+    for node in candidates:
+        used_cpu, used_memory = node.used()
+        least_allocated.append(50 * (
+            (node.cpu - used_cpu - cpu) / node.cpu
+            + (node.memory - used_memory - memory) / node.memory
+        ))
+        node_affinity.append(sum(
+            term['weight'] for term in node_terms
+            if all(
+                node.labels.get(expression['key']) in expression['values']
+                for expression in term['preference']['matchExpressions']
+            )
+        ))
+        pod_affinity.append(sum(
+            term['weight'] for term in pod_terms
+            for labels, _, _ in node.pods.values()
+            if _matches(labels, term['podAffinityTerm']['labelSelector'])
+        ))
+
+    scores = [
+        RESOURCES_WEIGHT * resources + AFFINITY_WEIGHT * (by_node + by_pod)
+        for resources, by_node, by_pod in zip(
+            least_allocated, _normalized(node_affinity), _normalized(pod_affinity)
+        )
+    ]
+    best = max(range(len(candidates)), key=lambda index: scores[index])
+    node = candidates[best]
+    node.pods[pod['metadata']['labels']['workshop']] = (
+        pod['metadata']['labels'], cpu, memory
+    )
+    return node
+
+
+async def scenario(placed: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    nodes = [
+        Node(f"node-{pool}-{index:02d}", f"zone-{pool}", args.node_cpu,
+             memory_bytes(args.node_memory))
+        for pool in range(args.pools)
+        for index in range(args.nodes)
+    ]
+    placement._planner = PlacementPlanner(POOL_LABEL) if placed else None
+    for node in nodes:
+        await node_placement_event(type='ADDED', name=node.name, **node.as_event())
+
+    template = {
+        'image': 'rocker/rstudio:4.3',
+        'resources': {'cpuRequest': '500m', 'memoryRequest': '1Gi'},
+        'duration': '4h',
+    }
+    # (time, order, event, cohort name, seats)
+    timeline: List[Tuple[float, int, str, str, int]] = []
+    for index in range(args.cohorts):
+        name = f"cohort-{index:03d}"
+        seats = rng.randint(args.min_seats, args.max_seats)
+        lifetime = rng.uniform(args.lifetime / 2, args.lifetime * 1.5)
+        heapq.heappush(timeline, (float(index), 1, 'arrive', name, seats))
+        heapq.heappush(timeline, (index + lifetime, 0, 'expire', name, seats))
+
+    in_use: List[int] = []
+    freed = unschedulable = 0
+    while timeline:
+        _, _, event, name, seats = heapq.heappop(timeline)
+        spec = {'template': template, 'seats': seats}
+        if event == 'arrive':
+            cohort_placement = place_cohort(
+                NAMESPACE, name, template, seats, {COHORT_LABEL: name}
+            )
+            await cohort_placement_event(
+                type='ADDED', namespace=NAMESPACE, name=name, spec=spec,
+                status={'phase': 'Ready', 'placement': cohort_placement}
+            )
+            for seat_name, seat_spec in iter_seat_specs(
+                seat_names(name, seats), seat_template(name, template)
+            ):
+                manifests = render_workshop_manifests(
+                    seat_name, NAMESPACE, seat_spec, {COHORT_LABEL: name},
+                    placement=cohort_placement
+                )
+                deployment = manifests['deployment']
+                if schedule(nodes, deployment['spec']['template']) is None:
+                    unschedulable += 1
+        else:
+            await cohort_placement_event(
+                type='DELETED', namespace=NAMESPACE, name=name, spec=spec,
+                status={}
+            )
+            for node in nodes:
+                had_pods = bool(node.pods)
+                node.pods = {
+                    seat: pod for seat, pod in node.pods.items()
+                    if pod[0].get(COHORT_LABEL) != name
+                }
+                if had_pods and not node.pods:
+                    freed += 1
+        in_use.append(sum(1 for node in nodes if node.pods))
+
+    placement._planner = None
+    return {
+        'in_use': sum(in_use) / len(in_use),
+        'peak': max(in_use),
+        'freed': freed,
+        'unschedulable': unschedulable,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pools', type=int, default=3)
+    parser.add_argument('--nodes', type=int, default=8,
+                        help='nodes per pool')
+    parser.add_argument('--node-cpu', type=int, default=4000,
+                        help='allocatable millicores per node')
+    parser.add_argument('--node-memory', default='16Gi')
+    parser.add_argument('--cohorts', type=int, default=60)
+    parser.add_argument('--min-seats', type=int, default=4)
+    parser.add_argument('--max-seats', type=int, default=24)
+    parser.add_argument('--lifetime', type=float, default=8.0,
+                        help='mean cohort lifetime in arrival intervals')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"{args.pools} pools x {args.nodes} nodes, {args.cohorts} cohorts of "
+        f"{args.min_seats}-{args.max_seats} seats"
+    )
+    print(
+        f"{'placement':<12} {'mean nodes in use':>18} {'peak':>6} "
+        f"{'nodes freed':>12} {'unschedulable':>14}"
+    )
+    for label, placed in (('spread', False), ('bin-packed', True)):
+        result = asyncio.run(scenario(placed, args))
+        print(
+            f"{label:<12} {result['in_use']:>18.1f} {result['peak']:>6} "
+            f"{result['freed']:>12} {result['unschedulable']:>14}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Benchmark: default vs usage-rightsized requests for a course image.
+
+Simulates ``--pods`` RStudio sessions of one course image, each with its
+own typical CPU and memory use and occasional CPU bursts. Samples them
+every minute for ``--hours`` through a static usage source into the
+rightsizer. Then it creates a Workshop through the create handler in
+``auto`` mode against the fake API. Reports:
+
+- the sketch size and the error of its percentiles against exact ones
+- the requests a new workshop gets
+- the pods one node's requests fit, and the nodes the sessions need
+- the real CPU and memory utilization of those nodes
+- the share of samples above the request
+
+Usage:
+    python benchmarks/bench_rightsizing.py [--pods 300] [--hours 8]
+        [--node-cpu 4] [--node-memory 16Gi] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+from typing import Any, Dict, List, Tuple
+
+from fakes import FakeKubernetesApi, workshop_spec
+
+import handlers.rightsizing as rightsizing
+from handlers.rightsizing import Rightsizer
+from handlers.workshop import workshop_create_handler
+from resources.deployment import DEFAULT_RESOURCES
+from utils.k8s_client import configure_gateway, shutdown_gateway
+from utils.quantity import cpu_millis, memory_bytes
+from utils.usage import StaticUsageSource, UsageSample
+
+
+NAMESPACE = 'bench'
+IMAGE = 'rocker/rstudio:4.3'
+SAMPLE_INTERVAL = 60.0
+
+
+def exact_quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def sessions(
+    args: argparse.Namespace,
+    rng: random.Random
+) -> List[Tuple[float, float]]:
+    """Typical (CPU cores, memory bytes) of each simulated session."""
+    return [
+        (
+            rng.lognormvariate(math.log(0.12), 0.5),
+            rng.lognormvariate(math.log(400 * 2 ** 20), 0.25),
+        )
+        for _ in range(args.pods)
+    ]
+
+
+def sample(
+    typical: Tuple[float, float],
+    rng: random.Random
+) -> Tuple[float, float]:
+    cpu, memory = typical
+    # Knitting a document or fitting a model now and then
+    if rng.random() < 0.05:
+        cpu *= rng.uniform(3, 6)
+    return cpu * rng.uniform(0.7, 1.3), memory * rng.uniform(0.95, 1.1)
+
+
+def packing(
+    requests: Tuple[int, int],
+    usage: List[Tuple[float, float]],
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    """Nodes needed for the sessions at ``requests``, and their utilization."""
+    node_cpu, node_memory = args.node_cpu * 1000, memory_bytes(args.node_memory)
+    per_node = min(node_cpu // requests[0], node_memory // requests[1])
+    nodes = -(-args.pods // per_node)
+    cpu_used = sum(cpu for cpu, _ in usage) / len(usage) * args.pods
+    memory_used = sum(memory for _, memory in usage) / len(usage) * args.pods
+    return {
+        'per_node': per_node,
+        'nodes': nodes,
+        'cpu_util': cpu_used * 1000 / (nodes * node_cpu),
+        'memory_util': memory_used / (nodes * node_memory),
+        'cpu_over': sum(1 for cpu, _ in usage if cpu * 1000 > requests[0])
+        / len(usage),
+        'memory_over': sum(1 for _, memory in usage if memory > requests[1])
+        / len(usage),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    now = [0.0]
+    source = StaticUsageSource()
+    rightsizer = Rightsizer(source, auto=True, clock=lambda: now[0])
+    typical = sessions(args, rng)
+
+    usage: List[Tuple[float, float]] = []
+    for _ in range(int(args.hours * 3600 / SAMPLE_INTERVAL)):
+        for index, session in enumerate(typical):
+            cpu, memory = sample(session, rng)
+            usage.append((cpu, memory))
+            source.set(
+                (NAMESPACE, f"seat-{index:03d}-deployment-5d9c7-x{index}"),
+                UsageSample(f"docker.io/{IMAGE}", cpu, memory)
+            )
+        await rightsizer.collect()
+        now[0] += SAMPLE_INTERVAL
+
+    cpu_sketch, memory_sketch = rightsizer._usage[IMAGE]
+    print(
+        f"{args.pods} sessions sampled every {SAMPLE_INTERVAL:.0f}s for "
+        f"{args.hours:g}h: {len(usage)} samples in "
+        f"{cpu_sketch.buckets + memory_sketch.buckets} sketch buckets"
+    )
+    for label, sketch, values, q in (
+        ('cpu p90', cpu_sketch, [cpu for cpu, _ in usage],
+         rightsizer.cpu_percentile),
+        ('memory p99', memory_sketch, [memory for _, memory in usage],
+         rightsizer.memory_percentile),
+    ):
+        exact = exact_quantile(values, q)
+        error = abs(sketch.quantile(q) - exact) / exact
+        print(f"  {label:<11} error {error:.2%}")
+
+    # A new workshop created through the handler gets the rightsized requests
+    fake = FakeKubernetesApi(latency=0.0)
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    rightsizing._rightsizer = rightsizer
+    spec = {**workshop_spec(0, storage=False), 'image': IMAGE}
+    patch: Dict[str, Any] = {}
+    await workshop_create_handler(
+        spec=spec, meta={'creationTimestamp': ''}, patch=patch, status={},
+        namespace=NAMESPACE, name=spec['name']
+    )
+    rightsizing._rightsizer = None
+    shutdown_gateway()
+    deployment = next(
+        obj for (_, _, name), obj in fake.objects.items()
+        if name == f"{spec['name']}-deployment"
+    )
+    container = deployment['spec']['template']['spec']['containers'][0]
+    requests = container['resources']['requests']
+    print(
+        f"  new workshop requests {requests['cpu']} CPU, "
+        f"{requests['memory']} memory"
+    )
+
+    print(
+        f"{'requests':<18} {'pods/node':>10} {'nodes':>6} {'CPU util':>9} "
+        f"{'mem util':>9} {'CPU > req':>10} {'mem > req':>10}"
+    )
+    defaults = (
+        DEFAULT_RESOURCES['cpuRequest'], DEFAULT_RESOURCES['memoryRequest']
+    )
+    for cpu, memory in (defaults, (requests['cpu'], requests['memory'])):
+        label = f"{cpu}/{memory}"
+        result = packing((cpu_millis(cpu), memory_bytes(memory)), usage, args)
+        print(
+            f"{label:<18} {result['per_node']:>10} {result['nodes']:>6} "
+            f"{result['cpu_util']:>9.0%} {result['memory_util']:>9.0%} "
+            f"{result['cpu_over']:>10.1%} {result['memory_over']:>10.1%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pods', type=int, default=300)
+    parser.add_argument('--hours', type=float, default=8.0)
+    parser.add_argument('--node-cpu', type=int, default=4,
+                        help='allocatable cores per node')
+    parser.add_argument('--node-memory', default='16Gi')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark: one IngressRoute per workshop vs aggregated IngressRoutes.
+
+Creates N workshops in batches, then deletes them again, once with an
+IngressRoute per workshop and once with the route index writing one
+IngressRoute per namespace. Workshop watch events are fed to the route
+index as Kopf would. Reports the API calls, the IngressRoute writes Traefik
+has to reload for, and the most IngressRoute objects in the cluster at once.
+
+Usage:
+    python benchmarks/bench_routes.py [--workshops 2000] [--batch 50]
+        [--interval 0.02] [--debounce 0.2]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Set
+
+from fakes import FakeKubernetesApi, workshop_spec
+
+from handlers.routes import (
+    route_workshop_event,
+    start_route_index,
+    stop_route_index,
+)
+from handlers.workshop import build_create_plan, build_delete_plan
+from resources.owner import owner_reference
+from utils.k8s_client import configure_gateway, get_gateway, shutdown_gateway
+
+
+NAMESPACE = 'bench'
+
+
+async def scenario(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ['ORCHESTRA_INGRESS_MODE'] = mode
+    os.environ['ORCHESTRA_INGRESS_DEBOUNCE'] = str(args.debounce)
+    fake = FakeKubernetesApi()
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    counts = {'writes': 0, 'peak': 0}
+    live: Set[Any] = set()
+
+    def on_change(verb: str, key: Any, obj: Any) -> None:
+        if key[0] != 'ingressroutes':
+            return
+        counts['writes'] += 1
+        if verb.startswith('delete'):
+            live.discard(key)
+        else:
+            live.add(key)
+        counts['peak'] = max(counts['peak'], len(live))
+
+    fake.watch(on_change)
+    await start_route_index()
+
+    async def create(index: int) -> None:
+        spec = workshop_spec(index, storage=False)
+        name = spec['name']
+        await build_create_plan(
+            get_gateway(), name, NAMESPACE, spec,
+            owner=owner_reference('Workshop', name, f"uid-{index}")
+        ).run()
+        await route_workshop_event(
+            type='ADDED', namespace=NAMESPACE, name=name, meta={}, spec=spec,
+            status={}
+        )
+
+    async def delete(index: int) -> None:
+        spec = workshop_spec(index, storage=False)
+        await build_delete_plan(get_gateway(), spec['name'], NAMESPACE).run()
+        await route_workshop_event(
+            type='DELETED', namespace=NAMESPACE, name=spec['name'], meta={},
+            spec=spec, status={}
+        )
+
+    for step in (create, delete):
+        for first in range(0, args.workshops, args.batch):
+            batch = range(first, min(first + args.batch, args.workshops))
+            await asyncio.gather(*(step(index) for index in batch))
+            await asyncio.sleep(args.interval)
+        # Let the last debounced write land
+        await asyncio.sleep(args.debounce * 2)
+    await stop_route_index()
+    shutdown_gateway()
+    return {'calls': fake.count(), **counts}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=50,
+                        help='workshops created or deleted together')
+    parser.add_argument('--interval', type=float, default=0.02,
+                        help='seconds between batches')
+    parser.add_argument('--debounce', type=float, default=0.2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"{args.workshops} workshops created and deleted in batches of "
+        f"{args.batch}, {args.debounce:g}s debounce"
+    )
+    print(f"{'mode':<12} {'API calls':>10} {'route writes':>13} {'peak routes':>12}")
+    for mode in ('workshop', 'aggregated'):
+        result = asyncio.run(scenario(mode, args))
+        print(
+            f"{mode:<12} {result['calls']:>10} {result['writes']:>13} "
+            f"{result['peak']:>12}"
+        )
+
+
+if __name__ == '__main__':
+    main()
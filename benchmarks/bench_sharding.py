@@ -0,0 +1,196 @@
+"""Benchmark: how evenly shards split and how much moves on a rebalance.
+
+Runs ``--replicas`` shard coordinators against one fake API server (their
+Leases are real ``V1Lease`` objects in the fake's store), tracks
+``--workshops`` Workshops on each, then walks through a scale-up, a graceful
+scale-down and a crashed replica whose Lease has to expire. For every step
+it checks that each Workshop has exactly one owner and reports how many
+changed hands, next to what naive ``hash % N`` placement would have moved.
+
+Usage:
+    python benchmarks/bench_sharding.py [--workshops 10000] [--replicas 3]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fakes import FakeKubernetesApi
+
+from utils.k8s_client import configure_gateway, shutdown_gateway
+from utils.sharding import (
+    KubernetesLeaseStore, ObjectKey, ShardCoordinator, _hash, shard_key
+)
+
+LEASE_DURATION = 15
+
+
+class Cluster:
+    """Replicas sharing one fake API server and a controllable clock."""
+
+    def __init__(self, keys: List[ObjectKey]) -> None:
+        self.fake = FakeKubernetesApi()
+        self.now = datetime.now(timezone.utc)
+        self.keys = keys
+        self.replicas: Dict[str, ShardCoordinator] = {}
+        self.touched = 0
+
+    async def _on_gained(self, gained: List[ObjectKey]) -> None:
+        self.touched += len(gained)
+
+    def add(self, identity: str) -> ShardCoordinator:
+        store = KubernetesLeaseStore(
+            'orchestra-system', api=self.fake, clock=lambda: self.now
+        )
+        coordinator = ShardCoordinator(
+            identity, store, lease_duration=LEASE_DURATION, renew_interval=5,
+            on_gained=self._on_gained
+        )
+        for key in self.keys:
+            coordinator.track(key)
+        self.replicas[identity] = coordinator
+        return coordinator
+
+    async def settle(self) -> None:
+        """Let every replica renew and re-read the membership."""
+        for _ in range(2):
+            for coordinator in self.replicas.values():
+                await coordinator.refresh()
+
+    def owners(self) -> Dict[ObjectKey, str]:
+        owners: Dict[ObjectKey, str] = {}
+        for key in self.keys:
+            holders = [
+                identity for identity, coordinator in self.replicas.items()
+                if coordinator.owns(key[1], key[2])
+            ]
+            if len(holders) != 1:
+                raise AssertionError(f"{key} is owned by {holders}")
+            owners[key] = holders[0]
+        return owners
+
+
+def modulo_owner(key: ObjectKey, members: List[str]) -> str:
+    return sorted(members)[_hash(shard_key(key[1], key[2])) % len(members)]
+
+
+def moved(
+    before: Dict[ObjectKey, str],
+    after: Dict[ObjectKey, str]
+) -> int:
+    return sum(1 for key in before if before[key] != after[key])
+
+
+def report(
+    step: str,
+    cluster: Cluster,
+    before: Optional[Dict[ObjectKey, str]],
+    after: Dict[ObjectKey, str],
+    old_members: List[str],
+    elapsed: float
+) -> None:
+    counts = [
+        sum(1 for owner in after.values() if owner == identity)
+        for identity in cluster.replicas
+    ]
+    total = len(after)
+    ideal = total / len(counts)
+    line = (
+        f"{step:<26}{len(counts):>9}{min(counts):>7}{max(counts):>7}"
+        f"{max(counts) / ideal:>8.2f}"
+    )
+    if before is None:
+        print(f"{line}{'-':>9}{'-':>9}{'-':>9}{elapsed * 1000:>9.1f}")
+        return
+    members = list(cluster.replicas)
+    naive = sum(
+        1 for key in cluster.keys
+        if modulo_owner(key, old_members) != modulo_owner(key, members)
+    )
+    print(
+        f"{line}{moved(before, after) / total:>8.1%}"
+        f"{cluster.touched / total:>9.1%}{naive / total:>9.1%}"
+        f"{elapsed * 1000:>9.1f}"
+    )
+
+
+async def run(workshops: int, replicas: int) -> None:
+    fake_keys = [
+        ('workshops', f"class-{index % 40}", f"ws-{index:05d}")
+        for index in range(workshops)
+    ]
+    cluster = Cluster(fake_keys)
+    configure_gateway(
+        apps=cluster.fake, core=cluster.fake, custom=cluster.fake,
+        apply=cluster.fake, write_limiter=None
+    )
+
+    print(f"{workshops} workshops, {replicas} replicas to start with")
+    print(
+        f"{'step':<26}{'replicas':>9}{'min':>7}{'max':>7}{'max/avg':>8}"
+        f"{'moved':>8}{'touched':>9}{'hash%N':>9}{'ms':>9}"
+    )
+
+    for index in range(replicas):
+        cluster.add(f"replica-{index}")
+    start = time.perf_counter()
+    await cluster.settle()
+    owners = cluster.owners()
+    report('initial', cluster, None, owners, [], time.perf_counter() - start)
+
+    async def step(name: str, change) -> None:
+        nonlocal owners
+        members = list(cluster.replicas)
+        cluster.touched = 0
+        start = time.perf_counter()
+        await change()
+        await cluster.settle()
+        elapsed = time.perf_counter() - start
+        after = cluster.owners()
+        report(name, cluster, owners, after, members, elapsed)
+        owners = after
+
+    async def scale_up() -> None:
+        cluster.add(f"replica-{replicas}")
+
+    async def scale_down() -> None:
+        await cluster.replicas.pop('replica-0').stop()
+
+    async def crash() -> None:
+        cluster.replicas.pop('replica-1')
+        # Survivors keep renewing until the dead replica's Lease runs out
+        for _ in range(LEASE_DURATION // 5 + 1):
+            cluster.now += timedelta(seconds=5)
+            for coordinator in cluster.replicas.values():
+                await coordinator.refresh()
+
+    await step('scale up (+1)', scale_up)
+    await step('graceful leave (-1)', scale_down)
+    await step('crash, lease expired (-1)', crash)
+
+    lookups = 100000
+    coordinator = next(iter(cluster.replicas.values()))
+    start = time.perf_counter()
+    for index in range(lookups):
+        key = fake_keys[index % len(fake_keys)]
+        coordinator.owns(key[1], key[2])
+    per_lookup = (time.perf_counter() - start) / lookups
+    print(
+        f"ownership check: {per_lookup * 1e6:.2f}us per Kopf when= filter call; "
+        f"moved is the share that changed owner, touched the share re-annotated"
+    )
+    shutdown_gateway()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=10000)
+    parser.add_argument('--replicas', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.workshops, args.replicas))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Benchmark: operator restart with and without the paced startup resync.
+
+Seeds N running workshops into the fake API. A share of them have children
+whose content hash no longer matches what the operator renders, as after an
+upgrade, and a share expired while the operator was down. The benchmark
+then replays them as Kopf does after a restart. Each workshop gets an
+expiration event and then its resume handler, on at most ``--workers``
+workers at a time (Kopf's ``worker_limit``). A deleted Workshop runs the
+delete handler.
+
+This runs twice: once unpaced, and once after the warm-up listing with
+resyncs and overdue expiries paced at ``--rate`` per second. Reports:
+
+- the time until the operator reports ready
+- the time until every workshop is resynced and every expired one torn
+  down (steady state)
+- the peak API calls in any one second
+
+Usage:
+    python benchmarks/bench_startup.py [--workshops 2000] [--drifted 0.5]
+        [--overdue 0.1] [--rate 20] [--latency 0.01]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from fakes import FakeKubernetesApi, workshop_spec
+
+import handlers.cleanup as cleanup
+from handlers.children import CHILD_INDEXES
+from handlers.startup import stop_warm_up, warm_up
+from handlers.workshop import workshop_delete_handler, workshop_update_handler
+from resources.manifests import manifest_hash, render_workshop_manifests
+from resources.owner import owner_reference
+from utils.k8s_client import configure_gateway, shutdown_gateway
+
+
+NAMESPACE = 'bench'
+
+ObjectKey = Tuple[str, str, str]
+
+
+def seed(
+    fake: FakeKubernetesApi,
+    args: argparse.Namespace
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Store the Workshops and index their children as Kopf would.
+
+    Returns:
+        The child indexes and the names of the workshops already expired
+    """
+    indexes: Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]] = {
+        index_name: {} for index_name in CHILD_INDEXES.values()
+    }
+    expired = []
+    drifted_every = round(1 / args.drifted) if args.drifted else 0
+    overdue_every = round(1 / args.overdue) if args.overdue else 0
+    for index in range(args.workshops):
+        spec = workshop_spec(index)
+        name = spec['name']
+        uid = f"uid-{index}"
+        overdue = overdue_every and index % overdue_every == 1
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            minutes=-1 if overdue else 240
+        )
+        if overdue:
+            expired.append(name)
+        fake.objects[('workshops', NAMESPACE, name)] = {
+            'metadata': {'name': name, 'namespace': NAMESPACE, 'uid': uid},
+            'spec': spec,
+            'status': {
+                'phase': 'Running',
+                'expiresAt': expires_at.isoformat(),
+            },
+        }
+        manifests = render_workshop_manifests(
+            name, NAMESPACE, spec, owner=owner_reference('Workshop', name, uid)
+        )
+        drifted = drifted_every and index % drifted_every == 0
+        for kind, manifest in manifests.items():
+            indexes[CHILD_INDEXES[kind]][(NAMESPACE, name)] = [{
+                'name': name,
+                'hash': 'stale' if drifted else manifest_hash(manifest),
+                'owner': uid,
+                'ready': True,
+            }]
+    return indexes, expired
+
+
+async def scenario(paced: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeKubernetesApi(latency=args.latency)
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    indexes, expired = seed(fake, args)
+    loop = asyncio.get_running_loop()
+    torn_down: List[str] = []
+    teardowns: set = set()
+
+    async def teardown(name: str) -> None:
+        await workshop_delete_handler(
+            meta={'uid': None}, namespace=NAMESPACE, name=name
+        )
+        torn_down.append(name)
+
+    def on_change(verb: str, key: ObjectKey, obj: Any) -> None:
+        # Called on an executor thread
+        if key[0] == 'workshops' and verb == 'delete':
+            loop.call_soon_threadsafe(
+                lambda: teardowns.add(loop.create_task(teardown(key[2])))
+            )
+
+    fake.watch(on_change)
+
+    # Sample the call count to find the busiest second
+    samples: List[Tuple[float, int]] = []
+
+    async def sample() -> None:
+        while True:
+            samples.append((time.monotonic(), fake.count()))
+            await asyncio.sleep(0.05)
+
+    sampler = loop.create_task(sample())
+
+    # The restart: a fresh expiration schedule, the warm-up, then Kopf
+    cleanup._scheduler = None
+    cleanup._expires_at_seen.clear()
+    started = time.monotonic()
+    if paced:
+        await warm_up(page_size=args.page_size, rate=args.rate)
+    ready = time.monotonic() - started
+    cleanup.start_expiration_scheduler()
+
+    workers = asyncio.Semaphore(args.workers)
+
+    async def resume(key: ObjectKey) -> None:
+        async with workers:
+            item = fake.objects.get(key)
+            if item is None:  # Deleted since; Kopf would not replay it
+                return
+            meta, spec, status = item['metadata'], item['spec'], item['status']
+            cleanup.track_expiration(
+                'workshops', None, meta, status, NAMESPACE, meta['name']
+            )
+            await workshop_update_handler(
+                spec=spec, meta=meta, status=status, patch={},
+                namespace=NAMESPACE, name=meta['name'], reason='resume',
+                **indexes
+            )
+
+    keys = [key for key in list(fake.objects) if key[0] == 'workshops']
+    await asyncio.gather(*(resume(key) for key in keys))
+    while len(torn_down) < len(expired):
+        await asyncio.sleep(0.05)
+    steady = time.monotonic() - started
+
+    sampler.cancel()
+    await cleanup.stop_expiration_scheduler()
+    stop_warm_up()
+    shutdown_gateway()
+
+    peak = 0
+    for index, (at, count) in enumerate(samples):
+        later = [c for t, c in samples[index:] if t - at <= 1.0]
+        peak = max(peak, later[-1] - count)
+    return {
+        'ready': ready,
+        'steady': steady,
+        'calls': fake.count(),
+        'peak': peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=2000)
+    parser.add_argument('--drifted', type=float, default=0.5,
+                        help='share of workshops whose children need applying')
+    parser.add_argument('--overdue', type=float, default=0.1,
+                        help='share of workshops that expired during the restart')
+    parser.add_argument('--rate', type=float, default=20.0)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.01)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"{args.workshops} workshops, {args.drifted:.0%} drifted, "
+        f"{args.overdue:.0%} expired during the restart"
+    )
+    print(
+        f"{'resync':<10} {'ready':>8} {'steady state':>13} "
+        f"{'API calls':>10} {'peak calls/s':>13}"
+    )
+    for label, paced in (('unpaced', False), (f"{args.rate:g}/s", True)):
+        result = asyncio.run(scenario(paced, args))
+        print(
+            f"{label:<10} {result['ready']:>7.2f}s {result['steady']:>12.2f}s "
+            f"{result['calls']:>10} {result['peak']:>13}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Benchmark: direct vs coalesced Workshop status writes.
+
+Replays a burst of RStudio Deployment events for N workshops through the
+readiness handler, once patching every status change directly and once
+through the status writer. Each workshop's pod becomes ready, then
+available, then fails and passes its readiness probe a few times, with
+some unchanged resync events in between. Workshop watch events reach the
+readiness index and the status writer ``--watch-delay`` seconds after each
+PATCH, as Kopf's would. Reports the status PATCHes sent, how long the first
+Ready took to be written, and the conditions each workshop ends up with.
+
+Usage:
+    python benchmarks/bench_status.py [--workshops 1000] [--window 0.5]
+        [--flaps 3] [--watch-delay 0.05]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+from fakes import FakeKubernetesApi, percentile
+
+import handlers.readiness as readiness
+import handlers.status as status_writer
+from handlers.readiness import _workshop_summary, deployment_readiness_event
+from utils.k8s_client import configure_gateway, shutdown_gateway
+
+
+NAMESPACE = 'bench'
+
+# (readyReplicas, availableReplicas, seconds until the next event)
+Event = Tuple[int, int, float]
+
+
+def events(flaps: int, rng: random.Random) -> List[Event]:
+    """Build one workshop's Deployment status changes."""
+    stream: List[Event] = [(1, 0, rng.uniform(0.02, 0.1)), (1, 1, 0.2)]
+    for _ in range(flaps):
+        stream.append((0, 0, rng.uniform(0.05, 0.2)))
+        stream.append((1, 1, rng.uniform(0.05, 0.2)))
+        # Resync of an unchanged Deployment
+        stream.append((1, 1, 0.1))
+    return stream
+
+
+async def scenario(window: float, args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeKubernetesApi(latency=args.latency)
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    # Start over from the previous scenario's readiness bookkeeping
+    readiness._reported.clear()
+    readiness._deployment_phases.clear()
+    if window:
+        status_writer._writer = status_writer.StatusWriter(window=window)
+    loop = asyncio.get_running_loop()
+    index: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    # When each workshop's pod first became ready
+    sent_ready: Dict[str, float] = {}
+    armed: Set[str] = set()
+    ready_after: List[float] = []
+
+    def names() -> List[str]:
+        return [f"ws-{number:05d}" for number in range(args.workshops)]
+
+    def deliver(name: str, obj: Dict[str, Any]) -> None:
+        status = obj.get('status') or {}
+        index[(NAMESPACE, name)] = [
+            _workshop_summary(name, obj['metadata'], status)
+        ]
+        loop.create_task(status_writer.status_writer_event(
+            type='MODIFIED', namespace=NAMESPACE, name=name, status=status
+        ))
+
+    def on_change(verb: str, key: Any, obj: Any) -> None:
+        # Called on an executor thread
+        if key[0] != 'workshops':
+            return
+        name = key[2]
+        ready = _workshop_summary(name, obj['metadata'], obj['status'])['ready']
+        if ready and name in sent_ready:
+            ready_after.append(time.monotonic() - sent_ready.pop(name))
+        loop.call_soon_threadsafe(
+            loop.call_later, args.watch_delay, deliver, name, obj
+        )
+
+    for name in names():
+        obj = {
+            'metadata': {'name': name, 'namespace': NAMESPACE},
+            'spec': {'name': name},
+            'status': {'phase': 'Creating'},
+        }
+        fake.objects[('workshops', NAMESPACE, name)] = obj
+        deliver(name, obj)
+    fake.watch(on_change)
+
+    rng = random.Random(args.seed)
+
+    async def replay(name: str) -> None:
+        await asyncio.sleep(rng.uniform(0, args.spread))
+        for ready, available, pause in events(args.flaps, rng):
+            if ready and name not in armed:
+                armed.add(name)
+                sent_ready[name] = time.monotonic()
+            await deployment_readiness_event(
+                type='MODIFIED',
+                namespace=NAMESPACE,
+                labels={'workshop': name, 'component': 'rstudio'},
+                spec={'replicas': 1},
+                status={'readyReplicas': ready, 'availableReplicas': available},
+                workshop_phases=index,
+            )
+            await asyncio.sleep(pause)
+
+    await asyncio.gather(*(replay(name) for name in names()))
+    await status_writer.stop_status_writer()
+    await asyncio.sleep(args.watch_delay * 2)
+    shutdown_gateway()
+
+    finals = [fake.objects[('workshops', NAMESPACE, name)] for name in names()]
+    return {
+        'patches': fake.count('patch_'),
+        'ready_after': ready_after or [float('nan')],
+        'running': sum(
+            1 for obj in finals if obj['status'].get('phase') == 'Running'
+        ),
+        'conditions': max(len(obj['status'].get('conditions') or []) for obj in finals),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=1000)
+    parser.add_argument('--window', type=float, default=0.5)
+    parser.add_argument('--flaps', type=int, default=3)
+    parser.add_argument('--spread', type=float, default=2.0,
+                        help='seconds over which the workshops start')
+    parser.add_argument('--watch-delay', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"{args.workshops} workshops, {args.flaps} readiness flaps each, "
+        f"{args.window:g}s window"
+    )
+    print(
+        f"{'writes':<10} {'PATCHes':>8} {'per workshop':>13} "
+        f"{'ready p50':>10} {'ready p99':>10} {'Running':>8} {'conditions':>11}"
+    )
+    baseline = None
+    for label, window in (('direct', 0.0), ('coalesced', args.window)):
+        result = asyncio.run(scenario(window, args))
+        baseline = baseline or result['patches']
+        print(
+            f"{label:<10} {result['patches']:>8} "
+            f"{result['patches'] / args.workshops:>13.2f} "
+            f"{percentile(result['ready_after'], 0.5):>9.3f}s "
+            f"{percentile(result['ready_after'], 0.99):>9.3f}s "
+            f"{result['running']:>8} {result['conditions']:>11}"
+        )
+    print(f"reduction  {baseline / max(result['patches'], 1):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
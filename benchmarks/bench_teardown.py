@@ -0,0 +1,118 @@
+"""Benchmark: end-of-class teardown of many workshops.
+
+Provisions N workshops against the fake API and tears them down three ways:
+
+- ``by label``: the delete handler for children without owner references,
+  one ``deletecollection`` per child kind
+- ``owned (GC)``: the delete handler when the watch cache shows every child
+  owned by the Workshop, which leaves them to the garbage collector
+- ``orphan sweep``: one sweeper pass over children whose Workshops are gone
+
+Usage:
+    python benchmarks/bench_teardown.py [--workshops 300] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+from fakes import FakeKubernetesApi, workshop_spec
+
+from handlers.children import CHILD_INDEXES
+from handlers.orphans import OrphanSweeper
+from handlers.workshop import build_create_plan, workshop_delete_handler
+from resources.owner import owner_reference
+from utils.k8s_client import configure_gateway, get_gateway, shutdown_gateway
+
+
+def uid(index: int) -> str:
+    return f"uid-{index:05d}"
+
+
+async def provision(workshops: int, owned: bool) -> None:
+    async def create_one(index: int) -> None:
+        spec = workshop_spec(index)
+        owner = owner_reference('Workshop', spec['name'], uid(index)) if owned else None
+        await build_create_plan(
+            get_gateway(), spec['name'], 'bench', spec, owner=owner
+        ).run()
+
+    await asyncio.gather(*(create_one(index) for index in range(workshops)))
+
+
+def owned_indexes(workshops: int) -> Dict[str, Any]:
+    """Kopf indexes as they look when every child is owned by its Workshop."""
+    indexes: Dict[str, Dict[tuple, list]] = {
+        name: {} for name in CHILD_INDEXES.values()
+    }
+    for index in range(workshops):
+        name = workshop_spec(index)['name']
+        for store in indexes.values():
+            store[('bench', name)] = [{'name': name, 'owner': uid(index)}]
+    return indexes
+
+
+async def delete_all(workshops: int, indexes: Dict[str, Any]) -> None:
+    await asyncio.gather(*(
+        workshop_delete_handler(
+            meta={'uid': uid(index)},
+            namespace='bench',
+            name=workshop_spec(index)['name'],
+            **indexes
+        )
+        for index in range(workshops)
+    ))
+
+
+async def sweep() -> None:
+    await OrphanSweeper().sweep()
+
+
+def measure(label: str, workshops: int, latency: float, owned: bool, teardown) -> None:
+    fake = FakeKubernetesApi(latency=latency)
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    asyncio.run(provision(workshops, owned))
+    created = len(fake.objects)
+    before = fake.count()
+
+    started = time.perf_counter()
+    asyncio.run(teardown())
+    elapsed = time.perf_counter() - started
+    shutdown_gateway()
+
+    calls = fake.count() - before
+    removed = created - len(fake.objects)
+    print(
+        f"{label:<16}{elapsed:>9.2f}{calls:>8}{calls / workshops:>10.2f}"
+        f"{removed:>10}"
+    )
+
+
+def run(workshops: int, latency: float) -> None:
+    print(f"{workshops} workshops, {latency * 1000:.0f} ms API latency")
+    print(f"{'mode':<16}{'seconds':>9}{'calls':>8}{'per ws':>10}{'removed':>10}")
+    measure(
+        'by label', workshops, latency, False,
+        lambda: delete_all(workshops, {})
+    )
+    measure(
+        'owned (GC)', workshops, latency, True,
+        lambda: delete_all(workshops, owned_indexes(workshops))
+    )
+    measure('orphan sweep', workshops, latency, False, sweep)
+    print("owned children are removed by the API server's garbage collector")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+    run(args.workshops, args.latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark: overhead of lifecycle tracing.
+
+Runs the create, update and delete handlers for N workshops against the
+zero-latency fake API, so handler CPU time dominates, first with tracing
+off and then exporting OTLP/JSON to a temporary file. Reports the time per
+workshop, spans recorded and exported bytes, and checks that every
+workshop's spans landed in a single trace.
+
+Usage:
+    python benchmarks/bench_tracing.py [--workshops 500] [--rounds 5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+from fakes import FakeKubernetesApi, workshop_spec
+
+from handlers.workshop import (
+    workshop_create_handler,
+    workshop_delete_handler,
+    workshop_update_handler,
+)
+from utils.k8s_client import configure_gateway, shutdown_gateway
+from utils.tracing import FileExporter, Tracer, configure_tracer, span
+
+
+NAMESPACE = 'bench'
+
+
+async def lifecycle(index: int) -> None:
+    """Create, update and delete one workshop, carrying Kopf's patch over."""
+    spec = workshop_spec(index)
+    name = spec['name']
+    meta: Dict[str, Any] = {'uid': f"uid-{index}", 'name': name}
+    patch: Dict[str, Any] = {}
+    await workshop_create_handler(
+        spec=spec, meta=meta, patch=patch, status={},
+        namespace=NAMESPACE, name=name,
+    )
+    meta['annotations'] = patch.get('metadata', {}).get('annotations', {})
+    status = patch.get('status') or {}
+
+    spec = dict(spec, image='rocker/rstudio:4.4')
+    await workshop_update_handler(
+        spec=spec, meta=meta, status=status, patch={},
+        namespace=NAMESPACE, name=name,
+    )
+    await workshop_delete_handler(
+        meta=meta, namespace=NAMESPACE, name=name, patch={}
+    )
+
+
+async def run_round(workshops: int, tracer: Optional[Tracer]) -> float:
+    fake = FakeKubernetesApi()
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    configure_tracer(tracer)
+    started = time.perf_counter()
+    for index in range(workshops):
+        await lifecycle(index)
+    elapsed = time.perf_counter() - started
+    configure_tracer(None)
+    if tracer is not None:
+        await tracer.flush()
+    shutdown_gateway()
+    return elapsed
+
+
+def traces_per_workshop(path: str) -> Set[int]:
+    """Count distinct trace IDs among each workshop's handler spans."""
+    traces: Dict[str, Set[str]] = defaultdict(set)
+    with open(path, encoding='utf-8') as lines:
+        for line in lines:
+            body = json.loads(line)
+            for resource_spans in body['resourceSpans']:
+                for scope in resource_spans['scopeSpans']:
+                    for item in scope['spans']:
+                        for attribute in item['attributes']:
+                            if attribute['key'] == 'orchestra.object':
+                                name = attribute['value']['stringValue']
+                                traces[name].add(item['traceId'])
+    return {len(ids) for ids in traces.values()}
+
+
+async def span_cost(count: int) -> float:
+    """Microseconds to open and close one nested span."""
+    with tempfile.TemporaryDirectory() as tmp:
+        exporter = FileExporter(os.path.join(tmp, 'spans.json'))
+        tracer = Tracer(exporter, max_queue=count + 1)
+        configure_tracer(tracer)
+        with span('root'):
+            started = time.perf_counter()
+            for _ in range(count):
+                with span('child', key='value'):
+                    pass
+            elapsed = time.perf_counter() - started
+        configure_tracer(None)
+    return elapsed / count * 1e6
+
+
+def run(workshops: int, rounds: int) -> None:
+    print(f"{workshops} workshops created, updated and deleted, 0 ms API latency")
+    print(f"{'tracing':<10}{'seconds':>9}{'us/ws':>9}{'spans':>8}{'KiB':>8}")
+
+    # Alternate the two modes so drift in machine load hits both alike
+    baseline = best = float('inf')
+    spans = 0
+    size = 0
+    counts: Set[int] = set()
+    for _ in range(rounds):
+        baseline = min(baseline, asyncio.run(run_round(workshops, None)))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'spans.json')
+            tracer = Tracer(FileExporter(path), max_queue=10 ** 7)
+            best = min(best, asyncio.run(run_round(workshops, tracer)))
+            spans = tracer.finished
+            size = os.path.getsize(path)
+            counts = traces_per_workshop(path)
+    print(f"{'off':<10}{baseline:>9.3f}{baseline / workshops * 1e6:>9.0f}")
+    print(
+        f"{'file':<10}{best:>9.3f}{best / workshops * 1e6:>9.0f}{spans:>8}"
+        f"{size / 1024:>8.0f}"
+    )
+    print(
+        f"overhead: {(best / baseline - 1) * 100:.1f}% "
+        f"({(best - baseline) / spans * 1e6:.1f} us per span)"
+    )
+    print(f"traces per workshop: {sorted(counts)}")
+    print(f"bare span: {asyncio.run(span_cost(100000)):.2f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workshops', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    run(args.workshops, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
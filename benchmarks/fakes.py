@@ -0,0 +1,237 @@
+"""In-process fakes of the Kubernetes API used by the benchmarks."""
+
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from kubernetes.client.rest import ApiException
+
+# Make the operator sources importable the same way the container does
+# (PYTHONPATH=/app/src).
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from utils.k8s_client import api_call_labels  # noqa: E402
+
+
+def _object_name(body: Any) -> str:
+    """Return metadata.name from a model object or a manifest dict."""
+    if isinstance(body, dict):
+        return body['metadata']['name']
+    return body.metadata.name
+
+
+def object_labels(obj: Any) -> Dict[str, str]:
+    """Return metadata.labels from a model object or a manifest dict."""
+    if isinstance(obj, dict):
+        return obj.get('metadata', {}).get('labels') or {}
+    return (obj.metadata.labels if obj.metadata else None) or {}
+
+
+def matches_selector(labels: Dict[str, str], selector: Optional[str]) -> bool:
+    """Evaluate an equality-based label selector (``a``, ``!a``, ``a=b``, ``a!=b``)."""
+    for term in filter(None, (selector or '').split(',')):
+        term = term.strip()
+        if '!=' in term:
+            key, value = term.split('!=', 1)
+            if labels.get(key) == value:
+                return False
+        elif '=' in term:
+            key, value = term.split('=', 1)
+            if labels.get(key) != value:
+                return False
+        elif term.startswith('!'):
+            if term[1:] in labels:
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """Apply a JSON merge patch (RFC 7386) to ``target``, returning a copy."""
+    if not isinstance(patch, dict):
+        return patch
+    merged = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = merge_patch(merged.get(key), value)
+    return merged
+
+
+class FakeKubernetesApi:
+    """
+    Blocking stand-in for AppsV1Api, CoreV1Api and CustomObjectsApi.
+
+    Every ``create_*``/``delete_*``/``read_*``/``patch_*``/``list_*`` method
+    sleeps for ``latency`` seconds to emulate the API server round trip, then
+    applies the call to an in-memory object store. Creating an existing object
+    raises a 409 and deleting a missing one raises a 404, like the real thing.
+    ``list_*`` and ``delete_collection_*`` honour ``label_selector``; a list
+    without a ``namespace`` covers every namespace.
+    ``apply_*`` methods stand in for :class:`utils.k8s_client.ApplyApi` and
+    create or replace the object. Custom objects are listed as
+    ``{'items': [...]}`` and patched with JSON merge-patch semantics, as
+    ``CustomObjectsApi`` does.
+
+    Failures can be injected: a ``throttle_rate`` share of calls is answered
+    with a 429 carrying ``Retry-After: retry_after``, and an ``error_rate``
+    share with a 500. Callbacks registered with :meth:`watch` see every
+    change to the store, standing in for the watch streams.
+    """
+
+    VERBS = ('create', 'delete', 'read', 'patch', 'replace', 'list', 'apply')
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.1,
+        seed: int = 0
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.objects: Dict[Tuple[str, str, str], Any] = {}
+        self.calls: List[str] = []
+        self.injected: Dict[int, int] = {429: 0, 500: 0}
+        self._random = random.Random(seed)
+        self._watchers: List[Callable[[str, Tuple[str, str, str], Any], None]] = []
+        self._lock = threading.Lock()
+
+    def __getattr__(self, method_name: str) -> Callable[..., Any]:
+        verb = method_name.split('_', 1)[0]
+        if verb not in self.VERBS:
+            raise AttributeError(method_name)
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            return self._handle(method_name, verb, **kwargs)
+
+        return call
+
+    def watch(self, callback: Callable[[str, Tuple[str, str, str], Any], None]) -> None:
+        """
+        Call ``callback(verb, (kind, namespace, name), obj)`` after each change.
+
+        Callbacks run on the calling (executor) thread, outside the store lock.
+        """
+        self._watchers.append(callback)
+
+    def _select(self, kind: str, kwargs: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        namespace = kwargs.get('namespace')
+        return [
+            key for key, obj in self.objects.items()
+            if key[0] == kind
+            and (namespace is None or key[1] == namespace)
+            and matches_selector(object_labels(obj), kwargs.get('label_selector'))
+        ]
+
+    def _inject(self, method_name: str) -> None:
+        roll = self._random.random()
+        if roll < self.throttle_rate:
+            status, reason = 429, 'TooManyRequests'
+        elif roll < self.throttle_rate + self.error_rate:
+            status, reason = 500, 'InternalError'
+        else:
+            return
+        with self._lock:
+            self.calls.append(method_name)
+            self.injected[status] += 1
+        error = ApiException(status=status, reason=reason)
+        if status == 429:
+            error.headers = {'Retry-After': f"{self.retry_after:g}"}
+        raise error
+
+    def _handle(self, method_name: str, verb: str, **kwargs: Any) -> Any:
+        if self.latency:
+            time.sleep(self.latency)
+        self._inject(method_name)
+
+        verb, kind = api_call_labels(method_name, kwargs)
+        with self._lock:
+            self.calls.append(method_name)
+            result, changed = self._apply(verb, kind, kwargs)
+        for key, obj in changed:
+            for callback in self._watchers:
+                callback(verb, key, obj)
+        return result
+
+    def _apply(
+        self,
+        verb: str,
+        kind: str,
+        kwargs: Dict[str, Any]
+    ) -> Tuple[Any, List[Tuple[Tuple[str, str, str], Any]]]:
+        """Apply one call to the store; return its result and changed objects."""
+        if verb == 'list':
+            items = [self.objects[key] for key in self._select(kind, kwargs)]
+            if 'plural' in kwargs:
+                return {'items': items}, []
+            return items, []
+        if verb == 'deletecollection':
+            removed = [
+                (key, self.objects.pop(key)) for key in self._select(kind, kwargs)
+            ]
+            return [obj for _, obj in removed], removed
+
+        name = kwargs.get('name') or _object_name(kwargs['body'])
+        key = (kind, kwargs.get('namespace', ''), name)
+
+        if verb == 'create' and key in self.objects:
+            raise ApiException(status=409, reason='AlreadyExists')
+        if verb in ('create', 'apply'):
+            self.objects[key] = kwargs['body']
+            return kwargs['body'], [(key, kwargs['body'])]
+
+        if key not in self.objects:
+            raise ApiException(status=404, reason='NotFound')
+
+        if verb == 'delete':
+            obj = self.objects.pop(key)
+            return obj, [(key, obj)]
+        if verb == 'patch' and 'plural' in kwargs:
+            self.objects[key] = merge_patch(self.objects[key], kwargs['body'])
+            return self.objects[key], [(key, self.objects[key])]
+        if verb in ('patch', 'replace'):
+            self.objects[key] = kwargs['body']
+            return kwargs['body'], [(key, kwargs['body'])]
+        return self.objects[key], []
+
+    def count(self, prefix: Optional[str] = None) -> int:
+        """Number of calls made, optionally only those starting with prefix."""
+        if prefix is None:
+            return len(self.calls)
+        return sum(1 for call in self.calls if call.startswith(prefix))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the ``fraction`` quantile of ``values`` (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def workshop_spec(index: int, storage: bool = True) -> Dict[str, Any]:
+    """Build a synthetic Workshop spec for seat ``index``."""
+    spec: Dict[str, Any] = {
+        'name': f"bench-{index:05d}",
+        'duration': '4h',
+        'image': 'rocker/rstudio:latest',
+        'resources': {
+            'cpu': '1',
+            'memory': '2Gi',
+            'cpuRequest': '500m',
+            'memoryRequest': '1Gi',
+        },
+        'ingress': {},
+    }
+    if storage:
+        spec['storage'] = {'size': '10Gi'}
+    return spec
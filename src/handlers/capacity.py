@@ -0,0 +1,518 @@
+"""Cluster capacity accounting and the workshop admission queue.
+
+The ledger keeps running totals of the allocatable CPU and memory of ready,
+schedulable nodes, and of the ``cpuRequest``/``memoryRequest`` reserved by
+live Workshops and cohort seats. Watch events adjust the totals by the
+difference for one object, so nothing is re-summed per event. A hibernated
+Workshop has no pod, so it holds no reservation until it wakes.
+
+A Workshop whose requests do not fit into the free capacity is held
+``Pending`` in a queue ordered by ``spec.priority`` (highest first) and then
+creation time. The create handler retries until the ledger has admitted it.
+A WorkshopCohort queues the same way, for all of its seats at once.
+Queued workshops are admitted strictly in order as capacity frees up, so a
+large request is not starved by smaller ones behind it.
+"""
+
+import bisect
+import logging
+import time
+from typing import (
+    Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+)
+
+import kopf
+
+from handlers.rightsizing import rightsized
+from resources.deployment import DEFAULT_RESOURCES
+from utils.config import env_bool, env_float
+from utils.metrics import ADMISSION_QUEUE_LENGTH, CLUSTER_CAPACITY
+from utils.quantity import cpu_millis, memory_bytes
+from utils.time_utils import parse_timestamp
+
+
+logger = logging.getLogger(__name__)
+
+# Share of node allocatable the ledger hands out; the rest covers system pods
+# and anything else running on the nodes
+DEFAULT_HEADROOM = 0.9
+
+# Seconds between a queued workshop's admission checks
+DEFAULT_RETRY_DELAY = 15.0
+
+# Phases in which a workshop's pod exists (or is about to)
+RESERVING_PHASES = ('Creating', 'Ready', 'Running')
+
+# Phases in which a cohort's seats exist (or are about to)
+COHORT_RESERVING_PHASES = ('Creating', 'Ready', 'Degraded')
+
+# (cpu millicores, memory bytes)
+Demand = Tuple[int, int]
+
+# (plural, namespace, name)
+ObjectKey = Tuple[str, str, str]
+
+# Sort key of a queued workshop: (-priority, created_at, arrival)
+QueueOrder = Tuple[int, float, int]
+
+
+class Admission(NamedTuple):
+    """Outcome of an admission request."""
+
+    admitted: bool
+    position: int = 0
+    estimated_wait: Optional[float] = None
+
+
+def register_capacity_handlers() -> None:
+    """Register the capacity accounting handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def workshop_demand(spec: Mapping[str, Any]) -> Demand:
+    """Return the CPU and memory a workshop's RStudio pod requests."""
+    resources = spec.get('resources') or {}
+    return (
+        cpu_millis(resources.get('cpuRequest', DEFAULT_RESOURCES['cpuRequest'])),
+        memory_bytes(
+            resources.get('memoryRequest', DEFAULT_RESOURCES['memoryRequest'])
+        ),
+    )
+
+
+def cohort_demand(
+    spec: Mapping[str, Any],
+    rightsizing: Optional[Mapping[str, Any]] = None
+) -> Demand:
+    """
+    Return the CPU and memory all of a cohort's seats request together.
+
+    Args:
+        spec: Cohort spec
+        rightsizing: ``status.rightsizing`` of the cohort, if any
+    """
+    cpu, memory = workshop_demand(
+        rightsized(spec.get('template') or {}, rightsizing)
+    )
+    seats = spec.get('seats', 1)
+    return (cpu * seats, memory * seats)
+
+
+def node_allocatable(
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any]
+) -> Demand:
+    """Return what a node offers to workshops: nothing unless it is usable."""
+    if spec.get('unschedulable'):
+        return (0, 0)
+    ready = any(
+        condition.get('type') == 'Ready' and condition.get('status') == 'True'
+        for condition in status.get('conditions') or []
+    )
+    allocatable = status.get('allocatable') or {}
+    if not ready or not allocatable:
+        return (0, 0)
+    return (
+        cpu_millis(allocatable.get('cpu', 0)),
+        memory_bytes(allocatable.get('memory', 0)),
+    )
+
+
+class CapacityLedger:
+    """
+    Incremental ledger of node capacity, reservations and the admission queue.
+
+    Until the first node has been seen the capacity is unknown and every
+    request is admitted, so a missing node watch never blocks workshops.
+    """
+
+    def __init__(
+        self,
+        headroom: float = DEFAULT_HEADROOM,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        """
+        Args:
+            headroom: Share of node allocatable available to workshops
+            clock: Returns the current time in epoch seconds
+        """
+        self.headroom = headroom
+        self.clock = clock
+        self._nodes: Dict[str, Demand] = {}
+        self.allocatable_cpu = 0
+        self.allocatable_memory = 0
+        # Key -> (demand, epoch seconds it expires at, if known)
+        self._reservations: Dict[ObjectKey, Tuple[Demand, Optional[float]]] = {}
+        self.reserved_cpu = 0
+        self.reserved_memory = 0
+        self._queue: List[Tuple[QueueOrder, ObjectKey]] = []
+        self._queued: Dict[ObjectKey, Tuple[QueueOrder, Demand]] = {}
+        self._arrivals = 0
+
+    @property
+    def capacity_known(self) -> bool:
+        return bool(self._nodes)
+
+    def free(self) -> Demand:
+        """Return the CPU and memory not yet reserved."""
+        return (
+            int(self.allocatable_cpu * self.headroom) - self.reserved_cpu,
+            int(self.allocatable_memory * self.headroom) - self.reserved_memory,
+        )
+
+    def fits(self, demand: Demand) -> bool:
+        cpu, memory = self.free()
+        return demand[0] <= cpu and demand[1] <= memory
+
+    def is_reserved(self, key: ObjectKey) -> bool:
+        return key in self._reservations
+
+    def __len__(self) -> int:
+        """Number of queued workshops."""
+        return len(self._queue)
+
+    def set_node(self, name: str, allocatable: Optional[Demand]) -> None:
+        """Record a node's allocatable capacity (``None`` once it is gone)."""
+        old = self._nodes.pop(name, (0, 0))
+        self.allocatable_cpu -= old[0]
+        self.allocatable_memory -= old[1]
+        if allocatable is not None:
+            self._nodes[name] = allocatable
+            self.allocatable_cpu += allocatable[0]
+            self.allocatable_memory += allocatable[1]
+        self._promote()
+
+    def reserve(
+        self,
+        key: ObjectKey,
+        demand: Demand,
+        expires_at: Optional[float] = None
+    ) -> None:
+        """Reserve capacity for a running object, replacing its old reservation."""
+        old = self._reservations.get(key)
+        if old is not None:
+            if expires_at is None:
+                expires_at = old[1]
+            self.reserved_cpu -= old[0][0]
+            self.reserved_memory -= old[0][1]
+        self._dequeue(key)
+        self._reservations[key] = (demand, expires_at)
+        self.reserved_cpu += demand[0]
+        self.reserved_memory += demand[1]
+        self._update_metrics()
+
+    def release(self, key: ObjectKey) -> None:
+        """Drop an object's reservation (or queue entry) and admit waiters."""
+        self._dequeue(key)
+        old = self._reservations.pop(key, None)
+        if old is not None:
+            self.reserved_cpu -= old[0][0]
+            self.reserved_memory -= old[0][1]
+            self._promote()
+        self._update_metrics()
+
+    def request(
+        self,
+        key: ObjectKey,
+        demand: Demand,
+        priority: int = 0,
+        created_at: float = 0.0
+    ) -> Admission:
+        """
+        Ask to admit a workshop, queueing it if it does not fit yet.
+
+        Args:
+            key: Workshop key
+            demand: CPU and memory its pod requests
+            priority: Higher priorities are admitted first
+            created_at: Creation time, ordering workshops of equal priority
+
+        Returns:
+            Whether it is admitted; otherwise its 1-based queue position and
+            estimated wait in seconds (``None`` if no release is in sight)
+        """
+        if key in self._reservations:
+            return Admission(True)
+        if key not in self._queued:
+            self._arrivals += 1
+            order = (-priority, created_at, self._arrivals)
+            bisect.insort(self._queue, (order, key))
+            self._queued[key] = (order, demand)
+        self._promote()
+        if key in self._reservations:
+            return Admission(True)
+        position = self.position(key)
+        return Admission(False, position, self.estimate_wait(position))
+
+    def position(self, key: ObjectKey) -> int:
+        """Return a queued workshop's 1-based position (0 if not queued)."""
+        entry = self._queued.get(key)
+        if entry is None:
+            return 0
+        return bisect.bisect_left(self._queue, (entry[0], key)) + 1
+
+    def estimate_wait(self, position: int) -> Optional[float]:
+        """
+        Estimate when the workshop at ``position`` will be admitted.
+
+        Assumes running workshops free their capacity at their expiry and
+        everything ahead in the queue is admitted first.
+        """
+        need_cpu = need_memory = 0
+        for _, key in self._queue[:position]:
+            demand = self._queued[key][1]
+            need_cpu += demand[0]
+            need_memory += demand[1]
+
+        free_cpu, free_memory = self.free()
+        now = self.clock()
+        releases = sorted(
+            (expires_at, demand)
+            for demand, expires_at in self._reservations.values()
+            if expires_at is not None
+        )
+        for expires_at, demand in releases:
+            free_cpu += demand[0]
+            free_memory += demand[1]
+            if need_cpu <= free_cpu and need_memory <= free_memory:
+                return max(expires_at - now, 0.0)
+        return None
+
+    def _dequeue(self, key: ObjectKey) -> None:
+        entry = self._queued.pop(key, None)
+        if entry is not None:
+            index = bisect.bisect_left(self._queue, (entry[0], key))
+            del self._queue[index]
+
+    def _promote(self) -> None:
+        # Strict queue order: stop at the first workshop that does not fit
+        while self._queue:
+            _, key = self._queue[0]
+            demand = self._queued[key][1]
+            if self.capacity_known and not self.fits(demand):
+                break
+            self.reserve(key, demand)
+            logger.info(f"Admitted {key[0]} {key[2]} in namespace {key[1]}")
+        self._update_metrics()
+
+    def _update_metrics(self) -> None:
+        ADMISSION_QUEUE_LENGTH.set(len(self._queue))
+        CLUSTER_CAPACITY.labels('cpu', 'allocatable').set(self.allocatable_cpu / 1000)
+        CLUSTER_CAPACITY.labels('cpu', 'reserved').set(self.reserved_cpu / 1000)
+        CLUSTER_CAPACITY.labels('memory', 'allocatable').set(self.allocatable_memory)
+        CLUSTER_CAPACITY.labels('memory', 'reserved').set(self.reserved_memory)
+
+
+_ledger: Optional[CapacityLedger] = None
+_retry_delay = DEFAULT_RETRY_DELAY
+
+
+def get_ledger() -> Optional[CapacityLedger]:
+    """Return the capacity ledger, or ``None`` if admission control is off."""
+    return _ledger
+
+
+def start_admission_control() -> None:
+    """
+    Enable capacity-aware admission.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_ADMISSION_CONTROL``: hold workshops that do not fit
+      (default on)
+    - ``ORCHESTRA_ADMISSION_HEADROOM``: share of node allocatable available
+      to workshops (default 0.9)
+    - ``ORCHESTRA_ADMISSION_RETRY_DELAY``: seconds between a queued
+      workshop's admission checks (default 15)
+    """
+    global _ledger, _retry_delay
+
+    if not env_bool('ORCHESTRA_ADMISSION_CONTROL', True):
+        logger.info("Admission control disabled")
+        return
+    _ledger = CapacityLedger(
+        headroom=env_float('ORCHESTRA_ADMISSION_HEADROOM', DEFAULT_HEADROOM)
+    )
+    _retry_delay = env_float('ORCHESTRA_ADMISSION_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    try:
+        return parse_timestamp(timestamp).timestamp()
+    except ValueError:
+        return None
+
+
+def pending_status(admission: Admission) -> Dict[str, Any]:
+    """Build the status of a workshop waiting in the admission queue."""
+    wait = admission.estimated_wait
+    if wait is None:
+        message = (
+            f"Position {admission.position} in the admission queue; "
+            "waiting for cluster capacity"
+        )
+    else:
+        message = (
+            f"Position {admission.position} in the admission queue; "
+            f"estimated wait {int(wait // 60)}m"
+        )
+    return {
+        'phase': 'Pending',
+        'queue': {
+            'position': admission.position,
+            'estimatedWaitSeconds': None if wait is None else int(wait),
+        },
+        'conditions': [{
+            'type': 'Ready',
+            'status': 'False',
+            'reason': 'WaitingForCapacity',
+            'message': message,
+        }],
+    }
+
+
+def admit_workshop(
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    patch: Dict[str, Any],
+    pooled: bool = False
+) -> None:
+    """
+    Admit a workshop into the cluster, or keep it queued.
+
+    Args:
+        namespace: Kubernetes namespace
+        name: Workshop object name
+        spec: Workshop spec
+        meta: Workshop metadata
+        patch: Kopf patch; receives the ``Pending`` status while queued
+        pooled: The workshop claimed an already-running warm pool entry, so
+            it is admitted without queueing
+
+    Raises:
+        kopf.TemporaryError: If it does not fit yet, so Kopf retries the
+            create handler later
+    """
+    if _ledger is None:
+        return
+    key = ('workshops', namespace, name)
+    demand = workshop_demand(spec)
+    if pooled:
+        _ledger.reserve(key, demand)
+        return
+    _admit(key, demand, spec, meta, patch, f"Workshop {name}")
+
+
+def admit_cohort(
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    patch: Dict[str, Any]
+) -> None:
+    """
+    Admit a cohort's seats into the cluster together, or keep it queued.
+
+    Args:
+        namespace: Kubernetes namespace
+        name: WorkshopCohort object name
+        spec: Cohort spec
+        meta: Cohort metadata
+        patch: Kopf patch; receives the ``Pending`` status while queued
+
+    Raises:
+        kopf.TemporaryError: If its seats do not fit yet, so Kopf retries the
+            create handler later
+    """
+    if _ledger is None:
+        return
+    key = ('workshopcohorts', namespace, name)
+    _admit(key, cohort_demand(spec), spec, meta, patch, f"Cohort {name}")
+
+
+def _admit(
+    key: ObjectKey,
+    demand: Demand,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    patch: Dict[str, Any],
+    description: str
+) -> None:
+    admission = _ledger.request(
+        key, demand, spec.get('priority', 0),
+        _epoch(meta.get('creationTimestamp')) or 0.0
+    )
+    if not admission.admitted:
+        patch['status'] = pending_status(admission)
+        raise kopf.TemporaryError(
+            f"{description} is queued at position {admission.position}",
+            delay=_retry_delay
+        )
+
+
+@kopf.on.event('', 'v1', 'nodes')  # type: ignore
+async def node_capacity_event(
+    type: Optional[str],
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Track the allocatable capacity of every usable node."""
+    if _ledger is None:
+        return
+    if type == 'DELETED':
+        _ledger.set_node(name, None)
+    else:
+        _ledger.set_node(name, node_allocatable(spec, status))
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_capacity_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep a Workshop's reservation in step with its phase."""
+    if _ledger is None:
+        return
+    key = ('workshops', namespace, name)
+    phase = status.get('phase')
+    if type == 'DELETED' or phase in ('Failed', 'Terminating', 'Hibernated'):
+        _ledger.release(key)
+    elif phase in RESERVING_PHASES:
+        _ledger.reserve(
+            key, workshop_demand(rightsized(spec, status.get('rightsizing'))),
+            _epoch(status.get('expiresAt'))
+        )
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def cohort_capacity_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep a cohort's reservation in step with its phase and seat count."""
+    if _ledger is None:
+        return
+    key = ('workshopcohorts', namespace, name)
+    phase = status.get('phase')
+    if type == 'DELETED' or phase in ('Failed', 'Terminating'):
+        _ledger.release(key)
+    elif phase in COHORT_RESERVING_PHASES:
+        _ledger.reserve(
+            key, cohort_demand(spec, status.get('rightsizing')),
+            _epoch(status.get('expiresAt'))
+        )
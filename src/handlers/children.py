@@ -0,0 +1,189 @@
+"""Watch-backed indexes of the child resources owned by each workshop.
+
+Kopf keeps these indexes up to date from its own watch streams and does not
+invoke any handler until every index has been populated, so a handler can
+answer "does this child exist / is it ready / has it drifted" without calling
+the API server. Indexes are keyed by ``(namespace, workshop)``; every summary
+carries the child's content hash (see :mod:`resources.manifests`) and the uid
+of the controller named in its ownerReferences, if any.
+"""
+
+import logging
+from typing import Any, Dict, Mapping, Optional, Set
+
+import kopf
+
+from handlers.warm_pool import POOL_STATE_LABEL
+from resources.manifests import CONTENT_HASH_ANNOTATION
+from utils.metrics import CHILD_CACHE_LOOKUPS
+
+
+logger = logging.getLogger(__name__)
+
+# Child kind -> name of the index (handler kwarg) that tracks it
+CHILD_INDEXES = {
+    'deployment': 'workshop_deployments',
+    'service': 'workshop_services',
+    'pvc': 'workshop_pvcs',
+    'ingress': 'workshop_ingressroutes',
+}
+
+
+def register_children_indexes() -> None:
+    """Register the child resource indexes."""
+    # Indexes are registered via decorators below
+    pass
+
+
+def _summary(
+    name: str,
+    meta: Mapping[str, Any],
+    **fields: Any
+) -> Dict[str, Any]:
+    annotations = meta.get('annotations') or {}
+    owner = next(
+        (ref.get('uid') for ref in meta.get('ownerReferences') or []
+         if ref.get('controller')),
+        None
+    )
+    return {
+        'name': name,
+        'hash': annotations.get(CONTENT_HASH_ANNOTATION),
+        'owner': owner,
+        **fields,
+    }
+
+
+def _workshop_key(namespace: str, labels: Mapping[str, str]) -> Optional[tuple]:
+    # Older Services and PVCs were only labelled with 'app'
+    workshop = labels.get('workshop') or labels.get('app')
+    return (namespace, workshop) if workshop else None
+
+
+@kopf.index('apps', 'v1', 'deployments', labels={'component': 'rstudio'})
+def workshop_deployments(
+    namespace: str,
+    name: str,
+    labels: Mapping[str, str],
+    meta: Mapping[str, Any],
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> Optional[Dict[tuple, Dict[str, Any]]]:
+    """Index RStudio Deployments with their availability."""
+    key = _workshop_key(namespace, labels)
+    if key is None:
+        return None
+    replicas = spec.get('replicas', 1)
+    available = status.get('availableReplicas') or 0
+    # A claimed warm pool entry keeps its generated name in the 'app' label
+    claimed = labels.get(POOL_STATE_LABEL) == 'claimed'
+    return {key: _summary(
+        name, meta,
+        replicas=replicas,
+        readyReplicas=status.get('readyReplicas') or 0,
+        availableReplicas=available,
+        ready=replicas > 0 and available >= replicas,
+        warmPoolEntry=labels.get('app') if claimed else None,
+    )}
+
+
+@kopf.index('', 'v1', 'services', labels={'component': 'rstudio'})
+def workshop_services(
+    namespace: str,
+    name: str,
+    labels: Mapping[str, str],
+    meta: Mapping[str, Any],
+    **kwargs: Any
+) -> Optional[Dict[tuple, Dict[str, Any]]]:
+    """Index workshop Services."""
+    key = _workshop_key(namespace, labels)
+    if key is None:
+        return None
+    return {key: _summary(name, meta, ready=True)}
+
+
+@kopf.index('', 'v1', 'persistentvolumeclaims', labels={'component': 'storage'})
+def workshop_pvcs(
+    namespace: str,
+    name: str,
+    labels: Mapping[str, str],
+    meta: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> Optional[Dict[tuple, Dict[str, Any]]]:
+    """Index workshop PersistentVolumeClaims with their binding phase."""
+    key = _workshop_key(namespace, labels)
+    if key is None:
+        return None
+    phase = status.get('phase', 'Pending')
+    return {key: _summary(name, meta, phase=phase, ready=phase == 'Bound')}
+
+
+@kopf.index('traefik.io', 'v1alpha1', 'ingressroutes', labels={'component': 'rstudio'})
+def workshop_ingressroutes(
+    namespace: str,
+    name: str,
+    labels: Mapping[str, str],
+    meta: Mapping[str, Any],
+    **kwargs: Any
+) -> Optional[Dict[tuple, Dict[str, Any]]]:
+    """Index workshop IngressRoutes."""
+    key = _workshop_key(namespace, labels)
+    if key is None:
+        return None
+    return {key: _summary(name, meta, ready=True)}
+
+
+def find_children(
+    indexes: Mapping[str, Any],
+    namespace: str,
+    workshop_name: str
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Look up a workshop's child resources in the watch-backed indexes.
+
+    Args:
+        indexes: Handler kwargs, which carry the Kopf indexes
+        namespace: Kubernetes namespace
+        workshop_name: Name of the workshop
+
+    Returns:
+        Mapping of child kind (``deployment``, ``service``, ``pvc``,
+        ``ingress``) to its summary for every child that exists, or ``None``
+        when the indexes are not available (e.g. outside a Kopf handler)
+    """
+    if not all(index_name in indexes for index_name in CHILD_INDEXES.values()):
+        return None
+
+    key = (namespace, workshop_name)
+    children: Dict[str, Dict[str, Any]] = {}
+    for kind, index_name in CHILD_INDEXES.items():
+        store = indexes[index_name].get(key)
+        if store:
+            children[kind] = next(iter(store))
+            CHILD_CACHE_LOOKUPS.labels(kind=kind, result='hit').inc()
+        else:
+            CHILD_CACHE_LOOKUPS.labels(kind=kind, result='miss').inc()
+    return children
+
+
+def unowned_children(
+    children: Mapping[str, Dict[str, Any]],
+    uid: Optional[str]
+) -> Set[str]:
+    """
+    Return the kinds of the indexed children not controlled by owner ``uid``.
+
+    Owned children are removed by the garbage collector once their owner is
+    deleted; only the rest need deleting explicitly.
+    """
+    return {
+        kind for kind, child in children.items()
+        if not uid or child.get('owner') != uid
+    }
+
+
+def children_ready(children: Mapping[str, Dict[str, Any]]) -> bool:
+    """Return True if every indexed child reports ready."""
+    return bool(children) and all(child['ready'] for child in children.values())
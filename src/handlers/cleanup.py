@@ -1,13 +1,37 @@
 """Cleanup handlers for expired workshops."""
 
 import logging
-from typing import Any
+import time
+from datetime import timezone
+from typing import Any, Dict, Hashable, Optional, Tuple
 
 import kopf
+from kubernetes.client.rest import ApiException
+
+from utils.k8s_client import get_gateway
+from utils.metrics import WORKSHOPS_BY_PHASE, timed_handler
+from utils.pacing import paced_deadline
+from utils.scheduler import DeadlineScheduler
+from utils.sharding import is_owned, owns
+from utils.time_utils import get_expiration_time, parse_timestamp
 
 
 logger = logging.getLogger(__name__)
 
+# Seconds before retrying an expiration whose delete call failed
+EXPIRATION_RETRY_DELAY = 30
+
+# Scheduler keys are (plural, namespace, name)
+ExpirationKey = Tuple[str, str, str]
+
+_scheduler: Optional[DeadlineScheduler] = None
+
+# Last expiresAt string seen per key, so unchanged timestamps are not re-parsed
+_expires_at_seen: Dict[ExpirationKey, str] = {}
+
+# Phase each live workshop is counted under, keyed by (namespace, name)
+_phases: Dict[Tuple[str, str], str] = {}
+
 
 def register_cleanup_handlers() -> None:
     """Register cleanup-related Kopf handlers."""
@@ -15,64 +39,234 @@ def register_cleanup_handlers() -> None:
     pass
 
 
-# check every 5 minutes for expired workshops
-@kopf.timer('orchestra.io', 'v1', 'workshops', interval=300)  # type: ignore
-async def workshop_expiration_timer(
-    spec: dict,
-    status: dict,
+@timed_handler('expire')
+async def expire_resource(key: Hashable) -> None:
+    """
+    Delete an expired Workshop or WorkshopCohort.
+
+    Deleting the custom object runs its delete handler, which tears down the
+    child resources.
+    """
+    plural, namespace, name = key
+    _expires_at_seen.pop(key, None)
+    if not owns(namespace, name):  # Moved to another replica's shard
+        return
+    logger.info(f"{plural} {name} in namespace {namespace} has expired, deleting it")
+    try:
+        await get_gateway().custom.delete_namespaced_custom_object(
+            group='orchestra.io',
+            version='v1',
+            namespace=namespace,
+            plural=plural,
+            name=name
+        )
+    except ApiException as e:
+        if e.status != 404:  # Already gone is fine
+            logger.warning(
+                f"Failed to delete expired {plural} {name}, retrying in "
+                f"{EXPIRATION_RETRY_DELAY}s: {e}"
+            )
+            get_expiration_scheduler().schedule(
+                key, time.time() + EXPIRATION_RETRY_DELAY
+            )
+
+
+def get_expiration_scheduler() -> DeadlineScheduler:
+    """Return the process-wide expiration scheduler, creating it on first use."""
+    global _scheduler
+
+    if _scheduler is None:
+        _scheduler = DeadlineScheduler(expire_resource)
+    return _scheduler
+
+
+def start_expiration_scheduler() -> None:
+    """Start the expiration scheduler on the running event loop."""
+    get_expiration_scheduler().start()
+
+
+async def stop_expiration_scheduler() -> None:
+    """Stop the expiration scheduler and log how it performed."""
+    if _scheduler is not None:
+        await _scheduler.stop()
+        stats = _scheduler.stats()
+        logger.info(
+            f"Expiration scheduler stopped: {stats['fired']} expired, "
+            f"{stats['wakeups']} wakeups, max lateness {stats['max_lateness']:.3f}s"
+        )
+
+
+def track_expiration(
+    plural: str,
+    event_type: Optional[str],
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
     namespace: str,
-    name: str,
-    **kwargs: Any
+    name: str
 ) -> None:
     """
-    Periodic timer to check for expired workshops and clean them up.
-    
-    This runs every 5 minutes to check if workshops have expired
-    based on their expiresAt timestamp.
+    Keep the scheduler in step with an object's ``status.expiresAt``.
+
+    Args:
+        plural: Resource plural (``workshops`` or ``workshopcohorts``)
+        event_type: Watch event type; ``None`` for the initial listing
+        meta: Object metadata
+        status: Object status
+        namespace: Kubernetes namespace
+        name: Object name
     """
-    logger.info(f"Checking expiration for workshop {name} in namespace {namespace}")
-    
-    # Get expiration time from status
+    scheduler = get_expiration_scheduler()
+    key = (plural, namespace, name)
+
     expires_at = status.get('expiresAt')
-    if not expires_at:
-        logger.warning(f"Workshop {name} has no expiration time set")
+    if (
+        event_type == 'DELETED'
+        or meta.get('deletionTimestamp')
+        or not expires_at
+        or not owns(namespace, name)  # Another replica's shard expires it
+    ):
+        scheduler.cancel(key)
+        _expires_at_seen.pop(key, None)
         return
-    
-    # Parse expiration time and check if expired
-    from datetime import datetime
+
+    if _expires_at_seen.get(key) == expires_at and key in scheduler:
+        return
+
     try:
-        expiration_time = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-        current_time = datetime.now(expiration_time.tzinfo)
-        
-        if current_time >= expiration_time:
-            logger.info(f"Workshop {name} has expired, scheduling for deletion")
-            
-            # Mark workshop for deletion by updating its phase
-            # The actual deletion will be handled by the delete handler
-            # For now, we'll just log the expiration
-            # In a real implementation, you'd trigger deletion here
-            
-            logger.info(f"Workshop {name} marked for expiration cleanup")
-            
+        deadline = parse_timestamp(expires_at).timestamp()
     except ValueError as e:
-        logger.error(f"Failed to parse expiration time for workshop {name}: {e}")
+        logger.error(f"Failed to parse expiration time for {plural} {name}: {e}")
+        return
 
+    _expires_at_seen[key] = expires_at
+    # Expiries that passed while the operator was down are spread out
+    scheduler.schedule(key, paced_deadline(deadline))
 
-@kopf.on.field('orchestra.io', 'v1', 'workshops', field='status.phase') # type: ignore
-async def workshop_phase_change(
-    old: str,
-    new: str, 
+
+# Every watch event -- including the initial listing Kopf performs on startup,
+# which rebuilds the schedule -- refreshes the object's deadline.
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_expiration_event(
+    type: Optional[str],
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
     namespace: str,
     name: str,
     **kwargs: Any
 ) -> None:
+    """Schedule workshop teardown at ``status.expiresAt``."""
+    track_expiration('workshops', type, meta, status, namespace, name)
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def cohort_expiration_event(
+    type: Optional[str],
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Schedule cohort teardown at ``status.expiresAt``."""
+    track_expiration('workshopcohorts', type, meta, status, namespace, name)
+
+
+def recompute_expiration(
+    duration: str,
+    meta: Dict[str, Any],
+    status: Dict[str, Any]
+) -> Optional[str]:
     """
-    Handle changes to workshop phase for logging and monitoring.
-    
-    This provides visibility into workshop lifecycle transitions.
+    Recalculate ``expiresAt`` from the creation time and a new duration.
+
+    Returns:
+        New ISO timestamp, or ``None`` if the object has no creation time yet
     """
-    if old != new:
-        logger.info(f"Workshop {name} phase changed: {old} -> {new}")
-        
-        # You could add metrics collection here
-        # or send notifications about state changes
+    created_at = status.get('createdAt') or meta.get('creationTimestamp')
+    if not created_at:
+        return None
+    start_time = parse_timestamp(created_at).astimezone(timezone.utc)
+    # Stored timestamps are naive UTC, matching get_expiration_time's default
+    return get_expiration_time(duration, start_time.replace(tzinfo=None)).isoformat()
+
+
+@kopf.on.update(  # type: ignore
+    'orchestra.io', 'v1', 'workshops', field='spec.duration', when=is_owned
+)
+async def workshop_duration_change(
+    new: str,
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
+    patch,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Move ``expiresAt`` when a workshop's duration is changed."""
+    expires_at = recompute_expiration(new, meta, status)
+    if expires_at:
+        logger.info(
+            f"Workshop {name} duration changed to {new}, expires at {expires_at}"
+        )
+        patch.setdefault('status', {})['expiresAt'] = expires_at
+
+
+@kopf.on.update(  # type: ignore
+    'orchestra.io', 'v1', 'workshopcohorts', field='spec.template.duration',
+    when=is_owned
+)
+async def cohort_duration_change(
+    new: str,
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
+    patch,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Move ``expiresAt`` when a cohort's duration is changed."""
+    expires_at = recompute_expiration(new, meta, status)
+    if expires_at:
+        logger.info(
+            f"Cohort {name} duration changed to {new}, expires at {expires_at}"
+        )
+        patch.setdefault('status', {})['expiresAt'] = expires_at
+
+
+def track_phase(
+    event_type: Optional[str],
+    namespace: str,
+    name: str,
+    phase: Optional[str]
+) -> None:
+    """
+    Keep the per-phase workshop gauge in step with a watch event.
+
+    Counting from watch events rather than phase changes means the initial
+    listing after a restart rebuilds the counts. Transitions are logged from
+    here too, rather than from a ``status.phase`` field handler whose
+    bookkeeping would add a write of its own to every transition.
+    """
+    key = (namespace, name)
+    previous = _phases.pop(key, None)
+    if previous is not None:
+        WORKSHOPS_BY_PHASE.labels(previous).dec()
+    if event_type == 'DELETED':
+        return
+    phase = phase or 'Pending'
+    if previous is not None and previous != phase:
+        logger.info(f"Workshop {name} phase changed: {previous} -> {phase}")
+    _phases[key] = phase
+    WORKSHOPS_BY_PHASE.labels(phase).inc()
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_phase_event(
+    type: Optional[str],
+    status: Dict[str, Any],
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Count this replica's workshops by phase for the metrics endpoint."""
+    if not owns(namespace, name):
+        type = 'DELETED'
+    track_phase(type, namespace, name, status.get('phase'))
@@ -0,0 +1,621 @@
+"""WorkshopCohort handlers: provision many workshop seats in one reconcile.
+
+Seats are reported as created once their child resources exist; the cohort
+stays ``Creating`` until every seat's RStudio Deployment passes readiness,
+which is tracked from Deployment watch events like a single workshop's.
+"""
+
+import asyncio
+import logging
+from typing import (
+    Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Set,
+    Tuple, TypeVar
+)
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from handlers.capacity import admit_cohort
+from handlers.children import find_children
+from handlers.provisioning import ProvisioningError
+from handlers.placement import place_cohort
+from handlers.readiness import deployment_phase
+from handlers.rightsizing import rightsize, rightsized
+from handlers.workshop import build_create_plan, build_delete_plan
+from resources.cohort import (
+    iter_seat_specs,
+    seat_names,
+    seat_template,
+    seat_url_template,
+)
+from resources.owner import owner_reference
+from resources.snapshot import (
+    SNAPSHOT_GROUP,
+    SNAPSHOT_PLURAL,
+    SNAPSHOT_VERSION,
+    create_golden_snapshot,
+)
+from utils.k8s_client import ApiGateway, get_gateway, throttled_retry_delay
+from utils.metrics import timed_handler
+from utils.sharding import is_owned, owns
+from utils.tracing import traced_handler
+from utils.time_utils import get_expiration_time
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Label stamped on every seat's child resources
+COHORT_LABEL = 'orchestra.io/cohort'
+
+DEFAULT_PARALLELISM = 20
+
+# Only this many failed seats are itemised in status, keeping the patch small
+MAX_REPORTED_FAILURES = 10
+
+# Cohort phases in which seat readiness is written to status
+TRACKED_PHASES = ('Creating', 'Ready', 'Degraded')
+
+CohortKey = Tuple[str, str]
+
+# Seats whose RStudio Deployment passes readiness, keyed by (namespace, cohort)
+_ready_seats: Dict[CohortKey, Set[str]] = {}
+
+# Ready count and phase last written per cohort, so repeated Deployment events
+# do not repeat the same patch before the cohort's own watch event catches up
+_reported: Dict[CohortKey, Tuple[int, str]] = {}
+
+# Seconds between checks on a golden snapshot that is not ready yet
+GOLDEN_POLL_DELAY = 10
+
+
+def register_cohort_handlers() -> None:
+    """Register all cohort-related Kopf handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+async def run_bounded(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[None]],
+    parallelism: int
+) -> None:
+    """
+    Run ``worker`` over ``items`` with at most ``parallelism`` in flight.
+
+    Workers pull from one shared iterator, so a slow item never holds up the
+    others the way fixed-size batches would.
+    """
+    iterator = iter(items)
+
+    async def drain() -> None:
+        for item in iterator:
+            await worker(item)
+
+    await asyncio.gather(*(drain() for _ in range(max(parallelism, 1))))
+
+
+async def provision_seats(
+    api: ApiGateway,
+    cohort_name: str,
+    namespace: str,
+    seats: Iterable[str],
+    template: Dict[str, Any],
+    parallelism: int,
+    owner: Optional[Dict[str, Any]] = None,
+    placement: Optional[Dict[str, Any]] = None,
+    indexes: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Provision the child resources for a set of seats.
+
+    Seats throttled by the API server are neither created nor failed; the
+    caller retries them after ``retryAfter`` seconds. Children already in the
+    watch-backed indexes are not created again, so a retry only issues the
+    missing creates.
+
+    Args:
+        api: API gateway to issue the creates through
+        cohort_name: Name of the owning cohort
+        namespace: Kubernetes namespace
+        seats: Seat names to provision
+        template: ``spec.template`` from the cohort
+        parallelism: Maximum seats provisioned concurrently
+        owner: ownerReference to the cohort, stamped on every seat's children
+        placement: ``status.placement`` of the cohort, shared by every seat
+        indexes: Handler kwargs carrying the child indexes, if available
+
+    Returns:
+        Dict with the ``created`` count, a list of ``failures``, the number
+        of ``throttled`` seats and, if there were any, the longest
+        ``retryAfter`` the API server asked for
+    """
+    labels = {COHORT_LABEL: cohort_name}
+    outcome: Dict[str, Any] = {'created': 0, 'failures': [], 'throttled': 0}
+
+    async def provision(item: Any) -> None:
+        seat_name, seat_spec = item
+        children = find_children(indexes or {}, namespace, seat_name)
+        try:
+            await build_create_plan(
+                api, seat_name, namespace, seat_spec, labels, owner=owner,
+                placement=placement,
+                present=children.keys() if children is not None else None
+            ).run()
+            outcome['created'] += 1
+        except ProvisioningError as e:
+            delay = throttled_retry_delay(e.cause)
+            if delay is not None:
+                outcome['throttled'] += 1
+                outcome['retryAfter'] = max(outcome.get('retryAfter', 0), delay)
+                return
+            logger.error(f"Cohort {cohort_name} seat {seat_name} failed: {e}")
+            outcome['failures'].append(
+                {'seat': seat_name, 'stage': e.stage, 'message': str(e.cause)}
+            )
+
+    await run_bounded(iter_seat_specs(seats, template), provision, parallelism)
+    return outcome
+
+
+async def ensure_golden_snapshot(
+    api: ApiGateway,
+    cohort_name: str,
+    namespace: str,
+    template: Dict[str, Any],
+    owner: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Take the cohort's golden snapshot if its template asks for one.
+
+    The snapshot is server-side applied, so calling this again while it is
+    being taken costs one call and changes nothing. It is owned by the
+    cohort and deleted with it.
+
+    Raises:
+        kopf.TemporaryError: Until the snapshot is ready to be cloned
+    """
+    golden = (template.get('storage') or {}).get('golden')
+    if not golden:
+        return
+    manifest = create_golden_snapshot(
+        cohort_name, namespace, golden, {COHORT_LABEL: cohort_name}, owner
+    )
+    snapshot = await api.apply.apply_namespaced_custom_object(
+        group=SNAPSHOT_GROUP,
+        version=SNAPSHOT_VERSION,
+        namespace=namespace,
+        plural=SNAPSHOT_PLURAL,
+        name=manifest['metadata']['name'],
+        body=manifest
+    )
+    snapshot_status = (snapshot or {}).get('status') or {}
+    if snapshot_status.get('readyToUse'):
+        return
+    # Snapshot errors are retried by the snapshot controller
+    error = (snapshot_status.get('error') or {}).get('message')
+    raise kopf.TemporaryError(
+        f"Golden snapshot {manifest['metadata']['name']} of PVC "
+        f"{golden['sourcePVC']} is not ready" + (f": {error}" if error else ''),
+        delay=GOLDEN_POLL_DELAY
+    )
+
+
+async def teardown_seats(
+    api: ApiGateway,
+    namespace: str,
+    seats: Iterable[str],
+    parallelism: int
+) -> None:
+    """Delete the child resources of a set of seats."""
+    async def teardown(seat_name: str) -> None:
+        await build_delete_plan(api, seat_name, namespace).run()
+
+    await run_bounded(seats, teardown, parallelism)
+
+
+def ready_seats(namespace: str, cohort_name: str, limit: int) -> int:
+    """Return how many of a cohort's seats pass readiness, capped at ``limit``."""
+    return min(len(_ready_seats.get((namespace, cohort_name), ())), limit)
+
+
+def readiness_fields(
+    seats: int,
+    created: int,
+    failed: int,
+    ready: int
+) -> Dict[str, Any]:
+    """
+    Derive a cohort's phase and Ready condition from its seat counts.
+
+    Returns:
+        ``phase``, ``readySeats`` and ``conditions`` status fields: ``Failed``
+        when no seat was created, ``Degraded`` when some failed, ``Ready``
+        once every seat passes readiness, ``Creating`` until then
+    """
+    if failed and not created:
+        phase, reason = 'Failed', 'CreationFailed'
+    elif failed:
+        phase, reason = 'Degraded', 'SeatsFailed'
+    elif ready >= seats:
+        phase, reason = 'Ready', 'SeatsReady'
+    else:
+        phase, reason = 'Creating', 'WaitingForSeats'
+
+    return {
+        'phase': phase,
+        'readySeats': ready,
+        'conditions': [{
+            'type': 'Ready',
+            'status': 'True' if phase == 'Ready' else 'False',
+            'reason': reason,
+            'message': f"{ready}/{seats} seats ready, {created} created"
+        }]
+    }
+
+
+def cohort_status(
+    seats: int,
+    created: int,
+    failures: List[Dict[str, Any]],
+    template: Dict[str, Any],
+    failed: Optional[int] = None,
+    ready: int = 0
+) -> Dict[str, Any]:
+    """
+    Aggregate per-seat outcomes into one compact cohort status.
+
+    Args:
+        seats: Total seats in the cohort
+        created: Seats whose child resources were created
+        failures: Failed seats with their stage and message
+        template: ``spec.template`` from the cohort
+        failed: Total failed seats, when ``failures`` is only a sample
+        ready: Seats whose RStudio pod passes readiness
+
+    Returns:
+        Status dict for the cohort
+    """
+    if failed is None:
+        failed = len(failures)
+
+    return {
+        'seats': seats,
+        'createdSeats': created,
+        'failedSeats': failed,
+        'failures': failures[:MAX_REPORTED_FAILURES],
+        'urlTemplate': seat_url_template(template),
+        **readiness_fields(seats, created, failed, ready),
+    }
+
+
+@kopf.on.create('orchestra.io', 'v1', 'workshopcohorts', when=is_owned)
+@timed_handler('cohort_create')
+@traced_handler('cohort_create')
+async def cohort_create_handler(
+    spec: Dict[str, Any],
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
+    patch,
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Handle WorkshopCohort creation by provisioning every seat."""
+    seats = spec.get('seats', 1)
+    template = spec.get('template', {})
+    parallelism = spec.get('parallelism', DEFAULT_PARALLELISM)
+    owner = owner_reference('WorkshopCohort', name, meta.get('uid'))
+    logger.info(f"Creating cohort {name} with {seats} seats in namespace {namespace}")
+
+    try:
+        # Seats are sized from what the image's sessions use
+        rightsizing = status.get('rightsizing') or rightsize(template)
+        sized_template = rightsized(template, rightsizing)
+
+        # Hold the cohort Pending until the cluster has room for every seat
+        admit_cohort(
+            namespace, name, {**spec, 'template': sized_template}, meta, patch
+        )
+
+        # Queued time does not count
+        expiration_time = get_expiration_time(template.get('duration', '4h'))
+        # Seats clone their data, so it must be snapshotted before any exist
+        await ensure_golden_snapshot(
+            get_gateway(), name, namespace, template, owner
+        )
+        # Every seat goes to one pool and onto as few nodes as possible
+        placement = status.get('placement') or place_cohort(
+            namespace, name, sized_template, seats, {COHORT_LABEL: name}
+        )
+        outcome = await provision_seats(
+            get_gateway(), name, namespace, seat_names(name, seats),
+            seat_template(name, sized_template), parallelism, owner,
+            placement=placement, indexes=kwargs
+        )
+    except kopf.TemporaryError as e:
+        # A queued cohort has already written its place in the queue
+        if 'status' not in patch:
+            logger.info(f"Cohort {name} is waiting for its data: {e}")
+            patch['status'] = {
+                'phase': 'Pending',
+                'conditions': [{
+                    'type': 'Ready',
+                    'status': 'False',
+                    'reason': 'PreparingData',
+                    'message': str(e)
+                }]
+            }
+        raise
+    except Exception as e:
+        delay = throttled_retry_delay(e)
+        if delay is not None:
+            raise kopf.TemporaryError(
+                f"Creating cohort {name} was throttled by the API server",
+                delay=delay
+            ) from e
+        logger.error(f"Failed to create cohort {name}: {e}")
+        patch['status'] = {
+            'phase': 'Failed',
+            'conditions': [{
+                'type': 'Ready',
+                'status': 'False',
+                'reason': 'CreationFailed',
+                'message': str(e)
+            }]
+        }
+        return
+
+    status_return = cohort_status(
+        seats, outcome['created'], outcome['failures'], template,
+        ready=ready_seats(namespace, name, outcome['created'])
+    )
+    status_return['createdAt'] = meta.get('creationTimestamp', '')
+    status_return['expiresAt'] = expiration_time.isoformat()
+    if placement:
+        status_return['placement'] = placement
+    if rightsizing:
+        status_return['rightsizing'] = rightsizing
+    if status.get('queue'):
+        status_return['queue'] = None
+    logger.info(
+        f"Cohort {name}: {outcome['created']}/{seats} seats created, "
+        f"{len(outcome['failures'])} failed, {outcome['throttled']} throttled"
+    )
+    patch['status'] = status_return
+    if outcome['throttled']:
+        # The retry recounts every seat, skipping children that exist
+        raise kopf.TemporaryError(
+            f"{outcome['throttled']} seats of cohort {name} were throttled "
+            f"by the API server",
+            delay=outcome['retryAfter']
+        )
+
+
+@kopf.on.update(
+    'orchestra.io', 'v1', 'workshopcohorts', field='spec.seats', when=is_owned
+)
+@timed_handler('cohort_resize')
+@traced_handler('cohort_resize')
+async def cohort_resize_handler(
+    old: int,
+    new: int,
+    spec: Dict[str, Any],
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
+    patch,
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Add or remove seats when ``spec.seats`` changes."""
+    old = old or 0
+    template = spec.get('template', {})
+    parallelism = spec.get('parallelism', DEFAULT_PARALLELISM)
+    api = get_gateway()
+    logger.info(f"Resizing cohort {name} from {old} to {new} seats")
+
+    failures = status.get('failures', [])
+    failed = status.get('failedSeats', len(failures))
+
+    try:
+        if new > old:
+            owner = owner_reference('WorkshopCohort', name, meta.get('uid'))
+            await ensure_golden_snapshot(api, name, namespace, template, owner)
+            outcome = await provision_seats(
+                api, name, namespace, seat_names(name, new, start=old + 1),
+                seat_template(
+                    name, rightsized(template, status.get('rightsizing'))
+                ),
+                parallelism, owner,
+                placement=status.get('placement'), indexes=kwargs
+            )
+        else:
+            await teardown_seats(
+                api, namespace, seat_names(name, old, start=new + 1), parallelism
+            )
+    except Exception as e:
+        delay = throttled_retry_delay(e)
+        if delay is not None:
+            raise kopf.TemporaryError(
+                f"Resizing cohort {name} was throttled by the API server",
+                delay=delay
+            ) from e
+        raise
+
+    if new > old:
+        if outcome['throttled']:
+            # Status is left alone: the retry adds the new seats' counts to
+            # it, skipping children that already exist
+            raise kopf.TemporaryError(
+                f"{outcome['throttled']} new seats of cohort {name} were "
+                f"throttled by the API server",
+                delay=outcome['retryAfter']
+            )
+        created = status.get('createdSeats', old) + outcome['created']
+        failures = failures + outcome['failures']
+        failed += len(outcome['failures'])
+    else:
+        # Failures on removed seats no longer count against the cohort. Only
+        # a sample of failures is kept, so beyond that the count is a bound.
+        kept = set(seat_names(name, new))
+        sampled = len(failures)
+        failures = [f for f in failures if f['seat'] in kept]
+        if failed <= sampled:
+            failed = len(failures)
+        failed = min(failed, new)
+        created = new - failed
+
+    patch['status'] = cohort_status(
+        new, created, failures, template, failed,
+        ready_seats(namespace, name, created)
+    )
+
+
+@kopf.on.delete('orchestra.io', 'v1', 'workshopcohorts', when=is_owned)
+@timed_handler('cohort_delete')
+@traced_handler('cohort_delete', annotate=False)
+async def cohort_delete_handler(
+    spec: Dict[str, Any],
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """
+    Handle WorkshopCohort deletion by tearing down every seat.
+
+    Seats owned by the cohort are garbage-collected with it anyway; deleting
+    every seat by the cohort label takes four calls whatever the seat count
+    and also covers seats created before owner references were stamped.
+    """
+    seats = spec.get('seats', 1)
+    logger.info(f"Deleting cohort {name} with {seats} seats in namespace {namespace}")
+
+    try:
+        await build_delete_plan(
+            get_gateway(), name, namespace, label_selector=f"{COHORT_LABEL}={name}"
+        ).run()
+    except Exception as e:
+        delay = throttled_retry_delay(e)
+        if delay is not None:
+            raise kopf.TemporaryError(
+                f"Deleting cohort {name} was throttled by the API server",
+                delay=delay
+            ) from e
+        logger.error(f"Failed to delete cohort {name}: {e}")
+        raise kopf.PermanentError(f"Cohort deletion failed: {e}")
+
+
+def _cohort_summary(
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any]
+) -> Dict[str, Any]:
+    return {
+        'seats': spec.get('seats', 1),
+        'phase': status.get('phase'),
+        'createdSeats': status.get('createdSeats', 0),
+        'failedSeats': status.get('failedSeats', 0),
+        'readySeats': status.get('readySeats', 0),
+    }
+
+
+@kopf.index('orchestra.io', 'v1', 'workshopcohorts')
+def cohort_summaries(
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> Dict[CohortKey, Dict[str, Any]]:
+    """Index WorkshopCohorts by the name their seats are labelled with."""
+    return {(namespace, name): _cohort_summary(spec, status)}
+
+
+@kopf.on.event(  # type: ignore
+    'apps', 'v1', 'deployments', labels={COHORT_LABEL: kopf.PRESENT}
+)
+async def seat_readiness_event(
+    type: Optional[str],
+    namespace: str,
+    labels: Mapping[str, str],
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    cohort_summaries: kopf.Index,
+    **kwargs: Any
+) -> None:
+    """Count a seat as ready while its RStudio Deployment passes readiness."""
+    seat_name = labels.get('workshop') or labels.get('app')
+    if not seat_name:
+        return
+    key = (namespace, labels[COHORT_LABEL])
+    ready = _ready_seats.setdefault(key, set())
+    if type != 'DELETED' and deployment_phase(spec, status) != 'Creating':
+        ready.add(seat_name)
+    else:
+        ready.discard(seat_name)
+        if not ready:
+            del _ready_seats[key]
+
+    for cohort in cohort_summaries.get(key, []):
+        await _report_ready(namespace, key[1], cohort)
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def cohort_readiness_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """
+    Catch up a cohort whose seats became ready before it was ``Creating``.
+
+    The create and resize handlers count ready seats when they finish; seats
+    that became ready while their status was being written were only
+    recorded.
+    """
+    if type == 'DELETED':
+        _reported.pop((namespace, name), None)
+        return
+    await _report_ready(namespace, name, _cohort_summary(spec, status))
+
+
+async def _report_ready(namespace: str, name: str, cohort: Dict[str, Any]) -> None:
+    # Cohorts still being provisioned pick the count up from ready_seats();
+    # failed or terminating ones, and other replicas' shards, are left alone.
+    if cohort['phase'] not in TRACKED_PHASES or not owns(namespace, name):
+        return
+    created = cohort['createdSeats']
+    fields = readiness_fields(
+        cohort['seats'], created, cohort['failedSeats'],
+        ready_seats(namespace, name, created)
+    )
+    reported = (fields['readySeats'], fields['phase'])
+    if reported == (cohort['readySeats'], cohort['phase']):
+        _reported.pop((namespace, name), None)
+        return
+    if _reported.get((namespace, name)) == reported:
+        return
+
+    try:
+        await get_gateway().custom.patch_namespaced_custom_object(
+            group='orchestra.io',
+            version='v1',
+            namespace=namespace,
+            plural='workshopcohorts',
+            name=name,
+            body={'status': fields}
+        )
+    except ApiException as e:
+        if e.status != 404:  # Deleted in the meantime
+            logger.warning(f"Failed to update readiness of cohort {name}: {e}")
+        return
+
+    _reported[(namespace, name)] = reported
+    logger.info(
+        f"Cohort {name}: {fields['readySeats']}/{cohort['seats']} seats ready, "
+        f"phase {cohort['phase']} -> {fields['phase']}"
+    )
@@ -0,0 +1,659 @@
+"""Scale idle workshops to zero and wake them on their next request.
+
+The idle detector periodically lists the Workshops this replica owns and
+asks an activity source (see :mod:`utils.activity`) how busy each one has
+been. A ``Ready`` or ``Running`` Workshop that stays idle for its idle
+timeout is hibernated: its phase becomes ``Hibernated``, its Deployment is
+scaled to zero and its IngressRoute is pointed at the operator's wake-up
+Service. The PVC is kept, so no work is lost, and the capacity ledger
+releases the Workshop's reservation.
+
+The wake-up server behind that Service answers requests for a hibernated
+host with a page that reloads itself, and annotates the Workshop
+(``orchestra.io/wake-requested``). The owning replica's wake handler scales
+the Deployment back up and, once the pod is ready, routes the host back to
+it; the next reload reaches RStudio.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from handlers.children import find_children
+from handlers.cohort import run_bounded
+from handlers.readiness import observed_phase
+from handlers.rightsizing import rightsized
+from handlers.status import write_status
+from handlers.workshop import build_apply_plan
+from resources.ingress import workshop_host
+from resources.owner import owner_reference
+from utils.activity import (
+    Activity,
+    ActivitySource,
+    WorkshopKey,
+    activity_source_from_env,
+)
+from utils.config import env_float, env_int, env_str
+from utils.k8s_client import ApiGateway, get_gateway
+from utils.metrics import (
+    HIBERNATION_TRANSITIONS,
+    WORKSHOP_WAKE_DURATION,
+    timed_handler,
+)
+from utils.sharding import is_owned, owns
+from utils.time_utils import parse_duration, parse_timestamp
+from utils.tracing import traced_handler
+
+
+logger = logging.getLogger(__name__)
+
+# Annotation the wake-up server sets, with the time of the request, to ask
+# the owning replica to wake a workshop
+WAKE_ANNOTATION = 'orchestra.io/wake-requested'
+
+DEFAULT_IDLE_TIMEOUT = 1800.0
+DEFAULT_CHECK_INTERVAL = 60.0
+
+# A workshop is idle while both signals stay at or below these. RStudio
+# polls the server from an open browser tab, so a trickle of requests is
+# not activity.
+DEFAULT_MAX_REQUEST_RATE = 0.1
+DEFAULT_MAX_CPU = 0.02
+
+# Workshops hibernated concurrently
+DEFAULT_PARALLELISM = 10
+
+DEFAULT_WAKE_PORT = 8081
+DEFAULT_WAKE_SERVICE = 'orchestra-wake'
+
+# Seconds between the wake handler's checks for the pod being ready, and
+# how long it keeps checking
+WAKE_POLL_DELAY = 2.0
+WAKE_TIMEOUT = 600
+
+# Seconds before another request for the same workshop re-sends its wake-up
+WAKE_REQUEST_DEBOUNCE = 30.0
+
+# Phases a workshop can be hibernated from
+HIBERNATING_PHASES = ('Ready', 'Running')
+
+# (namespace, Workshop object name)
+ObjectKey = Tuple[str, str]
+
+
+def register_hibernation_handlers() -> None:
+    """Register the hibernation handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def idle_timeout(spec: Mapping[str, Any], default: float) -> Optional[float]:
+    """
+    Return how long a workshop may idle before it is hibernated.
+
+    Args:
+        spec: Workshop spec; ``idleTimeout`` (e.g. ``45m``, ``0`` to never
+            hibernate) overrides the default
+        default: Operator-wide idle timeout in seconds (0 disables)
+
+    Returns:
+        Seconds, or ``None`` if the workshop is never hibernated
+
+    Raises:
+        ValueError: If ``idleTimeout`` is not a valid duration
+    """
+    value = spec.get('idleTimeout')
+    if value is None:
+        return default if default > 0 else None
+    if str(value).strip() == '0':
+        return None
+    return parse_duration(str(value)).total_seconds()
+
+
+def is_idle(activity: Activity, max_request_rate: float, max_cpu: float) -> bool:
+    """
+    Decide whether a workshop is idle.
+
+    Unknown signals are ignored; a workshop with no known signal at all is
+    not considered idle.
+    """
+    signals = [
+        (value, limit)
+        for value, limit in (
+            (activity.requests_per_second, max_request_rate),
+            (activity.cpu_cores, max_cpu),
+        )
+        if value is not None
+    ]
+    return bool(signals) and all(value <= limit for value, limit in signals)
+
+
+def hibernated_status(wake_service: Dict[str, str]) -> Dict[str, Any]:
+    """Build the status of a workshop being hibernated."""
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        'phase': 'Hibernated',
+        'hibernation': {**wake_service, 'hibernatedAt': now},
+        'conditions': [{
+            'type': 'Ready',
+            'status': 'False',
+            'reason': 'Hibernated',
+            'message': 'Scaled to zero while idle; the next request wakes it',
+            'lastTransitionTime': now,
+        }],
+    }
+
+
+def waking_status() -> Dict[str, Any]:
+    """Build the status of a hibernated workshop whose pod is starting again."""
+    return {
+        'phase': 'Creating',
+        'conditions': [{
+            'type': 'Ready',
+            'status': 'False',
+            'reason': 'Waking',
+            'message': 'Waking up from hibernation',
+            'lastTransitionTime': datetime.now(timezone.utc).isoformat(),
+        }],
+    }
+
+
+class IdleDetector:
+    """Hibernates owned workshops that have been idle for their idle timeout."""
+
+    def __init__(
+        self,
+        source: ActivitySource,
+        wake_service: Dict[str, str],
+        api: Optional[ApiGateway] = None,
+        interval: float = DEFAULT_CHECK_INTERVAL,
+        default_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_request_rate: float = DEFAULT_MAX_REQUEST_RATE,
+        max_cpu: float = DEFAULT_MAX_CPU,
+        parallelism: int = DEFAULT_PARALLELISM
+    ) -> None:
+        """
+        Args:
+            source: Where activity is read from
+            wake_service: ``service`` and ``namespace`` of the wake-up Service
+            api: API gateway (defaults to the process-wide one)
+            interval: Seconds between checks
+            default_timeout: Idle seconds before hibernating a workshop that
+                sets no ``idleTimeout`` (0 only hibernates those that do)
+            max_request_rate: Requests per second still counted as idle
+            max_cpu: CPU cores still counted as idle
+            parallelism: Workshops hibernated concurrently
+        """
+        self.source = source
+        self.wake_service = wake_service
+        self.interval = interval
+        self.default_timeout = default_timeout
+        self.max_request_rate = max_request_rate
+        self.max_cpu = max_cpu
+        self.parallelism = parallelism
+        self._api = api
+        # When each owned workshop was first seen idle in its current stretch
+        self._idle_since: Dict[ObjectKey, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    async def _candidates(self) -> List[Tuple[Dict[str, Any], float]]:
+        """Return owned, running workshops with their idle timeouts."""
+        result = await self.api.custom.list_cluster_custom_object(
+            group='orchestra.io', version='v1', plural='workshops'
+        )
+        candidates = []
+        for item in result.get('items', []):
+            metadata = item['metadata']
+            status = item.get('status') or {}
+            if status.get('phase') not in HIBERNATING_PHASES:
+                continue
+            # Warm pool entries are shared infrastructure, not the workshop's;
+            # a workshop still waking up keeps status.hibernation
+            if status.get('warmPool') or status.get('hibernation'):
+                continue
+            if metadata.get('deletionTimestamp'):
+                continue
+            if not owns(metadata.get('namespace'), metadata['name']):
+                continue
+            try:
+                timeout = idle_timeout(item.get('spec') or {}, self.default_timeout)
+            except ValueError as e:
+                logger.warning(f"Workshop {metadata['name']}: {e}")
+                continue
+            if timeout is not None:
+                candidates.append((item, timeout))
+        return candidates
+
+    async def check(self, now: Optional[float] = None) -> List[ObjectKey]:
+        """
+        Measure every candidate's activity and hibernate those idle too long.
+
+        Args:
+            now: Current time (defaults to ``time.monotonic()``)
+
+        Returns:
+            The workshops hibernated
+        """
+        now = time.monotonic() if now is None else now
+        candidates = await self._candidates()
+        keys: Dict[ObjectKey, WorkshopKey] = {}
+        for item, _ in candidates:
+            metadata = item['metadata']
+            keys[(metadata['namespace'], metadata['name'])] = (
+                metadata['namespace'],
+                (item.get('spec') or {}).get('name', metadata['name'])
+            )
+        activity = await self.source.activity(list(keys.values()))
+
+        due: List[Dict[str, Any]] = []
+        for item, timeout in candidates:
+            key = (item['metadata']['namespace'], item['metadata']['name'])
+            measured = activity.get(keys[key])
+            if measured is None or not is_idle(
+                measured, self.max_request_rate, self.max_cpu
+            ):
+                self._idle_since.pop(key, None)
+                continue
+            since = self._idle_since.setdefault(key, now)
+            if now - since >= timeout:
+                due.append(item)
+
+        # Forget workshops that went away or are no longer ours
+        for key in set(self._idle_since) - set(keys):
+            del self._idle_since[key]
+
+        hibernated: List[ObjectKey] = []
+
+        async def hibernate(item: Dict[str, Any]) -> None:
+            key = (item['metadata']['namespace'], item['metadata']['name'])
+            try:
+                await self.hibernate(item)
+            except Exception as e:
+                logger.error(f"Failed to hibernate workshop {key[1]}: {e}")
+                return
+            self._idle_since.pop(key, None)
+            hibernated.append(key)
+
+        await run_bounded(due, hibernate, self.parallelism)
+        return hibernated
+
+    async def hibernate(self, workshop: Dict[str, Any]) -> None:
+        """
+        Scale a workshop to zero and route its host to the wake-up Service.
+
+        The status is written first, so readiness events from the pod
+        shutting down find the workshop already ``Hibernated``.
+        """
+        metadata = workshop['metadata']
+        spec = workshop.get('spec') or {}
+        namespace, name = metadata['namespace'], metadata['name']
+        previous = workshop.get('status') or {}
+        status = hibernated_status(self.wake_service)
+        await self._patch_status(namespace, name, status)
+        try:
+            await build_apply_plan(
+                self.api, spec.get('name', name), namespace,
+                rightsized(spec, previous.get('rightsizing')),
+                owner=owner_reference('Workshop', name, metadata.get('uid')),
+                wake_service=status['hibernation'],
+                kinds=('deployment', 'ingress'),
+                placement=previous.get('placement')
+            ).run()
+        except Exception:
+            await self._patch_status(namespace, name, {
+                'phase': previous.get('phase'),
+                'hibernation': None,
+                'conditions': previous.get('conditions'),
+            })
+            raise
+        HIBERNATION_TRANSITIONS.labels(transition='hibernate').inc()
+        logger.info(f"Hibernated idle workshop {name} in namespace {namespace}")
+
+    async def _patch_status(
+        self,
+        namespace: str,
+        name: str,
+        status: Dict[str, Any]
+    ) -> None:
+        await write_status(namespace, name, status, api=self.api)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Idle check failed: {e}")
+
+    def start(self) -> None:
+        """Start checking on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop checking."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+WAKE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="{delay}">
+<title>Waking up your workshop</title></head>
+<body style="font-family: sans-serif; text-align: center; margin-top: 20vh">
+<h1>Waking up your workshop</h1>
+<p>It was paused while idle. This page reloads until RStudio is back.</p>
+</body></html>
+"""
+
+
+class WakeServer:
+    """
+    HTTP server answering requests routed to hibernated workshops.
+
+    Every replica tracks the hosts of all hibernated workshops from watch
+    events, so whichever replica the request lands on can ask for the wake;
+    the owning replica's wake handler does the rest.
+    """
+
+    def __init__(
+        self,
+        port: int = DEFAULT_WAKE_PORT,
+        api: Optional[ApiGateway] = None,
+        retry_after: int = 5
+    ) -> None:
+        """
+        Args:
+            port: Port to listen on
+            api: API gateway (defaults to the process-wide one)
+            retry_after: Seconds the wake page waits before reloading
+        """
+        self.port = port
+        self.retry_after = retry_after
+        self._api = api
+        self._hosts: Dict[str, ObjectKey] = {}
+        self._host_of: Dict[ObjectKey, str] = {}
+        # Workshops still hibernated, as opposed to already waking up
+        self._hibernated: Set[ObjectKey] = set()
+        self._requested: Dict[ObjectKey, float] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    def track(self, host: str, key: ObjectKey, hibernated: bool) -> None:
+        """Route ``host`` to a hibernated (or waking) workshop."""
+        host = host.lower()
+        old = self._host_of.get(key)
+        if old is not None and old != host:
+            self._hosts.pop(old, None)
+        self._hosts[host] = key
+        self._host_of[key] = host
+        if hibernated:
+            self._hibernated.add(key)
+        else:
+            self._hibernated.discard(key)
+
+    def forget(self, key: ObjectKey) -> None:
+        """Stop tracking a workshop that is back up or gone."""
+        host = self._host_of.pop(key, None)
+        if host is not None:
+            self._hosts.pop(host, None)
+        self._hibernated.discard(key)
+        self._requested.pop(key, None)
+
+    async def wake(self, host: str) -> Optional[ObjectKey]:
+        """
+        Ask for the workshop served on ``host`` to be woken.
+
+        Returns:
+            The workshop, or ``None`` if no hibernated workshop has that host
+        """
+        key = self._hosts.get(host.lower())
+        if key is None:
+            return None
+        now = time.monotonic()
+        if key not in self._hibernated:
+            return key
+        requested = self._requested.get(key)
+        if requested is not None and now - requested < WAKE_REQUEST_DEBOUNCE:
+            return key
+        self._requested[key] = now
+        namespace, name = key
+        try:
+            await self.api.custom.patch_namespaced_custom_object(
+                group='orchestra.io',
+                version='v1',
+                namespace=namespace,
+                plural='workshops',
+                name=name,
+                body={'metadata': {'annotations': {
+                    WAKE_ANNOTATION: datetime.now(timezone.utc).isoformat()
+                }}}
+            )
+        except ApiException as e:
+            self._requested.pop(key, None)
+            if e.status == 404:
+                self.forget(key)
+                return None
+            raise
+        logger.info(f"Wake-up requested for workshop {name} in namespace {namespace}")
+        return key
+
+    async def _handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=10)
+            lines = head.decode('latin-1').split('\r\n')
+            path = lines[0].split(' ')[1] if lines[0].count(' ') >= 2 else '/'
+            headers = {}
+            for line in lines[1:]:
+                field, _, value = line.partition(':')
+                headers[field.strip().lower()] = value.strip()
+            host = headers.get('x-forwarded-host') or headers.get('host', '')
+            host = host.split(',')[0].strip().rsplit(':', 1)[0]
+
+            content_type, extra = 'text/plain', ''
+            if path == '/healthz':
+                status, body = '200 OK', 'ok\n'
+            elif await self.wake(host) is None:
+                status, body = '404 Not Found', 'No such workshop\n'
+            else:
+                # 503 with Retry-After keeps crawlers and caches off the page
+                status = '503 Service Unavailable'
+                body = WAKE_PAGE.format(delay=self.retry_after)
+                content_type = 'text/html'
+                extra = f"Retry-After: {self.retry_after}\r\n"
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError):
+            writer.close()
+            return
+        except Exception as e:
+            logger.error(f"Wake-up request failed: {e}")
+            status, body = '500 Internal Server Error', 'Error\n'
+
+        payload = body.encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Cache-Control: no-store\r\n"
+            f"{extra}"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        """Start listening."""
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, port=self.port)
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+_detector: Optional[IdleDetector] = None
+_wake_server: Optional[WakeServer] = None
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def hibernation_host_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep the wake-up server's hosts in step with hibernated workshops."""
+    if _wake_server is None:
+        return
+    key = (namespace, name)
+    # status.hibernation stays set until the host is routed back after waking
+    if type == 'DELETED' or not status.get('hibernation'):
+        _wake_server.forget(key)
+        return
+    host = workshop_host(spec.get('name', name), spec.get('ingress') or {})
+    _wake_server.track(host, key, status.get('phase') == 'Hibernated')
+
+
+@kopf.on.field(
+    'orchestra.io', 'v1', 'workshops',
+    field=('metadata', 'annotations', WAKE_ANNOTATION),
+    when=is_owned, timeout=WAKE_TIMEOUT
+)
+@timed_handler('wake')
+@traced_handler('wake')
+async def workshop_wake_handler(
+    new: Optional[str],
+    spec: Dict[str, Any],
+    meta: Dict[str, Any],
+    status: Dict[str, Any],
+    patch,
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """
+    Wake a hibernated workshop after a request reached the wake-up server.
+
+    Scales the Deployment back up and waits, retrying every couple of
+    seconds, until the pod is ready before routing the host back to it.
+    """
+    if not new or not status.get('hibernation'):
+        return
+    workshop_name = spec.get('name', name)
+    children = find_children(kwargs, namespace, workshop_name)
+    owner = owner_reference('Workshop', name, meta.get('uid'))
+    sized_spec = rightsized(spec, status.get('rightsizing'))
+    api = get_gateway()
+
+    if status.get('phase') == 'Hibernated':
+        logger.info(f"Waking workshop {name} in namespace {namespace}")
+        await build_apply_plan(
+            api, workshop_name, namespace, sized_spec, children, owner=owner,
+            kinds=('deployment',), placement=status.get('placement')
+        ).run()
+        patch['status'] = waking_status()
+
+    if observed_phase(namespace, workshop_name) in (None, 'Creating'):
+        raise kopf.TemporaryError(
+            f"Workshop {name} is waking up", delay=WAKE_POLL_DELAY
+        )
+
+    await build_apply_plan(
+        api, workshop_name, namespace, sized_spec, children, owner=owner,
+        kinds=('ingress',), placement=status.get('placement')
+    ).run()
+    patch.setdefault('status', {})['hibernation'] = None
+    HIBERNATION_TRANSITIONS.labels(transition='wake').inc()
+    try:
+        elapsed = (datetime.now(timezone.utc) - parse_timestamp(new)).total_seconds()
+        WORKSHOP_WAKE_DURATION.observe(max(elapsed, 0.0))
+    except ValueError:
+        pass
+    logger.info(f"Workshop {name} is awake")
+
+
+async def start_hibernation() -> None:
+    """
+    Start the idle detector and the wake-up server.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_ACTIVITY_PROMETHEUS_URL``: where activity is read from;
+      hibernation is off while unset (see :mod:`utils.activity`)
+    - ``ORCHESTRA_IDLE_TIMEOUT``: idle seconds before a workshop is
+      hibernated (default 1800; 0 only hibernates workshops that set
+      ``spec.idleTimeout``)
+    - ``ORCHESTRA_IDLE_CHECK_INTERVAL``: seconds between checks (default 60)
+    - ``ORCHESTRA_IDLE_MAX_REQUEST_RATE`` / ``ORCHESTRA_IDLE_MAX_CPU``:
+      requests per second and CPU cores still counted as idle
+      (defaults 0.1 and 0.02)
+    - ``ORCHESTRA_WAKE_PORT``: wake-up server port (default 8081)
+    - ``ORCHESTRA_WAKE_SERVICE``: Service in front of the wake-up server
+      (default ``orchestra-wake`` in the operator's namespace)
+    """
+    global _detector, _wake_server
+
+    source = activity_source_from_env()
+    if source is None:
+        logger.info("Hibernation disabled")
+        return
+    wake_service = {
+        'service': env_str('ORCHESTRA_WAKE_SERVICE', DEFAULT_WAKE_SERVICE),
+        'namespace': env_str('OPERATOR_NAMESPACE', 'default'),
+    }
+    _wake_server = WakeServer(env_int('ORCHESTRA_WAKE_PORT', DEFAULT_WAKE_PORT))
+    await _wake_server.start()
+    _detector = IdleDetector(
+        source,
+        wake_service,
+        interval=env_float('ORCHESTRA_IDLE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL),
+        default_timeout=env_float('ORCHESTRA_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT),
+        max_request_rate=env_float(
+            'ORCHESTRA_IDLE_MAX_REQUEST_RATE', DEFAULT_MAX_REQUEST_RATE
+        ),
+        max_cpu=env_float('ORCHESTRA_IDLE_MAX_CPU', DEFAULT_MAX_CPU),
+    )
+    _detector.start()
+    logger.info(
+        f"Hibernating workshops idle for {_detector.default_timeout:.0f}s; "
+        f"wake-up server on port {_wake_server.port}"
+    )
+
+
+async def stop_hibernation() -> None:
+    """Stop the idle detector and the wake-up server."""
+    global _detector, _wake_server
+
+    if _detector is not None:
+        await _detector.stop()
+        _detector = None
+    if _wake_server is not None:
+        await _wake_server.stop()
+        _wake_server = None
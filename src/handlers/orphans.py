@@ -0,0 +1,252 @@
+"""Periodic sweep of workshop child resources whose owner is gone.
+
+Children carry an ownerReference to their Workshop (or WorkshopCohort), so
+the garbage collector removes them when the owner is deleted. Children
+created before owner references were stamped, or left behind by a teardown
+that failed, are found here by their ``workshop=<name>`` label: one LIST per
+kind across all namespaces, one LIST of the owners, and then one
+label-selector ``deletecollection`` per kind for each missing owner.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from handlers.cohort import COHORT_LABEL, run_bounded
+from handlers.warm_pool import POOL_STATE_LABEL
+from handlers.workshop import build_delete_plan
+from resources.manifests import to_manifest
+from utils.config import env_float
+from utils.k8s_client import ApiGateway, get_gateway
+from utils.metrics import ORPHANS_SWEPT
+from utils.sharding import owns
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps
+DEFAULT_SWEEP_INTERVAL = 300.0
+
+# Orphan groups deleted concurrently
+DEFAULT_PARALLELISM = 20
+
+# Only warm pool entries waiting to be claimed are selected out; claimed
+# entries belong to a workshop like any other child
+ORPHAN_SELECTOR_SUFFIX = f"{POOL_STATE_LABEL}!=idle"
+
+# (namespace, owner name, label selector) of a group of orphans
+OrphanGroup = Tuple[str, str, str]
+
+
+def _items(result: Any) -> List[Dict[str, Any]]:
+    """Return the items of a LIST response as manifest dicts."""
+    if isinstance(result, dict):
+        items = result.get('items', [])
+    else:
+        items = getattr(result, 'items', result)
+    return [to_manifest(item) for item in items]
+
+
+class OrphanSweeper:
+    """Deletes labelled workshop children whose Workshop or cohort is gone."""
+
+    def __init__(
+        self,
+        api: Optional[ApiGateway] = None,
+        interval: float = DEFAULT_SWEEP_INTERVAL,
+        parallelism: int = DEFAULT_PARALLELISM
+    ) -> None:
+        """
+        Args:
+            api: API gateway (defaults to the process-wide one)
+            interval: Seconds between sweeps
+            parallelism: Orphan groups deleted concurrently
+        """
+        self.interval = interval
+        self.parallelism = parallelism
+        self._api = api
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    async def _list_children(self) -> Dict[str, List[Dict[str, Any]]]:
+        """LIST every child carrying a ``workshop`` label, by child kind."""
+        api = self.api
+        deployments, services, pvcs, ingresses = await asyncio.gather(
+            api.apps.list_deployment_for_all_namespaces(label_selector='workshop'),
+            api.core.list_service_for_all_namespaces(label_selector='workshop'),
+            api.core.list_persistent_volume_claim_for_all_namespaces(
+                label_selector='workshop'
+            ),
+            api.custom.list_cluster_custom_object(
+                group='traefik.io',
+                version='v1alpha1',
+                plural='ingressroutes',
+                label_selector='workshop'
+            ),
+        )
+        return {
+            'deployment': _items(deployments),
+            'service': _items(services),
+            'pvc': _items(pvcs),
+            'ingress': _items(ingresses),
+        }
+
+    async def _list_owners(self) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
+        """Return the live ``(namespace, name)`` of workshops and cohorts."""
+        workshops, cohorts = await asyncio.gather(
+            self.api.custom.list_cluster_custom_object(
+                group='orchestra.io', version='v1', plural='workshops'
+            ),
+            self.api.custom.list_cluster_custom_object(
+                group='orchestra.io', version='v1', plural='workshopcohorts'
+            ),
+        )
+        # Children are labelled with spec.name, which defaults to the name
+        live_workshops = {
+            (
+                item['metadata'].get('namespace', ''),
+                (item.get('spec') or {}).get('name', item['metadata']['name'])
+            )
+            for item in _items(workshops)
+        }
+        live_cohorts = {
+            (item['metadata'].get('namespace', ''), item['metadata']['name'])
+            for item in _items(cohorts)
+        }
+        return live_workshops, live_cohorts
+
+    @staticmethod
+    def find_orphans(
+        children: Mapping[str, List[Dict[str, Any]]],
+        live_workshops: Set[Tuple[str, str]],
+        live_cohorts: Set[Tuple[str, str]]
+    ) -> Dict[OrphanGroup, Dict[str, int]]:
+        """
+        Group children whose owner is not live.
+
+        Args:
+            children: Child manifests by kind, from :meth:`_list_children`
+            live_workshops: ``(namespace, spec.name)`` of every Workshop
+            live_cohorts: ``(namespace, name)`` of every WorkshopCohort
+
+        Returns:
+            Mapping of each orphan group to its orphan count per child kind
+        """
+        orphans: Dict[OrphanGroup, Dict[str, int]] = {}
+        for kind, items in children.items():
+            for item in items:
+                metadata = item['metadata']
+                labels = metadata.get('labels') or {}
+                namespace = metadata.get('namespace', '')
+                if metadata.get('deletionTimestamp'):
+                    continue
+                if labels.get(POOL_STATE_LABEL) == 'idle':
+                    continue
+                cohort = labels.get(COHORT_LABEL)
+                if cohort:
+                    if (namespace, cohort) in live_cohorts:
+                        continue
+                    group = (namespace, cohort, f"{COHORT_LABEL}={cohort}")
+                else:
+                    workshop = labels['workshop']
+                    if (namespace, workshop) in live_workshops:
+                        continue
+                    group = (
+                        namespace, workshop,
+                        f"workshop={workshop},{ORPHAN_SELECTOR_SUFFIX}"
+                    )
+                counts = orphans.setdefault(group, {})
+                counts[kind] = counts.get(kind, 0) + 1
+        return orphans
+
+    async def sweep(self) -> int:
+        """
+        Delete every orphaned child.
+
+        Returns:
+            Number of orphaned children found
+        """
+        # With sharding, one replica sweeps for everyone
+        if not owns(None, 'orphan-sweeper'):
+            return 0
+
+        # Children are listed before their owners: any child seen here
+        # existed before the owner LIST, so a live owner always shows up in it
+        children = await self._list_children()
+        live_workshops, live_cohorts = await self._list_owners()
+        orphans = self.find_orphans(children, live_workshops, live_cohorts)
+
+        async def delete(group: OrphanGroup) -> None:
+            namespace, owner, selector = group
+            counts = orphans[group]
+            logger.info(
+                f"Sweeping orphaned children of {owner} in namespace "
+                f"{namespace}: {counts}"
+            )
+            await build_delete_plan(
+                self.api, owner, namespace, present=counts.keys(),
+                label_selector=selector
+            ).run()
+            for kind, count in counts.items():
+                ORPHANS_SWEPT.labels(kind=kind).inc(count)
+
+        await run_bounded(sorted(orphans), delete, self.parallelism)
+        return sum(sum(counts.values()) for counts in orphans.values())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Orphan sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start sweeping on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sweeping."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_sweeper: Optional[OrphanSweeper] = None
+
+
+def start_orphan_sweeper() -> None:
+    """
+    Start the orphan sweeper.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_ORPHAN_SWEEP_INTERVAL``: seconds between sweeps
+      (default 300, 0 disables sweeping)
+    """
+    global _sweeper
+
+    interval = env_float('ORCHESTRA_ORPHAN_SWEEP_INTERVAL', DEFAULT_SWEEP_INTERVAL)
+    if interval <= 0:
+        logger.info("Orphan sweeping disabled")
+        return
+    _sweeper = OrphanSweeper(interval=interval)
+    _sweeper.start()
+    logger.info(f"Sweeping orphaned workshop children every {interval:g}s")
+
+
+async def stop_orphan_sweeper() -> None:
+    """Stop the orphan sweeper."""
+    global _sweeper
+
+    if _sweeper is not None:
+        await _sweeper.stop()
+        _sweeper = None
@@ -0,0 +1,340 @@
+"""Bin-packing placement of workshop pods onto node pools.
+
+Left to the default scheduler, RStudio pods spread across every node, so a
+cohort expiring frees a little capacity on many nodes and no whole node for
+the cluster autoscaler to remove. The planner groups nodes into pools by a
+node label (the zone by default) and keeps per-pool running totals of
+allocatable CPU and memory and of what placed workshops and cohorts
+request. Each new workshop goes to the pool it fits into most tightly
+(best fit); a cohort's seats all go to one pool, chosen for their combined
+requests.
+
+The choice is recorded as ``status.placement`` and rendered into the pod
+template as scheduling preferences (see
+:func:`resources.deployment.placement_affinity`): the pool as node
+affinity, and pod affinity on the node hostname towards the cohort's other
+seats and then any RStudio pod, so pods fill nodes already in use.
+Recording it keeps later renders, and so content hashes, stable.
+"""
+
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import kopf
+
+from handlers.capacity import (
+    DEFAULT_HEADROOM,
+    RESERVING_PHASES,
+    node_allocatable,
+    workshop_demand,
+)
+from handlers.rightsizing import rightsized
+from utils.config import env_bool, env_float, env_str
+from utils.metrics import PLACEMENT_POOL_CAPACITY, PLACEMENTS
+
+
+logger = logging.getLogger(__name__)
+
+# Node label whose values are the pools workshops are packed into
+DEFAULT_POOL_LABEL = 'topology.kubernetes.io/zone'
+
+# (cpu millicores, memory bytes)
+Demand = Tuple[int, int]
+
+# (plural, namespace, name)
+ObjectKey = Tuple[str, str, str]
+
+
+def register_placement_handlers() -> None:
+    """Register the placement accounting handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+class PlacementPlanner:
+    """
+    Per-pool ledger of node capacity and placed requests.
+
+    With no labelled nodes seen yet there are no pools, and placements only
+    carry the pod packing preferences.
+    """
+
+    def __init__(
+        self,
+        label: str = DEFAULT_POOL_LABEL,
+        headroom: float = DEFAULT_HEADROOM
+    ) -> None:
+        """
+        Args:
+            label: Node label grouping nodes into pools
+            headroom: Share of node allocatable available to workshops
+        """
+        self.label = label
+        self.headroom = headroom
+        # Node -> (pool, allocatable)
+        self._nodes: Dict[str, Tuple[str, Demand]] = {}
+        # Pool -> [cpu, memory, nodes]
+        self._allocatable: Dict[str, List[int]] = {}
+        # Pool -> [cpu, memory]
+        self._reserved: Dict[str, List[int]] = {}
+        self._reservations: Dict[ObjectKey, Tuple[str, Demand]] = {}
+
+    @property
+    def pools(self) -> List[str]:
+        return sorted(self._allocatable)
+
+    def pool_of(self, key: ObjectKey) -> Optional[str]:
+        """Return the pool an object is placed in, if any."""
+        reservation = self._reservations.get(key)
+        return reservation[0] if reservation else None
+
+    def free(self, pool: str) -> Demand:
+        """Return the CPU and memory of a pool not yet placed."""
+        cpu, memory, _ = self._allocatable.get(pool, (0, 0, 0))
+        reserved = self._reserved.get(pool, (0, 0))
+        return (
+            int(cpu * self.headroom) - reserved[0],
+            int(memory * self.headroom) - reserved[1],
+        )
+
+    def set_node(
+        self,
+        name: str,
+        pool: Optional[str],
+        allocatable: Optional[Demand]
+    ) -> None:
+        """Record a node's pool and allocatable capacity (``None`` once gone)."""
+        old = self._nodes.pop(name, None)
+        if old is not None:
+            totals = self._allocatable[old[0]]
+            totals[0] -= old[1][0]
+            totals[1] -= old[1][1]
+            totals[2] -= 1
+            if not totals[2]:
+                del self._allocatable[old[0]]
+            self._update_metrics(old[0])
+        if pool is None or allocatable is None:
+            return
+        self._nodes[name] = (pool, allocatable)
+        totals = self._allocatable.setdefault(pool, [0, 0, 0])
+        totals[0] += allocatable[0]
+        totals[1] += allocatable[1]
+        totals[2] += 1
+        self._update_metrics(pool)
+
+    def reserve(self, key: ObjectKey, pool: str, demand: Demand) -> None:
+        """Count an object's requests against a pool, replacing any old entry."""
+        self.release(key)
+        self._reservations[key] = (pool, demand)
+        reserved = self._reserved.setdefault(pool, [0, 0])
+        reserved[0] += demand[0]
+        reserved[1] += demand[1]
+        self._update_metrics(pool)
+
+    def release(self, key: ObjectKey) -> None:
+        """Drop an object's requests from its pool."""
+        old = self._reservations.pop(key, None)
+        if old is None:
+            return
+        reserved = self._reserved[old[0]]
+        reserved[0] -= old[1][0]
+        reserved[1] -= old[1][1]
+        self._update_metrics(old[0])
+
+    def choose(self, demand: Demand) -> Optional[str]:
+        """
+        Pick the pool that ``demand`` fits into most tightly.
+
+        Returns:
+            The pool left with the smallest share of its capacity free, or
+            ``None`` if it fits in no pool
+        """
+        best: Optional[Tuple[float, str]] = None
+        for pool, (cpu, memory, _) in sorted(self._allocatable.items()):
+            free_cpu, free_memory = self.free(pool)
+            if not cpu or not memory:
+                continue
+            if demand[0] > free_cpu or demand[1] > free_memory:
+                continue
+            left = max(
+                (free_cpu - demand[0]) / cpu, (free_memory - demand[1]) / memory
+            )
+            if best is None or left < best[0]:
+                best = (left, pool)
+        return best[1] if best else None
+
+    def place(
+        self,
+        key: ObjectKey,
+        demand: Demand,
+        pack_with: Optional[Mapping[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Choose a pool for an object and count its requests against it.
+
+        Placing an object again returns its existing pool.
+
+        Args:
+            key: Workshop or cohort key
+            demand: CPU and memory its pods request together
+            pack_with: Labels of the pods it should share nodes with
+
+        Returns:
+            Placement for ``status.placement``; without a ``pool`` when the
+            object fits nowhere (the cluster autoscaler may add a node)
+        """
+        pool = self.pool_of(key) or self.choose(demand)
+        placement: Dict[str, Any] = {'label': self.label}
+        if pool is not None:
+            self.reserve(key, pool, demand)
+            placement['pool'] = pool
+        if pack_with:
+            placement['packWith'] = dict(pack_with)
+        PLACEMENTS.labels(result='pool' if pool else 'unplaced').inc()
+        return placement
+
+    def _update_metrics(self, pool: str) -> None:
+        cpu, memory, _ = self._allocatable.get(pool, (0, 0, 0))
+        reserved = self._reserved.get(pool, (0, 0))
+        PLACEMENT_POOL_CAPACITY.labels(pool, 'cpu', 'allocatable').set(cpu / 1000)
+        PLACEMENT_POOL_CAPACITY.labels(pool, 'cpu', 'reserved').set(reserved[0] / 1000)
+        PLACEMENT_POOL_CAPACITY.labels(pool, 'memory', 'allocatable').set(memory)
+        PLACEMENT_POOL_CAPACITY.labels(pool, 'memory', 'reserved').set(reserved[1])
+
+
+_planner: Optional[PlacementPlanner] = None
+
+
+def get_planner() -> Optional[PlacementPlanner]:
+    """Return the placement planner, or ``None`` if placement is off."""
+    return _planner
+
+
+def start_placement() -> None:
+    """
+    Enable bin-packing placement of new workshops.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_PLACEMENT``: place new workshops and cohorts (default off)
+    - ``ORCHESTRA_PLACEMENT_LABEL``: node label grouping nodes into pools
+      (default ``topology.kubernetes.io/zone``)
+    - ``ORCHESTRA_PLACEMENT_HEADROOM``: share of node allocatable available
+      to workshops (default 0.9)
+    """
+    global _planner
+
+    if not env_bool('ORCHESTRA_PLACEMENT', False):
+        return
+    _planner = PlacementPlanner(
+        label=env_str('ORCHESTRA_PLACEMENT_LABEL', DEFAULT_POOL_LABEL),
+        headroom=env_float('ORCHESTRA_PLACEMENT_HEADROOM', DEFAULT_HEADROOM)
+    )
+    logger.info(f"Packing workshops into node pools by {_planner.label}")
+
+
+def place_workshop(
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Place a new workshop; ``None`` if placement is off."""
+    if _planner is None:
+        return None
+    return _planner.place(('workshops', namespace, name), workshop_demand(spec))
+
+
+def place_cohort(
+    namespace: str,
+    name: str,
+    template: Mapping[str, Any],
+    seats: int,
+    pack_with: Mapping[str, str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Place all of a cohort's seats in one pool.
+
+    Args:
+        namespace: Kubernetes namespace
+        name: Cohort name
+        template: ``spec.template`` from the cohort
+        seats: Seat count
+        pack_with: Labels shared by the cohort's seat pods
+
+    Returns:
+        Placement shared by every seat; ``None`` if placement is off
+    """
+    if _planner is None:
+        return None
+    cpu, memory = workshop_demand(template)
+    return _planner.place(
+        ('workshopcohorts', namespace, name), (cpu * seats, memory * seats),
+        pack_with
+    )
+
+
+@kopf.on.event('', 'v1', 'nodes')  # type: ignore
+async def node_placement_event(
+    type: Optional[str],
+    name: str,
+    labels: Mapping[str, str],
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Track the pool and allocatable capacity of every usable node."""
+    if _planner is None:
+        return
+    if type == 'DELETED':
+        _planner.set_node(name, None, None)
+    else:
+        _planner.set_node(
+            name, labels.get(_planner.label), node_allocatable(spec, status)
+        )
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_placement_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep a placed Workshop's requests counted while its pod exists."""
+    if _planner is None:
+        return
+    key = ('workshops', namespace, name)
+    phase = status.get('phase')
+    pool = (status.get('placement') or {}).get('pool')
+    if type == 'DELETED' or phase in ('Failed', 'Terminating', 'Hibernated'):
+        _planner.release(key)
+    elif pool and phase in RESERVING_PHASES:
+        _planner.reserve(
+            key, pool, workshop_demand(rightsized(spec, status.get('rightsizing')))
+        )
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def cohort_placement_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep a placed cohort's seats counted against its pool."""
+    if _planner is None:
+        return
+    key = ('workshopcohorts', namespace, name)
+    pool = (status.get('placement') or {}).get('pool')
+    if type == 'DELETED' or status.get('phase') == 'Failed':
+        _planner.release(key)
+    elif pool:
+        cpu, memory = workshop_demand(
+            rightsized(spec.get('template') or {}, status.get('rightsizing'))
+        )
+        seats = spec.get('seats', 1)
+        _planner.reserve(key, pool, (cpu * seats, memory * seats))
@@ -0,0 +1,353 @@
+"""Pre-pull DaemonSets for the images upcoming workshops will run.
+
+When a class starts, every node pulls the same multi-gigabyte image at the
+same moment the workshop pods land. The pre-puller counts the distinct
+``spec.image`` values across live Workshops and WorkshopCohorts (a cohort
+counts once per seat) and keeps a pre-pull DaemonSet for every image with
+at least ``min_references`` users, so nodes have the layers cached before
+the Deployments are scheduled. A DaemonSet is garbage-collected once no
+Workshop has referenced its image for ``gc_delay`` seconds.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Mapping, Optional, Set, Tuple
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from resources.daemonset import IMAGE_ANNOTATION, create_prepull_daemonset
+from resources.manifests import to_manifest
+from utils.config import env_float, env_int, env_str
+from utils.k8s_client import ApiGateway, get_gateway
+from utils.metrics import PREPULL_IMAGES
+from utils.sharding import owns
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE = 'rocker/rstudio:latest'
+
+# Workshops (or cohort seats) that must share an image before it is pre-pulled
+DEFAULT_MIN_REFERENCES = 2
+
+# Seconds an image must be unreferenced before its DaemonSet is deleted, so
+# a class that is torn down and recreated does not pull everything again
+DEFAULT_GC_DELAY = 300.0
+
+# Seconds between periodic reconciles (reference changes trigger one early)
+DEFAULT_RESYNC_INTERVAL = 60.0
+
+# Phases in which a workshop no longer needs its image pulled anywhere
+INACTIVE_PHASES = ('Terminating', 'Failed')
+
+ObjectKey = Tuple[str, str, str]
+
+
+def register_prepull_handlers() -> None:
+    """Register the pre-pull Kopf handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+class PrePuller:
+    """
+    Reference-counts workshop images and keeps their pre-pull DaemonSets.
+
+    References come from Workshop and WorkshopCohort watch events and the
+    existing DaemonSets from their own watch events, so a reconcile only
+    issues the creates and deletes that are actually needed.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        api: Optional[ApiGateway] = None,
+        min_references: int = DEFAULT_MIN_REFERENCES,
+        gc_delay: float = DEFAULT_GC_DELAY,
+        resync_interval: float = DEFAULT_RESYNC_INTERVAL,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """
+        Args:
+            namespace: Namespace the DaemonSets live in
+            api: API gateway (defaults to the process-wide one)
+            min_references: Users an image needs before it is pre-pulled
+            gc_delay: Seconds an image must be unreferenced before its
+                DaemonSet is deleted
+            resync_interval: Seconds between periodic reconciles
+            clock: Monotonic clock, in seconds
+        """
+        self.namespace = namespace
+        self.min_references = min_references
+        self.gc_delay = gc_delay
+        self.resync_interval = resync_interval
+        self.clock = clock
+        self._api = api
+        # Object -> (image, weight) it currently contributes
+        self._refs: Dict[ObjectKey, Tuple[str, int]] = {}
+        self.counts: Counter = Counter()
+        # Image -> DaemonSet name, for the DaemonSets that exist
+        self.daemonsets: Dict[str, str] = {}
+        # Image -> when its reference count last dropped to zero
+        self._unreferenced_since: Dict[str, float] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._synced = False
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    def hot_images(self) -> Set[str]:
+        """Return the images referenced often enough to pre-pull."""
+        return {
+            image for image, count in self.counts.items()
+            if count >= self.min_references
+        }
+
+    def track(self, key: ObjectKey, image: Optional[str], weight: int = 1) -> None:
+        """
+        Set the image (and how many pods' worth) an object references.
+
+        Args:
+            key: ``(plural, namespace, name)`` of the Workshop or cohort
+            image: Image it will run, or ``None`` once it no longer needs one
+            weight: Pods it runs the image in (seats, for a cohort)
+        """
+        new = (image, weight) if image and weight > 0 else None
+        old = self._refs.get(key)
+        if old == new:
+            return
+
+        was_hot = self.hot_images()
+        if old is not None:
+            self.counts[old[0]] -= old[1]
+            if self.counts[old[0]] <= 0:
+                del self.counts[old[0]]
+                self._unreferenced_since[old[0]] = self.clock()
+        if new is None:
+            self._refs.pop(key, None)
+        else:
+            self._refs[key] = new
+            self.counts[new[0]] += new[1]
+            self._unreferenced_since.pop(new[0], None)
+
+        if self.hot_images() != was_hot:
+            self._wake.set()
+
+    def observe_daemonset(
+        self,
+        event_type: Optional[str],
+        namespace: str,
+        name: str,
+        annotations: Mapping[str, str]
+    ) -> None:
+        """Update the known DaemonSets from a watch event."""
+        image = annotations.get(IMAGE_ANNOTATION)
+        if not image or namespace != self.namespace:
+            return
+        if event_type == 'DELETED':
+            if self.daemonsets.get(image) == name:
+                del self.daemonsets[image]
+        else:
+            self.daemonsets[image] = name
+            if image not in self.counts:
+                self._unreferenced_since.setdefault(image, self.clock())
+        PREPULL_IMAGES.set(len(self.daemonsets))
+
+    async def _sync(self) -> None:
+        """Learn about DaemonSets left by a previous run with one LIST."""
+        daemonsets = await self.api.apps.list_namespaced_daemon_set(
+            namespace=self.namespace, label_selector='app=orchestra-prepull'
+        )
+        for item in getattr(daemonsets, 'items', daemonsets):
+            metadata = to_manifest(item)['metadata']
+            self.observe_daemonset(
+                None, self.namespace, metadata['name'],
+                metadata.get('annotations') or {}
+            )
+        self._synced = True
+
+    async def reconcile(self) -> None:
+        """Create DaemonSets for hot images and delete long-unused ones."""
+        if not self._synced:
+            await self._sync()
+        # With sharding, one replica manages the DaemonSets for everyone
+        if not owns(None, 'prepull'):
+            return
+
+        for image in sorted(self.hot_images() - set(self.daemonsets)):
+            await self._create(image)
+
+        now = self.clock()
+        for image, name in sorted(self.daemonsets.items()):
+            unused_since = self._unreferenced_since.get(image)
+            if image in self.counts or unused_since is None:
+                continue
+            if now - unused_since >= self.gc_delay:
+                await self._delete(image, name)
+
+    async def _create(self, image: str) -> None:
+        daemonset = create_prepull_daemonset(image, self.namespace)
+        try:
+            await self.api.apps.create_namespaced_daemon_set(
+                namespace=self.namespace, body=daemonset
+            )
+            logger.info(
+                f"Pre-pulling {image} ({self.counts[image]} workshops) "
+                f"with DaemonSet {daemonset.metadata.name}"
+            )
+        except ApiException as e:
+            if e.status != 409:  # Already exists
+                logger.warning(f"Failed to create pre-pull DaemonSet for {image}: {e}")
+                return
+        self.daemonsets[image] = daemonset.metadata.name
+
+    async def _delete(self, image: str, name: str) -> None:
+        try:
+            await self.api.apps.delete_namespaced_daemon_set(
+                name=name, namespace=self.namespace
+            )
+            logger.info(f"Deleted pre-pull DaemonSet {name}; {image} is unused")
+        except ApiException as e:
+            if e.status != 404:  # Already gone
+                logger.warning(f"Failed to delete pre-pull DaemonSet {name}: {e}")
+                return
+        self.daemonsets.pop(image, None)
+        self._unreferenced_since.pop(image, None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Pre-pull reconcile failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.resync_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start reconciling on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop reconciling. Existing DaemonSets are left in place."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_prepuller: Optional[PrePuller] = None
+
+
+def start_prepuller() -> None:
+    """
+    Start the pre-puller.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_PREPULL_MIN_WORKSHOPS``: workshops sharing an image before
+      it is pre-pulled (default 2, 0 disables pre-pulling)
+    - ``ORCHESTRA_PREPULL_GC_DELAY``: seconds an image must be unused before
+      its DaemonSet is deleted (default 300)
+    - ``ORCHESTRA_PREPULL_NAMESPACE``: namespace for the DaemonSets
+      (defaults to the operator's own namespace)
+    """
+    global _prepuller
+
+    min_references = env_int('ORCHESTRA_PREPULL_MIN_WORKSHOPS', DEFAULT_MIN_REFERENCES)
+    if min_references <= 0:
+        logger.info("Image pre-pulling disabled")
+        return
+    namespace = env_str(
+        'ORCHESTRA_PREPULL_NAMESPACE', env_str('OPERATOR_NAMESPACE', 'default')
+    )
+    _prepuller = PrePuller(
+        namespace,
+        min_references=min_references,
+        gc_delay=env_float('ORCHESTRA_PREPULL_GC_DELAY', DEFAULT_GC_DELAY),
+    )
+    _prepuller.start()
+    logger.info(
+        f"Pre-pulling images used by {min_references}+ workshops into "
+        f"namespace {namespace}"
+    )
+
+
+async def stop_prepuller() -> None:
+    """Stop the pre-puller."""
+    global _prepuller
+
+    if _prepuller is not None:
+        await _prepuller.stop()
+        _prepuller = None
+
+
+def _is_active(meta: Mapping[str, Any], status: Mapping[str, Any]) -> bool:
+    return (
+        not meta.get('deletionTimestamp')
+        and status.get('phase') not in INACTIVE_PHASES
+    )
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_image_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Count a Workshop's image while it is pending or running."""
+    if _prepuller is None:
+        return
+    image = None
+    if type != 'DELETED' and _is_active(meta, status):
+        image = spec.get('image', DEFAULT_IMAGE)
+    _prepuller.track(('workshops', namespace, name), image)
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def cohort_image_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Count a cohort's image once per seat."""
+    if _prepuller is None:
+        return
+    image = None
+    if type != 'DELETED' and _is_active(meta, status):
+        image = spec.get('template', {}).get('image', DEFAULT_IMAGE)
+    _prepuller.track(
+        ('workshopcohorts', namespace, name), image, spec.get('seats', 1)
+    )
+
+
+@kopf.on.event('apps', 'v1', 'daemonsets', labels={'app': 'orchestra-prepull'})  # type: ignore
+async def prepull_daemonset_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    annotations: Mapping[str, str],
+    **kwargs: Any
+) -> None:
+    """Keep the pre-puller's view of its DaemonSets current."""
+    if _prepuller is not None:
+        _prepuller.observe_daemonset(type, namespace, name, annotations)
@@ -0,0 +1,167 @@
+"""Dependency-aware concurrent provisioning for workshop child resources."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from utils.tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProvisioningError(Exception):
+    """Raised when a provisioning stage fails."""
+
+    def __init__(
+        self,
+        stage: str,
+        cause: BaseException,
+        skipped: Optional[List[str]] = None
+    ) -> None:
+        self.stage = stage
+        self.cause = cause
+        self.skipped = skipped or []
+        super().__init__(f"stage '{stage}' failed: {cause}")
+
+
+class _DependencyFailed(Exception):
+    """Internal marker for stages skipped because a dependency failed."""
+
+
+class Stage:
+    """A named provisioning step and the stages it must wait for."""
+
+    def __init__(
+        self,
+        name: str,
+        action: Callable[[], Awaitable[Any]],
+        depends_on: Iterable[str] = ()
+    ) -> None:
+        self.name = name
+        self.action = action
+        self.depends_on = tuple(depends_on)
+
+
+class ProvisioningPlan:
+    """
+    A small DAG of provisioning stages.
+
+    Stages with no path between them run concurrently; a stage starts as soon
+    as everything it depends on has succeeded. If a stage fails, stages that
+    depend on it are skipped while independent stages still run to completion,
+    and :meth:`run` raises a :class:`ProvisioningError` naming the stage.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.durations: Dict[str, float] = {}
+        self._stages: Dict[str, Stage] = {}
+
+    def __len__(self) -> int:
+        return len(self._stages)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stages
+
+    def add(
+        self,
+        name: str,
+        action: Callable[[], Awaitable[Any]],
+        depends_on: Iterable[str] = ()
+    ) -> None:
+        """
+        Add a stage to the plan.
+
+        Args:
+            name: Unique stage name, used in errors and timings
+            action: Zero-argument coroutine function performing the stage
+            depends_on: Names of stages that must succeed first
+        """
+        if name in self._stages:
+            raise ValueError(f"Duplicate provisioning stage: {name}")
+        self._stages[name] = Stage(name, action, depends_on)
+
+    def _check_graph(self) -> None:
+        """Reject unknown dependencies and cycles before anything runs."""
+        for stage in self._stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self._stages:
+                    raise ValueError(
+                        f"Stage '{stage.name}' depends on unknown stage "
+                        f"'{dependency}'"
+                    )
+
+        remaining = {
+            name: set(stage.depends_on) for name, stage in self._stages.items()
+        }
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(
+                    f"Dependency cycle between stages: {sorted(remaining)}"
+                )
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run every stage, respecting dependencies.
+
+        Returns:
+            Mapping of stage name to the value its action returned
+
+        Raises:
+            ProvisioningError: For the first failed stage (in the order stages
+                were added); ``skipped`` lists stages that never ran
+        """
+        self._check_graph()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            if stage.depends_on:
+                outcomes = await asyncio.gather(
+                    *(tasks[name] for name in stage.depends_on),
+                    return_exceptions=True
+                )
+                if any(isinstance(outcome, BaseException) for outcome in outcomes):
+                    raise _DependencyFailed(stage.name)
+
+            started = time.monotonic()
+            try:
+                with span(f"stage.{stage.name}", plan=self.name):
+                    return await stage.action()
+            except Exception as e:
+                raise ProvisioningError(stage.name, e) from e
+            finally:
+                self.durations[stage.name] = time.monotonic() - started
+
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        results: Dict[str, Any] = {}
+        failures: List[ProvisioningError] = []
+        skipped: List[str] = []
+        for name, outcome in zip(tasks, outcomes):
+            if isinstance(outcome, ProvisioningError):
+                failures.append(outcome)
+            elif isinstance(outcome, _DependencyFailed):
+                skipped.append(name)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[name] = outcome
+
+        timings = ', '.join(
+            f"{name}={seconds:.3f}s" for name, seconds in self.durations.items()
+        )
+        logger.debug(f"Provisioning plan {self.name} stage durations: {timings}")
+
+        if failures:
+            failures[0].skipped = skipped
+            raise failures[0]
+        return results
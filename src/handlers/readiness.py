@@ -0,0 +1,264 @@
+"""Event-driven readiness tracking for workshops.
+
+A Workshop stays ``Creating`` after its child resources are created. Watch
+events on its RStudio Deployment then move it to ``Ready`` once the pod
+passes its readiness probe, and to ``Running`` once the Deployment reports
+it available (ready for ``minReadySeconds``). Nothing polls: every
+transition is driven by a Deployment status change.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from handlers.status import submit_status
+from utils.metrics import WORKSHOP_TIME_TO_READY
+from utils.sharding import owns
+from utils.time_utils import parse_timestamp
+from utils.tracing import record_span, span, trace_id_from
+
+
+logger = logging.getLogger(__name__)
+
+# Phases the tracker moves a workshop through, in order
+PHASE_ORDER = ('Creating', 'Ready', 'Running')
+
+WorkshopKey = Tuple[str, str]
+
+# Phase derived from each workshop's Deployment, keyed by (namespace, workshop)
+_deployment_phases: Dict[WorkshopKey, str] = {}
+
+# Last phase and readiness written per Workshop object, keyed by (namespace,
+# object name), so repeated Deployment events do not repeat the same patch
+# before the Workshop's own watch event has caught up.
+_reported: Dict[WorkshopKey, Tuple[str, bool]] = {}
+
+
+def register_readiness_handlers() -> None:
+    """Register the readiness tracking handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def deployment_phase(spec: Mapping[str, Any], status: Mapping[str, Any]) -> str:
+    """
+    Map a Deployment's status onto a workshop phase.
+
+    Returns:
+        ``Running`` when every replica is available, ``Ready`` when at least
+        one pod passes its readiness probe, ``Creating`` otherwise
+    """
+    replicas = spec.get('replicas', 1)
+    if replicas > 0 and (status.get('availableReplicas') or 0) >= replicas:
+        return 'Running'
+    if (status.get('readyReplicas') or 0) >= 1:
+        return 'Ready'
+    return 'Creating'
+
+
+def observed_phase(namespace: str, workshop_name: str) -> Optional[str]:
+    """Return the phase last derived from a workshop's Deployment, if any."""
+    return _deployment_phases.get((namespace, workshop_name))
+
+
+def readiness_status(
+    phase: str,
+    ready: bool,
+    current_phase: Optional[str],
+    created_at: Optional[str],
+    ready_at: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the status fields for a workshop moving to ``phase``.
+
+    Becoming ready for the first time records ``readyAt`` and observes the
+    time-to-ready histogram; a workshop waking from hibernation was ready
+    before and records neither.
+
+    Args:
+        phase: New phase
+        ready: Whether the RStudio pod currently passes its readiness probe
+        current_phase: Phase currently stored on the Workshop
+        created_at: Workshop creation timestamp
+        ready_at: ``readyAt`` already stored on the Workshop, if any
+
+    Returns:
+        Status fields to merge into the Workshop's status
+    """
+    status: Dict[str, Any] = {
+        'phase': phase,
+        'conditions': [{
+            'type': 'Ready',
+            'status': 'True' if ready else 'False',
+            'reason': 'PodReady' if ready else 'WaitingForPod',
+            'message': (
+                'RStudio is accepting connections' if ready
+                else 'Waiting for the RStudio pod to become ready'
+            ),
+            'lastTransitionTime': datetime.now(timezone.utc).isoformat(),
+        }]
+    }
+    if ready and current_phase in (None, 'Creating') and not ready_at:
+        now = datetime.now(timezone.utc)
+        status['readyAt'] = now.isoformat()
+        if created_at:
+            elapsed = (now - parse_timestamp(created_at)).total_seconds()
+            WORKSHOP_TIME_TO_READY.observe(max(elapsed, 0.0))
+    return status
+
+
+def _workshop_summary(
+    name: str,
+    meta: Mapping[str, Any],
+    status: Mapping[str, Any]
+) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'phase': status.get('phase'),
+        'ready': any(
+            condition.get('type') == 'Ready' and condition.get('status') == 'True'
+            for condition in status.get('conditions') or []
+        ),
+        'createdAt': meta.get('creationTimestamp'),
+        'readyAt': status.get('readyAt'),
+        'traceId': trace_id_from(meta),
+    }
+
+
+@kopf.index('orchestra.io', 'v1', 'workshops')
+def workshop_phases(
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> Dict[WorkshopKey, Dict[str, Any]]:
+    """Index Workshops by the name their child resources are labelled with."""
+    return {(namespace, spec.get('name', name)): _workshop_summary(name, meta, status)}
+
+
+def _next_phase(current: str, observed: str) -> str:
+    # Phases only move forward; a pod that stops being ready flips the Ready
+    # condition rather than sending the workshop back to Creating.
+    return max(current, observed, key=PHASE_ORDER.index)
+
+
+@kopf.on.event('apps', 'v1', 'deployments', labels={'component': 'rstudio'})  # type: ignore
+async def deployment_readiness_event(
+    type: Optional[str],
+    namespace: str,
+    labels: Mapping[str, str],
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    workshop_phases: kopf.Index,
+    **kwargs: Any
+) -> None:
+    """Advance a workshop's phase as its RStudio Deployment becomes ready."""
+    workshop_name = labels.get('workshop') or labels.get('app')
+    if not workshop_name:
+        return
+    key = (namespace, workshop_name)
+    if type == 'DELETED':
+        _deployment_phases.pop(key, None)
+        for workshop in workshop_phases.get(key, []):
+            _reported.pop((namespace, workshop['name']), None)
+        return
+
+    observed = deployment_phase(spec, status)
+    _deployment_phases[key] = observed
+
+    # Cohort seats have no Workshop object of their own
+    for workshop in workshop_phases.get(key, []):
+        # Workshops still being created pick the observed phase up from
+        # observed_phase(); failed or terminating ones are left alone.
+        if workshop['phase'] not in PHASE_ORDER:
+            continue
+        if not owns(namespace, workshop['name']):
+            continue
+        await _advance(namespace, workshop, observed)
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_readiness_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    spec: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """
+    Catch up a workshop whose Deployment became ready before it was Creating.
+
+    The create handler writes ``Creating`` when it finishes; Deployment
+    events that arrived while it was still running were only recorded.
+    """
+    if type == 'DELETED' or status.get('phase') not in PHASE_ORDER:
+        # Hibernated (or failed) workshops start over when they come back
+        _reported.pop((namespace, name), None)
+        return
+    if not owns(namespace, name):
+        return
+    observed = observed_phase(namespace, spec.get('name', name))
+    if status.get('phase') == 'Creating' and observed not in (None, 'Creating'):
+        await _advance(namespace, _workshop_summary(name, meta, status), observed)
+
+
+def _forget_failed(
+    namespace: str,
+    name: str,
+    reported: Tuple[str, bool],
+    future: Any
+) -> None:
+    # A failed write is retried on the Deployment's next event
+    if future.cancelled() or future.exception() is not None:
+        if _reported.get((namespace, name)) == reported:
+            del _reported[(namespace, name)]
+
+
+async def _advance(namespace: str, workshop: Dict[str, Any], observed: str) -> None:
+    name = workshop['name']
+    phase = _next_phase(workshop['phase'], observed)
+    ready = observed != 'Creating'
+    if (phase, ready) == (workshop['phase'], workshop['ready']):
+        _reported.pop((namespace, name), None)
+        return
+    if _reported.get((namespace, name)) == (phase, ready):
+        return
+
+    status = readiness_status(
+        phase, ready, workshop['phase'], workshop['createdAt'],
+        workshop.get('readyAt')
+    )
+    trace_id = workshop.get('traceId')
+    try:
+        with span('readiness.advance', trace_id, phase=phase, ready=ready):
+            # Not waited for, so the next Deployment event can be merged
+            # into the same write
+            written = await submit_status(namespace, name, status)
+    except ApiException as e:
+        if e.status != 404:  # Deleted in the meantime
+            logger.warning(f"Failed to update readiness of workshop {name}: {e}")
+        return
+    written.add_done_callback(
+        lambda future: _forget_failed(namespace, name, (phase, ready), future)
+    )
+
+    if 'readyAt' in status and workshop['createdAt']:
+        # The whole wait for the pod, from creation to the readiness probe
+        record_span(
+            'workshop.time_to_ready', trace_id,
+            int(parse_timestamp(workshop['createdAt']).timestamp() * 1e9),
+            **{'orchestra.object': name}
+        )
+
+    _reported[(namespace, name)] = (phase, ready)
+    logger.info(
+        f"Workshop {name} phase {workshop['phase']} -> {phase} "
+        f"(pod {'ready' if ready else 'not ready'})"
+    )
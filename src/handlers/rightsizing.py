@@ -0,0 +1,339 @@
+"""Usage-driven rightsizing of workshop CPU and memory requests.
+
+Workshops that leave out ``cpuRequest``/``memoryRequest`` get the defaults
+whatever the course runs, and the defaults are sized for the heaviest
+sessions; nodes then fill up with requests while most of their capacity
+sits unused. The :class:`Rightsizer` samples what every RStudio pod uses
+from a :class:`utils.usage.UsageSource` and keeps rolling percentiles per
+image. A new Workshop or cohort gets a recommendation once its image has
+enough samples: a high percentile of the usage plus a safety margin,
+never above the spec's limits.
+
+In ``recommend`` mode the recommendation is only recorded in
+``status.rightsizing``. In ``auto`` mode it is also applied, never raising
+what the spec asks for: the Deployment, the capacity ledger and the
+placement planner all work from the rightsized requests, through
+:func:`rightsized`. Existing workshops keep the requests they were
+created with.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from resources.deployment import DEFAULT_RESOURCES
+from utils.config import env_float, env_int, env_str
+from utils.metrics import RIGHTSIZING_RECOMMENDATION, RIGHTSIZING_SAMPLES
+from utils.quantity import cpu_millis, memory_bytes
+from utils.time_utils import parse_duration
+from utils.usage import (
+    RollingQuantiles,
+    UsageSource,
+    image_key,
+    usage_source_from_env,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE = 'rocker/rstudio:latest'
+
+MODES = ('off', 'recommend', 'auto')
+
+DEFAULT_INTERVAL = 60.0
+DEFAULT_WINDOW = '1d'
+WINDOW_SLICES = 24
+DEFAULT_CPU_PERCENTILE = 0.9
+# Memory cannot be throttled, so it is sized closer to the peak
+DEFAULT_MEMORY_PERCENTILE = 0.99
+DEFAULT_MARGIN = 0.15
+DEFAULT_MIN_SAMPLES = 30
+
+# Recommendations are rounded up to these steps, and never go below the floors
+CPU_STEP = 50
+MEMORY_STEP = 64 * 2 ** 20
+MIN_CPU = 100
+MIN_MEMORY = 256 * 2 ** 20
+
+
+def _round_up(value: float, step: int) -> int:
+    return -int(-value // step) * step
+
+
+def memory_quantity(value: int) -> str:
+    """Format a byte count as a memory quantity."""
+    for suffix, unit in (('Gi', 2 ** 30), ('Mi', 2 ** 20)):
+        if value % unit == 0:
+            return f"{value // unit}{suffix}"
+    return str(value)
+
+
+def rightsized(
+    spec: Dict[str, Any],
+    rightsizing: Optional[Mapping[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Return a Workshop spec (or cohort template) with its rightsizing applied.
+
+    Args:
+        spec: Workshop spec or ``spec.template`` of a cohort
+        rightsizing: ``status.rightsizing`` of the Workshop or cohort
+
+    Returns:
+        ``spec`` itself unless requests were applied, otherwise a copy
+        whose ``resources`` carry the rightsized requests
+    """
+    if not rightsizing or not rightsizing.get('applied'):
+        return spec
+    return {
+        **spec,
+        'resources': {
+            **(spec.get('resources') or {}),
+            'cpuRequest': rightsizing['cpuRequest'],
+            'memoryRequest': rightsizing['memoryRequest'],
+        },
+    }
+
+
+class Rightsizer:
+    """Samples RStudio pod usage and recommends requests per image."""
+
+    def __init__(
+        self,
+        source: UsageSource,
+        auto: bool = False,
+        interval: float = DEFAULT_INTERVAL,
+        window: float = 86400.0,
+        cpu_percentile: float = DEFAULT_CPU_PERCENTILE,
+        memory_percentile: float = DEFAULT_MEMORY_PERCENTILE,
+        margin: float = DEFAULT_MARGIN,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        """
+        Args:
+            source: Where pod usage is read from
+            auto: Apply recommendations to new workshops, not just record them
+            interval: Seconds between usage samples
+            window: Seconds of samples recommendations are based on
+            cpu_percentile: Percentile (0-1) of CPU usage the request covers
+            memory_percentile: Percentile (0-1) of memory usage it covers
+            margin: Share added on top of the percentiles
+            min_samples: Samples of an image needed before recommending
+            clock: Returns the current time in epoch seconds
+        """
+        self.source = source
+        self.auto = auto
+        self.interval = interval
+        self.window = window
+        self.cpu_percentile = cpu_percentile
+        self.memory_percentile = memory_percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.clock = clock
+        # Image -> (CPU cores, memory bytes)
+        self._usage: Dict[str, Tuple[RollingQuantiles, RollingQuantiles]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _sketches(self, image: str) -> Tuple[RollingQuantiles, RollingQuantiles]:
+        sketches = self._usage.get(image)
+        if sketches is None:
+            sketches = self._usage[image] = (
+                RollingQuantiles(self.window, WINDOW_SLICES, clock=self.clock),
+                RollingQuantiles(
+                    self.window, WINDOW_SLICES, floor=2 ** 20, clock=self.clock
+                ),
+            )
+        return sketches
+
+    async def collect(self) -> int:
+        """
+        Take one usage sample of every RStudio pod.
+
+        Returns:
+            Samples taken
+        """
+        samples = await self.source.usage()
+        images = set()
+        for sample in samples:
+            if not sample.image or sample.image.startswith('sha256:'):
+                continue
+            image = image_key(sample.image)
+            images.add(image)
+            cpu, memory = self._sketches(image)
+            if sample.cpu_cores is not None:
+                cpu.add(sample.cpu_cores)
+            if sample.memory_bytes is not None:
+                memory.add(sample.memory_bytes)
+        RIGHTSIZING_SAMPLES.inc(len(samples))
+        for image in images:
+            recommendation = self.recommend(image)
+            if recommendation is not None:
+                RIGHTSIZING_RECOMMENDATION.labels(image, 'cpu').set(
+                    cpu_millis(recommendation['cpuRequest']) / 1000
+                )
+                RIGHTSIZING_RECOMMENDATION.labels(image, 'memory').set(
+                    memory_bytes(recommendation['memoryRequest'])
+                )
+        return len(samples)
+
+    def recommend(self, image: str) -> Optional[Dict[str, Any]]:
+        """
+        Recommend requests for an image from its recent usage.
+
+        Returns:
+            ``cpuRequest``, ``memoryRequest`` and the ``samples`` they are
+            based on, or ``None`` while the image has too few samples
+        """
+        sketches = self._usage.get(image_key(image))
+        if sketches is None:
+            return None
+        samples = min(len(sketches[0]), len(sketches[1]))
+        if samples < self.min_samples:
+            return None
+        cpu = (sketches[0].quantile(self.cpu_percentile) or 0.0) * 1000
+        memory = sketches[1].quantile(self.memory_percentile) or 0.0
+        cpu = max(_round_up(cpu * (1 + self.margin), CPU_STEP), MIN_CPU)
+        memory = max(_round_up(memory * (1 + self.margin), MEMORY_STEP), MIN_MEMORY)
+        return {
+            'cpuRequest': f"{cpu}m",
+            'memoryRequest': memory_quantity(memory),
+            'samples': samples,
+        }
+
+    def rightsize(self, spec: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Size the requests of a new Workshop spec or cohort template.
+
+        Returns:
+            ``status.rightsizing``: the recommended requests (capped at the
+            limits, and in auto mode at what the spec asks for), their
+            sample count and whether they are ``applied``; ``None`` while
+            the image has too few samples
+        """
+        recommendation = self.recommend(spec.get('image', DEFAULT_IMAGE))
+        if recommendation is None:
+            return None
+        resources = {**DEFAULT_RESOURCES, **(spec.get('resources') or {})}
+        cpu = min(
+            cpu_millis(recommendation['cpuRequest']), cpu_millis(resources['cpu'])
+        )
+        memory = min(
+            memory_bytes(recommendation['memoryRequest']),
+            memory_bytes(resources['memory'])
+        )
+        if self.auto:
+            cpu = min(cpu, cpu_millis(resources['cpuRequest']))
+            memory = min(memory, memory_bytes(resources['memoryRequest']))
+        return {
+            'cpuRequest': f"{cpu}m",
+            'memoryRequest': memory_quantity(memory),
+            'samples': recommendation['samples'],
+            'applied': self.auto,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Usage sampling failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start sampling on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_rightsizer: Optional[Rightsizer] = None
+
+
+def get_rightsizer() -> Optional[Rightsizer]:
+    """Return the running rightsizer, if any."""
+    return _rightsizer
+
+
+def rightsize(spec: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """Size a new workshop's requests; ``None`` if rightsizing is off."""
+    if _rightsizer is None:
+        return None
+    return _rightsizer.rightsize(spec)
+
+
+def start_rightsizing() -> None:
+    """
+    Start sampling usage and rightsizing new workshops.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_RIGHTSIZING``: ``off`` (default), ``recommend`` to record
+      recommendations in status, or ``auto`` to also apply them
+    - ``ORCHESTRA_ACTIVITY_PROMETHEUS_URL``: where usage is read from;
+      rightsizing is off while unset (see :mod:`utils.usage`)
+    - ``ORCHESTRA_RIGHTSIZING_INTERVAL``: seconds between samples (default 60)
+    - ``ORCHESTRA_RIGHTSIZING_WINDOW``: usage recommendations are based on
+      (default ``1d``)
+    - ``ORCHESTRA_RIGHTSIZING_CPU_PERCENTILE`` /
+      ``ORCHESTRA_RIGHTSIZING_MEMORY_PERCENTILE``: percentiles of usage the
+      requests cover (defaults 0.9 and 0.99)
+    - ``ORCHESTRA_RIGHTSIZING_MARGIN``: share added on top (default 0.15)
+    - ``ORCHESTRA_RIGHTSIZING_MIN_SAMPLES``: samples of an image needed
+      before recommending (default 30)
+    """
+    global _rightsizer
+
+    mode = env_str('ORCHESTRA_RIGHTSIZING', 'off')
+    if mode not in MODES:
+        logger.warning(
+            f"Unknown ORCHESTRA_RIGHTSIZING mode {mode!r}; rightsizing is off"
+        )
+        return
+    if mode == 'off':
+        return
+    source = usage_source_from_env()
+    if source is None:
+        logger.warning(
+            "Rightsizing needs ORCHESTRA_ACTIVITY_PROMETHEUS_URL; it is off"
+        )
+        return
+    _rightsizer = Rightsizer(
+        source,
+        auto=mode == 'auto',
+        interval=env_float('ORCHESTRA_RIGHTSIZING_INTERVAL', DEFAULT_INTERVAL),
+        window=parse_duration(
+            env_str('ORCHESTRA_RIGHTSIZING_WINDOW', DEFAULT_WINDOW)
+        ).total_seconds(),
+        cpu_percentile=env_float(
+            'ORCHESTRA_RIGHTSIZING_CPU_PERCENTILE', DEFAULT_CPU_PERCENTILE
+        ),
+        memory_percentile=env_float(
+            'ORCHESTRA_RIGHTSIZING_MEMORY_PERCENTILE', DEFAULT_MEMORY_PERCENTILE
+        ),
+        margin=env_float('ORCHESTRA_RIGHTSIZING_MARGIN', DEFAULT_MARGIN),
+        min_samples=env_int(
+            'ORCHESTRA_RIGHTSIZING_MIN_SAMPLES', DEFAULT_MIN_SAMPLES
+        ),
+    )
+    _rightsizer.start()
+    logger.info(f"Rightsizing new workshops ({mode})")
+
+
+async def stop_rightsizing() -> None:
+    """Stop sampling usage."""
+    global _rightsizer
+
+    if _rightsizer is not None:
+        await _rightsizer.stop()
+        _rightsizer = None
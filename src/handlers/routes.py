@@ -0,0 +1,568 @@
+"""Aggregated IngressRoutes: one route object per namespace or cohort.
+
+By default every workshop gets an IngressRoute of its own, so Traefik's
+configuration and the API server's object count grow with the number of
+workshops, and every create and delete makes Traefik resync. With
+``ORCHESTRA_INGRESS_MODE=aggregated`` the operator instead keeps an index of
+every workshop's route, built from Workshop and WorkshopCohort watch events,
+and writes it out as one IngressRoute per group: the standalone workshops of
+a namespace share ``orchestra-routes`` and each cohort's seats share
+``<cohort>-routes``. Changes are debounced, so a burst of creates and
+deletes costs one apply per group.
+
+Every replica keeps the whole index; each group's IngressRoute is written
+only by the replica that owns it on the shard ring.
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from resources.cohort import iter_seat_specs, seat_names, seat_template
+from resources.ingress import (
+    create_aggregated_ingress,
+    create_workshop_ingress,
+    workshop_host,
+)
+from resources.manifests import (
+    CONTENT_HASH_ANNOTATION,
+    content_hash,
+    stamp_content_hash,
+)
+from resources.owner import owner_reference
+from resources.templates import canonical_json
+from utils.config import env_float, env_str
+from utils.k8s_client import ApiGateway, get_gateway
+from utils.sharding import owns
+
+
+logger = logging.getLogger(__name__)
+
+INGRESS_MODES = ('workshop', 'aggregated')
+
+# IngressRoute shared by the standalone workshops of a namespace
+NAMESPACE_ROUTES = 'orchestra-routes'
+
+# Label on every aggregated IngressRoute
+ROUTES_LABEL = 'orchestra.io/routes'
+
+# Label on a cohort's IngressRoute, as on its seats' children
+COHORT_LABEL = 'orchestra.io/cohort'
+
+DEFAULT_ENTRY_POINTS = ['web']
+
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_RESYNC_INTERVAL = 60.0
+
+# (namespace, IngressRoute name)
+GroupKey = Tuple[str, str]
+
+
+def register_route_handlers() -> None:
+    """Register the route index's Kopf handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def workshop_route(
+    workshop_name: str,
+    namespace: str,
+    spec: Mapping[str, Any],
+    status: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Render a workshop's IngressRoute as it stands given its status.
+
+    Routes to the claimed warm pool entry's Service when the workshop runs on
+    one, and to the wake-up Service while ``status.hibernation`` is set,
+    i.e. until the woken pod is ready again.
+    """
+    status = status or {}
+    hibernation = status.get('hibernation')
+    pooled = status.get('warmPool')
+    service_name = service_namespace = None
+    if hibernation:
+        service_name = hibernation['service']
+        service_namespace = hibernation['namespace']
+    elif pooled:
+        service_name = pooled['service']
+    return create_workshop_ingress(
+        workshop_name, namespace, spec.get('ingress') or {},
+        service_name=service_name, service_namespace=service_namespace
+    )
+
+
+class RouteGroup:
+    """Routes written out as one IngressRoute."""
+
+    __slots__ = ('entry_points', 'annotations', 'owner', 'labels', 'routes', '_hash')
+
+    def __init__(
+        self,
+        entry_points: List[str],
+        annotations: Dict[str, str],
+        owner: Optional[Dict[str, Any]] = None,
+        labels: Optional[Dict[str, str]] = None
+    ) -> None:
+        self.entry_points = entry_points
+        self.annotations = annotations
+        self.owner = owner
+        self.labels = labels or {}
+        # Route per workshop (or cohort seat) name
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self._hash: Optional[str] = None
+
+    def changed(self) -> None:
+        self._hash = None
+
+    def manifest(self, namespace: str, name: str) -> Dict[str, Any]:
+        """Render the group's hash-stamped IngressRoute."""
+        manifest = create_aggregated_ingress(
+            name, namespace, self.entry_points,
+            [self.routes[key] for key in sorted(self.routes)],
+            {ROUTES_LABEL: 'true', **self.labels}, self.annotations, self.owner
+        )
+        return stamp_content_hash(manifest)
+
+    def content_hash(self, namespace: str, name: str) -> str:
+        if self._hash is None:
+            self._hash = content_hash(self.manifest(namespace, name))
+        return self._hash
+
+
+class RouteIndex:
+    """
+    Route of every workshop and cohort seat, grouped into IngressRoutes.
+
+    Watch events update the index in memory; a background task writes the
+    groups that changed, at most once per debounce interval, and checks
+    every group against what it last wrote once per resync interval, which
+    also picks up groups this replica gained on the shard ring.
+    """
+
+    def __init__(
+        self,
+        api: Optional[ApiGateway] = None,
+        debounce: float = DEFAULT_DEBOUNCE,
+        resync_interval: float = DEFAULT_RESYNC_INTERVAL
+    ) -> None:
+        """
+        Args:
+            api: API gateway (defaults to the process-wide one)
+            debounce: Seconds to collect changes before writing them
+            resync_interval: Seconds between checks of unchanged groups
+        """
+        self.debounce = debounce
+        self.resync_interval = resync_interval
+        self.groups: Dict[GroupKey, RouteGroup] = {}
+        # Host -> (group, route name) serving it, and back
+        self.hosts: Dict[str, Tuple[GroupKey, str]] = {}
+        self._host_of: Dict[Tuple[GroupKey, str], str] = {}
+        # (namespace, Workshop name) -> group holding its route
+        self._workshops: Dict[Tuple[str, str], GroupKey] = {}
+        # (namespace, cohort name) -> generation its seats were routed for
+        self._cohorts: Dict[Tuple[str, str], Any] = {}
+        # Content hash of each group as last written (or found) in the cluster
+        self._written: Dict[GroupKey, str] = {}
+        self._api = api
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    def route_for(self, host: str) -> Optional[Tuple[GroupKey, str]]:
+        """Return the group and route name serving ``host``, if any."""
+        return self.hosts.get(host)
+
+    def _group(
+        self,
+        key: GroupKey,
+        ingress: Mapping[str, Any],
+        owner: Optional[Dict[str, Any]] = None,
+        labels: Optional[Dict[str, str]] = None
+    ) -> RouteGroup:
+        group = self.groups.get(key)
+        settings = RouteGroup(
+            ingress['spec']['entryPoints'], ingress['metadata']['annotations'],
+            owner, labels
+        )
+        if group is None:
+            group = self.groups[key] = settings
+        elif any(
+            getattr(group, field) != getattr(settings, field)
+            for field in ('entry_points', 'annotations', 'owner', 'labels')
+        ):
+            # A recreated cohort, or a group found in the cluster by load()
+            group.entry_points = settings.entry_points
+            group.annotations = settings.annotations
+            group.owner = settings.owner
+            group.labels = settings.labels
+            group.changed()
+            self._changed.set()
+        return group
+
+    def _put(
+        self,
+        key: GroupKey,
+        group: RouteGroup,
+        name: str,
+        host: str,
+        route: Dict[str, Any]
+    ) -> None:
+        if group.routes.get(name) == route:
+            return
+        previous = self._host_of.get((key, name))
+        if previous is not None and previous != host:
+            self._release_host(previous, key, name)
+        served = self.hosts.get(host)
+        if served is not None and served != (key, name):
+            logger.warning(
+                f"Host {host} of {name} is already routed to {served[1]} "
+                f"in {served[0][1]}"
+            )
+        group.routes[name] = route
+        self.hosts[host] = (key, name)
+        self._host_of[(key, name)] = host
+        group.changed()
+        self._changed.set()
+
+    def _release_host(self, host: str, key: GroupKey, name: str) -> None:
+        if self.hosts.get(host) == (key, name):
+            del self.hosts[host]
+
+    def _drop(self, key: GroupKey, name: str) -> None:
+        group = self.groups.get(key)
+        if group is None or name not in group.routes:
+            return
+        del group.routes[name]
+        host = self._host_of.pop((key, name), None)
+        if host is not None:
+            self._release_host(host, key, name)
+        group.changed()
+        self._changed.set()
+
+    @staticmethod
+    def namespace_group(namespace: str, ingress: Mapping[str, Any]) -> GroupKey:
+        """
+        Return the group of a standalone workshop.
+
+        Routes share their IngressRoute's entry points and annotations, so
+        workshops with non-default ones get an IngressRoute per combination.
+        """
+        entry_points = ingress['spec']['entryPoints']
+        annotations = ingress['metadata']['annotations']
+        if entry_points == DEFAULT_ENTRY_POINTS and not annotations:
+            return namespace, NAMESPACE_ROUTES
+        settings = canonical_json([entry_points, annotations])
+        suffix = hashlib.sha256(settings.encode()).hexdigest()[:8]
+        return namespace, f"{NAMESPACE_ROUTES}-{suffix}"
+
+    def set_workshop(
+        self,
+        namespace: str,
+        name: str,
+        spec: Mapping[str, Any],
+        status: Optional[Mapping[str, Any]] = None
+    ) -> None:
+        """Route a Workshop as its spec and status currently ask."""
+        workshop_name = spec.get('name', name)
+        ingress = workshop_route(workshop_name, namespace, spec, status)
+        key = self.namespace_group(namespace, ingress)
+        previous = self._workshops.get((namespace, name))
+        if previous is not None and previous != key:
+            self._drop(previous, name)
+        self._workshops[(namespace, name)] = key
+        self._put(
+            key, self._group(key, ingress), name,
+            workshop_host(workshop_name, spec.get('ingress') or {}),
+            ingress['spec']['routes'][0]
+        )
+
+    def remove_workshop(self, namespace: str, name: str) -> None:
+        """Stop routing a Workshop."""
+        key = self._workshops.pop((namespace, name), None)
+        if key is not None:
+            self._drop(key, name)
+
+    def set_cohort(
+        self,
+        namespace: str,
+        name: str,
+        spec: Mapping[str, Any],
+        uid: Optional[str] = None,
+        generation: Any = None
+    ) -> None:
+        """
+        Route every seat of a cohort.
+
+        Seats are not objects of their own, so their routes are rendered
+        from the cohort's spec; that is skipped when its generation (which
+        only changes with the spec) has not moved.
+        """
+        seen = self._cohorts.get((namespace, name))
+        if generation is not None and seen == generation:
+            return
+        self._cohorts[(namespace, name)] = generation
+        key = (namespace, f"{name}-routes")
+        template = seat_template(name, spec.get('template') or {})
+        routes = {
+            seat: (
+                workshop_host(seat, seat_spec['ingress']),
+                workshop_route(seat, namespace, seat_spec)
+            )
+            for seat, seat_spec in iter_seat_specs(
+                seat_names(name, spec.get('seats', 1)), template
+            )
+        }
+        if not routes:
+            self.remove_cohort(namespace, name)
+            return
+        _, sample = next(iter(routes.values()))
+        group = self._group(
+            key, sample, owner_reference('WorkshopCohort', name, uid),
+            {COHORT_LABEL: name}
+        )
+        for seat in set(group.routes) - set(routes):
+            self._drop(key, seat)
+        for seat, (host, ingress) in routes.items():
+            self._put(key, group, seat, host, ingress['spec']['routes'][0])
+
+    def remove_cohort(self, namespace: str, name: str) -> None:
+        """Stop routing a cohort's seats."""
+        self._cohorts.pop((namespace, name), None)
+        key = (namespace, f"{name}-routes")
+        group = self.groups.get(key)
+        for seat in list(group.routes) if group is not None else []:
+            self._drop(key, seat)
+
+    async def load(self) -> None:
+        """
+        Fill the index from the cluster before the first write.
+
+        Without this, a replica that just started would write groups holding
+        only the workshops whose events had arrived so far. Aggregated
+        IngressRoutes already in the cluster are recorded as written, so
+        unchanged groups are not written again and empty ones are deleted.
+        """
+        api = self.api
+        workshops, cohorts, ingresses = await asyncio.gather(
+            api.custom.list_cluster_custom_object(
+                group='orchestra.io', version='v1', plural='workshops'
+            ),
+            api.custom.list_cluster_custom_object(
+                group='orchestra.io', version='v1', plural='workshopcohorts'
+            ),
+            api.custom.list_cluster_custom_object(
+                group='traefik.io', version='v1alpha1', plural='ingressroutes',
+                label_selector=ROUTES_LABEL
+            ),
+        )
+        for item in (workshops or {}).get('items', []):
+            metadata = item['metadata']
+            if metadata.get('deletionTimestamp'):
+                continue
+            self.set_workshop(
+                metadata['namespace'], metadata['name'], item.get('spec') or {},
+                item.get('status')
+            )
+        for item in (cohorts or {}).get('items', []):
+            metadata = item['metadata']
+            if metadata.get('deletionTimestamp'):
+                continue
+            self.set_cohort(
+                metadata['namespace'], metadata['name'], item.get('spec') or {},
+                metadata.get('uid'), metadata.get('generation')
+            )
+        for item in (ingresses or {}).get('items', []):
+            metadata = item['metadata']
+            key = (metadata['namespace'], metadata['name'])
+            self._written[key] = (
+                (metadata.get('annotations') or {}).get(CONTENT_HASH_ANNOTATION, '')
+            )
+            if key not in self.groups:
+                # Left over from workshops that are gone; deleted on flush
+                self.groups[key] = RouteGroup([], {})
+        logger.info(
+            f"Route index loaded {sum(len(g.routes) for g in self.groups.values())} "
+            f"routes in {len(self.groups)} groups"
+        )
+
+    async def _write(self, key: GroupKey, group: RouteGroup) -> None:
+        namespace, name = key
+        if group.routes:
+            await self.api.apply.apply_namespaced_custom_object(
+                group='traefik.io',
+                version='v1alpha1',
+                namespace=namespace,
+                plural='ingressroutes',
+                name=name,
+                body=group.manifest(namespace, name)
+            )
+            return
+        try:
+            await self.api.custom.delete_namespaced_custom_object(
+                group='traefik.io',
+                version='v1alpha1',
+                namespace=namespace,
+                plural='ingressroutes',
+                name=name
+            )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+
+    async def flush(self) -> int:
+        """
+        Write every owned group that differs from what was last written.
+
+        Returns:
+            Number of IngressRoutes applied or deleted
+        """
+        written = 0
+        for key, group in list(self.groups.items()):
+            namespace, name = key
+            if not owns(namespace, name):
+                # Another replica writes it; check it again if it comes back
+                self._written.pop(key, None)
+                continue
+            digest = group.content_hash(namespace, name) if group.routes else ''
+            if self._written.get(key) == digest:
+                if not group.routes:
+                    del self.groups[key]
+                continue
+            try:
+                await self._write(key, group)
+            except Exception as e:
+                logger.warning(f"Failed to write IngressRoute {namespace}/{name}: {e}")
+                continue
+            written += 1
+            self._written[key] = digest
+            if not group.routes:
+                del self.groups[key]
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait(), timeout=self.resync_interval
+                )
+                # Let the rest of a burst of changes arrive
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                written = await self.flush()
+                if written:
+                    logger.info(f"Wrote {written} aggregated IngressRoutes")
+            except Exception as e:
+                logger.error(f"Route index flush failed: {e}")
+
+    def start(self) -> None:
+        """Start the background writer."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write pending changes and stop the background writer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+_index: Optional[RouteIndex] = None
+
+
+def get_route_index() -> Optional[RouteIndex]:
+    """Return the route index, or ``None`` when workshops route themselves."""
+    return _index
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def route_workshop_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    meta: Mapping[str, Any],
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep a Workshop's route in the index in step with the Workshop."""
+    if _index is None:
+        return
+    if type == 'DELETED' or meta.get('deletionTimestamp'):
+        _index.remove_workshop(namespace, name)
+    else:
+        _index.set_workshop(namespace, name, spec, status)
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def route_cohort_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    meta: Mapping[str, Any],
+    spec: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep a cohort's seat routes in the index in step with the cohort."""
+    if _index is None:
+        return
+    if type == 'DELETED' or meta.get('deletionTimestamp'):
+        _index.remove_cohort(namespace, name)
+    else:
+        _index.set_cohort(
+            namespace, name, spec, meta.get('uid'), meta.get('generation')
+        )
+
+
+async def start_route_index() -> None:
+    """
+    Build the route index and start writing it, if aggregated routes are on.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_INGRESS_MODE``: ``workshop`` (one IngressRoute per
+      workshop, the default) or ``aggregated``
+    - ``ORCHESTRA_INGRESS_DEBOUNCE``: seconds changes are collected before
+      they are written (default 1)
+    """
+    global _index
+
+    mode = env_str('ORCHESTRA_INGRESS_MODE', 'workshop')
+    if mode not in INGRESS_MODES:
+        raise ValueError(
+            f"ORCHESTRA_INGRESS_MODE must be one of {', '.join(INGRESS_MODES)}, "
+            f"not {mode!r}"
+        )
+    if mode != 'aggregated':
+        return
+    index = RouteIndex(
+        debounce=env_float('ORCHESTRA_INGRESS_DEBOUNCE', DEFAULT_DEBOUNCE)
+    )
+    await index.load()
+    _index = index
+    index.start()
+    logger.info("Workshops are routed through aggregated IngressRoutes")
+
+
+async def stop_route_index() -> None:
+    """Stop writing the route index."""
+    global _index
+
+    if _index is not None:
+        await _index.stop()
+        _index = None
@@ -0,0 +1,48 @@
+"""Track the objects a replica may have to take over when shards move."""
+
+import logging
+from typing import Any, Optional
+
+import kopf
+
+from utils.sharding import get_coordinator
+
+
+logger = logging.getLogger(__name__)
+
+
+def register_sharding_handlers() -> None:
+    """Register the shard tracking handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def _track(plural: str, event_type: Optional[str], namespace: str, name: str) -> None:
+    coordinator = get_coordinator()
+    if coordinator is not None:
+        coordinator.track(
+            (plural, namespace, name), deleted=event_type == 'DELETED'
+        )
+
+
+# Every replica sees every event; only the owner's handlers act on it.
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def workshop_shard_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Remember a Workshop for handover on rebalance."""
+    _track('workshops', type, namespace, name)
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshopcohorts')  # type: ignore
+async def cohort_shard_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    **kwargs: Any
+) -> None:
+    """Remember a WorkshopCohort for handover on rebalance."""
+    _track('workshopcohorts', type, namespace, name)
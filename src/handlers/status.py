@@ -0,0 +1,388 @@
+"""Coalesced status writes for Workshops.
+
+Readiness tracking and hibernation write a Workshop's status outside any
+Kopf handler, and every write is another watch event for each watcher of
+Workshops, the orchestra-api included. They go through a
+:class:`StatusWriter` instead of patching directly:
+
+- The first update to a workshop after a quiet spell is written at once;
+  updates arriving within the following window are merged into one
+  trailing PATCH, so each workshop is written at most once per window.
+- Fields that already hold the value being written are left out of the
+  PATCH, and an update that changes nothing is not written at all.
+- Conditions are merged by ``type``, keep their ``lastTransitionTime``
+  while their ``status`` is unchanged, and are capped in number.
+
+What a workshop's status currently holds is known from Workshop watch
+events and from the writer's own writes.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+import kopf
+
+from utils.config import env_float, env_int
+from utils.k8s_client import ApiGateway, get_gateway
+from utils.metrics import STATUS_WRITES
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.5
+DEFAULT_MAX_CONDITIONS = 8
+
+# (namespace, Workshop object name)
+ObjectKey = Tuple[str, str]
+
+
+def register_status_handlers() -> None:
+    """Register the status writer's watch handler."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def merge_patch(base: Mapping[str, Any], update: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Combine two merge patches into one with the effect of applying both.
+
+    Nested mappings are merged; any other value, ``None`` included,
+    replaces what ``base`` holds.
+    """
+    result = dict(base)
+    for field, value in update.items():
+        if isinstance(value, Mapping) and isinstance(result.get(field), Mapping):
+            result[field] = merge_patch(result[field], value)
+        else:
+            result[field] = value
+    return result
+
+
+def merge_conditions(
+    current: List[Mapping[str, Any]],
+    updates: List[Mapping[str, Any]],
+    limit: int = DEFAULT_MAX_CONDITIONS
+) -> List[Dict[str, Any]]:
+    """
+    Upsert conditions by ``type``.
+
+    A condition whose ``status`` is unchanged keeps its
+    ``lastTransitionTime``, and keeps its place in the list. Conditions of
+    new types are appended; beyond ``limit`` the oldest are dropped.
+    """
+    merged: Dict[Any, Dict[str, Any]] = {
+        condition.get('type'): dict(condition) for condition in current
+    }
+    for condition in updates:
+        condition = dict(condition)
+        old = merged.get(condition.get('type'))
+        if (
+            old is not None
+            and old.get('status') == condition.get('status')
+            and old.get('lastTransitionTime')
+        ):
+            condition['lastTransitionTime'] = old['lastTransitionTime']
+        merged[condition.get('type')] = condition
+    return list(merged.values())[-limit:]
+
+
+def status_changes(
+    current: Mapping[str, Any],
+    update: Mapping[str, Any],
+    max_conditions: int = DEFAULT_MAX_CONDITIONS
+) -> Dict[str, Any]:
+    """
+    Return the part of a status update that would change ``current``.
+
+    ``conditions`` in the result are the whole merged list, as a merge
+    patch replaces lists.
+    """
+    changes: Dict[str, Any] = {}
+    for field, value in update.items():
+        old = current.get(field)
+        if field == 'conditions':
+            conditions = merge_conditions(
+                old or [], value or [], max_conditions
+            )
+            if conditions != list(old or []):
+                changes[field] = conditions
+        elif isinstance(value, Mapping) and isinstance(old, Mapping):
+            nested = status_changes(old, value, max_conditions)
+            if nested:
+                changes[field] = nested
+        elif value != old:
+            changes[field] = value
+    return changes
+
+
+class _Pending:
+    """A workshop's status updates waiting to be written together."""
+
+    __slots__ = ('status', 'done')
+
+    def __init__(self, done: asyncio.Future) -> None:
+        self.status: Dict[str, Any] = {}
+        self.done = done
+
+
+class StatusWriter:
+    """Merges and rate-limits status writes per Workshop."""
+
+    def __init__(
+        self,
+        api: Optional[ApiGateway] = None,
+        window: float = DEFAULT_WINDOW,
+        max_conditions: int = DEFAULT_MAX_CONDITIONS
+    ) -> None:
+        """
+        Args:
+            api: API gateway (defaults to the process-wide one)
+            window: Seconds after a write during which further updates to
+                the same workshop are merged into one trailing write
+            max_conditions: Most conditions kept in a workshop's status
+        """
+        self.window = window
+        self.max_conditions = max_conditions
+        self._api = api
+        self._pending: Dict[ObjectKey, _Pending] = {}
+        # Status each workshop is known to hold, from watch events and writes
+        self._known: Dict[ObjectKey, Dict[str, Any]] = {}
+        self._written_at: Dict[ObjectKey, float] = {}
+        self._in_flight: Dict[ObjectKey, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    def observe(self, namespace: str, name: str, status: Mapping[str, Any]) -> None:
+        """Record the status a watch event reported for a workshop."""
+        self._known[(namespace, name)] = dict(status)
+
+    def forget(self, namespace: str, name: str) -> None:
+        """Drop what is known about a deleted workshop."""
+        self._known.pop((namespace, name), None)
+        self._written_at.pop((namespace, name), None)
+
+    def submit(
+        self,
+        namespace: str,
+        name: str,
+        status: Mapping[str, Any]
+    ) -> asyncio.Future:
+        """
+        Merge ``status`` into the workshop's pending write.
+
+        Args:
+            namespace: Namespace of the Workshop
+            name: Name of the Workshop object
+            status: Status fields to set, as for a merge patch
+
+        Returns:
+            Future resolving once the merged write is done: ``True`` if a
+            PATCH was sent, ``False`` if it changed nothing; it holds the
+            ``ApiException`` of a failed PATCH, which is also logged
+        """
+        key = (namespace, name)
+        pending = self._pending.get(key)
+        if pending is None:
+            done = asyncio.get_running_loop().create_future()
+            # Failures are logged here; callers need not wait for the result
+            done.add_done_callback(
+                lambda future: future.cancelled() or future.exception()
+            )
+            pending = self._pending[key] = _Pending(done)
+            last = self._written_at.get(key)
+            delay = 0.0 if last is None else last + self.window - time.monotonic()
+            task = asyncio.create_task(self._flush(key, max(delay, 0.0)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            STATUS_WRITES.labels(result='merged').inc()
+        pending.status = merge_patch(pending.status, status)
+        return pending.done
+
+    async def write(
+        self,
+        namespace: str,
+        name: str,
+        status: Mapping[str, Any]
+    ) -> bool:
+        """
+        Submit a status update and wait for it to be written.
+
+        Returns:
+            Whether a PATCH was sent
+
+        Raises:
+            ApiException: The PATCH failed
+        """
+        return await asyncio.shield(self.submit(namespace, name, status))
+
+    async def _flush(self, key: ObjectKey, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        # Writes to one workshop land in the order they were merged
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            await asyncio.wait([in_flight])
+        pending = self._pending.pop(key)
+        changes = status_changes(
+            self._known.get(key, {}), pending.status, self.max_conditions
+        )
+        if not changes:
+            STATUS_WRITES.labels(result='dropped').inc()
+            pending.done.set_result(False)
+            return
+
+        namespace, name = key
+        self._in_flight[key] = pending.done
+        self._written_at[key] = time.monotonic()
+        try:
+            await self.api.custom.patch_namespaced_custom_object(
+                group='orchestra.io',
+                version='v1',
+                namespace=namespace,
+                plural='workshops',
+                name=name,
+                body={'status': changes}
+            )
+        except Exception as e:
+            if getattr(e, 'status', None) != 404:  # Deleted in the meantime
+                logger.warning(f"Failed to update status of workshop {name}: {e}")
+            pending.done.set_exception(e)
+            return
+        finally:
+            if self._in_flight.get(key) is pending.done:
+                del self._in_flight[key]
+        self._known[key] = merge_patch(self._known.get(key, {}), changes)
+        STATUS_WRITES.labels(result='written').inc()
+        pending.done.set_result(True)
+
+    async def stop(self) -> None:
+        """Wait for the pending writes to go out."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+_writer: Optional[StatusWriter] = None
+
+
+def get_status_writer() -> Optional[StatusWriter]:
+    """Return the running status writer, if any."""
+    return _writer
+
+
+async def submit_status(
+    namespace: str,
+    name: str,
+    status: Mapping[str, Any],
+    api: Optional[ApiGateway] = None
+) -> asyncio.Future:
+    """
+    Queue a Workshop status update without waiting for it to be written.
+
+    Without a running writer the status is patched directly, before this
+    returns; a failed PATCH then raises.
+
+    Args:
+        namespace: Namespace of the Workshop
+        name: Name of the Workshop object
+        status: Status fields to set, as for a merge patch
+        api: API gateway for direct patches (defaults to the process-wide one)
+
+    Returns:
+        Future resolving as for :meth:`StatusWriter.submit`
+    """
+    if _writer is not None:
+        return _writer.submit(namespace, name, status)
+    done = asyncio.get_running_loop().create_future()
+    done.set_result(await write_status(namespace, name, status, api))
+    return done
+
+
+async def write_status(
+    namespace: str,
+    name: str,
+    status: Mapping[str, Any],
+    api: Optional[ApiGateway] = None
+) -> bool:
+    """
+    Write a Workshop's status through the status writer.
+
+    Without a running writer the status is patched directly.
+
+    Args:
+        namespace: Namespace of the Workshop
+        name: Name of the Workshop object
+        status: Status fields to set, as for a merge patch
+        api: API gateway for direct patches (defaults to the process-wide one)
+
+    Returns:
+        Whether a PATCH was sent
+    """
+    if _writer is not None:
+        return await _writer.write(namespace, name, status)
+    await (api or get_gateway()).custom.patch_namespaced_custom_object(
+        group='orchestra.io',
+        version='v1',
+        namespace=namespace,
+        plural='workshops',
+        name=name,
+        body={'status': dict(status)}
+    )
+    return True
+
+
+def start_status_writer() -> None:
+    """
+    Start coalescing status writes.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_STATUS_WINDOW``: seconds updates to one workshop are
+      merged for after a write (default 0.5; 0 writes every update directly)
+    - ``ORCHESTRA_STATUS_MAX_CONDITIONS``: most conditions kept in a
+      workshop's status (default 8)
+    """
+    global _writer
+
+    window = env_float('ORCHESTRA_STATUS_WINDOW', DEFAULT_WINDOW)
+    if window <= 0:
+        logger.info("Status writes are not coalesced")
+        return
+    _writer = StatusWriter(
+        window=window,
+        max_conditions=env_int(
+            'ORCHESTRA_STATUS_MAX_CONDITIONS', DEFAULT_MAX_CONDITIONS
+        ),
+    )
+    logger.info(f"Coalescing status writes over {window:g}s windows")
+
+
+async def stop_status_writer() -> None:
+    """Flush the pending status writes and stop coalescing."""
+    global _writer
+
+    if _writer is not None:
+        writer, _writer = _writer, None
+        await writer.stop()
+
+
+@kopf.on.event('orchestra.io', 'v1', 'workshops')  # type: ignore
+async def status_writer_event(
+    type: Optional[str],
+    namespace: str,
+    name: str,
+    status: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep the status writer's view of each workshop's status current."""
+    if _writer is None:
+        return
+    if type == 'DELETED':
+        _writer.forget(namespace, name)
+    else:
+        _writer.observe(namespace, name, status)
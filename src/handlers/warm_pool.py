@@ -0,0 +1,541 @@
+"""Warm pool of idle RStudio Deployment/Service pairs for instant claims.
+
+Cold-starting a workshop means scheduling a pod and pulling a multi-gigabyte
+image. For each configured profile (namespace, image and resources) the pool
+keeps ``size`` idle entries running ahead of demand. An entry is an ordinary
+workshop Deployment and Service built by the usual builders under a
+generated name. A new Workshop whose spec matches a profile claims an entry
+by relabelling it and only needs its IngressRoute created; the pool is then
+refilled in the background.
+
+Deployment selectors are immutable, so a claimed entry keeps its generated
+name and selector; the Workshop records both in ``status.warmPool``. Entries
+have no PersistentVolumeClaim, so only workshops without ``storage`` are
+served from the pool.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+import kopf
+from kubernetes.client.rest import ApiException
+
+from resources.deployment import DEFAULT_RESOURCES, create_rstudio_deployment
+from resources.manifests import to_manifest
+from resources.service import create_workshop_service
+from utils.config import env_float, env_yaml
+from utils.k8s_client import ApiGateway, get_gateway
+from utils.metrics import WARM_POOL_CLAIMS, WARM_POOL_IDLE
+from utils.sharding import owns
+
+
+logger = logging.getLogger(__name__)
+
+# Labels on every pool entry: the profile it belongs to, and idle/claimed
+POOL_LABEL = 'orchestra.io/pool'
+POOL_STATE_LABEL = 'orchestra.io/pool-state'
+
+DEFAULT_IMAGE = 'rocker/rstudio:latest'
+
+# Seconds between background refills (claims also trigger one immediately)
+DEFAULT_REFILL_INTERVAL = 30.0
+
+PoolKey = Tuple[str, str]
+
+
+def register_warm_pool_handlers() -> None:
+    """Register the warm pool's Kopf handlers."""
+    # Handlers are registered via decorators below
+    pass
+
+
+def normalize_resources(resources: Optional[Mapping[str, Any]]) -> Dict[str, str]:
+    """Fill in the Deployment defaults so equivalent specs compare equal."""
+    resources = resources or {}
+    return {
+        key: str(resources.get(key, default))
+        for key, default in DEFAULT_RESOURCES.items()
+    }
+
+
+def profile_id(image: str, resources: Mapping[str, str]) -> str:
+    """Return a short, label-safe identifier for an image/resources pair."""
+    canonical = json.dumps(
+        {'image': image, 'resources': dict(resources)}, sort_keys=True
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+class PoolProfile:
+    """``size`` idle entries of one image and resource profile in a namespace."""
+
+    def __init__(
+        self,
+        namespace: str,
+        image: str = DEFAULT_IMAGE,
+        resources: Optional[Mapping[str, Any]] = None,
+        size: int = 1
+    ) -> None:
+        if size < 0:
+            raise ValueError(f"Warm pool size must not be negative, got {size}")
+        self.namespace = namespace
+        self.image = image
+        self.resources = normalize_resources(resources)
+        self.size = size
+        self.id = profile_id(image, self.resources)
+
+    @classmethod
+    def from_config(cls, item: Mapping[str, Any]) -> 'PoolProfile':
+        """
+        Build a profile from one entry of ``ORCHESTRA_WARM_POOL``.
+
+        Raises:
+            ValueError: If the entry has no namespace or unknown keys
+        """
+        unknown = set(item) - {'namespace', 'image', 'resources', 'size'}
+        if unknown:
+            raise ValueError(f"Unknown warm pool keys: {', '.join(sorted(unknown))}")
+        if not item.get('namespace'):
+            raise ValueError("Every warm pool profile needs a namespace")
+        return cls(
+            namespace=item['namespace'],
+            image=item.get('image', DEFAULT_IMAGE),
+            resources=item.get('resources'),
+            size=int(item.get('size', 1)),
+        )
+
+    @property
+    def key(self) -> PoolKey:
+        return (self.namespace, self.id)
+
+    def matches(self, namespace: str, spec: Mapping[str, Any]) -> bool:
+        """Return True if a Workshop spec can run on this profile's entries."""
+        return (
+            namespace == self.namespace
+            and not spec.get('storage')
+            and spec.get('image', DEFAULT_IMAGE) == self.image
+            and normalize_resources(spec.get('resources')) == self.resources
+        )
+
+
+def load_profiles() -> List[PoolProfile]:
+    """
+    Read the pool profiles from ``ORCHESTRA_WARM_POOL``.
+
+    The variable holds a YAML list, e.g.::
+
+        - namespace: workshops
+          image: bioconductor/bioconductor_docker:RELEASE_3_19
+          resources: {cpu: "2", memory: 4Gi}
+          size: 5
+
+    Raises:
+        ValueError: If the setting is not a list of valid profiles
+    """
+    config = env_yaml('ORCHESTRA_WARM_POOL', [])
+    if not isinstance(config, list):
+        raise ValueError("ORCHESTRA_WARM_POOL must be a YAML list of profiles")
+    return [PoolProfile.from_config(item) for item in config]
+
+
+def claimed_entry(
+    children: Optional[Mapping[str, Dict[str, Any]]]
+) -> Optional[Dict[str, str]]:
+    """
+    Recognize a warm pool entry already claimed for a workshop.
+
+    A create handler retried after claiming finds the entry among the
+    workshop's children, labelled ``claimed``.
+
+    Args:
+        children: Live children from :func:`handlers.children.find_children`
+
+    Returns:
+        ``status.warmPool`` for the entry, or ``None`` if the workshop's
+        Deployment is not a claimed pool entry
+    """
+    deployment = (children or {}).get('deployment') or {}
+    entry = deployment.get('warmPoolEntry')
+    if not entry:
+        return None
+    return {
+        'entry': entry,
+        'deployment': deployment['name'],
+        'service': f"{entry}-service",
+    }
+
+
+class WarmPool:
+    """
+    Tracks idle entries from Deployment events and claims and refills them.
+
+    Idle entries are known from the watch stream, so a claim makes no reads:
+    one Deployment patch and one Service patch hand the entry over.
+    """
+
+    def __init__(
+        self,
+        profiles: List[PoolProfile],
+        api: Optional[ApiGateway] = None,
+        refill_interval: float = DEFAULT_REFILL_INTERVAL
+    ) -> None:
+        """
+        Args:
+            profiles: Pools to keep filled
+            api: API gateway (defaults to the process-wide one)
+            refill_interval: Seconds between background refills
+        """
+        self.profiles = profiles
+        self.refill_interval = refill_interval
+        self._api = api
+        # Idle entries per pool: entry name -> summary
+        self._idle: Dict[PoolKey, Dict[str, Dict[str, Any]]] = {}
+        # Entries created but not yet seen on the watch stream
+        self._creating: Dict[PoolKey, Set[str]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._synced = False
+
+    @property
+    def api(self) -> ApiGateway:
+        return self._api or get_gateway()
+
+    def profile_for(
+        self,
+        namespace: str,
+        spec: Mapping[str, Any]
+    ) -> Optional[PoolProfile]:
+        """Return the profile a Workshop spec can be served from, if any."""
+        for profile in self.profiles:
+            if profile.matches(namespace, spec):
+                return profile
+        return None
+
+    def idle_count(self, key: PoolKey) -> int:
+        return len(self._idle.get(key, {}))
+
+    def observe(
+        self,
+        event_type: Optional[str],
+        namespace: str,
+        labels: Mapping[str, str],
+        spec: Mapping[str, Any],
+        status: Mapping[str, Any],
+        meta: Mapping[str, Any]
+    ) -> None:
+        """
+        Update the idle set from a pool Deployment's watch event.
+
+        Args:
+            event_type: Watch event type; ``None`` for the initial listing
+            namespace: Deployment namespace
+            labels: Deployment labels
+            spec: Deployment spec
+            status: Deployment status
+            meta: Deployment metadata
+        """
+        entry = labels.get('app')
+        key = (namespace, labels.get(POOL_LABEL, ''))
+        if not entry:
+            return
+        self._creating.get(key, set()).discard(entry)
+
+        idle = self._idle.setdefault(key, {})
+        if event_type == 'DELETED' or labels.get(POOL_STATE_LABEL) != 'idle':
+            idle.pop(entry, None)
+        else:
+            replicas = spec.get('replicas', 1)
+            idle[entry] = {
+                'deployment': meta.get('name'),
+                'service': f"{entry}-service",
+                'resourceVersion': meta.get('resourceVersion'),
+                'available': (status.get('availableReplicas') or 0) >= replicas,
+            }
+        WARM_POOL_IDLE.labels(profile=key[1]).set(len(idle))
+
+    async def claim(
+        self,
+        namespace: str,
+        workshop_name: str,
+        spec: Mapping[str, Any],
+        owner: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, str]]:
+        """
+        Hand an idle entry over to a Workshop.
+
+        Args:
+            namespace: Workshop namespace
+            workshop_name: Name the workshop's children are labelled with
+            spec: Workshop spec
+            owner: ownerReference to the Workshop, set on the entry so it is
+                garbage-collected with it
+
+        Returns:
+            ``{'entry', 'deployment', 'service'}`` of the claimed entry, or
+            ``None`` if the spec matches no profile or its pool is empty
+        """
+        profile = self.profile_for(namespace, spec)
+        if profile is None:
+            return None
+
+        idle = self._idle.get(profile.key, {})
+        # Entries that are already serving come first
+        candidates = sorted(idle, key=lambda entry: not idle[entry]['available'])
+        for entry in candidates:
+            # Taken out synchronously, so concurrent claims never share one
+            summary = idle.pop(entry, None)
+            if summary is None:
+                continue
+            try:
+                claimed = await self._relabel(
+                    namespace, workshop_name, entry, summary, owner
+                )
+            except Exception:
+                # Still idle as far as we know; a newer summary from the
+                # watch stream wins
+                idle.setdefault(entry, summary)
+                WARM_POOL_IDLE.labels(profile=profile.id).set(len(idle))
+                raise
+            if claimed:
+                WARM_POOL_CLAIMS.labels(result='hit').inc()
+                WARM_POOL_IDLE.labels(profile=profile.id).set(len(idle))
+                self._wake.set()
+                logger.info(
+                    f"Workshop {workshop_name} claimed warm pool entry {entry}"
+                )
+                return claimed
+
+        WARM_POOL_CLAIMS.labels(result='miss').inc()
+        self._wake.set()
+        logger.info(f"Warm pool {profile.id} is empty, {workshop_name} starts cold")
+        return None
+
+    async def _relabel(
+        self,
+        namespace: str,
+        workshop_name: str,
+        entry: str,
+        summary: Dict[str, Any],
+        owner: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, str]]:
+        labels = {'workshop': workshop_name, POOL_STATE_LABEL: 'claimed'}
+        owner_references = [owner] if owner else None
+        try:
+            # The resourceVersion makes this fail rather than double-claim if
+            # the entry changed since we last saw it
+            await self.api.apps.patch_namespaced_deployment(
+                name=summary['deployment'],
+                namespace=namespace,
+                body={'metadata': {
+                    'labels': labels,
+                    'ownerReferences': owner_references,
+                    'resourceVersion': summary['resourceVersion'],
+                }}
+            )
+        except ApiException as e:
+            if e.status not in (404, 409):
+                raise
+            logger.info(f"Warm pool entry {entry} changed underneath us: {e.reason}")
+            return None
+        try:
+            await self.api.core.patch_namespaced_service(
+                name=summary['service'],
+                namespace=namespace,
+                body={'metadata': {
+                    'labels': labels, 'ownerReferences': owner_references
+                }}
+            )
+        except Exception as e:
+            # Hand the Deployment back so the entry is never half claimed;
+            # the watch stream returns it to the idle set
+            await self._release(namespace, entry, summary)
+            if isinstance(e, ApiException) and e.status in (404, 409):
+                logger.info(
+                    f"Warm pool entry {entry} changed underneath us: {e.reason}"
+                )
+                return None
+            raise
+        return {
+            'entry': entry,
+            'deployment': summary['deployment'],
+            'service': summary['service'],
+        }
+
+    async def _release(
+        self,
+        namespace: str,
+        entry: str,
+        summary: Dict[str, Any]
+    ) -> None:
+        """Undo the Deployment half of a claim whose Service patch failed."""
+        try:
+            await self.api.apps.patch_namespaced_deployment(
+                name=summary['deployment'],
+                namespace=namespace,
+                body={'metadata': {
+                    'labels': {'workshop': entry, POOL_STATE_LABEL: 'idle'},
+                    'ownerReferences': None,
+                }}
+            )
+        except ApiException as e:
+            logger.error(f"Failed to release warm pool entry {entry}: {e}")
+
+    async def _sync(self) -> None:
+        """Seed the idle set with one LIST per namespace before the first refill."""
+        for namespace in sorted({profile.namespace for profile in self.profiles}):
+            deployments = await self.api.apps.list_namespaced_deployment(
+                namespace=namespace,
+                label_selector=f"{POOL_LABEL},{POOL_STATE_LABEL}=idle"
+            )
+            for item in getattr(deployments, 'items', deployments):
+                deployment = to_manifest(item)
+                metadata = deployment['metadata']
+                self.observe(
+                    None, namespace, metadata.get('labels') or {},
+                    deployment.get('spec') or {}, deployment.get('status') or {},
+                    metadata
+                )
+        self._synced = True
+
+    async def refill(self) -> None:
+        """Create entries until every pool has ``size`` idle or pending ones."""
+        if not self._synced:
+            await self._sync()
+        # With sharding, one replica refills for everyone
+        if not owns(None, 'warm-pool'):
+            return
+
+        creates = []
+        for profile in self.profiles:
+            pending = self.idle_count(profile.key) + len(
+                self._creating.get(profile.key, ())
+            )
+            creates.extend(
+                self._create_entry(profile)
+                for _ in range(max(profile.size - pending, 0))
+            )
+        if creates:
+            await asyncio.gather(*creates)
+
+    async def _create_entry(self, profile: PoolProfile) -> None:
+        entry = f"pool-{profile.id[:8]}-{secrets.token_hex(3)}"
+        labels = {POOL_LABEL: profile.id, POOL_STATE_LABEL: 'idle'}
+        deployment = create_rstudio_deployment(
+            entry, profile.namespace, profile.image, profile.resources, {}, labels
+        )
+        service = create_workshop_service(entry, profile.namespace, labels)
+
+        self._creating.setdefault(profile.key, set()).add(entry)
+        # The Service goes first: an entry is tracked through its Deployment,
+        # so a visible Deployment always has its Service in place
+        try:
+            await self.api.core.create_namespaced_service(
+                namespace=profile.namespace, body=service
+            )
+        except ApiException as e:
+            self._creating[profile.key].discard(entry)
+            logger.warning(f"Failed to create warm pool entry {entry}: {e}")
+            return
+        try:
+            await self.api.apps.create_namespaced_deployment(
+                namespace=profile.namespace, body=deployment
+            )
+        except ApiException as e:
+            self._creating[profile.key].discard(entry)
+            logger.warning(f"Failed to create warm pool entry {entry}: {e}")
+            try:
+                await self.api.core.delete_namespaced_service(
+                    name=f"{entry}-service", namespace=profile.namespace
+                )
+            except ApiException:
+                pass
+            return
+        logger.info(f"Created warm pool entry {entry} for pool {profile.id}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.error(f"Warm pool refill failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start background refilling on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop background refilling. Idle entries are left running."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_pool: Optional[WarmPool] = None
+
+
+def get_warm_pool() -> Optional[WarmPool]:
+    """Return the process-wide warm pool, or ``None`` if none is configured."""
+    return _pool
+
+
+def start_warm_pool() -> None:
+    """
+    Start the warm pool configured by ``ORCHESTRA_WARM_POOL``, if any.
+
+    ``ORCHESTRA_WARM_POOL_REFILL_INTERVAL`` sets the seconds between
+    background refills (default 30).
+    """
+    global _pool
+
+    profiles = load_profiles()
+    if not profiles:
+        return
+    _pool = WarmPool(
+        profiles,
+        refill_interval=env_float(
+            'ORCHESTRA_WARM_POOL_REFILL_INTERVAL', DEFAULT_REFILL_INTERVAL
+        ),
+    )
+    _pool.start()
+    logger.info(
+        f"Warm pool started with {len(profiles)} profiles, "
+        f"{sum(profile.size for profile in profiles)} entries"
+    )
+
+
+async def stop_warm_pool() -> None:
+    """Stop the process-wide warm pool's refills."""
+    global _pool
+
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+
+@kopf.on.event('apps', 'v1', 'deployments', labels={POOL_LABEL: kopf.PRESENT})  # type: ignore
+async def pool_deployment_event(
+    type: Optional[str],
+    namespace: str,
+    labels: Mapping[str, str],
+    spec: Mapping[str, Any],
+    status: Mapping[str, Any],
+    meta: Mapping[str, Any],
+    **kwargs: Any
+) -> None:
+    """Keep the warm pool's idle set in step with the pool's Deployments."""
+    if _pool is not None:
+        _pool.observe(type, namespace, labels, spec, status, meta)
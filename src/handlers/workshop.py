@@ -1,16 +1,28 @@
 """Workshop event handlers for the Orchestra Operator."""
 
+import functools
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Collection, Dict, Optional
 
 import kopf
-import kubernetes.client as k8s_client
 from kubernetes.client.rest import ApiException
 
-from resources.deployment import create_rstudio_deployment
-from resources.service import create_workshop_service  
-from resources.ingress import create_workshop_ingress
-from resources.pvc import create_workshop_pvc
+from handlers.capacity import admit_workshop
+from handlers.children import find_children, unowned_children
+from handlers.placement import place_workshop
+from handlers.provisioning import ProvisioningError, ProvisioningPlan
+from handlers.readiness import observed_phase, readiness_status
+from handlers.rightsizing import rightsize, rightsized
+from handlers.routes import get_route_index
+from handlers.warm_pool import claimed_entry, get_warm_pool
+from resources.ingress import workshop_url
+from resources.manifests import manifest_hash, render_workshop_manifests
+from resources.owner import owner_reference
+from utils.k8s_client import ApiGateway, get_gateway, throttled_retry_delay
+from utils.metrics import API_CALLS_AVOIDED, timed_handler
+from utils.pacing import resync_slot
+from utils.sharding import is_owned
+from utils.tracing import traced_handler
 from utils.time_utils import parse_duration, get_expiration_time
 
 
@@ -23,7 +35,326 @@ def register_workshop_handlers() -> None:
     pass
 
 
-@kopf.on.create('orchestra.io', 'v1', 'workshops')
+def _retry_if_throttled(error: Exception, action: str) -> None:
+    """
+    Hand a failure caused by API throttling back to Kopf to retry.
+
+    A 429 that outlasted the gateway's own retries means the API server is
+    overloaded, not that the workshop is broken, so it must not be marked
+    ``Failed``.
+
+    Raises:
+        kopf.TemporaryError: If ``error`` was caused by a 429
+    """
+    delay = throttled_retry_delay(error)
+    if delay is not None:
+        raise kopf.TemporaryError(
+            f"{action} was throttled by the API server", delay=delay
+        ) from error
+
+
+async def _create_pvc(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    pvc: Dict[str, Any]
+) -> None:
+    """Create the PersistentVolumeClaim for workshop data."""
+    try:
+        await api.core.create_namespaced_persistent_volume_claim(
+            namespace=namespace, body=pvc
+        )
+        logger.info(f"Created PVC for workshop {workshop_name}")
+    except ApiException as e:
+        if e.status == 409:  # Already exists
+            logger.info(f"PVC for workshop {workshop_name} already exists")
+        else:
+            raise
+
+
+async def _create_deployment(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    deployment: Dict[str, Any]
+) -> None:
+    """Create the RStudio Deployment."""
+    try:
+        await api.apps.create_namespaced_deployment(
+            namespace=namespace, body=deployment
+        )
+        logger.info(f"Created deployment for workshop {workshop_name}")
+    except ApiException as e:
+        if e.status == 409:  # Already exists
+            logger.info(f"Deployment for workshop {workshop_name} already exists")
+        else:
+            raise
+
+
+async def _create_service(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    service: Dict[str, Any]
+) -> None:
+    """Create the Service in front of the RStudio pod."""
+    try:
+        await api.core.create_namespaced_service(
+            namespace=namespace, body=service
+        )
+        logger.info(f"Created service for workshop {workshop_name}")
+    except ApiException as e:
+        if e.status == 409:  # Already exists
+            logger.info(f"Service for workshop {workshop_name} already exists")
+        else:
+            raise
+
+
+async def _create_ingress(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    ingress: Dict[str, Any],
+    url: str
+) -> str:
+    """Create the Traefik IngressRoute and return the workshop URL."""
+    try:
+        await api.custom.create_namespaced_custom_object(
+            group="traefik.io",
+            version="v1alpha1", 
+            namespace=namespace,
+            plural="ingressroutes",
+            body=ingress
+        )
+        logger.info(f"Created ingress route for workshop {workshop_name} at {url}")
+    except ApiException as e:
+        if e.status == 409:  # Already exists
+            logger.info(
+                f"Ingress route for workshop {workshop_name} already exists "
+                f"at {url}"
+            )
+        else:
+            raise
+    return url
+
+
+async def _existing_url(url: str) -> str:
+    """Plan stage for a route that needs no API call."""
+    return url
+
+
+def _skip_existing(
+    present: Optional[Collection[str]],
+    kind: str,
+    verb: str
+) -> bool:
+    """
+    Decide from the watch cache whether a create/delete call can be skipped.
+
+    Args:
+        present: Child kinds known to exist, or ``None`` if unknown
+        kind: Child kind of the stage
+        verb: ``create`` (skipped if present) or ``delete`` (skipped if absent)
+
+    Returns:
+        True if the API call is unnecessary
+    """
+    if present is None:
+        return False
+    skip = (kind in present) if verb == 'create' else (kind not in present)
+    if skip:
+        API_CALLS_AVOIDED.labels(verb=verb, kind=kind).inc()
+    return skip
+
+
+def build_create_plan(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    spec: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    present: Optional[Collection[str]] = None,
+    pooled: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None,
+    placement: Optional[Dict[str, Any]] = None
+) -> ProvisioningPlan:
+    """
+    Build the provisioning plan for a workshop's child resources.
+
+    Only the Deployment depends on anything (its volume needs the PVC), so the
+    PVC, Service and IngressRoute are all created concurrently. Every child is
+    created with its content-hash annotation, so later reconciles can tell
+    whether it has drifted from the spec.
+
+    Args:
+        api: API gateway to issue the creates through
+        workshop_name: Name of the workshop
+        namespace: Kubernetes namespace
+        spec: Workshop spec
+        labels: Extra labels stamped on every child resource
+        present: Child kinds the watch cache says already exist; their
+            creates are skipped. ``None`` creates everything.
+        pooled: Warm pool entry claimed for the workshop; only the
+            IngressRoute is created, routed to the entry's Service
+        owner: ownerReference stamped on every child
+        placement: Node pool and packing the RStudio pod prefers (see
+            :mod:`handlers.placement`)
+
+    Returns:
+        Plan whose ``ingress`` stage result is the workshop URL
+    """
+    manifests = render_workshop_manifests(
+        workshop_name, namespace, spec, labels, pooled, owner,
+        placement=placement
+    )
+
+    plan = ProvisioningPlan(workshop_name)
+    deployment_deps = []
+    if 'pvc' in manifests and not _skip_existing(present, 'pvc', 'create'):
+        plan.add(
+            'pvc',
+            lambda: _create_pvc(api, workshop_name, namespace, manifests['pvc'])
+        )
+        deployment_deps.append('pvc')
+    if 'deployment' in manifests and not _skip_existing(
+        present, 'deployment', 'create'
+    ):
+        plan.add(
+            'deployment',
+            lambda: _create_deployment(
+                api, workshop_name, namespace, manifests['deployment']
+            ),
+            depends_on=deployment_deps
+        )
+    if 'service' in manifests and not _skip_existing(present, 'service', 'create'):
+        plan.add(
+            'service',
+            lambda: _create_service(
+                api, workshop_name, namespace, manifests['service']
+            )
+        )
+    # The route is in the watch cache already, or written by the route index
+    url = workshop_url(workshop_name, spec.get('ingress') or {})
+    if get_route_index() is not None or _skip_existing(present, 'ingress', 'create'):
+        plan.add('ingress', lambda: _existing_url(url))
+    else:
+        plan.add(
+            'ingress',
+            lambda: _create_ingress(
+                api, workshop_name, namespace, manifests['ingress'], url
+            )
+        )
+    return plan
+
+
+async def _apply_child(
+    api: ApiGateway,
+    kind: str,
+    workshop_name: str,
+    namespace: str,
+    manifest: Dict[str, Any]
+) -> None:
+    """Server-side apply one child resource."""
+    name = manifest['metadata']['name']
+    if kind == 'ingress':
+        await api.apply.apply_namespaced_custom_object(
+            group="traefik.io",
+            version="v1alpha1",
+            namespace=namespace,
+            plural="ingressroutes",
+            name=name,
+            body=manifest
+        )
+    else:
+        apply = getattr(api.apply, f"apply_namespaced_{APPLY_METHOD_SUFFIX[kind]}")
+        await apply(name=name, namespace=namespace, body=manifest)
+    logger.info(
+        f"Applied {kind} for workshop {workshop_name} "
+        f"(content hash {manifest_hash(manifest)})"
+    )
+
+
+# Child kind -> suffix of the ApplyApi method for built-in kinds
+APPLY_METHOD_SUFFIX = {
+    'pvc': 'persistent_volume_claim',
+    'deployment': 'deployment',
+    'service': 'service',
+}
+
+
+def build_apply_plan(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    spec: Dict[str, Any],
+    children: Optional[Dict[str, Dict[str, Any]]] = None,
+    labels: Optional[Dict[str, str]] = None,
+    pooled: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None,
+    wake_service: Optional[Dict[str, str]] = None,
+    kinds: Optional[Collection[str]] = None,
+    placement: Optional[Dict[str, Any]] = None
+) -> ProvisioningPlan:
+    """
+    Build a plan that brings drifted child resources in line with the spec.
+
+    Each child is rendered and hashed; only those whose content hash differs
+    from the one recorded on the live object get a server-side apply. When
+    nothing has changed the plan is empty and makes no API calls.
+
+    Args:
+        api: API gateway to issue the applies through
+        workshop_name: Name of the workshop
+        namespace: Kubernetes namespace
+        spec: Workshop spec
+        children: Live children from :func:`handlers.children.find_children`;
+            ``None`` applies every child
+        labels: Extra labels stamped on every child resource
+        pooled: ``status.warmPool`` of a workshop running on a claimed warm
+            pool entry; only its IngressRoute is reconciled
+        owner: ownerReference stamped on every child; children created
+            before owner references were stamped get it on their next apply
+        wake_service: ``status.hibernation`` of a hibernated workshop, whose
+            Deployment stays scaled to zero
+        kinds: Only consider these child kinds
+        placement: ``status.placement`` of the workshop
+
+    Returns:
+        Plan with one stage per child that needs applying
+    """
+    manifests = render_workshop_manifests(
+        workshop_name, namespace, spec, labels, pooled, owner, wake_service,
+        placement
+    )
+
+    # Aggregated routes are written by the route index from Workshop events
+    aggregated = get_route_index() is not None
+
+    plan = ProvisioningPlan(workshop_name)
+    for kind, manifest in manifests.items():
+        if kinds is not None and kind not in kinds:
+            continue
+        if kind == 'ingress' and aggregated:
+            continue
+        if children is not None:
+            live_hash = children.get(kind, {}).get('hash')
+            if live_hash == manifest_hash(manifest):
+                API_CALLS_AVOIDED.labels(verb='apply', kind=kind).inc()
+                continue
+        depends_on = ['pvc'] if kind == 'deployment' and 'pvc' in plan else []
+        plan.add(
+            kind,
+            functools.partial(
+                _apply_child, api, kind, workshop_name, namespace, manifest
+            ),
+            depends_on=depends_on
+        )
+    return plan
+
+
+@kopf.on.create('orchestra.io', 'v1', 'workshops', when=is_owned)
+@timed_handler('create')
+@traced_handler('create')
 async def workshop_create_handler(
     spec: Dict[str, Any],
     meta: Dict[str, Any],
@@ -37,113 +368,98 @@ async def workshop_create_handler(
     logger.info(f"Creating workshop {name} in namespace {namespace}")
     
     try:
-        # Update status to Creating
-        await update_workshop_status(namespace, name, "Creating", "Workshop creation started")
-        
         # Extract workshop configuration
         workshop_name = spec.get('name', name)
         duration = spec.get('duration', '4h')
-        image = spec.get('image', 'rocker/rstudio:latest')
-        resources = spec.get('resources', {})
-        storage = spec.get('storage', {})
-        ingress_config = spec.get('ingress', {})
-        
-        # Calculate expiration time
+        # Children are owned by the Workshop, so deleting it cascades to them
+        owner = owner_reference('Workshop', name, meta.get('uid'))
+
+        # Kubernetes API calls run off the event loop via the gateway;
+        # independent child resources are created concurrently, and children
+        # the watch cache already knows about are not created again
+        children = find_children(kwargs, namespace, workshop_name)
+
+        # A matching idle warm pool entry replaces the Deployment and Service;
+        # a retry after claiming one finds it among the children
+        pooled = status.get('warmPool') or claimed_entry(children)
+        warm_pool = get_warm_pool()
+        if pooled is None and warm_pool is not None and not children:
+            pooled = await warm_pool.claim(namespace, workshop_name, spec, owner)
+
+        # Requests sized from what the image's sessions use; a claimed
+        # entry's pod already runs with the pool's requests
+        rightsizing = status.get('rightsizing')
+        if rightsizing is None and not pooled:
+            rightsizing = rightsize(spec)
+        sized_spec = rightsized(spec, rightsizing)
+
+        # Hold the workshop Pending until the cluster has room for its pod
+        admit_workshop(
+            namespace, name, sized_spec, meta, patch, pooled=bool(pooled)
+        )
+
+        # Calculate expiration time; queued time does not count
         expiration_time = get_expiration_time(duration)
-        
-        # Create Kubernetes client
-        k8s_apps_v1 = k8s_client.AppsV1Api()
-        k8s_core_v1 = k8s_client.CoreV1Api()
-        k8s_custom_objects_v1 = k8s_client.CustomObjectsApi()
-        
-        # Create PersistentVolumeClaim for workshop data
-        if storage:
-            try:
-                pvc = create_workshop_pvc(workshop_name, namespace, storage)
-                k8s_core_v1.create_namespaced_persistent_volume_claim(
-                    namespace=namespace, body=pvc
-                )
-                logger.info(f"Created PVC for workshop {workshop_name}")
-            except ApiException as e:
-                if e.status == 409:  # Already exists
-                    logger.info(f"PVC for workshop {workshop_name} already exists")
-                else:
-                    raise
-        
-        # Create Deployment for RStudio
-        try:
-            deployment = create_rstudio_deployment(
-                workshop_name, namespace, image, resources, storage
-            )
-            k8s_apps_v1.create_namespaced_deployment(
-                namespace=namespace, body=deployment
-            )
-            logger.info(f"Created deployment for workshop {workshop_name}")
-        except ApiException as e:
-            if e.status == 409:  # Already exists
-                logger.info(f"Deployment for workshop {workshop_name} already exists")
-            else:
-                raise
-        
-        # Create Service
-        try:
-            service = create_workshop_service(workshop_name, namespace)
-            k8s_core_v1.create_namespaced_service(
-                namespace=namespace, body=service
-            )
-            logger.info(f"Created service for workshop {workshop_name}")
-        except ApiException as e:
-            if e.status == 409:  # Already exists
-                logger.info(f"Service for workshop {workshop_name} already exists")
-            else:
-                raise
-        
-        # Create Ingress (if enabled)
-        workshop_url = None
-        # Always create ingress with auto-generated hostname
-        try:
-            ingress = create_workshop_ingress(workshop_name, namespace, ingress_config)
-            k8s_custom_objects_v1.create_namespaced_custom_object(
-                group="traefik.io",
-                version="v1alpha1", 
-                namespace=namespace,
-                plural="ingressroutes",
-                body=ingress
-            )
-            # Extract the host from the ingress route
-            host = ingress['spec']['routes'][0]['match'].split('`')[1]  # Extract from Host(`hostname`)
-            workshop_url = f"https://{host}"
-            logger.info(f"Created ingress route for workshop {workshop_name} at {workshop_url}")
-        except ApiException as e:
-            if e.status == 409:  # Already exists
-                # Generate the expected URL for existing ingress
-                host = f"{workshop_name}.orchestraplatform.org"
-                if ingress_config.get('host'):
-                    host = ingress_config['host']
-                workshop_url = f"https://{host}"
-                logger.info(f"Ingress route for workshop {workshop_name} already exists at {workshop_url}")
-            else:
-                raise
+
+        # A pod of a claimed entry is already running wherever it landed
+        placement = status.get('placement')
+        if placement is None and not pooled:
+            placement = place_workshop(namespace, name, sized_spec)
+
+        plan = build_create_plan(
+            get_gateway(), workshop_name, namespace, sized_spec,
+            present=children.keys() if children is not None else None,
+            pooled=pooled,
+            owner=owner,
+            placement=placement
+        )
+        results = await plan.run()
+        workshop_url = results['ingress']
        
         logger.info(f"Workshop {workshop_name} created successfully")
-        # Update status to Ready
+        # Stay Creating until the RStudio pod is ready; the readiness tracker
+        # advances the phase from Deployment events. If the pod already came
+        # up while the children were being created, report that directly.
+        phase = observed_phase(namespace, workshop_name) or 'Creating'
         status_return = {
-            'phase': 'Ready',  # Changed to Ready since workshop is actually created
             'url': workshop_url,
             'createdAt': meta.get('creationTimestamp', ''),
             'expiresAt': expiration_time.isoformat(),
-            'conditions': [{
-                'type': 'Ready',
-                'status': 'True',
-                'reason': 'WorkshopCreated',
-                'message': 'Workshop resources created successfully'
-            }]
+            **readiness_status(
+                phase, phase != 'Creating', None, meta.get('creationTimestamp')
+            )
         }
+        if pooled:
+            status_return['warmPool'] = pooled
+        if placement:
+            status_return['placement'] = placement
+        if rightsizing:
+            status_return['rightsizing'] = rightsizing
+        if status.get('queue'):
+            status_return['queue'] = None
         logger.info(f"Workshop {workshop_name} status updated: {status_return}")
         
         patch['status'] = status_return
         
+    except kopf.TemporaryError:
+        raise
+    except ProvisioningError as e:
+        _retry_if_throttled(e, f"Creating workshop {name}")
+        logger.error(
+            f"Failed to create workshop {name} at stage {e.stage}: {e.cause}"
+            + (f" (skipped: {', '.join(e.skipped)})" if e.skipped else "")
+        )
+        patch['status'] = {
+            'phase': 'Failed',
+            'conditions': [{
+                'type': 'Ready', 
+                'status': 'False',
+                'reason': 'CreationFailed',
+                'message': str(e)
+            }]
+        }
     except Exception as e:
+        _retry_if_throttled(e, f"Creating workshop {name}")
         logger.error(f"Failed to create workshop {name}: {e}")
         patch['status'] = {
             'phase': 'Failed',
@@ -156,24 +472,157 @@ async def workshop_create_handler(
         }
 
 
-@kopf.on.update('orchestra.io', 'v1', 'workshops')
+@kopf.on.resume('orchestra.io', 'v1', 'workshops', when=is_owned)
+@kopf.on.update('orchestra.io', 'v1', 'workshops', when=is_owned)
+@timed_handler('update')
+@traced_handler('update')
 async def workshop_update_handler(
     spec: Dict[str, Any],
     meta: Dict[str, Any],
     status: Dict[str, Any], 
+    patch,
     namespace: str,
     name: str,
     **kwargs: Any
-) -> Dict[str, Any]:
-    """Handle Workshop update events."""
-    logger.info(f"Updating workshop {name} in namespace {namespace}")
-    
-    # For now, we'll just log updates
-    # In the future, we might support scaling or configuration changes
-    return {'phase': status.get('phase', 'Ready')}
+) -> None:
+    """
+    Reconcile a workshop's child resources with its spec.
+
+    Runs on spec changes and once per workshop when the operator starts.
+    Children whose content hash already matches are left alone, so an
+    unchanged workshop costs no API calls; after a restart, those that do
+    need applies are paced (see :mod:`utils.pacing`).
+    """
+    logger.info(f"Reconciling workshop {name} in namespace {namespace}")
+
+    workshop_name = spec.get('name', name)
+    children = find_children(kwargs, namespace, workshop_name)
+    plan = build_apply_plan(
+        get_gateway(), workshop_name, namespace,
+        rightsized(spec, status.get('rightsizing')), children,
+        pooled=status.get('warmPool'),
+        owner=owner_reference('Workshop', name, meta.get('uid')),
+        wake_service=(
+            status.get('hibernation') if status.get('phase') == 'Hibernated'
+            else None
+        ),
+        placement=status.get('placement')
+    )
+    if kwargs.get('reason') == 'resume':
+        # Spread out after a restart; reconciles with nothing to write go
+        # ahead at once
+        await resync_slot(namespace, name, needed=len(plan) > 0)
+    try:
+        await plan.run()
+    except ProvisioningError as e:
+        _retry_if_throttled(e, f"Reconciling workshop {name}")
+        logger.error(
+            f"Failed to reconcile workshop {name} at stage {e.stage}: {e.cause}"
+        )
+        patch['status'] = {
+            'conditions': [{
+                'type': 'Ready',
+                'status': 'False',
+                'reason': 'ReconcileFailed',
+                'message': str(e)
+            }]
+        }
+        return
+
+    url = workshop_url(workshop_name, spec.get('ingress') or {})
+    if status.get('url') and status['url'] != url:
+        patch.setdefault('status', {})['url'] = url
 
 
-@kopf.on.delete('orchestra.io', 'v1', 'workshops')
+async def _delete_child(
+    description: str,
+    workshop_name: str,
+    delete_call: Callable[[], Awaitable[Any]]
+) -> None:
+    """Delete one kind of child resource, logging (not raising) on failure."""
+    try:
+        await delete_call()
+        logger.info(f"Deleted {description} for workshop {workshop_name}")
+    except ApiException as e:
+        if e.status == 429:  # Still throttled after retries; retry the handler
+            raise
+        if e.status != 404:  # Ignore not found errors
+            logger.warning(f"Failed to delete {description}: {e}")
+
+
+def build_delete_plan(
+    api: ApiGateway,
+    workshop_name: str,
+    namespace: str,
+    present: Optional[Collection[str]] = None,
+    label_selector: Optional[str] = None
+) -> ProvisioningPlan:
+    """
+    Build the teardown plan for a workshop's child resources.
+
+    Each kind is removed with one label-selector ``deletecollection`` call,
+    which also catches a claimed warm pool entry (relabelled to the
+    workshop) and children whose names were never recorded. The
+    IngressRoute, Service and Deployment go concurrently; the PVC waits for
+    the Deployment so the volume is never pulled from under a running pod.
+
+    Args:
+        api: API gateway to issue the deletes through
+        workshop_name: Name of the workshop
+        namespace: Kubernetes namespace
+        present: Child kinds to delete, e.g. those the watch cache says exist;
+            deletes of anything else are skipped. ``None`` deletes everything.
+        label_selector: Children to delete (defaults to the workshop's
+            ``workshop=<name>`` label)
+
+    Returns:
+        Plan that deletes every child resource
+    """
+    selector = label_selector or f"workshop={workshop_name}"
+
+    plan = ProvisioningPlan(workshop_name)
+    # Aggregated routes are dropped by the route index on the deletion event
+    if get_route_index() is None and not _skip_existing(present, 'ingress', 'delete'):
+        plan.add('ingress', lambda: _delete_child(
+            'ingress routes', workshop_name,
+            lambda: api.custom.delete_collection_namespaced_custom_object(
+                group="traefik.io",
+                version="v1alpha1",
+                namespace=namespace,
+                plural="ingressroutes",
+                label_selector=selector
+            )
+        ))
+    if not _skip_existing(present, 'service', 'delete'):
+        plan.add('service', lambda: _delete_child(
+            'services', workshop_name,
+            lambda: api.core.delete_collection_namespaced_service(
+                namespace=namespace, label_selector=selector
+            )
+        ))
+    pvc_deps = []
+    if not _skip_existing(present, 'deployment', 'delete'):
+        plan.add('deployment', lambda: _delete_child(
+            'deployments', workshop_name,
+            lambda: api.apps.delete_collection_namespaced_deployment(
+                namespace=namespace, label_selector=selector
+            )
+        ))
+        pvc_deps.append('deployment')
+    # Delete PVC (optionally preserve data by dropping this stage)
+    if not _skip_existing(present, 'pvc', 'delete'):
+        plan.add('pvc', lambda: _delete_child(
+            'PVCs', workshop_name,
+            lambda: api.core.delete_collection_namespaced_persistent_volume_claim(
+                namespace=namespace, label_selector=selector
+            )
+        ), depends_on=pvc_deps)
+    return plan
+
+
+@kopf.on.delete('orchestra.io', 'v1', 'workshops', when=is_owned)
+@timed_handler('delete')
+@traced_handler('delete', annotate=False)
 async def workshop_delete_handler(
     meta: Dict[str, Any],
     namespace: str, 
@@ -186,69 +635,26 @@ async def workshop_delete_handler(
     try:
         workshop_name = meta.get('name', name)
         
-        # Create Kubernetes clients
-        k8s_apps_v1 = k8s_client.AppsV1Api()
-        k8s_core_v1 = k8s_client.CoreV1Api()
-        k8s_custom_objects_v1 = k8s_client.CustomObjectsApi()
-        
-        # Delete in reverse order: IngressRoute -> Service -> Deployment -> PVC
-        
-        # Delete IngressRoute
-        try:
-            k8s_custom_objects_v1.delete_namespaced_custom_object(
-                group="traefik.io",
-                version="v1alpha1",
-                namespace=namespace,
-                plural="ingressroutes",
-                name=f"{workshop_name}-ingress"
+        # Children owned by this Workshop are left to the garbage collector,
+        # which removes them once Kopf releases the finalizer (the PVC is
+        # kept by its protection finalizer until the pod is gone). Children
+        # created before owner references were stamped are deleted by label:
+        # IngressRoute, Service and Deployment in parallel, then the PVC.
+        children = find_children(kwargs, namespace, workshop_name)
+        present = (
+            unowned_children(children, meta.get('uid'))
+            if children is not None else None
+        )
+        if present is not None and not present:
+            logger.info(
+                f"Children of workshop {workshop_name} are removed by "
+                f"the garbage collector"
             )
-            logger.info(f"Deleted ingress route for workshop {workshop_name}")
-        except ApiException as e:
-            if e.status != 404:  # Ignore not found errors
-                logger.warning(f"Failed to delete ingress route: {e}")
-        
-        # Delete Service  
-        try:
-            k8s_core_v1.delete_namespaced_service(
-                name=f"{workshop_name}-service", namespace=namespace
-            )
-            logger.info(f"Deleted service for workshop {workshop_name}")
-        except ApiException as e:
-            if e.status != 404:
-                logger.warning(f"Failed to delete service: {e}")
-                
-        # Delete Deployment
-        try:
-            k8s_apps_v1.delete_namespaced_deployment(
-                name=f"{workshop_name}-deployment", namespace=namespace
-            )
-            logger.info(f"Deleted deployment for workshop {workshop_name}")
-        except ApiException as e:
-            if e.status != 404:
-                logger.warning(f"Failed to delete deployment: {e}")
-        
-        # Delete PVC (optionally preserve data by commenting this out)
-        try:
-            k8s_core_v1.delete_namespaced_persistent_volume_claim(
-                name=f"{workshop_name}-pvc", namespace=namespace
-            )
-            logger.info(f"Deleted PVC for workshop {workshop_name}")
-        except ApiException as e:
-            if e.status != 404:
-                logger.warning(f"Failed to delete PVC: {e}")
+        await build_delete_plan(
+            get_gateway(), workshop_name, namespace, present=present
+        ).run()
         
     except Exception as e:
+        _retry_if_throttled(e, f"Deleting workshop {name}")
         logger.error(f"Failed to delete workshop {name}: {e}")
         raise kopf.PermanentError(f"Workshop deletion failed: {e}")
-
-
-async def update_workshop_status(
-    namespace: str, 
-    name: str, 
-    phase: str, 
-    message: str
-) -> None:
-    """Update the status of a Workshop resource."""
-    # This would update the Workshop's status field
-    # Implementation depends on how Kopf handles status updates
-    logger.info(f"Workshop {name} status: {phase} - {message}")
@@ -16,8 +16,55 @@ from typing import Any, Dict
 import kopf
 import kubernetes
 
+from handlers.capacity import register_capacity_handlers, start_admission_control
+from handlers.children import register_children_indexes
+from handlers.hibernation import (
+    register_hibernation_handlers,
+    start_hibernation,
+    stop_hibernation,
+)
+from handlers.orphans import start_orphan_sweeper, stop_orphan_sweeper
+from handlers.placement import register_placement_handlers, start_placement
+from handlers.prepull import (
+    register_prepull_handlers,
+    start_prepuller,
+    stop_prepuller,
+)
+from handlers.readiness import register_readiness_handlers
+from handlers.rightsizing import start_rightsizing, stop_rightsizing
+from handlers.routes import (
+    register_route_handlers,
+    start_route_index,
+    stop_route_index,
+)
+from handlers.sharding import register_sharding_handlers
+from handlers.startup import start_warm_up, stop_warm_up
+from handlers.status import (
+    register_status_handlers,
+    start_status_writer,
+    stop_status_writer,
+)
+from handlers.warm_pool import (
+    register_warm_pool_handlers,
+    start_warm_pool,
+    stop_warm_pool,
+)
 from handlers.workshop import register_workshop_handlers
-from handlers.cleanup import register_cleanup_handlers
+from handlers.cleanup import (
+    register_cleanup_handlers,
+    start_expiration_scheduler,
+    stop_expiration_scheduler,
+)
+from handlers.cohort import register_cohort_handlers
+from utils.k8s_client import (
+    close_client_registry,
+    configure_gateway,
+    init_client_registry,
+    shutdown_gateway,
+)
+from utils.metrics import HANDLER_WORKER_LIMIT, set_ready, start_metrics_server
+from utils.sharding import get_coordinator, start_sharding, stop_sharding
+from utils.tracing import start_tracing, stop_tracing
 
 
 def setup_logging() -> None:
@@ -33,7 +80,7 @@ def setup_logging() -> None:
 
 
 def setup_kubernetes() -> None:
-    """Initialize Kubernetes client configuration."""
+    """Initialize Kubernetes client configuration and the shared client pool."""
     try:
         # Try in-cluster config first (when running in pod)
         kubernetes.config.load_incluster_config()
@@ -43,6 +90,9 @@ def setup_kubernetes() -> None:
         kubernetes.config.load_kube_config()
         logging.info("Loaded local Kubernetes configuration")
 
+    # One pooled ApiClient shared by every handler for the operator's lifetime
+    init_client_registry()
+
 
 @kopf.on.startup()
 async def startup_handler(settings: kopf.OperatorSettings, **kwargs: Any) -> None:
@@ -53,9 +103,59 @@ async def startup_handler(settings: kopf.OperatorSettings, **kwargs: Any) -> Non
     settings.posting.level = logging.INFO
     settings.watching.reconnect_backoff = 1.0
     settings.batching.worker_limit = 20
+    HANDLER_WORKER_LIMIT.set(settings.batching.worker_limit)
     
     # Setup Kubernetes client
     setup_kubernetes()
+    configure_gateway()
+    start_metrics_server()
+
+    # Spans for handlers, provisioning stages and API calls, if an export
+    # target is configured
+    start_tracing()
+
+    # Claim a slice of the workshops when running several replicas; Kopf's
+    # own peering would otherwise pause all but one of them
+    await start_sharding()
+    if get_coordinator() is not None:
+        settings.peering.standalone = True
+    
+    # Status updates from outside Kopf's handlers, merged per workshop
+    start_status_writer()
+
+    # Hold workshops Pending while the cluster has no room for them
+    start_admission_control()
+
+    # New workshops packed into node pools, if ORCHESTRA_PLACEMENT is set
+    start_placement()
+
+    # Requests of new workshops sized from usage, if ORCHESTRA_RIGHTSIZING
+    # is set
+    start_rightsizing()
+
+    # Single deadline scheduler for every workshop's expiry
+    start_expiration_scheduler()
+
+    # Idle RStudio pods kept ahead of demand, if ORCHESTRA_WARM_POOL is set
+    start_warm_pool()
+
+    # DaemonSets that pull images shared by several workshops onto every node
+    start_prepuller()
+
+    # Periodic cleanup of children whose Workshop is gone
+    start_orphan_sweeper()
+
+    # Idle workshops scaled to zero, if an activity source is configured
+    await start_hibernation()
+
+    # One IngressRoute per namespace or cohort, if ORCHESTRA_INGRESS_MODE is
+    # aggregated; loaded before Kopf starts watching
+    await start_route_index()
+
+    # One paginated LIST of the existing objects; the resync Kopf starts
+    # next, and expiries that passed during the restart, are paced from it
+    await start_warm_up()
+    set_ready()
     
     logging.info("Orchestra Operator startup complete")
 
@@ -64,6 +164,20 @@ async def startup_handler(settings: kopf.OperatorSettings, **kwargs: Any) -> Non
 async def cleanup_handler(**kwargs: Any) -> None:
     """Clean up resources on operator shutdown."""
     logging.info("Orchestra Operator shutting down...")
+    set_ready(False)
+    await stop_sharding()
+    await stop_expiration_scheduler()
+    await stop_warm_pool()
+    await stop_prepuller()
+    await stop_orphan_sweeper()
+    await stop_hibernation()
+    await stop_rightsizing()
+    await stop_route_index()
+    await stop_status_writer()
+    stop_warm_up()
+    await stop_tracing()
+    shutdown_gateway()
+    close_client_registry()
 
 
 def main() -> None:
@@ -71,8 +185,19 @@ def main() -> None:
     setup_logging()
     
     # Register all handlers
+    register_children_indexes()
+    register_capacity_handlers()
+    register_placement_handlers()
     register_workshop_handlers()
+    register_readiness_handlers()
+    register_warm_pool_handlers()
+    register_prepull_handlers()
+    register_sharding_handlers()
     register_cleanup_handlers()
+    register_cohort_handlers()
+    register_hibernation_handlers()
+    register_route_handlers()
+    register_status_handlers()
     
     logging.info("Starting Orchestra Operator...")
     
@@ -0,0 +1,103 @@
+"""Seat expansion for WorkshopCohort resources."""
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from resources.snapshot import golden_snapshot_name
+
+
+def seat_names(cohort_name: str, seats: int, start: int = 1) -> List[str]:
+    """
+    Generate the seat names for a cohort.
+
+    Seats are numbered from 1 and zero-padded to three digits, e.g.
+    ``intro-r-001`` … ``intro-r-300``. The padding is fixed so a seat keeps
+    its name when the cohort is resized.
+
+    Args:
+        cohort_name: Name of the cohort
+        seats: Total number of seats in the cohort
+        start: First seat number to generate (for scaling up)
+
+    Returns:
+        List of seat names from ``start`` to ``seats`` inclusive
+    """
+    return [f"{cohort_name}-{index:03d}" for index in range(start, seats + 1)]
+
+
+def seat_template(cohort_name: str, template: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resolve the cohort-level settings of a cohort template for its seats.
+
+    With ``storage.golden`` set, every seat's PVC is cloned from the cohort's
+    golden snapshot rather than the golden PVC itself, so one snapshot of the
+    course data serves any number of seats.
+
+    Args:
+        cohort_name: Name of the cohort
+        template: ``spec.template`` from the cohort
+
+    Returns:
+        Template to expand into seat specs
+    """
+    storage = template.get('storage') or {}
+    if not storage.get('golden'):
+        return template
+    seat_storage = {key: value for key, value in storage.items() if key != 'golden'}
+    seat_storage['sourceSnapshot'] = golden_snapshot_name(cohort_name)
+    return {**template, 'storage': seat_storage}
+
+
+def create_seat_spec(seat_name: str, template: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the Workshop-style spec for a single cohort seat.
+
+    Args:
+        seat_name: Name of the seat
+        template: ``spec.template`` from the cohort
+
+    Returns:
+        Spec accepted by the workshop provisioning plan
+    """
+    ingress_config = dict(template.get('ingress', {}))
+    # A single host cannot serve every seat; seats get <seat>.<domain> instead
+    ingress_config.pop('host', None)
+    domain = ingress_config.pop('domain', None)
+    if domain:
+        ingress_config['host'] = f"{seat_name}.{domain}"
+
+    return {**template, 'name': seat_name, 'ingress': ingress_config}
+
+
+def iter_seat_specs(
+    seat_names: Iterable[str],
+    template: Dict[str, Any]
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Lazily yield ``(seat_name, seat_spec)`` pairs.
+
+    Specs are rendered only as provisioning workers pull them, so a large
+    cohort never holds every seat's spec in memory at once.
+
+    Args:
+        seat_names: Seats to render
+        template: ``spec.template`` from the cohort
+
+    Yields:
+        Seat name and its Workshop-style spec
+    """
+    for seat_name in seat_names:
+        yield seat_name, create_seat_spec(seat_name, template)
+
+
+def seat_url_template(template: Dict[str, Any]) -> str:
+    """
+    Describe every seat URL with a single pattern for the cohort status.
+
+    Args:
+        template: ``spec.template`` from the cohort
+
+    Returns:
+        URL pattern with a ``{seat}`` placeholder
+    """
+    domain = template.get('ingress', {}).get('domain', 'orchestraplatform.org')
+    return f"https://{{seat}}.{domain}"
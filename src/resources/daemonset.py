@@ -0,0 +1,94 @@
+"""Image pre-pull DaemonSet creation."""
+
+import hashlib
+from typing import Dict, Optional
+import kubernetes.client as k8s
+
+
+# Tiny always-running container that keeps the DaemonSet pod alive once the
+# init container has pulled the workshop image
+PAUSE_IMAGE = 'registry.k8s.io/pause:3.10'
+
+# Label carrying the short image id; the full reference is in an annotation
+PREPULL_LABEL = 'orchestra.io/prepull'
+IMAGE_ANNOTATION = 'orchestra.io/image'
+
+
+def image_id(image: str) -> str:
+    """Return a short, label-safe identifier for an image reference."""
+    return hashlib.sha256(image.encode()).hexdigest()[:12]
+
+
+def create_prepull_daemonset(
+    image: str,
+    namespace: str,
+    labels: Optional[Dict[str, str]] = None
+) -> k8s.V1DaemonSet:
+    """
+    Create a DaemonSet that pulls ``image`` onto every schedulable node.
+
+    The image runs once as an init container (just ``true``), so the kubelet
+    pulls and caches its layers; a pause container then holds the pod at a
+    few MiB. No tolerations are set, so it lands on the same nodes as the
+    workshop pods.
+
+    Args:
+        image: Workshop image to pre-pull
+        namespace: Kubernetes namespace for the DaemonSet
+        labels: Extra labels for the DaemonSet
+
+    Returns:
+        V1DaemonSet object ready to be created
+    """
+    selector_labels = {
+        'app': 'orchestra-prepull',
+        PREPULL_LABEL: image_id(image),
+    }
+    # Both containers are sized so the pods never compete with workshops
+    footprint = k8s.V1ResourceRequirements(
+        requests={'cpu': '1m', 'memory': '8Mi'},
+        limits={'cpu': '50m', 'memory': '32Mi'}
+    )
+
+    pod_template = k8s.V1PodTemplateSpec(
+        metadata=k8s.V1ObjectMeta(labels=selector_labels),
+        spec=k8s.V1PodSpec(
+            init_containers=[
+                k8s.V1Container(
+                    name='prepull',
+                    image=image,
+                    command=['sh', '-c', 'true'],
+                    resources=footprint
+                )
+            ],
+            containers=[
+                k8s.V1Container(
+                    name='pause',
+                    image=PAUSE_IMAGE,
+                    resources=footprint
+                )
+            ],
+            termination_grace_period_seconds=0
+        )
+    )
+
+    daemonset = k8s.V1DaemonSet(
+        api_version='apps/v1',
+        kind='DaemonSet',
+        metadata=k8s.V1ObjectMeta(
+            name=f"prepull-{image_id(image)}",
+            namespace=namespace,
+            labels={
+                **selector_labels,
+                'component': 'prepull',
+                **(labels or {})
+            },
+            annotations={IMAGE_ANNOTATION: image}
+        ),
+        spec=k8s.V1DaemonSetSpec(
+            selector=k8s.V1LabelSelector(match_labels=selector_labels),
+            template=pod_template
+        )
+    )
+
+    return daemonset
@@ -1,15 +1,96 @@
 """RStudio Deployment creation for workshops."""
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 import kubernetes.client as k8s
 
 
+# Seconds a pod must stay ready before the Deployment counts it available,
+# which is when a workshop moves from Ready to Running
+MIN_READY_SECONDS = 10
+
+# Resource settings used when the workshop spec leaves them out
+DEFAULT_RESOURCES = {
+    'cpu': '1',
+    'memory': '2Gi',
+    'cpuRequest': '500m',
+    'memoryRequest': '1Gi',
+}
+
+# Node label pods are packed onto the same values of
+HOSTNAME_LABEL = 'kubernetes.io/hostname'
+
+# Scheduler weights (1-100) of the placement preferences
+POOL_WEIGHT = 100
+GROUP_WEIGHT = 100
+PACK_WEIGHT = 50
+
+
+def placement_affinity(placement: Dict[str, Any]) -> k8s.V1Affinity:
+    """
+    Build the scheduling preferences of a workshop's placement.
+
+    The pod prefers nodes in the placement's pool, then nodes already
+    running pods of its group (a cohort's other seats), then nodes running
+    any RStudio pod. All are preferences, so a pod still schedules when the
+    pool is full or gone.
+
+    Args:
+        placement: ``status.placement`` of the workshop: the node ``label``
+            and ``pool`` value chosen for it, and ``packWith``, the labels
+            of the pods it is packed with
+
+    Returns:
+        Affinity for the pod template
+    """
+    node_affinity = None
+    if placement.get('pool'):
+        node_affinity = k8s.V1NodeAffinity(
+            preferred_during_scheduling_ignored_during_execution=[
+                k8s.V1PreferredSchedulingTerm(
+                    weight=POOL_WEIGHT,
+                    preference=k8s.V1NodeSelectorTerm(match_expressions=[
+                        k8s.V1NodeSelectorRequirement(
+                            key=placement['label'],
+                            operator='In',
+                            values=[placement['pool']]
+                        )
+                    ])
+                )
+            ]
+        )
+    terms = []
+    if placement.get('packWith'):
+        terms.append((GROUP_WEIGHT, {
+            'component': 'rstudio', **placement['packWith']
+        }))
+    terms.append((PACK_WEIGHT, {'component': 'rstudio'}))
+    return k8s.V1Affinity(
+        node_affinity=node_affinity,
+        pod_affinity=k8s.V1PodAffinity(
+            preferred_during_scheduling_ignored_during_execution=[
+                k8s.V1WeightedPodAffinityTerm(
+                    weight=weight,
+                    pod_affinity_term=k8s.V1PodAffinityTerm(
+                        label_selector=k8s.V1LabelSelector(match_labels=labels),
+                        topology_key=HOSTNAME_LABEL
+                    )
+                )
+                for weight, labels in terms
+            ]
+        )
+    )
+
+
 def create_rstudio_deployment(
     workshop_name: str,
     namespace: str, 
     image: str,
     resources: Dict[str, Any],
-    storage: Dict[str, Any]
+    storage: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None,
+    replicas: int = 1,
+    placement: Optional[Dict[str, Any]] = None
 ) -> k8s.V1Deployment:
     """
     Create a Kubernetes Deployment for an RStudio workshop instance.
@@ -20,15 +101,29 @@ def create_rstudio_deployment(
         image: Docker image for RStudio
         resources: Resource limits and requests
         storage: Storage configuration
+        labels: Extra labels for the Deployment and its pods
+        owner: ownerReference to the owning Workshop (see
+            :func:`resources.owner.owner_reference`)
+        replicas: Pod count; 0 while the workshop is hibernated
+        placement: Node pool and packing the pod prefers (see
+            :func:`placement_affinity`); ``None`` leaves scheduling to the
+            cluster defaults
         
     Returns:
         V1Deployment object ready to be created
     """
+    workshop_labels = {
+        'app': workshop_name,
+        'component': 'rstudio',
+        'workshop': workshop_name,
+        **(labels or {})
+    }
+
     # Resource limits and requests
-    cpu_limit = resources.get('cpu', '1')
-    memory_limit = resources.get('memory', '2Gi')
-    cpu_request = resources.get('cpuRequest', '500m')
-    memory_request = resources.get('memoryRequest', '1Gi')
+    cpu_limit = resources.get('cpu', DEFAULT_RESOURCES['cpu'])
+    memory_limit = resources.get('memory', DEFAULT_RESOURCES['memory'])
+    cpu_request = resources.get('cpuRequest', DEFAULT_RESOURCES['cpuRequest'])
+    memory_request = resources.get('memoryRequest', DEFAULT_RESOURCES['memoryRequest'])
     
     # Container definition
     container = k8s.V1Container(
@@ -37,6 +132,13 @@ def create_rstudio_deployment(
         ports=[
             k8s.V1ContainerPort(container_port=8787, name='rstudio')
         ],
+        # RStudio answers on 8787 only once the session server is up
+        readiness_probe=k8s.V1Probe(
+            http_get=k8s.V1HTTPGetAction(path='/', port='rstudio'),
+            initial_delay_seconds=2,
+            period_seconds=2,
+            failure_threshold=3
+        ),
         env=[
             k8s.V1EnvVar(name='DISABLE_AUTH', value='true'),  # For demo purposes
             k8s.V1EnvVar(name='ROOT', value='true'),
@@ -74,21 +176,19 @@ def create_rstudio_deployment(
     # Pod template
     pod_template = k8s.V1PodTemplateSpec(
         metadata=k8s.V1ObjectMeta(
-            labels={
-                'app': workshop_name,
-                'component': 'rstudio',
-                'workshop': workshop_name
-            }
+            labels=workshop_labels
         ),
         spec=k8s.V1PodSpec(
             containers=[container],
-            volumes=volumes if volumes else None
+            volumes=volumes if volumes else None,
+            affinity=placement_affinity(placement) if placement else None
         )
     )
     
     # Deployment specification
     deployment_spec = k8s.V1DeploymentSpec(
-        replicas=1,
+        replicas=replicas,
+        min_ready_seconds=MIN_READY_SECONDS,
         selector=k8s.V1LabelSelector(
             match_labels={
                 'app': workshop_name,
@@ -105,11 +205,8 @@ def create_rstudio_deployment(
         metadata=k8s.V1ObjectMeta(
             name=f"{workshop_name}-deployment",
             namespace=namespace,
-            labels={
-                'app': workshop_name,
-                'component': 'rstudio',
-                'workshop': workshop_name
-            }
+            labels=workshop_labels,
+            owner_references=[owner] if owner else None
         ),
         spec=deployment_spec
     )
@@ -1,12 +1,27 @@
 """Ingress creation for workshops."""
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
+
+
+def workshop_host(workshop_name: str, ingress_config: Dict[str, Any]) -> str:
+    """Return the host name a workshop is served on."""
+    # Custom host from the spec, else workshop name + orchestraplatform.org
+    return ingress_config.get('host') or f"{workshop_name}.orchestraplatform.org"
+
+
+def workshop_url(workshop_name: str, ingress_config: Dict[str, Any]) -> str:
+    """Return the URL a workshop is served at."""
+    return f"https://{workshop_host(workshop_name, ingress_config)}"
 
 
 def create_workshop_ingress(
     workshop_name: str, 
     namespace: str, 
-    ingress_config: Dict[str, Any]
+    ingress_config: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    service_name: Optional[str] = None,
+    owner: Optional[Dict[str, Any]] = None,
+    service_namespace: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Create a Traefik IngressRoute for a workshop.
@@ -15,17 +30,17 @@ def create_workshop_ingress(
         workshop_name: Name of the workshop
         namespace: Kubernetes namespace
         ingress_config: Ingress configuration from workshop spec
+        labels: Extra labels for the IngressRoute
+        service_name: Service to route to (defaults to the workshop's own)
+        owner: ownerReference to the owning Workshop
+        service_namespace: Namespace of ``service_name``, if not the
+            workshop's own (Traefik must allow cross-namespace references)
         
     Returns:
         IngressRoute manifest as a dictionary ready to be created
     """
-    # Generate host based on workshop name + orchestraplatform.org
-    host = f"{workshop_name}.orchestraplatform.org"
-    
-    # Override with custom host if provided in config
-    if ingress_config.get('host'):
-        host = ingress_config['host']
-    
+    host = workshop_host(workshop_name, ingress_config)
+
     # Get entry points (default to 'web' for HTTP)
     entry_points = ingress_config.get('entryPoints', ['web'])
     
@@ -41,7 +56,8 @@ def create_workshop_ingress(
             'labels': {
                 'app': workshop_name,
                 'component': 'rstudio',
-                'workshop': workshop_name
+                'workshop': workshop_name,
+                **(labels or {})
             },
             'annotations': annotations
         },
@@ -53,7 +69,7 @@ def create_workshop_ingress(
                     'kind': 'Rule',
                     'services': [
                         {
-                            'name': f"{workshop_name}-service",
+                            'name': service_name or f"{workshop_name}-service",
                             'port': 80
                         }
                     ]
@@ -62,4 +78,58 @@ def create_workshop_ingress(
         }
     }
     
+    if service_namespace:
+        ingress_route['spec']['routes'][0]['services'][0]['namespace'] = (
+            service_namespace
+        )
+
+    if owner:
+        ingress_route['metadata']['ownerReferences'] = [owner]
+
+    return ingress_route
+
+
+def create_aggregated_ingress(
+    name: str,
+    namespace: str,
+    entry_points: List[str],
+    routes: List[Dict[str, Any]],
+    labels: Optional[Dict[str, str]] = None,
+    annotations: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Create one Traefik IngressRoute holding the routes of many workshops.
+
+    Args:
+        name: Name of the IngressRoute
+        namespace: Kubernetes namespace
+        entry_points: Entry points shared by every route
+        routes: One route per workshop, as rendered by
+            :func:`create_workshop_ingress`
+        labels: Labels for the IngressRoute
+        annotations: Annotations shared by every route
+        owner: ownerReference to the owner of every route, if there is one
+
+    Returns:
+        IngressRoute manifest as a dictionary ready to be applied
+    """
+    ingress_route: Dict[str, Any] = {
+        'apiVersion': 'traefik.io/v1alpha1',
+        'kind': 'IngressRoute',
+        'metadata': {
+            'name': name,
+            'namespace': namespace,
+            'labels': {'component': 'routes', **(labels or {})},
+            'annotations': annotations or {}
+        },
+        'spec': {
+            'entryPoints': entry_points,
+            'routes': routes
+        }
+    }
+
+    if owner:
+        ingress_route['metadata']['ownerReferences'] = [owner]
+
     return ingress_route
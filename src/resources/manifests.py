@@ -0,0 +1,287 @@
+"""Rendered child manifests for a workshop, stamped with content hashes.
+
+Workshops sharing a profile (image, resources, storage, ingress settings
+other than the host, extra labels, owner kind and placement) differ only in
+their names, namespace, host and owner. The first workshop of a profile is
+rendered through the ``kubernetes.client`` builders into
+:class:`resources.templates.ManifestTemplate` objects; later ones are
+stamped from those templates without building any model objects. Both
+paths produce identical manifests and content hashes.
+"""
+
+import functools
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+import kubernetes.client as k8s
+
+from resources.deployment import create_rstudio_deployment
+from resources.ingress import create_workshop_ingress, workshop_host
+from resources.pvc import create_workshop_pvc
+from resources.service import create_workshop_service
+from resources.templates import (
+    ManifestTemplate,
+    canonical_json,
+    json_safe,
+    placeholder,
+)
+
+
+# Annotation holding the hash of the manifest the operator last applied
+CONTENT_HASH_ANNOTATION = 'orchestra.io/content-hash'
+
+# Spec fields that make up a workshop's profile
+PROFILE_FIELDS = ('image', 'resources', 'storage', 'ingress')
+
+# Per-workshop values substituted into a profile's templates
+TEMPLATE_FIELDS = ('workshop', 'namespace', 'host', 'owner', 'uid')
+
+# Compiled profiles kept; a cohort's seats, each with its own host, share one
+MAX_PROFILES = 256
+
+_serializer: Optional[k8s.ApiClient] = None
+
+
+def to_manifest(obj: Any) -> Dict[str, Any]:
+    """
+    Convert a ``kubernetes.client`` model (or a plain dict) to a manifest dict.
+
+    Args:
+        obj: Model object as returned by the resource builders
+
+    Returns:
+        JSON-ready manifest with camelCase keys and unset fields omitted
+    """
+    global _serializer
+
+    if _serializer is None:
+        _serializer = k8s.ApiClient()
+    return _serializer.sanitize_for_serialization(obj)
+
+
+def _unstamped(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a manifest without its content-hash annotation."""
+    metadata = dict(manifest.get('metadata') or {})
+    annotations = dict(metadata.get('annotations') or {})
+    annotations.pop(CONTENT_HASH_ANNOTATION, None)
+    metadata['annotations'] = annotations
+    return {**manifest, 'metadata': metadata}
+
+
+def _digest(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def content_hash(manifest: Dict[str, Any]) -> str:
+    """
+    Hash a manifest independently of key order.
+
+    The content-hash annotation itself is ignored, so a stamped manifest
+    hashes the same as the unstamped one.
+    """
+    return _digest(canonical_json(_unstamped(manifest)))
+
+
+def stamp_content_hash(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Set the content-hash annotation on a manifest and return it."""
+    metadata = manifest.setdefault('metadata', {})
+    # Copy, so annotations shared with the Workshop spec are not modified
+    metadata['annotations'] = {
+        **(metadata.get('annotations') or {}),
+        CONTENT_HASH_ANNOTATION: content_hash(manifest),
+    }
+    return manifest
+
+
+def manifest_hash(manifest: Dict[str, Any]) -> Optional[str]:
+    """Return the content hash a manifest was stamped with, if any."""
+    annotations = manifest.get('metadata', {}).get('annotations') or {}
+    return annotations.get(CONTENT_HASH_ANNOTATION)
+
+
+def _build_children(
+    workshop_name: str,
+    namespace: str,
+    spec: Dict[str, Any],
+    labels: Optional[Dict[str, str]],
+    pooled: Optional[Dict[str, str]],
+    owner: Optional[Dict[str, Any]],
+    wake_service: Optional[Dict[str, str]],
+    placement: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Build every child resource with the ``kubernetes.client`` builders."""
+    image = spec.get('image', 'rocker/rstudio:latest')
+    resources = spec.get('resources', {})
+    storage = spec.get('storage', {})
+    ingress_config = spec.get('ingress', {})
+
+    children: Dict[str, Any] = {}
+    if pooled:
+        children['ingress'] = create_workshop_ingress(
+            workshop_name, namespace, ingress_config, labels, pooled['service'],
+            owner
+        )
+        return children
+    if storage:
+        children['pvc'] = create_workshop_pvc(
+            workshop_name, namespace, storage, labels, owner
+        )
+    children['deployment'] = create_rstudio_deployment(
+        workshop_name, namespace, image, resources, storage, labels, owner,
+        replicas=0 if wake_service else 1, placement=placement
+    )
+    children['service'] = create_workshop_service(
+        workshop_name, namespace, labels, owner
+    )
+    if wake_service:
+        children['ingress'] = create_workshop_ingress(
+            workshop_name, namespace, ingress_config, labels,
+            wake_service['service'], owner, wake_service['namespace']
+        )
+    else:
+        children['ingress'] = create_workshop_ingress(
+            workshop_name, namespace, ingress_config, labels, owner=owner
+        )
+    return children
+
+
+@functools.lru_cache(maxsize=MAX_PROFILES)
+def _compile_profile(profile: str) -> Dict[str, ManifestTemplate]:
+    """Render a profile with placeholder values and compile its templates."""
+    spec, labels, owner, wake_service, placement = json.loads(profile)
+    spec['ingress'] = {**spec.get('ingress', {}), 'host': placeholder('host')}
+    if owner is not None:
+        owner = {**owner, 'name': placeholder('owner'), 'uid': placeholder('uid')}
+    children = _build_children(
+        placeholder('workshop'), placeholder('namespace'), spec, labels, None,
+        owner, wake_service, placement
+    )
+    return {
+        kind: ManifestTemplate(_unstamped(to_manifest(obj)), TEMPLATE_FIELDS)
+        for kind, obj in children.items()
+    }
+
+
+def _render_from_templates(
+    workshop_name: str,
+    namespace: str,
+    spec: Dict[str, Any],
+    labels: Optional[Dict[str, str]],
+    owner: Optional[Dict[str, Any]],
+    wake_service: Optional[Dict[str, str]],
+    placement: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Render from the profile's compiled templates, or ``None`` if unsafe."""
+    ingress_config = spec.get('ingress', {})
+    values = {
+        'workshop': workshop_name,
+        'namespace': namespace,
+        'host': workshop_host(workshop_name, ingress_config),
+        'owner': owner['name'] if owner else '',
+        'uid': owner['uid'] if owner else '',
+    }
+    if not all(json_safe(value) for value in values.values()):
+        return None
+    profile_spec = {field: spec[field] for field in PROFILE_FIELDS if field in spec}
+    if 'host' in ingress_config:
+        # Every workshop has its own host; it is stamped like the name
+        profile_spec['ingress'] = {
+            key: value for key, value in ingress_config.items() if key != 'host'
+        }
+    profile = canonical_json([
+        profile_spec,
+        labels,
+        {k: v for k, v in owner.items() if k not in ('name', 'uid')} if owner
+        else None,
+        {
+            'service': wake_service['service'],
+            'namespace': wake_service['namespace'],
+        } if wake_service else None,
+        placement or None,
+    ])
+    # Text in the spec that looks like a placeholder would be substituted
+    if '@@' in profile:
+        return None
+
+    manifests = {}
+    for kind, template in _compile_profile(profile).items():
+        canonical = template.render_json(values)
+        manifest = json.loads(canonical)
+        manifest['metadata']['annotations'][CONTENT_HASH_ANNOTATION] = (
+            _digest(canonical)
+        )
+        manifests[kind] = manifest
+    return manifests
+
+
+def render_workshop_manifests(
+    workshop_name: str,
+    namespace: str,
+    spec: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    pooled: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None,
+    wake_service: Optional[Dict[str, str]] = None,
+    placement: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Render every child resource of a workshop from its spec.
+
+    Args:
+        workshop_name: Name of the workshop
+        namespace: Kubernetes namespace
+        spec: Workshop spec
+        labels: Extra labels stamped on every child resource
+        pooled: ``status.warmPool`` of a workshop running on a claimed warm
+            pool entry; its Deployment and Service belong to the entry, so
+            only the IngressRoute (routed to the entry's Service) is rendered
+        owner: ownerReference stamped on every child, so deleting the owner
+            cascades to them
+        wake_service: ``status.hibernation`` of a hibernated workshop, naming
+            the operator's wake-up ``service`` and its ``namespace``: the
+            Deployment is scaled to zero and the IngressRoute routed there
+
+    Returns:
+        Mapping of child kind (``pvc``, ``deployment``, ``service``,
+        ``ingress``) to its hash-stamped manifest; ``pvc`` is only present
+        when the spec asks for storage
+    """
+    if not pooled:
+        manifests = _render_from_templates(
+            workshop_name, namespace, spec, labels, owner, wake_service,
+            placement
+        )
+        if manifests is not None:
+            return manifests
+    return render_workshop_manifests_uncompiled(
+        workshop_name, namespace, spec, labels, pooled, owner, wake_service,
+        placement
+    )
+
+
+def render_workshop_manifests_uncompiled(
+    workshop_name: str,
+    namespace: str,
+    spec: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    pooled: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None,
+    wake_service: Optional[Dict[str, str]] = None,
+    placement: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Render a workshop's children through the ``kubernetes.client`` builders.
+
+    Same arguments and result as :func:`render_workshop_manifests`, without
+    compiled templates; used for warm pool claims and as the reference the
+    templates are checked against.
+    """
+    children = _build_children(
+        workshop_name, namespace, spec, labels, pooled, owner, wake_service,
+        placement
+    )
+    return {
+        kind: stamp_content_hash(to_manifest(obj))
+        for kind, obj in children.items()
+    }
@@ -0,0 +1,38 @@
+"""Owner references tying child resources to their Workshop."""
+
+from typing import Any, Dict, Optional
+
+
+# API version of the operator's own custom resources
+API_VERSION = 'orchestra.io/v1'
+
+
+def owner_reference(
+    kind: str,
+    name: str,
+    uid: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Build an ownerReference to an Orchestra resource.
+
+    Children carrying it are removed by the API server's garbage collector
+    when the owner is deleted, so teardown needs no per-child DELETEs.
+
+    Args:
+        kind: Owner kind, ``Workshop`` or ``WorkshopCohort``
+        name: Owner name
+        uid: Owner ``metadata.uid``
+
+    Returns:
+        ownerReference dict, or ``None`` if the uid is not known
+    """
+    if not uid:
+        return None
+    return {
+        'apiVersion': API_VERSION,
+        'kind': kind,
+        'name': name,
+        'uid': uid,
+        'controller': True,
+        'blockOwnerDeletion': True,
+    }
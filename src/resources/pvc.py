@@ -1,13 +1,48 @@
 """PersistentVolumeClaim creation for workshops."""
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 import kubernetes.client as k8s
 
+from resources.snapshot import SNAPSHOT_GROUP
+
+
+def pvc_data_source(
+    storage_config: Dict[str, Any]
+) -> Optional[k8s.V1TypedLocalObjectReference]:
+    """
+    Return what a workshop's claim is populated from, if anything.
+
+    ``sourceSnapshot`` names a VolumeSnapshot to restore and ``sourcePVC`` a
+    claim to clone, both in the workshop's namespace. The CSI driver copies
+    the data when the volume is provisioned, so the RStudio container starts
+    with the course data in place instead of downloading it.
+
+    Args:
+        storage_config: Storage configuration from workshop spec
+
+    Returns:
+        ``dataSource`` of the claim, or ``None`` for an empty volume
+    """
+    if storage_config.get('sourceSnapshot'):
+        return k8s.V1TypedLocalObjectReference(
+            api_group=SNAPSHOT_GROUP,
+            kind='VolumeSnapshot',
+            name=storage_config['sourceSnapshot']
+        )
+    if storage_config.get('sourcePVC'):
+        return k8s.V1TypedLocalObjectReference(
+            kind='PersistentVolumeClaim',
+            name=storage_config['sourcePVC']
+        )
+    return None
+
 
 def create_workshop_pvc(
     workshop_name: str,
     namespace: str,
-    storage_config: Dict[str, Any]
+    storage_config: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None
 ) -> k8s.V1PersistentVolumeClaim:
     """
     Create a PersistentVolumeClaim for workshop data.
@@ -16,6 +51,8 @@ def create_workshop_pvc(
         workshop_name: Name of the workshop
         namespace: Kubernetes namespace
         storage_config: Storage configuration from workshop spec
+        labels: Extra labels for the claim
+        owner: ownerReference to the owning Workshop
         
     Returns:
         V1PersistentVolumeClaim object ready to be created
@@ -31,15 +68,19 @@ def create_workshop_pvc(
             namespace=namespace,
             labels={
                 'app': workshop_name,
-                'component': 'storage'
-            }
+                'component': 'storage',
+                'workshop': workshop_name,
+                **(labels or {})
+            },
+            owner_references=[owner] if owner else None
         ),
         spec=k8s.V1PersistentVolumeClaimSpec(
             access_modes=['ReadWriteOnce'],
             resources=k8s.V1ResourceRequirements(
                 requests={'storage': size}
             ),
-            storage_class_name=storage_class
+            storage_class_name=storage_class,
+            data_source=pvc_data_source(storage_config)
         )
     )
     
@@ -1,15 +1,23 @@
 """Service creation for workshops."""
 
+from typing import Any, Dict, Optional
 import kubernetes.client as k8s
 
 
-def create_workshop_service(workshop_name: str, namespace: str) -> k8s.V1Service:
+def create_workshop_service(
+    workshop_name: str,
+    namespace: str,
+    labels: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None
+) -> k8s.V1Service:
     """
     Create a Kubernetes Service for a workshop.
     
     Args:
         workshop_name: Name of the workshop
         namespace: Kubernetes namespace
+        labels: Extra labels for the Service
+        owner: ownerReference to the owning Workshop
         
     Returns:
         V1Service object ready to be created
@@ -22,8 +30,11 @@ def create_workshop_service(workshop_name: str, namespace: str) -> k8s.V1Service
             namespace=namespace,
             labels={
                 'app': workshop_name,
-                'component': 'rstudio'
-            }
+                'component': 'rstudio',
+                'workshop': workshop_name,
+                **(labels or {})
+            },
+            owner_references=[owner] if owner else None
         ),
         spec=k8s.V1ServiceSpec(
             selector={
@@ -0,0 +1,60 @@
+"""VolumeSnapshots of a course's golden data."""
+
+from typing import Any, Dict, Optional
+
+
+SNAPSHOT_GROUP = 'snapshot.storage.k8s.io'
+SNAPSHOT_VERSION = 'v1'
+SNAPSHOT_PLURAL = 'volumesnapshots'
+
+
+def golden_snapshot_name(cohort_name: str) -> str:
+    """Return the name of a cohort's golden snapshot."""
+    return f"{cohort_name}-golden"
+
+
+def create_golden_snapshot(
+    cohort_name: str,
+    namespace: str,
+    golden_config: Dict[str, Any],
+    labels: Optional[Dict[str, str]] = None,
+    owner: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Create a VolumeSnapshot of the PVC holding a course's prepared data.
+
+    Args:
+        cohort_name: Name of the cohort the snapshot is taken for
+        namespace: Kubernetes namespace of the cohort and the source PVC
+        golden_config: ``storage.golden`` from the cohort template, naming
+            the ``sourcePVC`` and optionally a ``snapshotClass``
+        labels: Extra labels for the snapshot
+        owner: ownerReference to the cohort, so the snapshot is deleted with it
+
+    Returns:
+        VolumeSnapshot manifest as a dictionary ready to be applied
+    """
+    spec: Dict[str, Any] = {
+        'source': {'persistentVolumeClaimName': golden_config['sourcePVC']}
+    }
+    if golden_config.get('snapshotClass'):
+        spec['volumeSnapshotClassName'] = golden_config['snapshotClass']
+
+    metadata: Dict[str, Any] = {
+        'name': golden_snapshot_name(cohort_name),
+        'namespace': namespace,
+        'labels': {
+            'app': cohort_name,
+            'component': 'golden-data',
+            **(labels or {})
+        }
+    }
+    if owner:
+        metadata['ownerReferences'] = [owner]
+
+    return {
+        'apiVersion': f"{SNAPSHOT_GROUP}/{SNAPSHOT_VERSION}",
+        'kind': 'VolumeSnapshot',
+        'metadata': metadata,
+        'spec': spec
+    }
@@ -0,0 +1,81 @@
+"""Precompiled manifest templates.
+
+Building a manifest from ``kubernetes.client`` models and serializing it
+back to a dict costs far more than the few fields that differ between two
+workshops of the same profile. A :class:`ManifestTemplate` is compiled once
+from a manifest rendered with placeholder values. Rendering it stitches the
+real values into the manifest's canonical JSON text, which can be hashed
+and parsed straight away.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+
+# Values that can be pasted into JSON text unescaped
+_JSON_SAFE = re.compile(r'^[^"\\\x00-\x1f]*$')
+
+
+def placeholder(field: str) -> str:
+    """Return the placeholder standing in for ``field`` in a template."""
+    return f"@@{field}@@"
+
+
+def canonical_json(manifest: Mapping[str, Any]) -> str:
+    """Serialize a manifest independently of key order."""
+    return json.dumps(manifest, sort_keys=True, separators=(',', ':'))
+
+
+def json_safe(value: str) -> bool:
+    """Return whether ``value`` can be substituted into a template as is."""
+    return bool(_JSON_SAFE.match(value))
+
+
+class ManifestTemplate:
+    """
+    Canonical JSON of a manifest, split around its placeholders.
+
+    Placeholders may only appear in string values, never in keys, so
+    substituting them keeps the text canonical.
+    """
+
+    __slots__ = ('fields', '_parts', '_slots')
+
+    def __init__(self, manifest: Mapping[str, Any], fields: Sequence[str]) -> None:
+        """
+        Args:
+            manifest: Manifest rendered with :func:`placeholder` values
+            fields: Names of the placeholders to substitute
+        """
+        self.fields = tuple(fields)
+        by_placeholder = {placeholder(field): field for field in self.fields}
+        pattern = re.compile(
+            '(' + '|'.join(re.escape(token) for token in by_placeholder) + ')'
+        )
+        parts: List[str] = pattern.split(canonical_json(manifest))
+        # Odd parts are the captured placeholders
+        self._slots: Tuple[Tuple[int, str], ...] = tuple(
+            (index, by_placeholder[parts[index]])
+            for index in range(1, len(parts), 2)
+        )
+        self._parts = parts
+
+    def render_json(self, values: Mapping[str, str]) -> str:
+        """
+        Render the manifest's canonical JSON.
+
+        Args:
+            values: Value per field; each must pass :func:`json_safe`
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        parts = self._parts.copy()
+        for index, field in self._slots:
+            parts[index] = values[field]
+        return ''.join(parts)
+
+    def render(self, values: Mapping[str, str]) -> Dict[str, Any]:
+        """Render the manifest as a new dict."""
+        return json.loads(self.render_json(values))
@@ -0,0 +1,193 @@
+"""Activity signals used to tell whether a workshop is idle.
+
+Sources report, per workshop, the rate of requests Traefik routed to it and
+the CPU its RStudio container used, both averaged over a recent window. A
+source answers for many workshops at once, so the idle detector makes a
+fixed number of queries per check however many workshops there are.
+"""
+
+import abc
+import asyncio
+import json
+import logging
+import urllib.parse
+import urllib.request
+from typing import Collection, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from utils.config import env_str
+
+
+logger = logging.getLogger(__name__)
+
+# (namespace, workshop name its child resources are labelled with)
+WorkshopKey = Tuple[str, str]
+
+DEFAULT_WINDOW = '5m'
+
+
+def prometheus_query(url: str, query: str, timeout: float) -> List[Dict]:
+    """
+    Run an instant PromQL query and return its result vector.
+
+    Blocks; call it from a worker thread.
+
+    Raises:
+        RuntimeError: If Prometheus reports the query failed
+    """
+    params = urllib.parse.urlencode({'query': query})
+    with urllib.request.urlopen(
+        f"{url}/api/v1/query?{params}", timeout=timeout
+    ) as response:
+        body = json.load(response)
+    if body.get('status') != 'success':
+        raise RuntimeError(f"Prometheus query failed: {body.get('error')}")
+    return body['data']['result']
+
+
+def pod_workshop(pod: str) -> Optional[str]:
+    """Return the workshop an RStudio pod belongs to, from the pod's name."""
+    # Pods are named <workshop>-deployment-<template hash>-<suffix>
+    deployment = pod.rsplit('-', 2)[0]
+    if not deployment.endswith('-deployment'):
+        return None
+    return deployment.removesuffix('-deployment')
+
+
+class Activity(NamedTuple):
+    """Recent activity of one workshop; ``None`` where a signal is unknown."""
+
+    requests_per_second: Optional[float] = None
+    cpu_cores: Optional[float] = None
+
+
+class ActivitySource(abc.ABC):
+    """Where workshop activity is read from."""
+
+    @abc.abstractmethod
+    async def activity(
+        self,
+        workshops: Collection[WorkshopKey]
+    ) -> Dict[WorkshopKey, Activity]:
+        """
+        Return the recent activity of each workshop.
+
+        Args:
+            workshops: Workshops to report on
+
+        Returns:
+            Activity per workshop; workshops the source knows nothing about
+            may be left out
+        """
+
+
+class StaticActivitySource(ActivitySource):
+    """Activity from an in-memory table, for benchmarks and local runs."""
+
+    def __init__(
+        self,
+        activity: Optional[Mapping[WorkshopKey, Activity]] = None
+    ) -> None:
+        self.table: Dict[WorkshopKey, Activity] = dict(activity or {})
+
+    def set(self, workshop: WorkshopKey, activity: Activity) -> None:
+        """Set the activity reported for ``workshop``."""
+        self.table[workshop] = activity
+
+    async def activity(
+        self,
+        workshops: Collection[WorkshopKey]
+    ) -> Dict[WorkshopKey, Activity]:
+        return {key: self.table[key] for key in workshops if key in self.table}
+
+
+class PrometheusActivitySource(ActivitySource):
+    """
+    Activity from Prometheus: Traefik's request counters and cAdvisor's CPU.
+
+    Two instant queries cover every workshop: the per-service request rate
+    (Traefik names a workshop's service ``<namespace>-<workshop>-service-80``)
+    and the per-pod CPU rate of ``rstudio`` containers.
+    """
+
+    REQUESTS_QUERY = (
+        'sum by (service) (rate(traefik_service_requests_total'
+        '{{service=~".+-service-80@kubernetescrd"}}[{window}]))'
+    )
+    CPU_QUERY = (
+        'sum by (namespace, pod) (rate(container_cpu_usage_seconds_total'
+        '{{container="rstudio"}}[{window}]))'
+    )
+
+    def __init__(
+        self,
+        url: str,
+        window: str = DEFAULT_WINDOW,
+        timeout: float = 10.0
+    ) -> None:
+        """
+        Args:
+            url: Prometheus base URL, e.g. ``http://prometheus:9090``
+            window: Range the rates are averaged over, in PromQL syntax
+            timeout: Seconds to wait for each query
+        """
+        self.url = url.rstrip('/')
+        self.window = window
+        self.timeout = timeout
+
+    def _query(self, query: str) -> List[Dict]:
+        """Run an instant query and return its result vector."""
+        return prometheus_query(self.url, query, self.timeout)
+
+    async def activity(
+        self,
+        workshops: Collection[WorkshopKey]
+    ) -> Dict[WorkshopKey, Activity]:
+        requests, cpu = await asyncio.gather(
+            asyncio.to_thread(
+                self._query, self.REQUESTS_QUERY.format(window=self.window)
+            ),
+            asyncio.to_thread(
+                self._query, self.CPU_QUERY.format(window=self.window)
+            ),
+        )
+        request_rates = {
+            sample['metric'].get('service', ''): float(sample['value'][1])
+            for sample in requests
+        }
+        cpu_rates: Dict[WorkshopKey, float] = {}
+        for sample in cpu:
+            metric = sample['metric']
+            workshop = pod_workshop(metric.get('pod', ''))
+            if workshop is None:
+                continue
+            key = (metric.get('namespace', ''), workshop)
+            cpu_rates[key] = cpu_rates.get(key, 0.0) + float(sample['value'][1])
+
+        # A service Traefik has no counter for has not been sent any requests
+        return {
+            (namespace, name): Activity(
+                request_rates.get(
+                    f"{namespace}-{name}-service-80@kubernetescrd", 0.0
+                ),
+                cpu_rates.get((namespace, name)),
+            )
+            for namespace, name in workshops
+        }
+
+
+def activity_source_from_env() -> Optional[ActivitySource]:
+    """
+    Build the activity source configured in the environment.
+
+    - ``ORCHESTRA_ACTIVITY_PROMETHEUS_URL``: Prometheus to query
+    - ``ORCHESTRA_ACTIVITY_WINDOW``: averaging window (default ``5m``)
+
+    Returns:
+        The source, or ``None`` if none is configured
+    """
+    url = env_str('ORCHESTRA_ACTIVITY_PROMETHEUS_URL')
+    if not url:
+        return None
+    return PrometheusActivitySource(
+        url, env_str('ORCHESTRA_ACTIVITY_WINDOW', DEFAULT_WINDOW)
+    )
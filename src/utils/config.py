@@ -0,0 +1,119 @@
+"""Environment-based configuration helpers for the Orchestra Operator."""
+
+import os
+from typing import Any, Optional
+
+import yaml
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Read a string setting from the environment.
+
+    Args:
+        name: Environment variable name
+        default: Value returned when the variable is unset or empty
+
+    Returns:
+        The configured value or the default
+    """
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return value.strip()
+
+
+def env_int(name: str, default: int) -> int:
+    """
+    Read an integer setting from the environment.
+
+    Args:
+        name: Environment variable name
+        default: Value returned when the variable is unset or empty
+
+    Returns:
+        The configured integer
+
+    Raises:
+        ValueError: If the variable is set but is not an integer
+    """
+    value = env_str(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+
+
+def env_float(name: str, default: float) -> float:
+    """
+    Read a float setting from the environment.
+
+    Args:
+        name: Environment variable name
+        default: Value returned when the variable is unset or empty
+
+    Returns:
+        The configured float
+
+    Raises:
+        ValueError: If the variable is set but is not a number
+    """
+    value = env_str(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}") from None
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """
+    Read a boolean setting from the environment.
+
+    Accepts 1/0, true/false, yes/no and on/off (case-insensitive).
+
+    Args:
+        name: Environment variable name
+        default: Value returned when the variable is unset or empty
+
+    Returns:
+        The configured boolean
+
+    Raises:
+        ValueError: If the variable is set to an unrecognised value
+    """
+    value = env_str(name)
+    if value is None:
+        return default
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes', 'on'):
+        return True
+    if lowered in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"{name} must be a boolean, got {value!r}")
+
+
+def env_yaml(name: str, default: Any = None) -> Any:
+    """
+    Read a structured setting written as YAML (or JSON) from the environment.
+
+    Args:
+        name: Environment variable name
+        default: Value returned when the variable is unset or empty
+
+    Returns:
+        The parsed document
+
+    Raises:
+        ValueError: If the variable is set but is not valid YAML
+    """
+    value = env_str(name)
+    if value is None:
+        return default
+    try:
+        return yaml.safe_load(value)
+    except yaml.YAMLError as e:
+        raise ValueError(f"{name} must be valid YAML: {e}") from e
@@ -0,0 +1,621 @@
+"""Kubernetes client utilities for the Orchestra Operator.
+
+The ``kubernetes`` client is synchronous, while Kopf runs every handler on a
+single asyncio event loop. Calling the client directly from an ``async def``
+handler blocks the loop for the whole API round trip, so every other workshop
+waits behind it. The :class:`ApiGateway` runs those calls on a bounded thread
+pool instead and hands back awaitables, so handlers stay non-blocking.
+
+All API objects share one ``ApiClient`` held by the :class:`ClientRegistry`,
+so connections to the API server are pooled and reused across events instead
+of being opened (and TLS-negotiated) per handler invocation.
+"""
+
+import asyncio
+import functools
+import logging
+import socket
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import kubernetes.client as k8s_client
+from kubernetes.client.rest import ApiException
+from urllib3.connection import HTTPConnection
+
+from utils.config import env_float, env_int
+from utils.metrics import (
+    API_CALL_DURATION,
+    API_CALL_ERRORS,
+    API_QUEUE_WAIT,
+    API_THROTTLED,
+)
+from utils.ratelimit import (
+    DEFAULT_RETRY_AFTER,
+    MAX_RETRY_AFTER,
+    WriteScheduler,
+    parse_retry_after,
+    write_priority,
+)
+from utils.tracing import SPAN_KIND_CLIENT, Span, span
+
+
+logger = logging.getLogger(__name__)
+
+# Enough threads for every Kopf worker (worker_limit = 20) to have a couple of
+# API calls in flight at once.
+DEFAULT_MAX_WORKERS = 32
+
+# Seconds a pooled connection may sit idle before TCP keep-alive probes start.
+DEFAULT_KEEPALIVE_IDLE = 30
+
+# Field manager recorded by the API server for server-side applies
+FIELD_MANAGER = 'orchestra-operator'
+
+# API writes admitted per second, and back to back after an idle period
+DEFAULT_WRITE_RATE = 50.0
+DEFAULT_WRITE_BURST = 100
+
+# Times a call rejected with 429 Too Many Requests is retried
+DEFAULT_MAX_RETRIES = 5
+
+
+def keepalive_socket_options(idle: int) -> List[Tuple[int, int, int]]:
+    """
+    Build urllib3 socket options that enable TCP keep-alive.
+
+    Args:
+        idle: Seconds of inactivity before the first keep-alive probe
+
+    Returns:
+        Socket options including urllib3's defaults (TCP_NODELAY)
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # The fine-grained knobs are Linux-specific; skip them elsewhere
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(idle // 3, 1)))
+    if hasattr(socket, 'TCP_KEEPCNT'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3))
+    return options
+
+
+class ClientRegistry:
+    """
+    Process-wide set of Kubernetes API objects sharing one connection pool.
+
+    Building ``AppsV1Api()`` and friends without arguments gives each one a
+    private ``ApiClient`` and urllib3 pool. The registry builds a single
+    ``ApiClient`` up front and hands the same API objects to every caller.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_MAX_WORKERS,
+        keepalive_idle: int = DEFAULT_KEEPALIVE_IDLE,
+        configuration: Optional[k8s_client.Configuration] = None,
+    ) -> None:
+        """
+        Args:
+            pool_size: Maximum pooled connections to the API server; should be
+                at least the gateway's worker count, otherwise connections are
+                discarded and re-opened under load
+            keepalive_idle: TCP keep-alive idle time in seconds (0 disables)
+            configuration: Client configuration (defaults to the one loaded
+                by ``kubernetes.config``)
+        """
+        if configuration is None:
+            configuration = k8s_client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = pool_size
+
+        self.pool_size = pool_size
+        self.keepalive_idle = keepalive_idle
+        self.api_client = k8s_client.ApiClient(configuration)
+
+        if keepalive_idle > 0:
+            # Only affects pools created from here on, which is all of them
+            # since nothing has connected yet.
+            pool_manager = self.api_client.rest_client.pool_manager
+            pool_manager.connection_pool_kw['socket_options'] = (
+                keepalive_socket_options(keepalive_idle)
+            )
+
+        self.apps = k8s_client.AppsV1Api(self.api_client)
+        self.core = k8s_client.CoreV1Api(self.api_client)
+        self.custom = k8s_client.CustomObjectsApi(self.api_client)
+        self.apply = ApplyApi(self.api_client)
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Summarise connection reuse across the shared pool.
+
+        Returns:
+            Dict with ``opened`` (new connections), ``reused`` (requests
+            served on an already-open connection) and ``requests`` totals
+        """
+        opened = requests = 0
+        pools = self.api_client.rest_client.pool_manager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            requests += pool.num_requests
+        return {
+            'opened': opened,
+            'reused': max(requests - opened, 0),
+            'requests': requests,
+        }
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self.api_client.close()
+
+
+class ApplyApi:
+    """
+    Server-side apply for the namespaced objects the operator owns.
+
+    The generated ``patch_*`` methods always send a JSON or merge patch
+    content type, so apply requests go through ``ApiClient.call_api`` with
+    ``application/apply-patch+yaml`` instead. Method names mirror the
+    generated client (``apply_namespaced_deployment`` and so on).
+    """
+
+    def __init__(
+        self,
+        api_client: k8s_client.ApiClient,
+        field_manager: str = FIELD_MANAGER
+    ) -> None:
+        self.api_client = api_client
+        self.field_manager = field_manager
+
+    def _apply(
+        self,
+        path: str,
+        namespace: str,
+        name: str,
+        body: Dict[str, Any],
+        force: bool = True,
+        _request_timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply ``body`` at ``path``, taking ownership of conflicting fields.
+
+        Args:
+            path: Resource path with ``{namespace}`` and ``{name}`` placeholders
+            namespace: Kubernetes namespace
+            name: Object name
+            body: Full manifest of the fields the operator manages
+            force: Take over fields owned by other managers
+            _request_timeout: Request timeout in seconds
+
+        Returns:
+            The object as stored by the API server
+        """
+        query_params = [('fieldManager', self.field_manager)]
+        if force:
+            query_params.append(('force', 'true'))
+        return self.api_client.call_api(
+            path,
+            'PATCH',
+            path_params={'namespace': namespace, 'name': name},
+            query_params=query_params,
+            header_params={
+                'Accept': 'application/json',
+                'Content-Type': 'application/apply-patch+yaml',
+            },
+            body=body,
+            response_type='object',
+            auth_settings=['BearerToken'],
+            _return_http_data_only=True,
+            _request_timeout=_request_timeout,
+        )
+
+    def apply_namespaced_deployment(
+        self, name: str, namespace: str, body: Dict[str, Any], **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Server-side apply a Deployment."""
+        return self._apply(
+            '/apis/apps/v1/namespaces/{namespace}/deployments/{name}',
+            namespace, name, body, **kwargs
+        )
+
+    def apply_namespaced_service(
+        self, name: str, namespace: str, body: Dict[str, Any], **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Server-side apply a Service."""
+        return self._apply(
+            '/api/v1/namespaces/{namespace}/services/{name}',
+            namespace, name, body, **kwargs
+        )
+
+    def apply_namespaced_persistent_volume_claim(
+        self, name: str, namespace: str, body: Dict[str, Any], **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Server-side apply a PersistentVolumeClaim."""
+        return self._apply(
+            '/api/v1/namespaces/{namespace}/persistentvolumeclaims/{name}',
+            namespace, name, body, **kwargs
+        )
+
+    def apply_namespaced_custom_object(
+        self,
+        group: str,
+        version: str,
+        namespace: str,
+        plural: str,
+        name: str,
+        body: Dict[str, Any],
+        **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Server-side apply a namespaced custom object."""
+        return self._apply(
+            f"/apis/{group}/{version}/namespaces/{{namespace}}/{plural}/{{name}}",
+            namespace, name, body, **kwargs
+        )
+
+
+_registry: Optional[ClientRegistry] = None
+
+
+def init_client_registry(**kwargs: Any) -> ClientRegistry:
+    """
+    Create the process-wide client registry, replacing any existing one.
+
+    Must run after the Kubernetes configuration has been loaded. Defaults come
+    from the environment:
+
+    - ``ORCHESTRA_API_POOL_SIZE``: pooled connections (defaults to
+      ``ORCHESTRA_API_WORKERS``)
+    - ``ORCHESTRA_API_KEEPALIVE``: TCP keep-alive idle seconds (default 30,
+      0 disables it)
+
+    Args:
+        **kwargs: Overrides passed straight to :class:`ClientRegistry`
+
+    Returns:
+        The new registry
+    """
+    global _registry
+
+    if 'pool_size' not in kwargs:
+        workers = env_int('ORCHESTRA_API_WORKERS', DEFAULT_MAX_WORKERS)
+        kwargs['pool_size'] = env_int('ORCHESTRA_API_POOL_SIZE', workers)
+    if 'keepalive_idle' not in kwargs:
+        kwargs['keepalive_idle'] = env_int(
+            'ORCHESTRA_API_KEEPALIVE', DEFAULT_KEEPALIVE_IDLE
+        )
+
+    if _registry is not None:
+        _registry.close()
+    _registry = ClientRegistry(**kwargs)
+    logger.info(
+        f"Kubernetes client pool ready with {_registry.pool_size} connections"
+    )
+    return _registry
+
+
+def get_client_registry() -> ClientRegistry:
+    """Return the process-wide client registry, creating it on first use."""
+    if _registry is None:
+        return init_client_registry()
+    return _registry
+
+
+def close_client_registry() -> None:
+    """Close the process-wide client registry, logging its connection reuse."""
+    global _registry
+
+    if _registry is not None:
+        stats = _registry.connection_stats()
+        logger.info(
+            f"Closing Kubernetes client pool: {stats['opened']} connections "
+            f"opened, {stats['reused']} requests reused a connection"
+        )
+        _registry.close()
+        _registry = None
+
+
+def api_call_labels(method_name: str, kwargs: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Derive the ``verb`` and ``resource`` metric labels of an API method call.
+
+    ``create_namespaced_deployment`` gives ``('create', 'deployment')`` and
+    ``delete_collection_namespaced_service`` gives
+    ``('deletecollection', 'service')``; custom object calls are labelled
+    with their ``plural`` instead.
+    """
+    verb, _, rest = method_name.partition('_')
+    if verb == 'delete' and rest.startswith('collection_'):
+        verb, rest = 'deletecollection', rest[len('collection_'):]
+    if 'plural' in kwargs:
+        return verb, kwargs['plural']
+    for prefix in ('namespaced_', 'cluster_'):
+        if rest.startswith(prefix):
+            rest = rest[len(prefix):]
+    rest = rest.removesuffix('_for_all_namespaces')
+    return verb, rest or method_name
+
+
+def throttled_retry_delay(error: BaseException) -> Optional[float]:
+    """
+    Return when to retry if ``error`` was caused by API server throttling.
+
+    Follows the ``__cause__`` chain, so a ``ProvisioningError`` wrapping a
+    429 counts too.
+
+    Returns:
+        Seconds to wait, or ``None`` if the error was not a 429
+    """
+    while error is not None:
+        if isinstance(error, ApiException) and error.status == 429:
+            return parse_retry_after(error.headers) or DEFAULT_RETRY_AFTER
+        error = error.__cause__
+    return None
+
+
+class AsyncApi:
+    """
+    Awaitable facade over a blocking ``kubernetes.client`` API object.
+
+    Attribute access returns a coroutine function with the same signature as
+    the wrapped method, e.g. ``await api.create_namespaced_service(...)``.
+    Calls go through :meth:`ApiGateway.request`.
+    """
+
+    def __init__(self, api: Any, gateway: 'ApiGateway') -> None:
+        self._api = api
+        self._gateway = gateway
+
+    def __getattr__(self, method_name: str) -> Callable[..., Any]:
+        method = getattr(self._api, method_name)
+
+        @functools.wraps(method)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self._gateway.request(method_name, method, *args, **kwargs)
+
+        return call
+
+
+class ApiGateway:
+    """
+    Runs blocking Kubernetes API calls off the event loop.
+
+    Calls are submitted to a bounded executor, so at most ``max_workers``
+    requests are in flight against the API server at any time; further calls
+    queue in the executor instead of blocking the loop. Writes additionally
+    pass through an optional :class:`WriteScheduler`, and calls rejected with
+    429 are retried after the server's ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        request_timeout: Optional[float] = None,
+        apps: Any = None,
+        core: Any = None,
+        custom: Any = None,
+        apply: Any = None,
+        executor: Optional[Executor] = None,
+        write_limiter: Optional[WriteScheduler] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        """
+        Args:
+            max_workers: Size of the thread pool used for API calls
+            request_timeout: Default ``_request_timeout`` (seconds) applied to
+                calls that do not set one
+            apps: AppsV1Api-compatible object (defaults to the registry's)
+            core: CoreV1Api-compatible object (defaults to the registry's)
+            custom: CustomObjectsApi-compatible object (defaults to the
+                registry's)
+            apply: :class:`ApplyApi`-compatible object (defaults to the
+                registry's)
+            executor: Executor to run calls on instead of a private pool
+            write_limiter: Rate limiter admitting writes by priority (no
+                client-side limit if omitted)
+            max_retries: Times a call rejected with 429 is retried before the
+                ``ApiException`` is raised
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.write_limiter = write_limiter
+        self.max_retries = max_retries
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='k8s-api'
+        )
+
+        if apps is None or core is None or custom is None or apply is None:
+            registry = get_client_registry()
+            apps = apps if apps is not None else registry.apps
+            core = core if core is not None else registry.core
+            custom = custom if custom is not None else registry.custom
+            apply = apply if apply is not None else registry.apply
+
+        self.apps = AsyncApi(apps, self)
+        self.core = AsyncApi(core, self)
+        self.custom = AsyncApi(custom, self)
+        self.apply = AsyncApi(apply, self)
+
+    async def request(
+        self,
+        method_name: str,
+        func: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Make an API call, rate limited and retried on 429.
+
+        Writes wait for the write limiter first; deletes are admitted ahead
+        of updates and creates. A 429 pauses all writes (or just this call,
+        for reads) for the ``Retry-After`` period and retries, up to
+        ``max_retries`` times. Latency and failures are recorded per verb
+        and resource, and the call, retries included, as a client span.
+
+        Args:
+            method_name: API method name, e.g. ``create_namespaced_service``
+            func: The blocking method to call
+            *args: Positional arguments for ``func``
+            **kwargs: Keyword arguments for ``func``
+        """
+        verb, resource = api_call_labels(method_name, kwargs)
+        with span(
+            f"k8s.{verb}", kind=SPAN_KIND_CLIENT,
+            **{'k8s.verb': verb, 'k8s.resource': resource}
+        ) as current:
+            return await self._request(
+                verb, resource, current, func, *args, **kwargs
+            )
+
+    async def _request(
+        self,
+        verb: str,
+        resource: str,
+        current: Optional[Span],
+        func: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any
+    ) -> Any:
+        priority = write_priority(verb)
+        limiter = self.write_limiter if priority is not None else None
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire(priority)
+            start = time.perf_counter()
+            try:
+                return await self.run(func, *args, **kwargs)
+            except ApiException as e:
+                API_CALL_ERRORS.labels(verb, resource, str(e.status)).inc()
+                if current is not None:
+                    current.set('http.status_code', e.status)
+                if e.status != 429 or attempt >= self.max_retries:
+                    raise
+                delay = parse_retry_after(e.headers) or min(
+                    DEFAULT_RETRY_AFTER * 2 ** attempt, MAX_RETRY_AFTER
+                )
+            except Exception:
+                API_CALL_ERRORS.labels(verb, resource, 'error').inc()
+                raise
+            finally:
+                API_CALL_DURATION.labels(verb, resource).observe(
+                    time.perf_counter() - start
+                )
+
+            attempt += 1
+            API_THROTTLED.labels(verb, resource).inc()
+            if current is not None:
+                current.set('k8s.retries', attempt)
+            logger.warning(
+                f"API server throttled {verb} {resource}, retry {attempt} "
+                f"in {delay:.1f}s"
+            )
+            if limiter is not None:
+                limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking API call on the gateway executor.
+
+        Args:
+            func: Blocking callable, usually a ``kubernetes.client`` API method
+            *args: Positional arguments for ``func``
+            **kwargs: Keyword arguments for ``func``
+
+        Returns:
+            Whatever ``func`` returns; exceptions such as ``ApiException``
+            propagate to the awaiting handler unchanged
+        """
+        if self.request_timeout is not None:
+            kwargs.setdefault('_request_timeout', self.request_timeout)
+        submitted = time.perf_counter()
+
+        def timed_call() -> Any:
+            API_QUEUE_WAIT.observe(time.perf_counter() - submitted)
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, timed_call)
+
+    def shutdown(self) -> None:
+        """Stop the executor, waiting for in-flight calls to finish."""
+        if self.write_limiter is not None:
+            self.write_limiter.close()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+
+_gateway: Optional[ApiGateway] = None
+
+
+def configure_gateway(**kwargs: Any) -> ApiGateway:
+    """
+    Create the process-wide API gateway, replacing any existing one.
+
+    Sizing defaults come from the environment:
+
+    - ``ORCHESTRA_API_WORKERS``: executor threads (default 32)
+    - ``ORCHESTRA_API_TIMEOUT``: per-request timeout in seconds (default 30,
+      0 disables it)
+    - ``ORCHESTRA_API_WRITE_QPS``: writes admitted per second (default 50,
+      0 disables client-side write limiting)
+    - ``ORCHESTRA_API_WRITE_BURST``: writes admitted back to back (default
+      100)
+    - ``ORCHESTRA_API_MAX_RETRIES``: retries of a call rejected with 429
+      (default 5)
+
+    Args:
+        **kwargs: Overrides passed straight to :class:`ApiGateway`
+
+    Returns:
+        The new gateway
+    """
+    global _gateway
+
+    if 'max_workers' not in kwargs:
+        kwargs['max_workers'] = env_int('ORCHESTRA_API_WORKERS', DEFAULT_MAX_WORKERS)
+    if 'request_timeout' not in kwargs:
+        timeout = env_float('ORCHESTRA_API_TIMEOUT', 30.0)
+        kwargs['request_timeout'] = timeout if timeout > 0 else None
+    if 'write_limiter' not in kwargs:
+        rate = env_float('ORCHESTRA_API_WRITE_QPS', DEFAULT_WRITE_RATE)
+        burst = env_int('ORCHESTRA_API_WRITE_BURST', DEFAULT_WRITE_BURST)
+        kwargs['write_limiter'] = WriteScheduler(rate, burst) if rate > 0 else None
+    if 'max_retries' not in kwargs:
+        kwargs['max_retries'] = env_int(
+            'ORCHESTRA_API_MAX_RETRIES', DEFAULT_MAX_RETRIES
+        )
+
+    if _gateway is not None:
+        _gateway.shutdown()
+    _gateway = ApiGateway(**kwargs)
+    logger.info(
+        f"Kubernetes API gateway ready with {_gateway.max_workers} workers"
+    )
+    return _gateway
+
+
+def get_gateway() -> ApiGateway:
+    """Return the process-wide API gateway, creating it on first use."""
+    if _gateway is None:
+        return configure_gateway()
+    return _gateway
+
+
+def shutdown_gateway() -> None:
+    """Shut down the process-wide API gateway, if one was created."""
+    global _gateway
+
+    if _gateway is not None:
+        _gateway.shutdown()
+        _gateway = None
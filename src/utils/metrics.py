@@ -0,0 +1,283 @@
+"""Prometheus metrics for the Orchestra Operator."""
+
+import functools
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, TypeVar
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import kopf
+from prometheus_client import Counter, Gauge, Histogram, make_wsgi_app
+from prometheus_client.exposition import ThreadingWSGIServer
+
+from utils.config import env_int
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_PORT = 8080
+
+F = TypeVar('F', bound=Callable[..., Awaitable[Any]])
+WsgiApp = Callable[..., Iterable[bytes]]
+
+# Set once the operator has warmed up; /readyz fails until then
+_ready = threading.Event()
+
+CHILD_CACHE_LOOKUPS = Counter(
+    'orchestra_child_cache_lookups_total',
+    'Child resource lookups answered from the local watch cache',
+    ['kind', 'result'],
+)
+
+API_CALLS_AVOIDED = Counter(
+    'orchestra_api_calls_avoided_total',
+    'Kubernetes API calls skipped because the watch cache already had the answer',
+    ['verb', 'kind'],
+)
+
+WORKSHOP_TIME_TO_READY = Histogram(
+    'orchestra_workshop_time_to_ready_seconds',
+    'Time from Workshop creation until its RStudio pod first passed readiness',
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600, 900),
+)
+
+WARM_POOL_CLAIMS = Counter(
+    'orchestra_warm_pool_claims_total',
+    'Workshop creations served from the warm pool (hit) or provisioned cold (miss)',
+    ['result'],
+)
+
+WARM_POOL_IDLE = Gauge(
+    'orchestra_warm_pool_idle_entries',
+    'Idle warm pool entries per pool profile',
+    ['profile'],
+)
+
+PREPULL_IMAGES = Gauge(
+    'orchestra_prepull_daemonsets',
+    'Images currently pre-pulled onto every node by a DaemonSet',
+)
+
+ORPHANS_SWEPT = Counter(
+    'orchestra_orphans_swept_total',
+    'Workshop child resources deleted by the orphan sweeper',
+    ['kind'],
+)
+
+HIBERNATION_TRANSITIONS = Counter(
+    'orchestra_hibernation_transitions_total',
+    'Workshops scaled to zero after idling, or woken again',
+    ['transition'],
+)
+
+WORKSHOP_WAKE_DURATION = Histogram(
+    'orchestra_workshop_wake_seconds',
+    'Time from a request reaching a hibernated workshop until it is routed back',
+    buckets=(1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300),
+)
+
+HANDLER_DURATION = Histogram(
+    'orchestra_handler_duration_seconds',
+    'Wall-clock time spent in each operator handler',
+    ['handler', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+HANDLERS_IN_FLIGHT = Gauge(
+    'orchestra_handlers_in_flight',
+    'Operator handlers currently running',
+    ['handler'],
+)
+
+HANDLER_WORKER_LIMIT = Gauge(
+    'orchestra_handler_worker_limit',
+    'Kopf worker limit (settings.batching.worker_limit) handlers run under',
+)
+
+API_CALL_DURATION = Histogram(
+    'orchestra_api_call_duration_seconds',
+    'Kubernetes API call latency, including time queued for a gateway worker',
+    ['verb', 'resource'],
+)
+
+API_CALL_ERRORS = Counter(
+    'orchestra_api_call_errors_total',
+    'Kubernetes API calls that raised, by HTTP status code',
+    ['verb', 'resource', 'code'],
+)
+
+API_QUEUE_WAIT = Histogram(
+    'orchestra_api_queue_wait_seconds',
+    'Time API calls waited for a free gateway worker thread',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+API_WRITE_QUEUE = Gauge(
+    'orchestra_api_write_queue',
+    'API writes waiting for a rate-limit token, by priority class',
+    ['priority'],
+)
+
+API_WRITE_WAIT = Histogram(
+    'orchestra_api_write_wait_seconds',
+    'Time API writes waited for a rate-limit token, by priority class',
+    ['priority'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+API_THROTTLED = Counter(
+    'orchestra_api_throttled_total',
+    'API calls the server rejected with 429 Too Many Requests',
+    ['verb', 'resource'],
+)
+
+ADMISSION_QUEUE_LENGTH = Gauge(
+    'orchestra_admission_queue_length',
+    'Workshops held Pending until the cluster has capacity for them',
+)
+
+CLUSTER_CAPACITY = Gauge(
+    'orchestra_cluster_capacity',
+    'Node allocatable and workshop reservations (CPU in cores, memory in bytes)',
+    ['resource', 'state'],
+)
+
+PLACEMENT_POOL_CAPACITY = Gauge(
+    'orchestra_placement_pool_capacity',
+    'Node allocatable and placed requests per node pool '
+    '(CPU in cores, memory in bytes)',
+    ['pool', 'resource', 'state'],
+)
+
+PLACEMENTS = Counter(
+    'orchestra_placements_total',
+    'Workshops and cohorts placed, by whether a node pool had room',
+    ['result'],
+)
+
+RIGHTSIZING_SAMPLES = Counter(
+    'orchestra_rightsizing_samples_total',
+    'RStudio pod usage samples taken for rightsizing',
+)
+
+RIGHTSIZING_RECOMMENDATION = Gauge(
+    'orchestra_rightsizing_recommendation',
+    'Recommended request per image (CPU in cores, memory in bytes)',
+    ['image', 'resource'],
+)
+
+WORKSHOPS_BY_PHASE = Gauge(
+    'orchestra_workshops',
+    'Workshops currently in each phase',
+    ['phase'],
+)
+
+STARTUP_SECONDS = Gauge(
+    'orchestra_startup_seconds',
+    'Seconds from operator start to the end of each startup stage '
+    '(warm_up: ready to serve; resync: every existing workshop reconciled)',
+    ['stage'],
+)
+
+STATUS_WRITES = Counter(
+    'orchestra_status_writes_total',
+    'Workshop status updates, by whether they were written, merged into '
+    'another pending write or dropped as no-ops',
+    ['result'],
+)
+
+
+def timed_handler(name: str) -> Callable[[F], F]:
+    """
+    Decorate an async handler to record its duration and concurrency.
+
+    Apply it below the Kopf decorators, so Kopf registers the wrapped
+    function. Raised exceptions propagate unchanged and are recorded with
+    outcome ``retry`` (``kopf.TemporaryError``) or ``error``.
+
+    Args:
+        name: Value of the ``handler`` label
+    """
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            in_flight = HANDLERS_IN_FLIGHT.labels(name)
+            in_flight.inc()
+            outcome = 'success'
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except kopf.TemporaryError:
+                outcome = 'retry'
+                raise
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                in_flight.dec()
+                HANDLER_DURATION.labels(name, outcome).observe(
+                    time.perf_counter() - start
+                )
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def set_ready(ready: bool = True) -> None:
+    """Report the operator ready (or not) on ``/readyz``."""
+    if ready:
+        _ready.set()
+    else:
+        _ready.clear()
+
+
+class _QuietHandler(WSGIRequestHandler):
+    """Request handler that does not log every probe and scrape."""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def _health_app(metrics: WsgiApp) -> WsgiApp:
+    """Wrap the metrics app with ``/healthz`` and ``/readyz``."""
+    def app(
+        environ: Dict[str, Any],
+        start_response: Callable[..., Any]
+    ) -> Iterable[bytes]:
+        path = environ.get('PATH_INFO')
+        if path == '/healthz':
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok\n']
+        if path == '/readyz':
+            if _ready.is_set():
+                start_response('200 OK', [('Content-Type', 'text/plain')])
+                return [b'ok\n']
+            start_response(
+                '503 Service Unavailable', [('Content-Type', 'text/plain')]
+            )
+            return [b'warming up\n']
+        return metrics(environ, start_response)
+
+    return app
+
+
+def start_metrics_server() -> None:
+    """
+    Serve ``/metrics``, ``/healthz`` and ``/readyz`` on
+    ``ORCHESTRA_METRICS_PORT`` (default 8080).
+
+    ``/readyz`` answers 503 until :func:`set_ready` is called. A port of 0
+    disables the endpoint.
+    """
+    port = env_int('ORCHESTRA_METRICS_PORT', DEFAULT_METRICS_PORT)
+    if port <= 0:
+        logger.info("Metrics endpoint disabled")
+        return
+    server = make_server(
+        '0.0.0.0', port, _health_app(make_wsgi_app()), ThreadingWSGIServer,
+        handler_class=_QuietHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on port {port}")
@@ -0,0 +1,130 @@
+"""Pacing for the resync that follows an operator restart.
+
+After a restart Kopf replays every Workshop at once: each owned workshop's
+resume handler reconciles it, and every expiry that passed while the
+operator was down comes due together. A :class:`ResyncPacer` spreads that
+work out at a fixed rate. Work that needs the API server reserves the next
+free slot, ``1 / rate`` seconds after the previous one plus random jitter,
+so replicas restarted together do not stay in lockstep. Pacing ends once
+every workshop counted at startup has resumed, or after twice the time the
+resync should take.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Hashable, Iterable, Optional, Set
+
+from utils.metrics import STARTUP_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds pacing may outlast the expected resync, for workshops that never
+# resume here (deleted, or moved to another replica's shard)
+GRACE_PERIOD = 60.0
+
+
+class ResyncPacer:
+    """Hands out evenly spaced, jittered slots until the startup resync is done."""
+
+    def __init__(
+        self,
+        keys: Iterable[Hashable],
+        rate: float,
+        clock: Callable[[], float] = time.time,
+        seed: Optional[int] = None
+    ) -> None:
+        """
+        Args:
+            keys: Workshops expected to resume, as ``(namespace, name)``
+            rate: Paced operations per second
+            clock: Returns the current time in epoch seconds
+            seed: Seed for the jitter
+        """
+        self.interval = 1.0 / rate
+        self.clock = clock
+        self.started = clock()
+        self.remaining: Set[Hashable] = set(keys)
+        self.expected = len(self.remaining)
+        self.ends = self.started + 2 * self.expected * self.interval + GRACE_PERIOD
+        self._next = self.started
+        self._random = random.Random(seed)
+
+    @property
+    def active(self) -> bool:
+        """Whether the startup resync is still being paced."""
+        return bool(self.remaining) and self.clock() < self.ends
+
+    def slot(self) -> float:
+        """Reserve the next free slot and return its time (epoch seconds)."""
+        slot = max(self.clock(), self._next)
+        self._next = slot + self.interval
+        return slot + self._random.uniform(0, self.interval)
+
+    async def wait(self) -> None:
+        """Wait for the next free slot."""
+        delay = self.slot() - self.clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def resumed(self, key: Hashable) -> None:
+        """Count a workshop as resynced."""
+        if key not in self.remaining:
+            return
+        self.remaining.discard(key)
+        if not self.remaining:
+            elapsed = self.clock() - self.started
+            STARTUP_SECONDS.labels('resync').set(elapsed)
+            logger.info(
+                f"Startup resync of {self.expected} workshops finished in "
+                f"{elapsed:.1f}s"
+            )
+
+
+_pacer: Optional[ResyncPacer] = None
+
+
+def get_resync_pacer() -> Optional[ResyncPacer]:
+    """Return the pacer while the startup resync is being paced."""
+    if _pacer is not None and not _pacer.active:
+        return None
+    return _pacer
+
+
+def set_resync_pacer(pacer: Optional[ResyncPacer]) -> None:
+    """Install (or, with ``None``, remove) the process-wide pacer."""
+    global _pacer
+
+    _pacer = pacer
+
+
+def paced_deadline(deadline: float) -> float:
+    """
+    Move an overdue deadline to the next free slot during the startup resync.
+
+    Deadlines still in the future are returned unchanged.
+    """
+    pacer = get_resync_pacer()
+    if pacer is None or deadline > pacer.clock():
+        return deadline
+    return pacer.slot()
+
+
+async def resync_slot(namespace: str, name: str, needed: bool) -> None:
+    """
+    Pace a workshop's resume reconcile during the startup resync.
+
+    Args:
+        namespace: Namespace of the Workshop
+        name: Name of the Workshop object
+        needed: Whether the reconcile makes API calls; one that does not
+            goes ahead at once
+    """
+    pacer = get_resync_pacer()
+    if pacer is None:
+        return
+    if needed:
+        await pacer.wait()
+    pacer.resumed((namespace, name))
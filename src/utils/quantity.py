@@ -0,0 +1,81 @@
+"""Fast parsing of Kubernetes resource quantities.
+
+``kubernetes.utils.parse_quantity`` goes through ``Decimal`` for every call.
+Capacity accounting parses the same handful of strings (``500m``, ``2Gi``)
+over and over, so these parsers work on integers and cache their results.
+"""
+
+import functools
+import re
+from typing import Union
+
+
+# Decimal SI and binary suffixes as (numerator, denominator) multipliers
+_SUFFIXES = {
+    'n': (1, 10 ** 9),
+    'u': (1, 10 ** 6),
+    'm': (1, 10 ** 3),
+    '': (1, 1),
+    'k': (10 ** 3, 1),
+    'M': (10 ** 6, 1),
+    'G': (10 ** 9, 1),
+    'T': (10 ** 12, 1),
+    'P': (10 ** 15, 1),
+    'E': (10 ** 18, 1),
+    'Ki': (2 ** 10, 1),
+    'Mi': (2 ** 20, 1),
+    'Gi': (2 ** 30, 1),
+    'Ti': (2 ** 40, 1),
+    'Pi': (2 ** 50, 1),
+    'Ei': (2 ** 60, 1),
+}
+
+_QUANTITY = re.compile(
+    r'^([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)(Ki|Mi|Gi|Ti|Pi|Ei|[numkMGTPE]?)$'
+)
+
+Quantity = Union[str, int, float]
+
+
+def _scaled(value: Quantity, scale: int) -> int:
+    """Return ``value * scale`` rounded up to an integer."""
+    if isinstance(value, (int, float)):
+        return -int(-value * scale // 1)
+    match = _QUANTITY.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid resource quantity: {value!r}")
+    number, suffix = match.groups()
+    numerator, denominator = _SUFFIXES[suffix]
+    if '.' in number or 'e' in number.lower():
+        # Rare in practice; float precision is plenty for scheduling maths
+        return -int(-float(number) * numerator * scale // denominator)
+    # Ceiling division keeps e.g. 1n of CPU from rounding down to nothing
+    return -(-int(number) * numerator * scale // denominator)
+
+
+@functools.lru_cache(maxsize=1024)
+def cpu_millis(value: Quantity) -> int:
+    """
+    Parse a CPU quantity into millicores.
+
+    >>> cpu_millis('500m'), cpu_millis('2'), cpu_millis('0.25')
+    (500, 2000, 250)
+
+    Raises:
+        ValueError: If ``value`` is not a valid quantity
+    """
+    return _scaled(value, 1000)
+
+
+@functools.lru_cache(maxsize=1024)
+def memory_bytes(value: Quantity) -> int:
+    """
+    Parse a memory quantity into bytes.
+
+    >>> memory_bytes('1Gi'), memory_bytes('512M')
+    (1073741824, 512000000)
+
+    Raises:
+        ValueError: If ``value`` is not a valid quantity
+    """
+    return _scaled(value, 1)
@@ -0,0 +1,222 @@
+"""Client-side rate limiting for Kubernetes API writes.
+
+A burst of class starts runs up to ``worker_limit`` create handlers at once,
+each issuing several writes. Without a limit they all hit the API server
+together, which answers with 429s. The :class:`WriteScheduler` admits
+writes through one token bucket in priority order. Deletes go first because
+they free capacity, then updates, then creates. A 429 pauses every write
+for the ``Retry-After`` period, so a burst queues rather than fails.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from utils.metrics import API_WRITE_QUEUE, API_WRITE_WAIT
+
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lowest value admitted first
+PRIORITY_DELETE = 0
+PRIORITY_UPDATE = 1
+PRIORITY_CREATE = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_DELETE: 'delete',
+    PRIORITY_UPDATE: 'update',
+    PRIORITY_CREATE: 'create',
+}
+
+# Priority of each write verb; other verbs are reads and are not limited
+VERB_PRIORITIES = {
+    'delete': PRIORITY_DELETE,
+    'deletecollection': PRIORITY_DELETE,
+    'patch': PRIORITY_UPDATE,
+    'replace': PRIORITY_UPDATE,
+    'apply': PRIORITY_UPDATE,
+    'create': PRIORITY_CREATE,
+}
+
+# Seconds to back off after a 429 without a usable Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+# Longest pause honoured from a single Retry-After header
+MAX_RETRY_AFTER = 60.0
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Read a ``Retry-After`` header as seconds from now.
+
+    Args:
+        headers: Response headers, as found on ``ApiException.headers``
+
+    Returns:
+        Delay in seconds (capped at :data:`MAX_RETRY_AFTER`), or ``None`` if
+        the header is missing or unparseable
+    """
+    if not headers:
+        return None
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = moment.timestamp() - time.time()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity, i.e. the largest burst admitted at once
+            clock: Monotonic clock, in seconds
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"rate and burst must be positive, got {rate}/{burst}")
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self._updated = clock()
+
+    def take(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one will be
+        """
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class WriteScheduler:
+    """
+    Admits API writes through a token bucket, highest priority first.
+
+    One dispatcher task hands out tokens; callers just await
+    :meth:`acquire`. Waiters of equal priority are admitted in arrival order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """
+        Args:
+            rate: Writes admitted per second on average
+            burst: Writes admitted back to back after an idle period
+            clock: Monotonic clock, in seconds
+        """
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.clock = clock
+        self.admitted = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._heap: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def acquire(self, priority: int = PRIORITY_CREATE) -> None:
+        """Wait until a write of ``priority`` may be sent."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._heap, (priority, next(self._counter), self.clock(), waiter)
+        )
+        API_WRITE_QUEUE.labels(PRIORITY_NAMES[priority]).inc()
+        self._changed.set()
+        await waiter
+
+    def pause(self, seconds: float) -> None:
+        """Hold every write for ``seconds``, e.g. after a 429."""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, self.clock() + seconds)
+        self._changed.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            delay = self._paused_until - self.clock()
+            if delay <= 0:
+                delay = self.bucket.take()
+            if delay > 0:
+                # A pause or a more urgent waiter may arrive meanwhile
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # A token was taken; hand it to the first waiter still waiting
+            while self._heap:
+                priority, _, queued_at, waiter = heapq.heappop(self._heap)
+                API_WRITE_QUEUE.labels(PRIORITY_NAMES[priority]).dec()
+                if waiter.done():  # Caller was cancelled
+                    continue
+                waiter.set_result(None)
+                self.admitted += 1
+                API_WRITE_WAIT.labels(PRIORITY_NAMES[priority]).observe(
+                    self.clock() - queued_at
+                )
+                break
+
+    def stats(self) -> Dict[str, int]:
+        """Return admission counters for logging."""
+        return {
+            'admitted': self.admitted,
+            'throttled': self.throttled,
+            'queued': len(self._heap),
+        }
+
+    def close(self) -> None:
+        """Stop the dispatcher and cancel every queued writer."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for priority, _, _, waiter in self._heap:
+            API_WRITE_QUEUE.labels(PRIORITY_NAMES[priority]).dec()
+            waiter.cancel()
+        self._heap.clear()
+
+
+def write_priority(verb: str) -> Optional[int]:
+    """Return the priority class of an API verb, or ``None`` for reads."""
+    return VERB_PRIORITIES.get(verb)
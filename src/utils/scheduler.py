@@ -0,0 +1,165 @@
+"""Single-task deadline scheduler backed by a min-heap."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import (
+    Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+)
+
+
+logger = logging.getLogger(__name__)
+
+# The event loop sleeps on a monotonic clock while deadlines are wall-clock
+# times; deadlines this close to now count as due rather than re-sleeping.
+CLOCK_TOLERANCE = 0.001
+
+
+class DeadlineScheduler:
+    """
+    Fire a callback for each key when its deadline passes.
+
+    One asyncio task sleeps until the earliest deadline, so the cost is at
+    most one wakeup per distinct deadline (plus one per earlier deadline
+    inserted) no matter how many keys are scheduled. Rescheduling or
+    cancelling a key leaves its old heap entry in place; stale entries are
+    skipped when they surface.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Hashable], Awaitable[Any]],
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        """
+        Args:
+            callback: Coroutine function called with the key once it is due
+            clock: Returns the current time in epoch seconds
+        """
+        self.callback = callback
+        self.clock = clock
+        self.wakeups = 0
+        self.fired = 0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int]] = {}
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._callbacks: set = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """Return the scheduled deadline for ``key`` (epoch seconds), if any."""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """
+        Schedule (or reschedule) ``key`` to fire at ``deadline``.
+
+        Args:
+            key: Identifier passed to the callback
+            deadline: Epoch seconds at which the key becomes due
+        """
+        current = self._entries.get(key)
+        if current is not None and current[0] == deadline:
+            return
+
+        sequence = next(self._counter)
+        self._entries[key] = (deadline, sequence)
+        heapq.heappush(self._heap, (deadline, sequence, key))
+        # Only an earlier head deadline requires the sleeper to wake up early
+        if self._heap[0][1] == sequence:
+            self._changed.set()
+
+    def cancel(self, key: Hashable) -> None:
+        """Forget ``key``; its heap entry is discarded lazily."""
+        self._entries.pop(key, None)
+
+    def _pop_stale(self) -> None:
+        while self._heap:
+            deadline, sequence, key = self._heap[0]
+            if self._entries.get(key) == (deadline, sequence):
+                return
+            heapq.heappop(self._heap)
+
+    async def _run(self) -> None:
+        while True:
+            self._pop_stale()
+            self._changed.clear()
+
+            if not self._heap:
+                await self._changed.wait()
+                self.wakeups += 1
+                continue
+
+            delay = self._heap[0][0] - self.clock()
+            if delay > CLOCK_TOLERANCE:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeups += 1
+                continue
+
+            now = self.clock()
+            while self._heap and self._heap[0][0] <= now + CLOCK_TOLERANCE:
+                deadline, sequence, key = heapq.heappop(self._heap)
+                if self._entries.get(key) != (deadline, sequence):
+                    continue
+                del self._entries[key]
+                self._fire(key, max(now - deadline, 0.0))
+
+    def _fire(self, key: Hashable, lateness: float) -> None:
+        self.fired += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+        task = asyncio.create_task(self._invoke(key))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _invoke(self, key: Hashable) -> None:
+        try:
+            await self.callback(key)
+        except Exception as e:
+            logger.error(f"Deadline callback for {key} failed: {e}")
+
+    def start(self) -> None:
+        """Start the scheduler task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler task and wait for running callbacks."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._callbacks:
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        """Return wakeup and lateness counters."""
+        return {
+            'scheduled': len(self._entries),
+            'wakeups': self.wakeups,
+            'fired': self.fired,
+            'max_lateness': self.max_lateness,
+            'mean_lateness': (
+                self.total_lateness / self.fired if self.fired else 0.0
+            ),
+        }
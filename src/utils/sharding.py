@@ -0,0 +1,393 @@
+"""Horizontal sharding of Workshops across operator replicas.
+
+Each replica renews a ``coordination.k8s.io`` Lease of its own. The set of
+unexpired Leases is the membership, and a consistent-hash ring over the
+members assigns every ``(namespace, name)`` to exactly one replica. Kopf
+handlers are filtered with :func:`owns` so a replica only reconciles its own
+slice. When a member joins or leaves, only the keys whose owner changed move,
+and the new owner touches each object it gained so Kopf delivers it a fresh
+event.
+
+Sharding is off by default; a single replica owns everything.
+"""
+
+import abc
+import asyncio
+import bisect
+import hashlib
+import logging
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any, Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+)
+
+import kubernetes.client as k8s_client
+from kubernetes.client.rest import ApiException
+
+from utils.config import env_bool, env_float, env_int, env_str
+from utils.k8s_client import AsyncApi, get_client_registry, get_gateway
+
+
+logger = logging.getLogger(__name__)
+
+# Label marking the Leases that make up the shard membership
+MEMBER_LABEL = 'orchestra.io/shard-member'
+
+# Annotation the new owner of a Workshop stamps to trigger a fresh event
+OWNER_ANNOTATION = 'orchestra.io/shard-owner'
+
+DEFAULT_LEASE_DURATION = 15
+DEFAULT_RENEW_INTERVAL = 5.0
+
+# Points per member on the ring; more points give a more even split
+DEFAULT_VNODES = 128
+
+# Objects tracked for handover are (plural, namespace, name)
+ObjectKey = Tuple[str, str, str]
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], 'big')
+
+
+def shard_key(namespace: Optional[str], name: str) -> str:
+    """Return the ring key for a namespaced object."""
+    return f"{namespace or ''}/{name}"
+
+
+class HashRing:
+    """
+    Consistent-hash ring mapping keys to members.
+
+    Each member is placed at ``vnodes`` pseudo-random points; a key belongs
+    to the first member point at or after the key's hash. Adding or removing
+    one of N members moves only about 1/N of the keys.
+    """
+
+    def __init__(
+        self,
+        members: Iterable[str] = (),
+        vnodes: int = DEFAULT_VNODES
+    ) -> None:
+        self.vnodes = vnodes
+        self.members = frozenset(members)
+        points = sorted(
+            (_hash(f"{member}#{index}"), member)
+            for member in self.members
+            for index in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Return the member owning ``key``, or ``None`` for an empty ring."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect_left(self._hashes, _hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+class LeaseStore(abc.ABC):
+    """Where shard members record their Leases."""
+
+    @abc.abstractmethod
+    async def renew(self, identity: str, duration: int) -> None:
+        """Create or renew the Lease held by ``identity``."""
+
+    @abc.abstractmethod
+    async def release(self, identity: str) -> None:
+        """Drop the Lease held by ``identity`` so peers rebalance at once."""
+
+    @abc.abstractmethod
+    async def members(self) -> Set[str]:
+        """Return the identities whose Leases have not expired."""
+
+
+class KubernetesLeaseStore(LeaseStore):
+    """
+    Shard Leases stored as ``coordination.k8s.io/v1`` Lease objects.
+
+    Calls run through the API gateway. ``api`` can be any
+    ``CoordinationV1Api``-compatible object, such as the benchmark fake.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        api: Any = None,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc)
+    ) -> None:
+        """
+        Args:
+            namespace: Namespace the Leases live in
+            api: CoordinationV1Api-compatible object (defaults to one on the
+                shared client registry)
+            clock: Returns the current time as an aware datetime
+        """
+        self.namespace = namespace
+        self.clock = clock
+        self._api = api
+
+    @property
+    def api(self) -> AsyncApi:
+        if self._api is None:
+            self._api = k8s_client.CoordinationV1Api(
+                get_client_registry().api_client
+            )
+        return AsyncApi(self._api, get_gateway())
+
+    @staticmethod
+    def lease_name(identity: str) -> str:
+        return f"orchestra-shard-{identity}"
+
+    def _lease(self, identity: str, duration: int) -> k8s_client.V1Lease:
+        return k8s_client.V1Lease(
+            api_version='coordination.k8s.io/v1',
+            kind='Lease',
+            metadata=k8s_client.V1ObjectMeta(
+                name=self.lease_name(identity),
+                namespace=self.namespace,
+                labels={MEMBER_LABEL: 'true'}
+            ),
+            spec=k8s_client.V1LeaseSpec(
+                holder_identity=identity,
+                lease_duration_seconds=duration,
+                renew_time=self.clock()
+            )
+        )
+
+    async def renew(self, identity: str, duration: int) -> None:
+        lease = self._lease(identity, duration)
+        try:
+            await self.api.replace_namespaced_lease(
+                name=lease.metadata.name, namespace=self.namespace, body=lease
+            )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            await self.api.create_namespaced_lease(
+                namespace=self.namespace, body=lease
+            )
+
+    async def release(self, identity: str) -> None:
+        try:
+            await self.api.delete_namespaced_lease(
+                name=self.lease_name(identity), namespace=self.namespace
+            )
+        except ApiException as e:
+            if e.status != 404:  # Already gone
+                raise
+
+    async def members(self) -> Set[str]:
+        leases = await self.api.list_namespaced_lease(
+            namespace=self.namespace, label_selector=f"{MEMBER_LABEL}=true"
+        )
+        now = self.clock()
+        alive = set()
+        for lease in getattr(leases, 'items', leases):
+            spec = lease.spec
+            if not spec or not spec.holder_identity or not spec.renew_time:
+                continue
+            expires = spec.renew_time + timedelta(
+                seconds=spec.lease_duration_seconds or DEFAULT_LEASE_DURATION
+            )
+            if expires > now:
+                alive.add(spec.holder_identity)
+        return alive
+
+
+class ShardCoordinator:
+    """
+    Keeps this replica's Lease alive and the hash ring in step with peers.
+
+    Until the first membership read the ring is empty and :meth:`owns`
+    returns ``False``, so call :meth:`refresh` before Kopf starts watching.
+    """
+
+    def __init__(
+        self,
+        identity: str,
+        store: LeaseStore,
+        lease_duration: int = DEFAULT_LEASE_DURATION,
+        renew_interval: float = DEFAULT_RENEW_INTERVAL,
+        vnodes: int = DEFAULT_VNODES,
+        on_gained: Optional[Callable[[List[ObjectKey]], Awaitable[Any]]] = None
+    ) -> None:
+        """
+        Args:
+            identity: Unique name of this replica (its pod name)
+            store: Where the Leases are kept
+            lease_duration: Seconds a Lease stays valid without renewal
+            renew_interval: Seconds between renewals; must be well under
+                ``lease_duration``
+            vnodes: Ring points per member
+            on_gained: Coroutine called with the tracked objects this
+                replica gained on a rebalance
+        """
+        if renew_interval >= lease_duration:
+            raise ValueError(
+                f"renew_interval ({renew_interval}s) must be shorter than "
+                f"lease_duration ({lease_duration}s)"
+            )
+        self.identity = identity
+        self.store = store
+        self.lease_duration = lease_duration
+        self.renew_interval = renew_interval
+        self.vnodes = vnodes
+        self.on_gained = on_gained
+        self.ring = HashRing((), vnodes)
+        self.rebalances = 0
+        self._known: Set[ObjectKey] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def owns(self, namespace: Optional[str], name: str) -> bool:
+        """Whether this replica reconciles the object ``namespace/name``."""
+        return self.ring.owner(shard_key(namespace, name)) == self.identity
+
+    def track(self, key: ObjectKey, deleted: bool = False) -> None:
+        """Remember (or forget) an object so it can be handed over later."""
+        if deleted:
+            self._known.discard(key)
+        else:
+            self._known.add(key)
+
+    async def refresh(self) -> None:
+        """Renew this replica's Lease and rebuild the ring from the members."""
+        await self.store.renew(self.identity, self.lease_duration)
+        members = await self.store.members()
+        members.add(self.identity)
+        if members == self.ring.members:
+            return
+
+        old_ring = self.ring
+        self.ring = HashRing(members, self.vnodes)
+        self.rebalances += 1
+        gained = [
+            key for key in sorted(self._known)
+            if self.owns(key[1], key[2])
+            and old_ring.owner(shard_key(key[1], key[2])) != self.identity
+        ]
+        logger.info(
+            f"Shard membership is now {sorted(members)}; "
+            f"{self.identity} gained {len(gained)} objects"
+        )
+        if gained and self.on_gained is not None:
+            await self.on_gained(gained)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to renew shard lease: {e}")
+
+    def start(self) -> None:
+        """Keep renewing on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop renewing and release the Lease so peers take over at once."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.store.release(self.identity)
+        except Exception as e:
+            logger.warning(f"Failed to release shard lease: {e}")
+
+
+_coordinator: Optional[ShardCoordinator] = None
+
+
+def get_coordinator() -> Optional[ShardCoordinator]:
+    """Return the shard coordinator, or ``None`` when sharding is off."""
+    return _coordinator
+
+
+def owns(namespace: Optional[str], name: str) -> bool:
+    """Whether this replica reconciles ``namespace/name`` (always, unsharded)."""
+    return _coordinator is None or _coordinator.owns(namespace, name)
+
+
+def is_owned(namespace: Optional[str], name: str, **kwargs: Any) -> bool:
+    """Kopf ``when=`` filter restricting a handler to this replica's shard."""
+    return owns(namespace, name)
+
+
+async def touch_gained(keys: List[ObjectKey]) -> None:
+    """
+    Stamp this replica on objects it just gained.
+
+    The annotation change is a new watch event, so Kopf runs any handlers the
+    previous owner left unfinished, and the update handler re-reconciles.
+    """
+    identity = _coordinator.identity if _coordinator else ''
+    custom = get_gateway().custom
+    for plural, namespace, name in keys:
+        try:
+            await custom.patch_namespaced_custom_object(
+                group='orchestra.io',
+                version='v1',
+                namespace=namespace,
+                plural=plural,
+                name=name,
+                body={'metadata': {'annotations': {OWNER_ANNOTATION: identity}}}
+            )
+        except ApiException as e:
+            if e.status != 404:  # Deleted in the meantime
+                logger.warning(f"Failed to take over {plural} {name}: {e}")
+
+
+async def start_sharding() -> None:
+    """
+    Join the shard membership, if sharding is enabled.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_SHARDING``: enable sharding (default off)
+    - ``ORCHESTRA_SHARD_IDENTITY``: replica name (defaults to
+      ``OPERATOR_NAME``, the pod name, then the hostname)
+    - ``ORCHESTRA_SHARD_LEASE_SECONDS``: Lease duration (default 15)
+    - ``ORCHESTRA_SHARD_RENEW_INTERVAL``: seconds between renewals (default 5)
+    """
+    global _coordinator
+
+    if not env_bool('ORCHESTRA_SHARDING', False):
+        return
+    identity = env_str(
+        'ORCHESTRA_SHARD_IDENTITY', env_str('OPERATOR_NAME', socket.gethostname())
+    )
+    store = KubernetesLeaseStore(env_str('OPERATOR_NAMESPACE', 'default'))
+    _coordinator = ShardCoordinator(
+        identity,
+        store,
+        lease_duration=env_int(
+            'ORCHESTRA_SHARD_LEASE_SECONDS', DEFAULT_LEASE_DURATION
+        ),
+        renew_interval=env_float(
+            'ORCHESTRA_SHARD_RENEW_INTERVAL', DEFAULT_RENEW_INTERVAL
+        ),
+        on_gained=touch_gained,
+    )
+    await _coordinator.refresh()
+    _coordinator.start()
+    logger.info(
+        f"Sharding enabled as {identity} with members "
+        f"{sorted(_coordinator.ring.members)}"
+    )
+
+
+async def stop_sharding() -> None:
+    """Leave the shard membership."""
+    global _coordinator
+
+    if _coordinator is not None:
+        await _coordinator.stop()
+        _coordinator = None
@@ -1,7 +1,7 @@
 """Time and duration utilities for the Orchestra Operator."""
 
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Union
 
 
@@ -93,3 +93,25 @@ def time_until_expiration(expiration_time: datetime) -> timedelta:
         timedelta until expiration (negative if already expired)
     """
     return expiration_time - datetime.utcnow()
+
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """
+    Parse an ISO 8601 timestamp from a Workshop status into an aware datetime.
+
+    Timestamps written by ``get_expiration_time`` carry no offset and are in
+    UTC; Kubernetes timestamps end in ``Z``. Both are returned in UTC.
+
+    Args:
+        timestamp: Timestamp string to parse
+
+    Returns:
+        Timezone-aware datetime
+
+    Raises:
+        ValueError: If the timestamp cannot be parsed
+    """
+    parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
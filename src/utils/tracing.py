@@ -0,0 +1,469 @@
+"""Lightweight tracing of the workshop lifecycle, exported as OTLP/JSON.
+
+Every handler run, provisioning stage and Kubernetes API call is recorded as
+a span. A Workshop's spans share one trace ID, stored in the
+``orchestra.io/trace-id`` annotation when the create handler first runs, so
+the update, readiness and delete spans of the same Workshop join its trace.
+
+Spans are buffered in memory and written in batches by a background task,
+either as OTLP/JSON lines to a local file (the format of the OpenTelemetry
+Collector's file exporter and ``otlpjsonfile`` receiver) or to an
+OTLP/HTTP collector's ``/v1/traces`` endpoint. Tracing is off unless an
+export target is configured, and then costs a few microseconds per span.
+"""
+
+import abc
+import asyncio
+import functools
+import json
+import logging
+import random
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, TypeVar
+
+from utils.config import env_float, env_int, env_str
+
+
+logger = logging.getLogger(__name__)
+
+# Annotation holding the trace ID every span of a Workshop belongs to
+TRACE_ANNOTATION = 'orchestra.io/trace-id'
+
+SERVICE_NAME = 'orchestra-operator'
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_ERROR = 2
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_BATCH = 512
+
+# Spans buffered before new ones are dropped, e.g. while a collector is down
+DEFAULT_MAX_QUEUE = 20000
+
+F = TypeVar('F', bound=Callable[..., Awaitable[Any]])
+
+_random = random.Random()
+
+
+def new_trace_id() -> str:
+    """Return a random 128-bit trace ID as 32 hex digits."""
+    return f"{_random.getrandbits(128):032x}"
+
+
+def _new_span_id() -> str:
+    return f"{_random.getrandbits(64):016x}"
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start_ns',
+        'end_ns', 'attributes', 'error',
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes if attributes is not None else {}
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute on the span."""
+        self.attributes[key] = value
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('orchestra_span', default=None)
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+
+def encode_spans(spans: List[Span], service_name: str = SERVICE_NAME) -> Dict[str, Any]:
+    """
+    Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``.
+
+    Args:
+        spans: Finished spans
+        service_name: ``service.name`` resource attribute
+
+    Returns:
+        JSON-ready request body
+    """
+    encoded = []
+    for span in spans:
+        item: Dict[str, Any] = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': span.kind,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': [
+                _attribute(key, value) for key, value in span.attributes.items()
+            ],
+        }
+        if span.parent_id:
+            item['parentSpanId'] = span.parent_id
+        if span.error is not None:
+            item['status'] = {'code': STATUS_ERROR, 'message': span.error}
+        encoded.append(item)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [_attribute('service.name', service_name)]},
+        'scopeSpans': [{'scope': {'name': 'orchestra'}, 'spans': encoded}],
+    }]}
+
+
+class SpanExporter(abc.ABC):
+    """Where batches of OTLP/JSON requests are sent. Called off the event loop."""
+
+    @abc.abstractmethod
+    def export(self, body: Dict[str, Any]) -> None:
+        """Send one OTLP/JSON export request."""
+
+
+class FileExporter(SpanExporter):
+    """Appends each batch to a file as one line of OTLP/JSON."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, body: Dict[str, Any]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as out:
+            out.write(json.dumps(body, separators=(',', ':')))
+            out.write('\n')
+
+
+class OtlpHttpExporter(SpanExporter):
+    """POSTs each batch to an OTLP/HTTP collector as JSON."""
+
+    def __init__(self, endpoint: str, timeout: float = 10.0) -> None:
+        """
+        Args:
+            endpoint: Collector traces URL, e.g.
+                ``http://otel-collector:4318/v1/traces``
+            timeout: Seconds to wait for the collector
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, body: Dict[str, Any]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body, separators=(',', ':')).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """
+    Creates spans and exports them in batches from a background task.
+
+    Finishing a span only appends it to a list; encoding and I/O happen in
+    :meth:`flush`, on a worker thread.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        service_name: str = SERVICE_NAME,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_queue: int = DEFAULT_MAX_QUEUE
+    ) -> None:
+        """
+        Args:
+            exporter: Destination for finished spans
+            service_name: ``service.name`` resource attribute
+            flush_interval: Seconds between exports
+            max_batch: Spans per export request; a full batch is exported
+                without waiting for the interval
+            max_queue: Spans buffered before new ones are dropped
+        """
+        self.exporter = exporter
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.finished = 0
+        self.dropped = 0
+        self._queue: List[Span] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start_span(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None
+    ) -> Span:
+        """
+        Start a span under the current one.
+
+        A ``trace_id`` different from the current span's starts a new root
+        span in that trace; without either, a new trace is started.
+        """
+        parent = _current.get()
+        if parent is not None and trace_id in (None, parent.trace_id):
+            return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        return Span(name, trace_id or new_trace_id(), None, kind, attributes)
+
+    def finish(self, span: Span) -> None:
+        """End ``span`` now, unless already ended, and queue it for export."""
+        if not span.end_ns:
+            span.end_ns = time.time_ns()
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        self.finished += 1
+        if len(self._queue) >= self.max_batch:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        """Export every queued span."""
+        while self._queue:
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            body = encode_spans(batch, self.service_name)
+            try:
+                await asyncio.to_thread(self.exporter.export, body)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        """Start exporting on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and export what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+class _Scope:
+    """Context manager making a span current for its duration."""
+
+    __slots__ = ('tracer', 'span', '_token')
+
+    def __init__(self, tracer: Tracer, span: Span) -> None:
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc is not None:
+            self.span.error = f"{type(exc).__name__}: {exc}"
+        _current.reset(self._token)
+        self.tracer.finish(self.span)
+
+
+class _NoopScope:
+    """Stands in for :class:`_Scope` while tracing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+
+_NOOP = _NoopScope()
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the process-wide tracer, or ``None`` when tracing is off."""
+    return _tracer
+
+
+def configure_tracer(tracer: Optional[Tracer]) -> None:
+    """Install (or, with ``None``, remove) the process-wide tracer."""
+    global _tracer
+    _tracer = tracer
+
+
+def span(
+    name: str,
+    trace_id: Optional[str] = None,
+    kind: int = SPAN_KIND_INTERNAL,
+    **attributes: Any
+) -> Any:
+    """
+    Context manager recording a span, a no-op while tracing is off.
+
+    Yields the :class:`Span` (or ``None``), so callers can add attributes.
+    An exception leaving the block marks the span as failed.
+
+    Args:
+        name: Span name
+        trace_id: Trace to record in; defaults to the current span's
+        kind: OTLP span kind
+        **attributes: Span attributes
+    """
+    if _tracer is None:
+        return _NOOP
+    return _Scope(_tracer, _tracer.start_span(name, trace_id, kind, attributes))
+
+
+def record_span(
+    name: str,
+    trace_id: Optional[str],
+    start_ns: int,
+    end_ns: Optional[int] = None,
+    **attributes: Any
+) -> None:
+    """Record a span whose start lies in the past, e.g. waiting for a pod."""
+    if _tracer is None or not trace_id:
+        return
+    finished = Span(name, trace_id, attributes=attributes, start_ns=start_ns)
+    finished.end_ns = end_ns or time.time_ns()
+    _tracer.finish(finished)
+
+
+def trace_id_from(meta: Optional[Mapping[str, Any]]) -> Optional[str]:
+    """Return the trace ID stored on an object's metadata, if any."""
+    if not meta:
+        return None
+    return (meta.get('annotations') or {}).get(TRACE_ANNOTATION)
+
+
+def traced_handler(name: str, annotate: bool = True) -> Callable[[F], F]:
+    """
+    Decorate a Kopf handler to run inside a span of its object's trace.
+
+    The trace ID comes from the object's ``orchestra.io/trace-id``
+    annotation. If it has none yet, a new trace is started and, with
+    ``annotate``, its ID written to the annotation through the handler's
+    ``patch``. Apply it below :func:`utils.metrics.timed_handler`.
+
+    Args:
+        name: Handler name, used in the span name ``handler.<name>``
+        annotate: Whether to store a new trace ID on the object; off for
+            deletion, where later handlers never run
+    """
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _tracer is None:
+                return await func(*args, **kwargs)
+            trace_id = trace_id_from(kwargs.get('meta'))
+            patch = kwargs.get('patch')
+            if trace_id is None and annotate and patch is not None:
+                trace_id = new_trace_id()
+                metadata = patch.setdefault('metadata', {})
+                metadata.setdefault('annotations', {})[TRACE_ANNOTATION] = trace_id
+            with span(
+                f"handler.{name}", trace_id, SPAN_KIND_SERVER,
+                **{
+                    'k8s.namespace.name': kwargs.get('namespace', ''),
+                    'orchestra.object': kwargs.get('name', ''),
+                }
+            ):
+                return await func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def start_tracing() -> None:
+    """
+    Start exporting spans, if an export target is configured.
+
+    Configured from the environment:
+
+    - ``ORCHESTRA_TRACE_FILE``: append OTLP/JSON lines to this file
+    - ``ORCHESTRA_TRACE_ENDPOINT``: POST OTLP/JSON to this collector URL,
+      e.g. ``http://otel-collector:4318/v1/traces`` (used if both are set)
+    - ``ORCHESTRA_TRACE_FLUSH_INTERVAL``: seconds between exports (default 5)
+    - ``ORCHESTRA_TRACE_MAX_QUEUE``: spans buffered before new ones are
+      dropped (default 20000)
+    """
+    endpoint = env_str('ORCHESTRA_TRACE_ENDPOINT')
+    path = env_str('ORCHESTRA_TRACE_FILE')
+    if endpoint:
+        exporter: SpanExporter = OtlpHttpExporter(endpoint)
+    elif path:
+        exporter = FileExporter(path)
+    else:
+        logger.info("Tracing disabled")
+        return
+    tracer = Tracer(
+        exporter,
+        flush_interval=env_float(
+            'ORCHESTRA_TRACE_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL
+        ),
+        max_queue=env_int('ORCHESTRA_TRACE_MAX_QUEUE', DEFAULT_MAX_QUEUE),
+    )
+    configure_tracer(tracer)
+    tracer.start()
+    logger.info(f"Exporting traces to {endpoint or path}")
+
+
+async def stop_tracing() -> None:
+    """Export the remaining spans and turn tracing off."""
+    tracer = _tracer
+    if tracer is not None:
+        configure_tracer(None)
+        await tracer.stop()
+        logger.info(
+            f"Tracing stopped: {tracer.finished} spans recorded, "
+            f"{tracer.dropped} dropped"
+        )
@@ -0,0 +1,247 @@
+"""Resource usage samples of RStudio pods, and rolling percentiles of them.
+
+Sources report the CPU and memory each running RStudio pod currently uses,
+together with the image it runs, for every pod at once. Samples are
+summarized per image in :class:`RollingQuantiles` sketches, so the
+recommended requests of a course image reflect what its sessions used over
+the last day, not what the spec guessed.
+"""
+
+import abc
+import asyncio
+import collections
+import math
+import time
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.activity import DEFAULT_WINDOW, pod_workshop, prometheus_query
+from utils.config import env_str
+
+
+# (namespace, pod name)
+PodKey = Tuple[str, str]
+
+# Relative error of the reported quantiles
+DEFAULT_ACCURACY = 0.02
+
+
+def image_key(image: str) -> str:
+    """
+    Return an image reference the way workshop specs usually write it.
+
+    The container runtime reports ``docker.io/rocker/rstudio:4.3`` for a
+    spec's ``rocker/rstudio:4.3``; both map to the latter. An untagged
+    reference gets ``:latest``.
+    """
+    for prefix in ('docker.io/library/', 'docker.io/'):
+        if image.startswith(prefix):
+            image = image[len(prefix):]
+            break
+    if '@' not in image and ':' not in image.rsplit('/', 1)[-1]:
+        image += ':latest'
+    return image
+
+
+class UsageSample(NamedTuple):
+    """What one RStudio pod uses right now; ``None`` where unknown."""
+
+    image: str
+    cpu_cores: Optional[float] = None
+    memory_bytes: Optional[float] = None
+
+
+class UsageSource(abc.ABC):
+    """Where pod resource usage is read from."""
+
+    @abc.abstractmethod
+    async def usage(self) -> List[UsageSample]:
+        """Return one sample per running RStudio pod."""
+
+
+class StaticUsageSource(UsageSource):
+    """Usage from an in-memory table, for benchmarks and local runs."""
+
+    def __init__(self) -> None:
+        self.table: Dict[PodKey, UsageSample] = {}
+
+    def set(self, pod: PodKey, sample: Optional[UsageSample]) -> None:
+        """Set the usage reported for ``pod`` (``None`` once it is gone)."""
+        if sample is None:
+            self.table.pop(pod, None)
+        else:
+            self.table[pod] = sample
+
+    async def usage(self) -> List[UsageSample]:
+        return list(self.table.values())
+
+
+class PrometheusUsageSource(UsageSource):
+    """
+    Usage from cAdvisor's container metrics in Prometheus.
+
+    Two instant queries cover every pod: the CPU rate and the peak working
+    set of ``rstudio`` containers over the window. Idle warm pool entries
+    would skew the percentiles down, so pods of ``pool-`` Deployments are
+    left out.
+    """
+
+    CPU_QUERY = (
+        'sum by (namespace, pod, image) (rate(container_cpu_usage_seconds_total'
+        '{{container="rstudio",image!=""}}[{window}]))'
+    )
+    MEMORY_QUERY = (
+        'max by (namespace, pod, image) (max_over_time('
+        'container_memory_working_set_bytes{{container="rstudio",image!=""}}'
+        '[{window}]))'
+    )
+
+    def __init__(
+        self,
+        url: str,
+        window: str = DEFAULT_WINDOW,
+        timeout: float = 10.0
+    ) -> None:
+        """
+        Args:
+            url: Prometheus base URL, e.g. ``http://prometheus:9090``
+            window: Range rates and peaks are taken over, in PromQL syntax
+            timeout: Seconds to wait for each query
+        """
+        self.url = url.rstrip('/')
+        self.window = window
+        self.timeout = timeout
+
+    async def usage(self) -> List[UsageSample]:
+        cpu, memory = await asyncio.gather(
+            asyncio.to_thread(
+                prometheus_query, self.url,
+                self.CPU_QUERY.format(window=self.window), self.timeout
+            ),
+            asyncio.to_thread(
+                prometheus_query, self.url,
+                self.MEMORY_QUERY.format(window=self.window), self.timeout
+            ),
+        )
+        pods: Dict[PodKey, Dict[str, float]] = {}
+        images: Dict[PodKey, str] = {}
+        for resource, vector in (('cpu', cpu), ('memory', memory)):
+            for sample in vector:
+                metric = sample['metric']
+                workshop = pod_workshop(metric.get('pod', ''))
+                if workshop is None or workshop.startswith('pool-'):
+                    continue
+                key = (metric.get('namespace', ''), metric['pod'])
+                images[key] = metric.get('image', '')
+                pods.setdefault(key, {})[resource] = float(sample['value'][1])
+        return [
+            UsageSample(images[key], values.get('cpu'), values.get('memory'))
+            for key, values in pods.items()
+        ]
+
+
+class RollingQuantiles:
+    """
+    Approximate quantiles of the samples seen over a rolling window.
+
+    Samples are counted in logarithmic buckets, so a quantile is within
+    ``accuracy`` of the true value (relative), and the size depends on the
+    spread of the values, not on how many there are: typically a few dozen
+    buckets per slice. The window is split into ``slices``; the oldest
+    slice is dropped whole as the window moves on.
+    """
+
+    def __init__(
+        self,
+        window: float = 86400.0,
+        slices: int = 24,
+        accuracy: float = DEFAULT_ACCURACY,
+        floor: float = 1e-3,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        """
+        Args:
+            window: Seconds of samples kept
+            slices: Parts the window is dropped in
+            accuracy: Relative error of the reported quantiles
+            floor: Smallest value told apart; smaller samples count as it
+            clock: Returns the current time in epoch seconds
+        """
+        self.slice_seconds = window / slices
+        self.slices = slices
+        self.floor = floor
+        self.clock = clock
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        # (slice number, bucket -> count), oldest first
+        self._counts: Deque[Tuple[int, Dict[int, int]]] = collections.deque()
+
+    def _roll(self) -> int:
+        """Drop slices that left the window; return the current slice number."""
+        current = int(self.clock() // self.slice_seconds)
+        while self._counts and self._counts[0][0] <= current - self.slices:
+            self._counts.popleft()
+        return current
+
+    def add(self, value: float) -> None:
+        """Count one sample."""
+        current = self._roll()
+        if not self._counts or self._counts[-1][0] != current:
+            self._counts.append((current, {}))
+        counts = self._counts[-1][1]
+        bucket = math.ceil(math.log(max(value, self.floor)) / self._log_gamma)
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+    def __len__(self) -> int:
+        """Number of samples in the window."""
+        self._roll()
+        return sum(sum(counts.values()) for _, counts in self._counts)
+
+    @property
+    def buckets(self) -> int:
+        """Buckets held across all slices, a measure of the sketch's size."""
+        return sum(len(counts) for _, counts in self._counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Return the ``q`` quantile (0-1) of the samples in the window.
+
+        Returns:
+            The quantile, or ``None`` without samples
+        """
+        self._roll()
+        merged: Dict[int, int] = {}
+        for _, counts in self._counts:
+            for bucket, count in counts.items():
+                merged[bucket] = merged.get(bucket, 0) + count
+        total = sum(merged.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(merged):
+            seen += merged[bucket]
+            if seen > rank:
+                break
+        # Bucket i holds (gamma^(i-1), gamma^i]; this is within accuracy of both
+        return 2 * self._gamma ** bucket / (self._gamma + 1)
+
+
+def usage_source_from_env() -> Optional[UsageSource]:
+    """
+    Build the usage source configured in the environment.
+
+    Usage is read from the Prometheus that activity is read from:
+
+    - ``ORCHESTRA_ACTIVITY_PROMETHEUS_URL``: Prometheus to query
+    - ``ORCHESTRA_ACTIVITY_WINDOW``: range rates and peaks are taken over
+      (default ``5m``)
+
+    Returns:
+        The source, or ``None`` if none is configured
+    """
+    url = env_str('ORCHESTRA_ACTIVITY_PROMETHEUS_URL')
+    if not url:
+        return None
+    return PrometheusUsageSource(
+        url, env_str('ORCHESTRA_ACTIVITY_WINDOW', DEFAULT_WINDOW)
+    )
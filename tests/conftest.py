@@ -0,0 +1,34 @@
+"""Shared fixtures: the operator runs against the benchmarks' fake API server."""
+
+from typing import Iterator
+
+import pytest
+
+from fakes import FakeKubernetesApi
+
+from utils.k8s_client import (
+    close_client_registry,
+    configure_gateway,
+    shutdown_gateway,
+)
+
+
+@pytest.fixture
+def fake_api() -> Iterator[FakeKubernetesApi]:
+    """Route the process-wide API gateway to an in-memory fake API server."""
+    fake = FakeKubernetesApi()
+    configure_gateway(
+        apps=fake, core=fake, custom=fake, apply=fake, write_limiter=None
+    )
+    yield fake
+    shutdown_gateway()
+
+
+@pytest.fixture
+def no_clients() -> Iterator[None]:
+    """Start without a gateway or client registry, and clean both up after."""
+    shutdown_gateway()
+    close_client_registry()
+    yield
+    shutdown_gateway()
+    close_client_registry()
@@ -0,0 +1,108 @@
+"""The capacity ledger and the admission queue for workshops and cohorts."""
+
+import kopf
+import pytest
+
+import handlers.capacity as capacity
+from handlers.capacity import (
+    CapacityLedger,
+    admit_cohort,
+    cohort_demand,
+    workshop_demand,
+)
+
+
+GiB = 2 ** 30
+
+
+def workshop_key(name):
+    return ('workshops', 'test', name)
+
+
+@pytest.fixture
+def ledger():
+    """A ledger with one node offering 4 CPUs and 8Gi to workshops."""
+    ledger = CapacityLedger(headroom=1.0, clock=lambda: 1000.0)
+    ledger.set_node('node-1', (4000, 8 * GiB))
+    return ledger
+
+
+def test_everything_is_admitted_until_a_node_is_seen():
+    ledger = CapacityLedger()
+
+    assert ledger.request(workshop_key('huge'), (10 ** 6, 10 ** 15)).admitted
+
+
+def test_requests_that_fit_are_admitted(ledger):
+    assert ledger.request(workshop_key('a'), (1000, 2 * GiB)).admitted
+    assert ledger.request(workshop_key('b'), (3000, 6 * GiB)).admitted
+    assert ledger.free() == (0, 0)
+
+
+def test_queue_is_ordered_by_priority_then_creation_time(ledger):
+    ledger.reserve(workshop_key('running'), (4000, 8 * GiB))
+
+    ledger.request(workshop_key('late'), (1000, GiB), priority=0, created_at=20)
+    ledger.request(workshop_key('early'), (1000, GiB), priority=0, created_at=10)
+    ledger.request(workshop_key('urgent'), (1000, GiB), priority=5, created_at=30)
+
+    assert [
+        ledger.position(workshop_key(name)) for name in ('urgent', 'early', 'late')
+    ] == [1, 2, 3]
+
+
+def test_queue_is_admitted_strictly_in_order(ledger):
+    ledger.reserve(workshop_key('running'), (3000, 6 * GiB))
+    ledger.request(workshop_key('large'), (2000, 2 * GiB), created_at=10)
+    small = ledger.request(workshop_key('small'), (500, GiB), created_at=20)
+
+    # The small request would fit, but does not jump the large one
+    assert not small.admitted
+    assert small.position == 2
+
+    ledger.release(workshop_key('running'))
+
+    assert ledger.is_reserved(workshop_key('large'))
+    assert ledger.is_reserved(workshop_key('small'))
+    assert len(ledger) == 0
+
+
+def test_estimated_wait_counts_down_to_the_next_expiry(ledger):
+    ledger.reserve(workshop_key('running'), (4000, 8 * GiB), expires_at=1600.0)
+
+    admission = ledger.request(workshop_key('next'), (1000, GiB))
+
+    assert admission.position == 1
+    assert admission.estimated_wait == 600.0
+
+
+def test_cohort_demand_is_every_seat_together():
+    template = {'resources': {'cpuRequest': '500m', 'memoryRequest': '1Gi'}}
+
+    assert workshop_demand(template) == (500, GiB)
+    assert cohort_demand({'seats': 30, 'template': template}) == (15000, 30 * GiB)
+
+    applied = {'cpuRequest': '250m', 'memoryRequest': '512Mi', 'applied': True}
+    assert cohort_demand({'seats': 4, 'template': template}, applied) == (
+        1000, 2 * GiB
+    )
+
+
+def test_cohort_waits_for_room_for_all_of_its_seats(ledger, monkeypatch):
+    monkeypatch.setattr(capacity, '_ledger', ledger)
+    spec = {
+        'seats': 10,
+        'template': {'resources': {'cpuRequest': '500m', 'memoryRequest': '1Gi'}},
+    }
+    patch = {}
+
+    with pytest.raises(kopf.TemporaryError):
+        admit_cohort('test', 'intro-r', spec, {}, patch)
+
+    assert patch['status']['phase'] == 'Pending'
+    assert patch['status']['queue']['position'] == 1
+    assert not ledger.is_reserved(('workshopcohorts', 'test', 'intro-r'))
+
+    # Half the class fits
+    admit_cohort('test', 'half', {**spec, 'seats': 4, 'priority': 1}, {}, {})
+    assert ledger.is_reserved(('workshopcohorts', 'test', 'half'))
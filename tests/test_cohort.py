@@ -0,0 +1,187 @@
+"""WorkshopCohort provisioning, throttling, readiness and admission."""
+
+import kopf
+import pytest
+
+import handlers.capacity as capacity
+import handlers.cohort as cohort
+from handlers.capacity import CapacityLedger
+from handlers.cohort import (
+    COHORT_LABEL,
+    cohort_create_handler,
+    cohort_resize_handler,
+    cohort_status,
+    seat_readiness_event,
+)
+from utils.k8s_client import configure_gateway
+
+
+NAMESPACE = 'test'
+TEMPLATE = {'duration': '3h', 'ingress': {'domain': 'example.org'}}
+
+
+@pytest.fixture(autouse=True)
+def no_seats_ready(monkeypatch):
+    monkeypatch.setattr(cohort, '_ready_seats', {})
+    monkeypatch.setattr(cohort, '_reported', {})
+
+
+def seat_deployments(fake_api):
+    return {
+        key[2] for key in fake_api.objects if key[0] == 'deployment'
+    }
+
+
+async def create_cohort(name, seats, status=None, patch=None):
+    patch = {} if patch is None else patch
+    await cohort_create_handler(
+        spec={'seats': seats, 'template': TEMPLATE},
+        meta={'creationTimestamp': '', 'uid': f"uid-{name}"},
+        status=status or {}, patch=patch, namespace=NAMESPACE, name=name
+    )
+    return patch['status']
+
+
+async def test_every_seat_is_created(fake_api):
+    status = await create_cohort('intro-r', 3)
+
+    assert seat_deployments(fake_api) == {
+        f"intro-r-00{seat}-deployment" for seat in (1, 2, 3)
+    }
+    assert status['createdSeats'] == 3
+    assert status['failedSeats'] == 0
+    # Created is not ready: no seat's pod has come up yet
+    assert status['phase'] == 'Creating'
+    assert status['readySeats'] == 0
+    assert status['conditions'][0]['status'] == 'False'
+
+
+def test_phase_follows_seat_counts():
+    def phase(created, failed, ready):
+        return cohort_status(4, created, [], TEMPLATE, failed, ready)['phase']
+
+    assert phase(4, 0, 0) == 'Creating'
+    assert phase(4, 0, 3) == 'Creating'
+    assert phase(4, 0, 4) == 'Ready'
+    assert phase(3, 1, 3) == 'Degraded'
+    assert phase(0, 4, 0) == 'Failed'
+
+
+async def test_throttled_seats_are_retried(fake_api):
+    configure_gateway(
+        apps=fake_api, core=fake_api, custom=fake_api, apply=fake_api,
+        write_limiter=None, max_retries=0
+    )
+    fake_api.throttle_rate = 0.3
+    fake_api.retry_after = 7
+
+    with pytest.raises(kopf.TemporaryError) as retry:
+        await create_cohort('intro-r', 10)
+
+    assert retry.value.delay == 7
+    # Each throttled seat is missing at least the child it was refused
+    partial = len(fake_api.objects)
+
+    # Kopf retries the handler once the API server has recovered
+    fake_api.throttle_rate = 0.0
+    status = await create_cohort('intro-r', 10)
+
+    assert len(fake_api.objects) > partial
+    assert len(seat_deployments(fake_api)) == 10
+    assert status['createdSeats'] == 10
+    assert status['failedSeats'] == 0
+
+
+async def test_throttled_resize_is_retried(fake_api):
+    status = await create_cohort('intro-r', 2)
+    configure_gateway(
+        apps=fake_api, core=fake_api, custom=fake_api, apply=fake_api,
+        write_limiter=None, max_retries=0
+    )
+    fake_api.throttle_rate = 1.0
+    resize = {
+        'old': 2, 'new': 4, 'spec': {'seats': 4, 'template': TEMPLATE},
+        'meta': {'uid': 'uid-intro-r'}, 'status': status,
+        'namespace': NAMESPACE, 'name': 'intro-r',
+    }
+
+    with pytest.raises(kopf.TemporaryError):
+        await cohort_resize_handler(patch={}, **resize)
+
+    fake_api.throttle_rate = 0.0
+    patch = {}
+    await cohort_resize_handler(patch=patch, **resize)
+
+    assert len(seat_deployments(fake_api)) == 4
+    assert patch['status']['createdSeats'] == 4
+
+
+async def test_cohort_becomes_ready_with_its_seats(fake_api):
+    status = await create_cohort('intro-r', 2)
+    key = ('workshopcohorts', NAMESPACE, 'intro-r')
+    fake_api.objects[key] = {'status': status}
+    summaries = {(NAMESPACE, 'intro-r'): [cohort._cohort_summary(
+        {'seats': 2}, status
+    )]}
+
+    async def seat_event(seat, ready_replicas, type='MODIFIED'):
+        await seat_readiness_event(
+            type=type, namespace=NAMESPACE,
+            labels={COHORT_LABEL: 'intro-r', 'workshop': seat},
+            spec={'replicas': 1}, status={'readyReplicas': ready_replicas},
+            cohort_summaries=summaries
+        )
+        # The cohort's own watch event catches the index up
+        summaries[(NAMESPACE, 'intro-r')] = [cohort._cohort_summary(
+            {'seats': 2}, {**status, **fake_api.objects[key]['status']}
+        )]
+
+    await seat_event('intro-r-001', 1)
+    assert fake_api.objects[key]['status']['readySeats'] == 1
+    assert fake_api.objects[key]['status']['phase'] == 'Creating'
+
+    await seat_event('intro-r-002', 1)
+    assert fake_api.objects[key]['status']['readySeats'] == 2
+    assert fake_api.objects[key]['status']['phase'] == 'Ready'
+
+    await seat_event('intro-r-002', 0, type='DELETED')
+    assert fake_api.objects[key]['status']['readySeats'] == 1
+
+
+async def test_queued_cohort_creates_no_seats(fake_api, monkeypatch):
+    ledger = CapacityLedger(headroom=1.0)
+    ledger.set_node('node-1', (2000, 2 ** 40))
+    monkeypatch.setattr(capacity, '_ledger', ledger)
+
+    patch = {}
+    with pytest.raises(kopf.TemporaryError):
+        await create_cohort('intro-r', 30, patch=patch)
+
+    assert not fake_api.objects
+    assert patch['status']['queue']['position'] == 1
+
+    ledger.set_node('node-2', (64000, 2 ** 40))
+    status = await create_cohort(
+        'intro-r', 30, status={'queue': {'position': 1}}
+    )
+
+    assert len(seat_deployments(fake_api)) == 30
+    assert status['queue'] is None
+
+
+async def test_seats_wait_for_the_golden_snapshot(fake_api):
+    template = {**TEMPLATE, 'storage': {'golden': {'sourcePVC': 'course-data'}}}
+    patch = {}
+
+    with pytest.raises(kopf.TemporaryError):
+        await cohort_create_handler(
+            spec={'seats': 3, 'template': template},
+            meta={'creationTimestamp': '', 'uid': 'uid-intro-r'},
+            status={}, patch=patch, namespace=NAMESPACE, name='intro-r'
+        )
+
+    snapshot = fake_api.objects[('volumesnapshots', NAMESPACE, 'intro-r-golden')]
+    assert snapshot['spec']['source']['persistentVolumeClaimName'] == 'course-data'
+    assert not seat_deployments(fake_api)
+    assert patch['status']['phase'] == 'Pending'
+    assert patch['status']['conditions'][0]['reason'] == 'PreparingData'
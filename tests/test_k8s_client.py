@@ -0,0 +1,93 @@
+"""The shared client registry and API gateway, built as the operator builds them."""
+
+import kubernetes
+import kubernetes.client as k8s_client
+
+import main
+from utils.k8s_client import (
+    ApplyApi,
+    close_client_registry,
+    configure_gateway,
+    get_client_registry,
+    get_gateway,
+    init_client_registry,
+)
+
+
+KUBECONFIG = """\
+apiVersion: v1
+kind: Config
+clusters:
+- name: test
+  cluster:
+    server: https://127.0.0.1:6443
+users:
+- name: test
+  user:
+    token: test-token
+contexts:
+- name: test
+  context:
+    cluster: test
+    user: test
+current-context: test
+"""
+
+
+def test_get_client_registry_creates_one_on_first_use(no_clients):
+    registry = get_client_registry()
+
+    assert get_client_registry() is registry
+    assert isinstance(registry.apps, k8s_client.AppsV1Api)
+    assert isinstance(registry.apply, ApplyApi)
+    # Every API object shares the one pooled client
+    assert registry.core.api_client is registry.api_client
+    assert registry.apply.api_client is registry.api_client
+
+
+def test_init_client_registry_replaces_the_registry(no_clients):
+    first = init_client_registry(pool_size=4)
+    second = init_client_registry(pool_size=8)
+
+    assert second is not first
+    assert get_client_registry() is second
+    assert second.pool_size == 8
+
+    close_client_registry()
+    assert get_client_registry() is not second
+
+
+def test_gateway_without_injected_apis_uses_the_registry(no_clients):
+    gateway = configure_gateway(write_limiter=None)
+    registry = get_client_registry()
+
+    assert get_gateway() is gateway
+    assert gateway.apps._api is registry.apps
+    assert gateway.core._api is registry.core
+    assert gateway.custom._api is registry.custom
+    assert gateway.apply._api is registry.apply
+
+
+def test_gateway_fills_in_apis_that_are_not_injected(no_clients, fake_api):
+    gateway = configure_gateway(apps=fake_api, write_limiter=None)
+
+    assert gateway.apps._api is fake_api
+    assert gateway.core._api is get_client_registry().core
+
+
+def test_setup_kubernetes_from_kubeconfig(no_clients, tmp_path, monkeypatch):
+    kubeconfig = tmp_path / 'config'
+    kubeconfig.write_text(KUBECONFIG)
+    monkeypatch.setenv('KUBECONFIG', str(kubeconfig))
+    monkeypatch.delenv('KUBERNETES_SERVICE_HOST', raising=False)
+    monkeypatch.setattr(
+        kubernetes.config.kube_config, 'KUBE_CONFIG_DEFAULT_LOCATION',
+        str(kubeconfig)
+    )
+
+    main.setup_kubernetes()
+    configure_gateway()
+
+    registry = get_client_registry()
+    assert registry.api_client.configuration.host == 'https://127.0.0.1:6443'
+    assert get_gateway().apps._api is registry.apps
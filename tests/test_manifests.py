@@ -0,0 +1,101 @@
+"""Manifests stamped from compiled templates match the builders' exactly."""
+
+import pytest
+
+from fakes import workshop_spec
+
+from resources.cohort import create_seat_spec
+from resources.manifests import (
+    CONTENT_HASH_ANNOTATION,
+    _compile_profile,
+    render_workshop_manifests,
+    render_workshop_manifests_uncompiled,
+)
+from resources.owner import owner_reference
+
+
+NAMESPACE = 'test'
+
+
+def with_ingress(spec, ingress):
+    return {**spec, 'ingress': ingress}
+
+
+SPECS = {
+    'default host': workshop_spec(0),
+    'no storage': workshop_spec(1, storage=False),
+    'custom host': with_ingress(workshop_spec(2), {'host': 'r.example.org'}),
+    'entry points': with_ingress(
+        workshop_spec(3), {'host': 'r.example.org', 'entryPoints': ['websecure']}
+    ),
+    'cohort seat': create_seat_spec(
+        'intro-r-007', with_ingress(workshop_spec(4), {'domain': 'example.org'})
+    ),
+    'defaults only': {'name': 'bare'},
+}
+
+
+@pytest.mark.parametrize('spec', SPECS.values(), ids=SPECS.keys())
+@pytest.mark.parametrize('owned', [False, True], ids=['unowned', 'owned'])
+def test_compiled_manifests_equal_the_builders(spec, owned):
+    name = spec.get('name', 'bench')
+    kwargs = {
+        'labels': {'orchestra.io/cohort': 'intro-r'},
+        'owner': owner_reference('Workshop', name, 'uid-1') if owned else None,
+    }
+
+    compiled = render_workshop_manifests(name, NAMESPACE, spec, **kwargs)
+    built = render_workshop_manifests_uncompiled(name, NAMESPACE, spec, **kwargs)
+
+    assert compiled == built
+
+
+def test_workshops_differing_in_host_share_a_profile():
+    _compile_profile.cache_clear()
+
+    for index in range(5):
+        name = f"ws-{index}"
+        spec = with_ingress(workshop_spec(0), {'host': f"{name}.example.org"})
+        manifests = render_workshop_manifests(name, NAMESPACE, spec)
+        route = manifests['ingress']['spec']['routes'][0]
+        assert route['match'] == f"Host(`{name}.example.org`)"
+
+    assert _compile_profile.cache_info().misses == 1
+
+
+def test_hash_follows_the_host():
+    first = render_workshop_manifests(
+        'ws', NAMESPACE, with_ingress(workshop_spec(0), {'host': 'a.example.org'})
+    )
+    second = render_workshop_manifests(
+        'ws', NAMESPACE, with_ingress(workshop_spec(0), {'host': 'b.example.org'})
+    )
+
+    def digest(manifests, kind):
+        return manifests[kind]['metadata']['annotations'][CONTENT_HASH_ANNOTATION]
+
+    assert digest(first, 'ingress') != digest(second, 'ingress')
+    assert digest(first, 'deployment') == digest(second, 'deployment')
+
+
+def test_placeholder_lookalikes_fall_back_to_the_builders():
+    spec = workshop_spec(0)
+    spec['image'] = 'registry.example.org/@@workshop@@:latest'
+
+    assert render_workshop_manifests('ws', NAMESPACE, spec) == (
+        render_workshop_manifests_uncompiled('ws', NAMESPACE, spec)
+    )
+
+
+def test_placed_workshops_match_the_builders():
+    placement = {
+        'label': 'pool', 'pool': 'a', 'packWith': {'orchestra.io/cohort': 'intro-r'}
+    }
+
+    for index in range(3):
+        spec = workshop_spec(index)
+        assert render_workshop_manifests(
+            spec['name'], NAMESPACE, spec, placement=placement
+        ) == render_workshop_manifests_uncompiled(
+            spec['name'], NAMESPACE, spec, placement=placement
+        )
@@ -0,0 +1,67 @@
+"""Node pool choice for workshops and cohorts."""
+
+import pytest
+
+from handlers.placement import PlacementPlanner
+
+
+GiB = 2 ** 30
+
+
+def key(name):
+    return ('workshops', 'test', name)
+
+
+@pytest.fixture
+def planner():
+    """Pool a: two 4 CPU / 16Gi nodes. Pool b: one 8 CPU / 32Gi node."""
+    planner = PlacementPlanner(label='pool', headroom=1.0)
+    planner.set_node('a-1', 'a', (4000, 16 * GiB))
+    planner.set_node('a-2', 'a', (4000, 16 * GiB))
+    planner.set_node('b-1', 'b', (8000, 32 * GiB))
+    return planner
+
+
+def test_no_pool_is_chosen_before_any_node_is_seen():
+    assert PlacementPlanner().choose((500, GiB)) is None
+
+
+def test_the_fullest_pool_that_fits_is_chosen(planner):
+    planner.reserve(key('running'), 'b', (6000, 8 * GiB))
+
+    # Pool b is left with less of its capacity free
+    assert planner.choose((1000, 4 * GiB)) == 'b'
+    # Pool b has no room for this one
+    assert planner.choose((3000, 4 * GiB)) == 'a'
+
+
+def test_the_tightest_resource_decides(planner):
+    planner.reserve(key('memory-heavy'), 'a', (1000, 28 * GiB))
+
+    # Pool a has CPU to spare, but too little memory
+    assert planner.choose((1000, 8 * GiB)) == 'b'
+    assert planner.choose((1000, 2 * GiB)) == 'a'
+
+
+def test_nothing_is_chosen_when_no_pool_has_room(planner):
+    assert planner.choose((9000, GiB)) is None
+
+
+def test_released_and_removed_capacity_is_accounted_for(planner):
+    planner.reserve(key('large'), 'b', (8000, 32 * GiB))
+    planner.set_node('a-2', None, None)
+
+    assert planner.free('a') == (4000, 16 * GiB)
+    assert planner.choose((5000, GiB)) is None
+
+    planner.release(key('large'))
+    assert planner.choose((5000, GiB)) == 'b'
+
+
+def test_placing_again_keeps_the_pool(planner):
+    first = planner.place(key('ws'), (1000, GiB), pack_with={'app': 'rstudio'})
+    # Pool a is now full, but the workshop is already counted in it
+    planner.reserve(key('other'), 'a', (7000, 30 * GiB))
+
+    assert planner.place(key('ws'), (1000, GiB))['pool'] == 'a'
+    assert first == {'label': 'pool', 'pool': 'a', 'packWith': {'app': 'rstudio'}}
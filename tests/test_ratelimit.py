@@ -0,0 +1,126 @@
+"""Client-side write rate limiting: the token bucket and the priority scheduler."""
+
+import asyncio
+import time
+
+import pytest
+
+from utils.ratelimit import (
+    MAX_RETRY_AFTER,
+    PRIORITY_CREATE,
+    PRIORITY_DELETE,
+    PRIORITY_UPDATE,
+    TokenBucket,
+    WriteScheduler,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_admits_a_burst_then_paces():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=3, clock=clock)
+
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.1)
+
+    clock.now += 0.1
+    assert bucket.take() == 0.0
+    assert bucket.take() > 0
+
+
+def test_bucket_refills_no_further_than_the_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+    bucket.take()
+    bucket.take()
+
+    clock.now += 60
+    assert [bucket.take() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.take() > 0
+
+
+def test_bucket_rejects_a_zero_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1)
+
+
+async def admit_in_order(scheduler, priorities):
+    """Queue one write per priority, in order; return the order admitted."""
+    admitted = []
+
+    async def write(index, priority):
+        await scheduler.acquire(priority)
+        admitted.append(index)
+
+    tasks = [
+        asyncio.create_task(write(index, priority))
+        for index, priority in enumerate(priorities)
+    ]
+    await asyncio.gather(*tasks)
+    return admitted
+
+
+async def test_scheduler_admits_deletes_then_updates_then_creates():
+    scheduler = WriteScheduler(rate=100, burst=1)
+    # Use up the burst so every write below has to queue
+    await scheduler.acquire(PRIORITY_CREATE)
+
+    admitted = await admit_in_order(
+        scheduler, [PRIORITY_CREATE, PRIORITY_UPDATE, PRIORITY_DELETE, PRIORITY_CREATE]
+    )
+    scheduler.close()
+
+    assert admitted == [2, 1, 0, 3]
+
+
+async def test_scheduler_keeps_arrival_order_within_a_priority():
+    scheduler = WriteScheduler(rate=100, burst=1)
+    await scheduler.acquire(PRIORITY_UPDATE)
+
+    admitted = await admit_in_order(scheduler, [PRIORITY_UPDATE] * 5)
+    scheduler.close()
+
+    assert admitted == [0, 1, 2, 3, 4]
+
+
+async def test_pause_holds_every_write():
+    scheduler = WriteScheduler(rate=1000, burst=10)
+    scheduler.pause(0.2)
+
+    started = time.monotonic()
+    await scheduler.acquire(PRIORITY_DELETE)
+    waited = time.monotonic() - started
+    scheduler.close()
+
+    assert waited >= 0.15
+    assert scheduler.stats()['throttled'] == 1
+
+
+async def test_close_cancels_queued_writers():
+    scheduler = WriteScheduler(rate=0.01, burst=1)
+    await scheduler.acquire(PRIORITY_CREATE)
+    waiter = asyncio.create_task(scheduler.acquire(PRIORITY_CREATE))
+    await asyncio.sleep(0)
+
+    scheduler.close()
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert len(scheduler) == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({'Retry-After': '2'}) == 2.0
+    assert parse_retry_after({'retry-after': '0.5'}) == 0.5
+    assert parse_retry_after({'Retry-After': '86400'}) == MAX_RETRY_AFTER
+    assert parse_retry_after({'Retry-After': 'soon'}) is None
+    assert parse_retry_after({}) is None
+    assert parse_retry_after(None) is None
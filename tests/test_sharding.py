@@ -0,0 +1,56 @@
+"""The consistent-hash ring that splits workshops between operator replicas."""
+
+from utils.sharding import HashRing, shard_key
+
+
+KEYS = [shard_key('test', f"bench-{index:05d}") for index in range(2000)]
+
+
+def owners(ring):
+    return {key: ring.owner(key) for key in KEYS}
+
+
+def test_empty_ring_owns_nothing():
+    assert HashRing().owner(KEYS[0]) is None
+
+
+def test_every_key_has_one_stable_owner():
+    members = {'replica-a', 'replica-b', 'replica-c'}
+    ring = HashRing(members)
+
+    assignment = owners(ring)
+
+    assert set(assignment.values()) == members
+    # Independent of construction order, so every replica agrees
+    assert owners(HashRing(sorted(members, reverse=True))) == assignment
+
+
+def test_keys_are_split_roughly_evenly():
+    ring = HashRing(['replica-a', 'replica-b', 'replica-c', 'replica-d'])
+
+    counts = {}
+    for owner in owners(ring).values():
+        counts[owner] = counts.get(owner, 0) + 1
+
+    assert max(counts.values()) < 1.5 * len(KEYS) / 4
+
+
+def test_adding_a_member_only_moves_keys_to_it():
+    before = owners(HashRing(['replica-a', 'replica-b', 'replica-c']))
+    after = owners(HashRing(['replica-a', 'replica-b', 'replica-c', 'replica-d']))
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+
+    assert {after[key] for key in moved} == {'replica-d'}
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_removing_a_member_only_moves_its_keys():
+    before = owners(HashRing(['replica-a', 'replica-b', 'replica-c']))
+    after = owners(HashRing(['replica-a', 'replica-c']))
+
+    for key in KEYS:
+        if before[key] != 'replica-b':
+            assert after[key] == before[key]
+        else:
+            assert after[key] in ('replica-a', 'replica-c')
@@ -0,0 +1,113 @@
+"""Coalesced Workshop status writes."""
+
+import pytest
+from kubernetes.client.rest import ApiException
+
+from handlers.status import StatusWriter, merge_conditions, status_changes
+
+
+NAMESPACE = 'test'
+WINDOW = 0.05
+
+
+def condition(type, status, since='2026-01-01T00:00:00Z'):
+    return {'type': type, 'status': status, 'lastTransitionTime': since}
+
+
+@pytest.fixture
+def workshop(fake_api):
+    """A Workshop object, and the list of statuses written to it."""
+    key = ('workshops', NAMESPACE, 'ws')
+    fake_api.objects[key] = {'status': {}}
+    written = []
+    fake_api.watch(
+        lambda verb, changed, obj: changed == key and written.append(obj['status'])
+    )
+    return fake_api.objects, written
+
+
+def test_unchanged_conditions_keep_their_transition_time():
+    merged = merge_conditions(
+        [condition('Ready', 'False', 'then'), condition('Hibernated', 'False', 'then')],
+        [condition('Ready', 'False', 'now'), condition('Hibernated', 'True', 'now')],
+    )
+
+    assert merged == [
+        condition('Ready', 'False', 'then'), condition('Hibernated', 'True', 'now')
+    ]
+
+
+def test_oldest_conditions_are_dropped_beyond_the_limit():
+    merged = merge_conditions(
+        [condition(f"Type{index}", 'True') for index in range(3)],
+        [condition('Ready', 'True')],
+        limit=3,
+    )
+
+    assert [c['type'] for c in merged] == ['Type1', 'Type2', 'Ready']
+
+
+def test_only_changed_fields_are_written():
+    current = {'phase': 'Ready', 'url': 'https://ws', 'resources': {'cpu': '1'}}
+
+    assert status_changes(current, {'phase': 'Ready', 'url': 'https://ws'}) == {}
+    assert status_changes(
+        current, {'phase': 'Hibernated', 'resources': {'cpu': '1', 'memory': '2Gi'}}
+    ) == {'phase': 'Hibernated', 'resources': {'memory': '2Gi'}}
+
+
+async def test_first_update_is_written_at_once(workshop):
+    objects, written = workshop
+    writer = StatusWriter(window=10)
+
+    assert await writer.write(NAMESPACE, 'ws', {'phase': 'Ready'})
+    assert written == [{'phase': 'Ready'}]
+
+
+async def test_updates_within_a_window_are_merged(workshop):
+    objects, written = workshop
+    writer = StatusWriter(window=WINDOW)
+    await writer.write(NAMESPACE, 'ws', {'phase': 'Creating'})
+
+    # Both land in one trailing write, the later value winning
+    writer.submit(NAMESPACE, 'ws', {'phase': 'Ready', 'url': 'https://ws'})
+    last = writer.submit(NAMESPACE, 'ws', {'phase': 'Hibernated'})
+    assert await last
+
+    assert len(written) == 2
+    assert objects[('workshops', NAMESPACE, 'ws')]['status'] == {
+        'phase': 'Hibernated', 'url': 'https://ws'
+    }
+
+
+async def test_update_that_changes_nothing_is_not_written(workshop):
+    objects, written = workshop
+    writer = StatusWriter(window=WINDOW)
+    writer.observe(NAMESPACE, 'ws', {'phase': 'Ready'})
+
+    assert not await writer.write(NAMESPACE, 'ws', {'phase': 'Ready'})
+    assert written == []
+
+
+async def test_stop_flushes_pending_writes(workshop):
+    objects, written = workshop
+    writer = StatusWriter(window=WINDOW)
+    await writer.write(NAMESPACE, 'ws', {'phase': 'Creating'})
+    writer.submit(NAMESPACE, 'ws', {'phase': 'Ready'})
+
+    await writer.stop()
+
+    assert written[-1] == {'phase': 'Ready'}
+
+
+async def test_failed_write_reaches_the_caller(fake_api):
+    writer = StatusWriter(window=WINDOW)
+
+    with pytest.raises(ApiException) as error:
+        await writer.write(NAMESPACE, 'missing', {'phase': 'Ready'})
+
+    assert error.value.status == 404
+
+    # The failed write is not remembered as the workshop's status
+    fake_api.objects[('workshops', NAMESPACE, 'missing')] = {'status': {}}
+    assert await writer.write(NAMESPACE, 'missing', {'phase': 'Ready'})
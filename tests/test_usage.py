@@ -0,0 +1,117 @@
+"""Rolling quantile sketches of pod usage, and the rightsizer built on them."""
+
+import random
+
+import pytest
+
+from handlers.rightsizing import Rightsizer, rightsized
+from utils.usage import RollingQuantiles, StaticUsageSource, UsageSample, UsageSource
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_quantiles_are_within_the_accuracy():
+    sketch = RollingQuantiles(accuracy=0.02, clock=FakeClock())
+    generator = random.Random(1)
+    values = sorted(generator.lognormvariate(0, 1) for _ in range(5000))
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+    assert len(sketch) == 5000
+    # The size follows the spread of the values, not their number
+    assert sketch.buckets < 500
+
+
+def test_empty_sketch_has_no_quantiles():
+    assert RollingQuantiles().quantile(0.5) is None
+
+
+def test_old_slices_leave_the_window():
+    clock = FakeClock()
+    sketch = RollingQuantiles(window=3600, slices=4, clock=clock)
+    for _ in range(10):
+        sketch.add(7.0)
+    clock.now = 1800
+    sketch.add(3.0)
+
+    assert len(sketch) == 11
+    assert sketch.quantile(0.5) == pytest.approx(7.0, rel=0.02)
+
+    # The first slice is dropped, the later one is kept
+    clock.now = 3600
+    assert len(sketch) == 1
+    assert sketch.quantile(0.5) == pytest.approx(3.0, rel=0.02)
+
+
+def test_usage_source_must_implement_usage():
+    class Incomplete(UsageSource):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+async def sampled_rightsizer(auto, cpu_cores, memory_bytes, samples=40):
+    source = StaticUsageSource()
+    rightsizer = Rightsizer(source, auto=auto, min_samples=30, clock=FakeClock())
+    source.set(('test', 'ws-deployment-1'), UsageSample(
+        'rocker/rstudio:4.3', cpu_cores, memory_bytes
+    ))
+    for _ in range(samples):
+        await rightsizer.collect()
+    return rightsizer
+
+
+async def test_no_recommendation_before_enough_samples():
+    rightsizer = await sampled_rightsizer(False, 0.2, 2 ** 29, samples=10)
+
+    assert rightsizer.rightsize({'image': 'rocker/rstudio:4.3'}) is None
+
+
+async def test_recommendation_is_usage_plus_margin():
+    rightsizer = await sampled_rightsizer(False, 0.2, 2 ** 29)
+
+    rightsizing = rightsizer.rightsize({'image': 'rocker/rstudio:4.3'})
+
+    # 200m and 512Mi, plus 15%, rounded up to the next step
+    assert rightsizing == {
+        'cpuRequest': '250m', 'memoryRequest': '640Mi',
+        'samples': 40, 'applied': False,
+    }
+    # Only recorded: the spec's requests stand
+    spec = {'resources': {'cpuRequest': '500m'}}
+    assert rightsized(spec, rightsizing) is spec
+
+
+async def test_auto_mode_never_raises_the_requests():
+    rightsizer = await sampled_rightsizer(True, 0.8, 3 * 2 ** 30)
+    spec = {
+        'image': 'rocker/rstudio:4.3',
+        'resources': {'cpuRequest': '500m', 'memoryRequest': '1Gi'},
+    }
+
+    rightsizing = rightsizer.rightsize(spec)
+
+    assert rightsizing['cpuRequest'] == '500m'
+    assert rightsizing['memoryRequest'] == '1Gi'
+    assert rightsized(spec, rightsizing)['resources'] == spec['resources']
+
+
+async def test_auto_mode_applies_smaller_requests():
+    rightsizer = await sampled_rightsizer(True, 0.2, 2 ** 29)
+    spec = {'image': 'rocker/rstudio:4.3', 'resources': {'cpu': '2'}}
+
+    resources = rightsized(spec, rightsizer.rightsize(spec))['resources']
+
+    assert resources == {
+        'cpu': '2', 'cpuRequest': '250m', 'memoryRequest': '640Mi'
+    }
@@ -0,0 +1,162 @@
+"""Claiming warm pool entries, including claims that fail halfway."""
+
+import pytest
+from kubernetes.client.rest import ApiException
+
+from fakes import workshop_spec
+
+import handlers.warm_pool as warm_pool
+from handlers.children import (
+    CHILD_INDEXES,
+    workshop_deployments,
+    workshop_services,
+)
+from handlers.warm_pool import (
+    POOL_STATE_LABEL,
+    PoolProfile,
+    WarmPool,
+    claimed_entry,
+)
+from handlers.workshop import workshop_create_handler
+from resources.manifests import to_manifest
+
+
+NAMESPACE = 'test'
+
+
+async def pool_with_entry(fake_api):
+    """A warm pool with one idle entry, seen on the watch stream."""
+    spec = workshop_spec(0, storage=False)
+    pool = WarmPool([PoolProfile(NAMESPACE, spec['image'], spec['resources'])])
+    await pool.refill()
+    deployment, = [
+        to_manifest(obj) for key, obj in fake_api.objects.items()
+        if key[0] == 'deployment'
+    ]
+    metadata = {**deployment['metadata'], 'resourceVersion': '1'}
+    pool.observe(
+        None, NAMESPACE, metadata['labels'], deployment['spec'], {}, metadata
+    )
+    return pool, spec, metadata['labels']['app']
+
+
+def fail_service_patch(fake_api, status):
+    def patch_namespaced_service(**kwargs):
+        raise ApiException(status=status, reason='Injected')
+
+    fake_api.patch_namespaced_service = patch_namespaced_service
+
+
+async def test_claim_relabels_the_entry(fake_api):
+    pool, spec, entry = await pool_with_entry(fake_api)
+
+    claimed = await pool.claim(NAMESPACE, spec['name'], spec)
+
+    assert claimed == {
+        'entry': entry,
+        'deployment': f"{entry}-deployment",
+        'service': f"{entry}-service",
+    }
+    for kind in ('deployment', 'service'):
+        labels = fake_api.objects[(kind, NAMESPACE, claimed[kind])]['metadata'][
+            'labels'
+        ]
+        assert labels == {'workshop': spec['name'], POOL_STATE_LABEL: 'claimed'}
+
+
+async def test_failed_service_patch_releases_the_deployment(fake_api):
+    pool, spec, entry = await pool_with_entry(fake_api)
+    fail_service_patch(fake_api, 500)
+
+    with pytest.raises(ApiException):
+        await pool.claim(NAMESPACE, spec['name'], spec)
+
+    deployment = fake_api.objects[('deployment', NAMESPACE, f"{entry}-deployment")]
+    assert deployment['metadata']['labels'] == {
+        'workshop': entry, POOL_STATE_LABEL: 'idle'
+    }
+    assert deployment['metadata']['ownerReferences'] is None
+    # The entry can still be claimed once the API server recovers
+    assert pool.idle_count(pool.profiles[0].key) == 1
+
+
+async def test_service_gone_during_claim_is_a_miss(fake_api):
+    pool, spec, entry = await pool_with_entry(fake_api)
+    fail_service_patch(fake_api, 404)
+
+    assert await pool.claim(NAMESPACE, spec['name'], spec) is None
+    deployment = fake_api.objects[('deployment', NAMESPACE, f"{entry}-deployment")]
+    assert deployment['metadata']['labels'][POOL_STATE_LABEL] == 'idle'
+
+
+def claimed_children(entry, workshop_name):
+    """Kopf indexes as they look after ``entry`` was claimed for a workshop."""
+    labels = {
+        'app': entry, 'component': 'rstudio', 'workshop': workshop_name,
+        POOL_STATE_LABEL: 'claimed',
+    }
+    meta = {'labels': labels}
+    indexes = {name: {} for name in CHILD_INDEXES.values()}
+    for index_name, summaries in (
+        ('workshop_deployments', workshop_deployments(
+            namespace=NAMESPACE, name=f"{entry}-deployment", labels=labels,
+            meta=meta, spec={'replicas': 1}, status={'availableReplicas': 1}
+        )),
+        ('workshop_services', workshop_services(
+            namespace=NAMESPACE, name=f"{entry}-service", labels=labels,
+            meta=meta
+        )),
+    ):
+        for key, summary in summaries.items():
+            indexes[index_name][key] = [summary]
+    return indexes
+
+
+def test_claimed_entry_is_recognized_among_the_children():
+    indexes = claimed_children('pool-abc', 'bench-00000')
+    children = {
+        kind: indexes[index_name][(NAMESPACE, 'bench-00000')][0]
+        for kind, index_name in CHILD_INDEXES.items()
+        if (NAMESPACE, 'bench-00000') in indexes[index_name]
+    }
+
+    assert claimed_entry(children) == {
+        'entry': 'pool-abc',
+        'deployment': 'pool-abc-deployment',
+        'service': 'pool-abc-service',
+    }
+    assert claimed_entry({'deployment': {'name': 'bench-00000-deployment'}}) is None
+    assert claimed_entry(None) is None
+
+
+async def test_create_retry_keeps_the_claimed_entry(fake_api, monkeypatch):
+    pool, spec, entry = await pool_with_entry(fake_api)
+    monkeypatch.setattr(warm_pool, '_pool', pool)
+    placed = []
+    monkeypatch.setattr(
+        'handlers.workshop.place_workshop',
+        lambda namespace, name, spec: placed.append(name) or {'pool': 'a'}
+    )
+    patch = {}
+
+    await workshop_create_handler(
+        spec=spec, meta={'creationTimestamp': '', 'uid': 'uid-0'}, patch=patch,
+        status={}, namespace=NAMESPACE, name=spec['name'],
+        **claimed_children(entry, spec['name'])
+    )
+
+    assert patch['status']['warmPool']['entry'] == entry
+    # Only the IngressRoute is created, routed to the claimed entry
+    workshop_children = {
+        key for key in fake_api.objects if key[2].startswith(spec['name'])
+    }
+    assert workshop_children == {
+        ('ingressroutes', NAMESPACE, f"{spec['name']}-ingress")
+    }
+    route = fake_api.objects[('ingressroutes', NAMESPACE, f"{spec['name']}-ingress")]
+    assert route['spec']['routes'][0]['services'][0]['name'] == f"{entry}-service"
+    # The idle entry is not claimed again
+    assert pool.idle_count(pool.profiles[0].key) == 1
+    # The entry's pod is already running, so there is nothing to place
+    assert placed == []
+    assert 'placement' not in patch['status']
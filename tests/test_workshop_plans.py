@@ -0,0 +1,138 @@
+"""Create and delete plans of a workshop's children, run against the fake API."""
+
+import pytest
+
+from fakes import workshop_spec
+
+from handlers.provisioning import ProvisioningError
+from handlers.workshop import (
+    build_create_plan,
+    build_delete_plan,
+    workshop_create_handler,
+    workshop_delete_handler,
+)
+from resources.manifests import CONTENT_HASH_ANNOTATION
+from resources.owner import owner_reference
+from utils.k8s_client import get_gateway
+
+
+NAMESPACE = 'test'
+CHILDREN = {
+    ('persistent_volume_claim', NAMESPACE, 'bench-00000-pvc'),
+    ('deployment', NAMESPACE, 'bench-00000-deployment'),
+    ('service', NAMESPACE, 'bench-00000-service'),
+    ('ingressroutes', NAMESPACE, 'bench-00000-ingress'),
+}
+
+
+def record_changes(fake_api):
+    """Collect ``(verb, kind)`` of every change to the fake's store, in order."""
+    changes = []
+    fake_api.watch(lambda verb, key, obj: changes.append((verb, key[0])))
+    return changes
+
+
+async def test_create_plan_creates_every_child(fake_api):
+    changes = record_changes(fake_api)
+    spec = workshop_spec(0)
+    plan = build_create_plan(get_gateway(), spec['name'], NAMESPACE, spec)
+
+    assert len(plan) == 4
+    results = await plan.run()
+
+    assert results['ingress'] == 'https://bench-00000.orchestraplatform.org'
+    assert set(fake_api.objects) == CHILDREN
+    # The Deployment mounts the PVC, so it is created after it
+    assert changes.index(('create', 'deployment')) > changes.index(
+        ('create', 'persistent_volume_claim')
+    )
+    for obj in fake_api.objects.values():
+        assert CONTENT_HASH_ANNOTATION in obj['metadata']['annotations']
+
+
+async def test_create_plan_stamps_the_owner(fake_api):
+    spec = workshop_spec(0)
+    owner = owner_reference('Workshop', spec['name'], 'uid-0')
+
+    await build_create_plan(
+        get_gateway(), spec['name'], NAMESPACE, spec, owner=owner
+    ).run()
+
+    for obj in fake_api.objects.values():
+        references = obj['metadata']['ownerReferences']
+        assert [reference['uid'] for reference in references] == ['uid-0']
+
+
+async def test_create_plan_skips_children_that_exist(fake_api):
+    spec = workshop_spec(0, storage=False)
+    plan = build_create_plan(
+        get_gateway(), spec['name'], NAMESPACE, spec,
+        present={'deployment', 'service'}
+    )
+
+    await plan.run()
+
+    assert set(fake_api.objects) == {
+        ('ingressroutes', NAMESPACE, 'bench-00000-ingress')
+    }
+
+
+async def test_create_plan_reports_the_failed_stage(fake_api):
+    fake_api.error_rate = 1.0
+    spec = workshop_spec(0, storage=False)
+
+    with pytest.raises(ProvisioningError) as failure:
+        await build_create_plan(get_gateway(), spec['name'], NAMESPACE, spec).run()
+
+    assert failure.value.stage in ('deployment', 'service', 'ingress')
+    assert not fake_api.objects
+
+
+async def test_delete_plan_removes_every_child(fake_api):
+    spec = workshop_spec(0)
+    await build_create_plan(get_gateway(), spec['name'], NAMESPACE, spec).run()
+    other = workshop_spec(1)
+    await build_create_plan(get_gateway(), other['name'], NAMESPACE, other).run()
+    changes = record_changes(fake_api)
+
+    await build_delete_plan(get_gateway(), spec['name'], NAMESPACE).run()
+
+    assert not set(fake_api.objects) & CHILDREN
+    assert len(fake_api.objects) == 4
+    # The volume is never pulled from under a running pod
+    assert changes.index(('deletecollection', 'persistent_volume_claim')) > (
+        changes.index(('deletecollection', 'deployment'))
+    )
+
+
+async def test_delete_plan_skips_children_that_are_gone(fake_api):
+    spec = workshop_spec(0)
+    await build_create_plan(get_gateway(), spec['name'], NAMESPACE, spec).run()
+
+    await build_delete_plan(
+        get_gateway(), spec['name'], NAMESPACE, present={'service'}
+    ).run()
+
+    assert set(fake_api.objects) == CHILDREN - {
+        ('service', NAMESPACE, 'bench-00000-service')
+    }
+
+
+async def test_create_and_delete_handlers(fake_api):
+    spec = workshop_spec(0)
+    patch = {}
+
+    await workshop_create_handler(
+        spec=spec, meta={'creationTimestamp': '', 'uid': 'uid-0'}, patch=patch,
+        status={}, namespace=NAMESPACE, name=spec['name']
+    )
+
+    assert patch['status']['phase'] == 'Creating', patch['status']
+    assert patch['status']['url'] == 'https://bench-00000.orchestraplatform.org'
+    assert set(fake_api.objects) == CHILDREN
+
+    await workshop_delete_handler(
+        meta={'uid': 'uid-0'}, namespace=NAMESPACE, name=spec['name']
+    )
+
+    assert not fake_api.objects